@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Compare the wall-clock time of sequential and concurrent wheel builds.
+
+The builds run through the real ``build_all`` scheduler and ``pip wheel``
+command line, but each Python interpreter is a stub script that sleeps and
+then drops a wheel into ``--wheel-dir``.  Packages named ``pure-*`` build a
+``py3-none-any`` wheel (so later Python versions skip them) and ``broken-*``
+fail, which exercises the built/skipped/excluded/failed accounting.
+
+    python benchmark_build.py --packages 40 --sleep 0.2 --jobs 8
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from build import build_all, BuildSummary, cp_tag, WheelIndex
+
+
+PYTHON_VERSIONS = ["3.10", "3.11", "3.12", "3.13", "3.13t"]
+ARCH = "x86_64"
+
+STUB = """#!/bin/sh
+# Called as: <stub> -m pip wheel --no-deps --wheel-dir DIR NAME==VERSION
+sleep {sleep}
+name=${{7%%==*}}
+version=${{7#*==}}
+# Wheel filenames use the normalised name
+wheel_name=$(echo "$name" | tr - _)
+case "$name" in
+  broken-*) exit 1 ;;
+  pure-*) touch "$6/$wheel_name-$version-py3-none-any.whl" ;;
+  *) touch "$6/$wheel_name-$version-{tag}-{tag}-manylinux_2_28_{arch}.whl" ;;
+esac
+"""
+
+
+def make_interpreters(root: Path, sleep: float) -> dict[str, str]:
+    interpreters = {}
+    for pyver in PYTHON_VERSIONS:
+        stub = root / f"python{pyver}"
+        stub.write_text(STUB.format(sleep=sleep, tag=cp_tag(pyver), arch=ARCH))
+        stub.chmod(0o755)
+        interpreters[pyver] = str(stub)
+    return interpreters
+
+
+def make_packages(count: int) -> list[str]:
+    packages = []
+    for i in range(count):
+        kind = ("native", "native", "pure", "broken")[i % 4]
+        packages.append(f"{kind}-{i}=={i}.0")
+    return packages
+
+
+def run(
+    packages: list[str],
+    interpreters: dict[str, str],
+    existing: list[str],
+    skip_set: set[str],
+    root: Path,
+    jobs: int,
+) -> tuple[BuildSummary, list[str], float]:
+    uploaded: list[str] = []
+    existing_wheels = WheelIndex(existing)
+    start = time.perf_counter()
+    # Keep the report readable, every build logs a few lines
+    with contextlib.redirect_stdout(io.StringIO()):
+        summary = build_all(
+            packages,
+            interpreters,
+            arch=ARCH,
+            existing_wheels=existing_wheels,
+            skip_set=skip_set,
+            force_rebuild="",
+            wheel_dir=root / f"wheels-{jobs}",
+            script_dir=root,
+            upload=lambda whl: uploaded.append(whl.name),
+            jobs=jobs,
+        )
+    elapsed = time.perf_counter() - start
+    # Builds finish in a different order
+    summary.failures.sort()
+    return summary, uploaded, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--packages", type=int, default=40)
+    parser.add_argument("--sleep", type=float, default=0.2)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    packages = make_packages(args.packages)
+    # A few wheels already in the cache, and a few unsupported combinations
+    existing = [
+        f"native_{i}-{i}.0-cp312-cp312-manylinux_2_28_{ARCH}.whl"
+        for i in range(0, args.packages, 8)
+    ]
+    skip_set = {f"native_{i}=={i}.0:3.10" for i in range(1, args.packages, 8)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        interpreters = make_interpreters(root, args.sleep)
+        print(
+            f"{len(packages)} packages x {len(interpreters)} Python versions,"
+            f" {args.sleep}s per build"
+        )
+        results = {}
+        for jobs in (1, args.jobs):
+            summary, uploaded, elapsed = run(
+                packages, interpreters, existing, skip_set, root, jobs
+            )
+            results[jobs] = (summary, sorted(uploaded))
+            print(
+                f"jobs={jobs:<3d} {elapsed:7.2f}s  built={summary.built}"
+                f"  skipped={summary.skipped}  excluded={summary.excluded}"
+                f"  failed={summary.failed}"
+            )
+
+    assert results[1] == results[args.jobs], "concurrent builds changed the outcome"
+
+
+if __name__ == "__main__":
+    main()
@@ -3,18 +3,31 @@
 
 Builds every requested package/Python-version combination and uploads the
 resulting wheels to an S3 bucket.  Wheels that already exist in S3 are
-skipped.  Expected build failures are reported via GitHub Actions
-``::warning::`` annotations; unexpected errors (S3, environment) abort
-the script with a non-zero exit code.
+skipped.  Up to ``BUILD_JOBS`` (default: 1) builds of different packages
+run concurrently, and built wheels upload in the background while the later
+builds run.  Expected build failures are reported
+via GitHub Actions ``::warning::`` annotations; unexpected errors (S3,
+environment) abort the script with a non-zero exit code.
 """
 
+import functools
 import os
 import re
 import shutil
 import subprocess
 import sys
+import tempfile
+import threading
+from concurrent.futures import as_completed, Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Union
+from typing import Any, Callable, Iterable, Optional, Union
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore import UNSIGNED
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
 
 
 # ---------------------------------------------------------------------------
@@ -23,6 +36,12 @@ from typing import Union
 
 BUILD_DIR = Path("/tmp/pypi-cache-build")
 FAILURE_SUMMARY_PATH = Path("/tmp/pypi-cache-failure-summary.txt")
+# Concurrent builds unless BUILD_JOBS is set. Builds can run parallel compilers
+# and need a lot of memory each, so this doesn't scale with the CPU count
+BUILD_JOBS = 1
+# Wheels uploading at the same time, and parts of each (large) wheel
+UPLOAD_JOBS = 4
+UPLOAD_PART_JOBS = 4
 
 # ---------------------------------------------------------------------------
 # Pure helpers (unit-testable, no I/O)
@@ -54,24 +73,14 @@ def normalize_name(name: str) -> str:
     return re.sub(r"[-_.]+", "_", name.lower())
 
 
-def wheel_matches(
-    norm_name: str,
-    version: str,
-    tag: str,
-    arch: str,
-    existing_names: list[str],
-) -> bool:
-    """Return True if a matching wheel already exists in *existing_names*.
-
-    Checks three patterns (same precedence as the original bash):
-      1. Native cpython wheel with a specific ABI tag.
-      2. Pure-python wheel (``py3-none-any``).
-      3. Platform-specific but python-version-independent wheel.
-    """
+@functools.lru_cache(maxsize=1024)
+def _wheel_patterns(
+    norm_name: str, version: str, tag: str, arch: str
+) -> tuple[re.Pattern[str], ...]:
     esc_name = re.escape(norm_name)
     esc_ver = re.escape(version)
     esc_arch = re.escape(arch)
-    patterns = [
+    return (
         re.compile(
             rf"^{esc_name}-{esc_ver}(-[^-]+)?-[^-]*-{tag}-.*manylinux.*{esc_arch}\.whl$",
             re.IGNORECASE,
@@ -84,7 +93,27 @@ def wheel_matches(
             rf"^{esc_name}-{esc_ver}-py[23][^-]*-none-.*manylinux.*{esc_arch}\.whl$",
             re.IGNORECASE,
         ),
-    ]
+    )
+
+
+def wheel_matches(
+    norm_name: str,
+    version: str,
+    tag: str,
+    arch: str,
+    existing_names: list[str],
+) -> bool:
+    """Return True if a matching wheel already exists in *existing_names*.
+
+    Checks three patterns (same precedence as the original bash):
+      1. Native cpython wheel with a specific ABI tag.
+      2. Pure-python wheel (``py3-none-any``).
+      3. Platform-specific but python-version-independent wheel.
+
+    This scans every name; :class:`WheelIndex` answers the same question
+    without doing so.
+    """
+    patterns = _wheel_patterns(norm_name, version, tag, arch)
     for name in existing_names:
         for pat in patterns:
             if pat.match(name):
@@ -92,6 +121,60 @@ def wheel_matches(
     return False
 
 
+def _is_manylinux_for(rest: str, arch: str) -> bool:
+    """Whether *rest* (lowercased) matches ``.*manylinux.*{arch}\\.whl$``."""
+    suffix = f"{arch}.whl"
+    return rest.endswith(suffix) and "manylinux" in rest[: -len(suffix)]
+
+
+class WheelIndex:
+    """Wheel filenames indexed by (lowercased) name and version.
+
+    Answers the same question as :func:`wheel_matches` by only looking at the
+    wheels of the queried name and version, instead of scanning every name in
+    the cache, and takes new wheels with :meth:`add` as they are built.
+    """
+
+    def __init__(self, names: Iterable[str] = ()) -> None:
+        self.names: list[str] = []
+        # (name, version) -> the rest of each filename's dash-separated parts
+        self._index: dict[tuple[str, str], list[list[str]]] = {}
+        for name in names:
+            self.add(name)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, name: str) -> None:
+        self.names.append(name)
+        parts = name.lower().split("-")
+        if len(parts) >= 3:
+            self._index.setdefault((parts[0], parts[1]), []).append(parts[2:])
+
+    def matches(self, norm_name: str, version: str, tag: str, arch: str) -> bool:
+        if "-" in norm_name or "-" in version:
+            # Can't be split on dashes, fall back to the regex scan
+            return wheel_matches(norm_name, version, tag, arch, self.names)
+        tag = tag.lower()
+        arch = arch.lower()
+        for rest in self._index.get((norm_name.lower(), version.lower()), ()):
+            # 1. [build-]python-{tag}-...manylinux...{arch}.whl
+            if len(rest) >= 3 and rest[1] == tag:
+                if _is_manylinux_for("-".join(rest[2:]), arch):
+                    return True
+            if len(rest) >= 4 and rest[0] and rest[2] == tag:
+                if _is_manylinux_for("-".join(rest[3:]), arch):
+                    return True
+            if len(rest) >= 3 and rest[0][:3] in ("py2", "py3") and rest[1] == "none":
+                # 2. py3-none-any.whl
+                if len(rest) == 3 and rest[2] == "any.whl":
+                    return True
+                # 3. py3-none-...manylinux...{arch}.whl
+                if _is_manylinux_for("-".join(rest[2:]), arch):
+                    return True
+        return False
+
+
 def load_skip_list(skip_file: Path) -> set[str]:
     """Parse *skip_python_versions.txt* into ``{'norm==ver:pyver', ...}``."""
     result: set[str] = set()
@@ -158,34 +241,125 @@ def _no_sign() -> bool:
     return os.environ.get("AWS_NO_SIGN_REQUEST", "").lower() in ("1", "true", "yes")
 
 
-def aws_s3_cp(src: str, dst: str, *, recursive: bool = False) -> None:
-    """``aws s3 cp`` wrapper.  Raises on failure."""
-    cmd = ["aws", "s3", "cp", src, dst]
-    if recursive:
-        cmd.append("--recursive")
-    if _no_sign():
-        cmd.append("--no-sign-request")
-    run_cmd(cmd)
+# ---------------------------------------------------------------------------
+# S3 transfers
+# ---------------------------------------------------------------------------
 
 
-def aws_s3_ls(path: str) -> list[str]:
-    """``aws s3 ls`` wrapper.  Returns list of ``.whl`` filenames.
+def make_s3_client() -> Any:
+    """S3 client for the wheel cache, unsigned with ``AWS_NO_SIGN_REQUEST``.
 
-    Returns an empty list when the prefix does not exist or the command
-    fails (mirrors the ``|| true`` in the original bash).
+    Like the ``aws`` CLI, the endpoint can be pointed at a local S3 stand-in
+    (MinIO, moto) with ``AWS_ENDPOINT_URL``.
     """
-    cmd = ["aws", "s3", "ls", path]
+    config = Config(
+        max_pool_connections=UPLOAD_JOBS * UPLOAD_PART_JOBS,
+        retries={"mode": "standard"},
+    )
     if _no_sign():
-        cmd.append("--no-sign-request")
-    result = run_cmd(cmd, check=False, capture=True)
-    if result.returncode != 0:
-        return []
-    names: list[str] = []
-    for line in result.stdout.splitlines():
-        parts = line.split()
-        if parts and parts[-1].endswith(".whl"):
-            names.append(parts[-1])
-    return names
+        config = config.merge(Config(signature_version=UNSIGNED))
+    return boto3.client(
+        "s3", region_name=os.environ.get("S3_REGION") or None, config=config
+    )
+
+
+class S3Transfer:
+    """Listing, download and background upload of the wheel cache bucket.
+
+    Uploads run on *upload_jobs* threads: :meth:`submit_upload` moves the
+    wheel out of the way and returns straight away, so that the caller can
+    remove its build directory and go on with the next build.  The first
+    failed upload is raised by the next :meth:`submit_upload` or by
+    :meth:`wait`.  With *dry_run*, wheels are reported but not uploaded.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        *,
+        client: Any = None,
+        dry_run: bool = False,
+        upload_jobs: int = UPLOAD_JOBS,
+    ) -> None:
+        self.bucket = bucket
+        self.client = client if client is not None else make_s3_client()
+        self.dry_run = dry_run
+        self._transfer_config = TransferConfig(max_concurrency=UPLOAD_PART_JOBS)
+        self._executor = ThreadPoolExecutor(
+            max_workers=upload_jobs, thread_name_prefix="upload"
+        )
+        self._futures: list[Future[None]] = []
+        self._staging = Path(tempfile.mkdtemp(prefix="pypi-cache-upload-"))
+
+    def _keys(self, prefix: str, delimiter: str = "") -> Iterable[str]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(
+            Bucket=self.bucket, Prefix=prefix, Delimiter=delimiter
+        ):
+            for obj in page.get("Contents", []):
+                yield obj["Key"]
+
+    def list_wheels(self, prefix: str) -> list[str]:
+        """Return the ``.whl`` filenames directly under *prefix*.
+
+        Returns an empty list when the listing fails (mirrors the ``|| true``
+        in the original bash).
+        """
+        try:
+            return [
+                key[len(prefix) :]
+                for key in self._keys(prefix, delimiter="/")
+                if key.endswith(".whl")
+            ]
+        except (BotoCoreError, ClientError) as e:
+            print(f"::warning::Failed to list s3://{self.bucket}/{prefix}: {e}")
+            return []
+
+    def download_prefix(self, prefix: str, dest: Path) -> None:
+        """Download every object under *prefix* into *dest*.  Raises on failure."""
+        for key in self._keys(prefix):
+            if key.endswith("/"):
+                continue
+            path = dest / key[len(prefix) :]
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self.client.download_file(self.bucket, key, str(path))
+
+    def _upload(self, path: Path, key: str) -> None:
+        try:
+            self.client.upload_file(
+                str(path), self.bucket, key, Config=self._transfer_config
+            )
+            print(f"    Uploaded s3://{self.bucket}/{key}", flush=True)
+        finally:
+            shutil.rmtree(path.parent, ignore_errors=True)
+
+    def _raise_failed(self) -> None:
+        for future in self._futures:
+            if future.done():
+                future.result()
+
+    def submit_upload(self, whl_path: Path, prefix: str) -> None:
+        """Upload *whl_path* to *prefix* in the background."""
+        self._raise_failed()
+        key = f"{prefix}{whl_path.name}"
+        if self.dry_run:
+            print(f"    Not uploading s3://{self.bucket}/{key} (dry run)")
+            return
+        # A directory of its own, the same wheel can be rebuilt (FORCE_REBUILD)
+        # while the previous copy is still uploading
+        staged = Path(tempfile.mkdtemp(dir=self._staging)) / whl_path.name
+        shutil.move(whl_path, staged)
+        self._futures.append(self._executor.submit(self._upload, staged, key))
+
+    def wait(self) -> int:
+        """Wait for the uploads, return how many there were.  Raises on failure."""
+        for future in self._futures:
+            future.result()
+        return len(self._futures)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(self._staging, ignore_errors=True)
 
 
 # ---------------------------------------------------------------------------
@@ -215,7 +389,7 @@ def setup_cuda(cuda_dir: str) -> None:
 
 
 def download_and_merge_wants(
-    s3_bucket: str, wants_dir: Path, packages_file: Path
+    transfer: S3Transfer, wants_dir: Path, packages_file: Path
 ) -> list[str]:
     """Download ``wants/*.txt`` from S3, merge, deduplicate, return entries.
 
@@ -233,7 +407,7 @@ def download_and_merge_wants(
         https://github.com/pytorch/ci-infra/blob/main/modules/pypi-cache/kubernetes/wants-collector-deployment.yaml.tpl
     """
     wants_dir.mkdir(parents=True, exist_ok=True)
-    aws_s3_cp(f"s3://{s3_bucket}/wants/", str(wants_dir) + "/", recursive=True)
+    transfer.download_prefix("wants/", wants_dir)
 
     entries: set[str] = set()
     for txt in sorted(wants_dir.glob("*.txt")):
@@ -247,13 +421,19 @@ def download_and_merge_wants(
     return packages
 
 
-def fetch_existing_wheels(s3_bucket: str, variant: str) -> list[str]:
+def fetch_existing_wheels(transfer: S3Transfer, variant: str) -> list[str]:
     """Return list of ``.whl`` filenames already present in S3."""
-    return aws_s3_ls(f"s3://{s3_bucket}/{variant}/")
+    return transfer.list_wheels(f"{variant}/")
+
 
+def build_wheel(
+    py_bin: str, entry: str, wheel_dir: Path, *, capture: bool = False
+) -> bool:
+    """Run ``pip wheel --no-deps``.  Return True on success, False on failure.
 
-def build_wheel(py_bin: str, entry: str, wheel_dir: Path) -> bool:
-    """Run ``pip wheel --no-deps``.  Return True on success, False on failure."""
+    With *capture*, the pip output is printed in one piece once the build is
+    done, so that concurrent builds don't interleave their logs.
+    """
     result = run_cmd(
         [
             py_bin,
@@ -266,7 +446,14 @@ def build_wheel(py_bin: str, entry: str, wheel_dir: Path) -> bool:
             entry,
         ],
         check=False,
+        capture=capture,
     )
+    if capture:
+        print(
+            f"::group::pip wheel {entry} ({py_bin})\n"
+            f"{result.stdout}{result.stderr}::endgroup::",
+            flush=True,
+        )
     return result.returncode == 0
 
 
@@ -287,18 +474,110 @@ def repair_if_needed(whl_path: Path, script_dir: Path, build_dir: Path) -> Path:
     return whl_path.parent / new_name
 
 
-def _clear_directory(path: Path) -> None:
-    """Remove all contents of *path* without removing the directory itself."""
-    for child in path.iterdir():
-        if child.is_dir():
-            shutil.rmtree(child)
-        else:
-            child.unlink()
+# ---------------------------------------------------------------------------
+# Scheduler
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class BuildSummary:
+    built: int = 0
+    skipped: int = 0
+    excluded: int = 0
+    failed: int = 0
+    failures: list[tuple[str, str]] = field(default_factory=list)
+
+
+def build_all(
+    packages: list[str],
+    interpreters: dict[str, str],
+    *,
+    arch: str,
+    existing_wheels: WheelIndex,
+    skip_set: set[str],
+    force_rebuild: str,
+    wheel_dir: Path,
+    script_dir: Path,
+    upload: Optional[Callable[[Path], None]],
+    jobs: int = 1,
+) -> BuildSummary:
+    """Build every package for every interpreter, *jobs* builds at a time.
+
+    *interpreters* maps Python versions to interpreter paths, in build order.
+    Builds of the same package (normalised name and version) run one after
+    another in that order, so a version-independent wheel built for one
+    Python version is found by the existing-wheel check of the next one,
+    exactly as in a sequential loop.  Different packages build concurrently,
+    each in its own directory.  Built wheels are passed to *upload* (unless
+    it is None), which has to be done with the file when it returns, and
+    added to *existing_wheels*.
+    """
+    groups: dict[tuple[str, str], list[str]] = {}
+    for entry in packages:
+        if "==" not in entry:
+            continue
+        pkg_name, pkg_version = entry.split("==", 1)
+        key = (normalize_name(pkg_name), pkg_version)
+        groups.setdefault(key, []).append(entry)
+
+    summary = BuildSummary()
+    lock = threading.Lock()
+
+    def build_group(norm: str, pkg_version: str, entries: list[str]) -> None:
+        out = wheel_dir / f"{norm}-{pkg_version}"
+        for pyver, py_bin in interpreters.items():
+            tag = cp_tag(pyver)
+            for entry in entries:
+                # Skip list — highest precedence
+                if f"{norm}=={pkg_version}:{pyver}" in skip_set:
+                    print(f"    Excluding {entry} for {pyver} (unsupported)")
+                    with lock:
+                        summary.excluded += 1
+                    continue
+
+                # Existing wheel check
+                if force_rebuild != "*" and force_rebuild != entry:
+                    with lock:
+                        exists = existing_wheels.matches(norm, pkg_version, tag, arch)
+                        if exists:
+                            summary.skipped += 1
+                    if exists:
+                        continue
 
+                print(f"    Building {entry} for {tag} ...", flush=True)
+                out.mkdir(parents=True, exist_ok=True)
+                try:
+                    if not build_wheel(py_bin, entry, out, capture=jobs > 1):
+                        print(f"::warning::Failed to build {entry} for Python {pyver}")
+                        with lock:
+                            summary.failures.append((entry, pyver))
+                            summary.failed += 1
+                        continue
 
-def upload_wheel(whl_path: Path, s3_bucket: str, variant: str) -> None:
-    """Upload a wheel to S3.  Raises on failure."""
-    aws_s3_cp(str(whl_path), f"s3://{s3_bucket}/{variant}/{whl_path.name}")
+                    for whl in sorted(out.glob("*.whl")):
+                        # The repair script works in a tmp/ under its cwd
+                        whl = repair_if_needed(whl, script_dir, out)
+                        if upload is not None:
+                            upload(whl)
+                        with lock:
+                            existing_wheels.add(whl.name)
+                            summary.built += 1
+                finally:
+                    shutil.rmtree(out, ignore_errors=True)
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(build_group, norm, pkg_version, entries)
+            for (norm, pkg_version), entries in groups.items()
+        ]
+        try:
+            for future in as_completed(futures):
+                future.result()
+        except BaseException:
+            # Unexpected errors (S3, environment) abort the whole run
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+    return summary
 
 
 # ---------------------------------------------------------------------------
@@ -316,6 +595,7 @@ def main() -> None:
     cuda_dir = os.environ.get("CUDA_DIR", "")
     force_rebuild = os.environ.get("FORCE_REBUILD", "")
     dry_run = os.environ.get("DRY_RUN", "").lower() in ("1", "true", "yes")
+    jobs = int(os.environ.get("BUILD_JOBS") or BUILD_JOBS)
 
     wants_dir = BUILD_DIR / "wants"
     wheel_dir = BUILD_DIR / "wheels"
@@ -328,6 +608,7 @@ def main() -> None:
     if dry_run:
         print("==> DRY RUN: wheels will be built but not uploaded to S3")
 
+    transfer = S3Transfer(s3_bucket, dry_run=dry_run)
     try:
         # Step 1: CUDA
         if cuda_dir:
@@ -345,7 +626,7 @@ def main() -> None:
         #   - Tracking per-version PyPI availability in the wants list
         #     would add significant complexity for no practical benefit.
         wheel_dir.mkdir(parents=True, exist_ok=True)
-        packages = download_and_merge_wants(s3_bucket, wants_dir, packages_file)
+        packages = download_and_merge_wants(transfer, wants_dir, packages_file)
         print(f"==> Merged package list ({len(packages)} entries)")
 
         # Step 2b: Skip list
@@ -354,73 +635,48 @@ def main() -> None:
             print(f"==> Skip list loaded ({len(skip_set)} entries)")
 
         # Step 3: Cache existing S3 listing
-        existing_wheels = fetch_existing_wheels(s3_bucket, variant)
+        existing_wheels = WheelIndex(fetch_existing_wheels(transfer, variant))
         print(f"==> Existing wheels in S3: {len(existing_wheels)}")
 
         # Step 4: Build
-        built = 0
-        skipped = 0
-        excluded = 0
-        failed = 0
-        failures: list[tuple[str, str]] = []
-
+        interpreters: dict[str, str] = {}
         for pyver in python_versions:
             py_bin = python_path(pyver)
-            tag = cp_tag(pyver)
-
             if not os.access(py_bin, os.X_OK):
                 print(f"::warning::Python {pyver} not found at {py_bin}, skipping")
                 continue
+            interpreters[pyver] = py_bin
 
-            print(f"==> Processing Python {pyver}  ({py_bin})")
-
-            for entry in packages:
-                if "==" not in entry:
-                    continue
-
-                pkg_name, pkg_version = entry.split("==", 1)
-                norm = normalize_name(pkg_name)
-                out = wheel_dir / pyver
-                out.mkdir(parents=True, exist_ok=True)
-
-                # Skip list — highest precedence
-                if f"{norm}=={pkg_version}:{pyver}" in skip_set:
-                    print(f"    Excluding {entry} for {pyver} (unsupported)")
-                    excluded += 1
-                    continue
-
-                # Existing wheel check
-                if force_rebuild != "*" and force_rebuild != entry:
-                    if wheel_matches(norm, pkg_version, tag, arch, existing_wheels):
-                        skipped += 1
-                        continue
-
-                print(f"    Building {entry} for {tag} ...")
-                if not build_wheel(py_bin, entry, out):
-                    print(f"::warning::Failed to build {entry} for Python {pyver}")
-                    failures.append((entry, pyver))
-                    failed += 1
-                    _clear_directory(out)
-                    continue
-
-                for whl in sorted(out.glob("*.whl")):
-                    whl = repair_if_needed(whl, script_dir, BUILD_DIR)
-                    if not dry_run:
-                        upload_wheel(whl, s3_bucket, variant)
-                    existing_wheels.append(whl.name)
-                    built += 1
-
-                _clear_directory(out)
+        print(
+            f"==> Building for Python {' '.join(interpreters)}"
+            f" with up to {jobs} concurrent builds"
+        )
+        summary = build_all(
+            packages,
+            interpreters,
+            arch=arch,
+            existing_wheels=existing_wheels,
+            skip_set=skip_set,
+            force_rebuild=force_rebuild,
+            wheel_dir=wheel_dir,
+            script_dir=script_dir,
+            upload=lambda whl: transfer.submit_upload(whl, f"{variant}/"),
+            jobs=jobs,
+        )
+        uploaded = transfer.wait()
+        if not dry_run:
+            print(f"==> Uploaded {uploaded} wheels")
 
         # Step 5: Summary
         print()
         print(
-            f"==> Build complete:  built={built}  skipped={skipped}"
-            f"  excluded={excluded}  failed={failed}"
+            f"==> Build complete:  built={summary.built}  skipped={summary.skipped}"
+            f"  excluded={summary.excluded}  failed={summary.failed}"
         )
-        write_failure_summary(failures, FAILURE_SUMMARY_PATH)
+        write_failure_summary(summary.failures, FAILURE_SUMMARY_PATH)
 
     finally:
+        transfer.close()
         shutil.rmtree(BUILD_DIR, ignore_errors=True)
 
 
@@ -1,16 +1,25 @@
 #!/usr/bin/env python3
 """Unit tests for build.py pure helper functions."""
 
+import random
 import textwrap
 from pathlib import Path
 
 import pytest
+from benchmark_build import make_interpreters, make_packages, PYTHON_VERSIONS
+from boto3.exceptions import S3UploadFailedError
 from build import (
+    build_all,
     cp_tag,
+    download_and_merge_wants,
+    fetch_existing_wheels,
     load_skip_list,
+    make_s3_client,
     normalize_name,
     python_path,
+    S3Transfer,
     wheel_matches,
+    WheelIndex,
     write_failure_summary,
 )
 
@@ -131,6 +140,81 @@ class TestWheelMatches:
         assert not wheel_matches("numpy", "2.4.4", "cp313", "x86_64", [])
 
 
+def synthetic_listing(count: int, seed: int = 0) -> list[str]:
+    """Wheel names covering every shape the three match patterns care about."""
+    rng = random.Random(seed)
+    names = ["numpy", "PyYAML", "torch", "c__utilities", "my_pkg", "Uv"]
+    versions = ["1.0", "2.4.4", "2.0+cu128", "2.0+CU128", "1.0rc1", "0.1.0.post1"]
+    pythons = ["cp310", "cp312", "cp313", "cp313t", "CP313", "py3", "py2.py3", "Py3"]
+    platforms = [
+        "manylinux_2_28_x86_64",
+        "manylinux_2_17_x86_64.manylinux2014_x86_64",
+        "manylinux_2_28_aarch64",
+        "musllinux_1_2_x86_64",
+        "linux_x86_64",
+        "win_amd64",
+        "any",
+        "MANYLINUX_2_28_X86_64",
+        "x86_64_manylinux",
+    ]
+    listing = []
+    for i in range(count):
+        name = rng.choice(names) + (str(i % 5000) if i % 3 else "")
+        version = rng.choice(versions)
+        python = rng.choice(pythons)
+        abi = rng.choice([python, "abi3", "none", "cp313"])
+        parts = [name, version]
+        if rng.random() < 0.1:
+            parts.append(str(rng.randint(1, 3)))  # build tag
+        parts += [python, abi, rng.choice(platforms)]
+        listing.append("-".join(parts) + rng.choice([".whl", ".whl", ".tar.gz"]))
+    return listing
+
+
+class TestWheelIndex:
+    def test_sample_listing(self):
+        index = WheelIndex(SAMPLE_LISTING)
+        assert index.matches("numpy", "2.4.4", "cp313", "x86_64")
+        assert not index.matches("numpy", "2.4.4", "cp313t", "x86_64")
+        assert index.matches("setuptools", "69.0.0", "cp312", "x86_64")
+        assert index.matches("uv", "0.1.0", "cp313", "x86_64")
+        assert not index.matches("numpy", "2.4.4", "cp313", "aarch64")
+
+    def test_add_updates_in_place(self):
+        index = WheelIndex()
+        assert not index.matches("requests", "2.31.0", "cp313", "x86_64")
+        index.add("requests-2.31.0-py3-none-any.whl")
+        assert index.matches("requests", "2.31.0", "cp313", "x86_64")
+        assert len(index) == 1
+
+    def test_same_answers_as_regex_scan(self):
+        listing = synthetic_listing(100_000)
+        index = WheelIndex(listing)
+        rng = random.Random(1)
+        queries = set()
+        while len(queries) < 120:
+            # Mostly name/version pairs that are in the listing
+            parts = rng.choice(listing).split("-")
+            name, version = parts[0], parts[1]
+            if rng.random() < 0.2:
+                version = rng.choice(["9.9", "1.0-1", version.upper()])
+            queries.add(
+                (
+                    normalize_name(name),
+                    version,
+                    rng.choice(["cp310", "cp312", "cp313", "cp313t"]),
+                    rng.choice(["x86_64", "aarch64"]),
+                )
+            )
+        matched = 0
+        for query in sorted(queries):
+            expected = wheel_matches(*query, listing)
+            assert index.matches(*query) == expected, query
+            matched += expected
+        # Both answers are well represented
+        assert 20 < matched < 100
+
+
 # ---------------------------------------------------------------------------
 # load_skip_list
 # ---------------------------------------------------------------------------
@@ -218,3 +302,165 @@ class TestWriteFailureSummary:
         write_failure_summary(failures, out)
         text = out.read_text()
         assert text.index("aiohttp") < text.index("zlib")
+
+
+# ---------------------------------------------------------------------------
+# build_all
+# ---------------------------------------------------------------------------
+
+
+class TestBuildAll:
+    def _run(self, tmp_path: Path, jobs: int, packages: list[str]):
+        interpreters = make_interpreters(tmp_path, sleep=0)
+        uploaded: list[str] = []
+        existing = WheelIndex(["native_0-0.0-cp312-cp312-manylinux_2_28_x86_64.whl"])
+        summary = build_all(
+            packages,
+            interpreters,
+            arch="x86_64",
+            existing_wheels=existing,
+            skip_set={"native_1==1.0:3.10"},
+            force_rebuild="",
+            wheel_dir=tmp_path / f"wheels-{jobs}",
+            script_dir=tmp_path,
+            upload=lambda whl: uploaded.append(whl.name),
+            jobs=jobs,
+        )
+        return summary, sorted(uploaded), existing
+
+    def test_counts(self, tmp_path: Path):
+        summary, uploaded, existing = self._run(tmp_path, 1, make_packages(4))
+        # native-0 exists for 3.12, native-1 is excluded for 3.10, pure-2 is
+        # built once, broken-3 fails everywhere
+        assert (summary.built, summary.skipped, summary.excluded) == (9, 5, 1)
+        assert summary.failed == 5
+        assert sorted(summary.failures) == [
+            ("broken-3==3.0", pyver) for pyver in sorted(PYTHON_VERSIONS)
+        ]
+        assert uploaded.count("pure_2-2.0-py3-none-any.whl") == 1
+        assert len(existing) == 1 + len(uploaded)
+
+    def test_concurrent_matches_sequential(self, tmp_path: Path):
+        packages = make_packages(12) + ["Native-4==4.0"]
+        sequential = self._run(tmp_path, 1, packages)
+        concurrent = self._run(tmp_path, 6, packages)
+        sequential[0].failures.sort()
+        concurrent[0].failures.sort()
+        assert sequential[:2] == concurrent[:2]
+        assert not list((tmp_path / "wheels-6").iterdir())
+
+
+# ---------------------------------------------------------------------------
+# S3Transfer, against moto's in-process S3
+# ---------------------------------------------------------------------------
+
+
+BUCKET = "pypi-wheel-cache-test"
+
+
+@pytest.fixture
+def s3(monkeypatch: pytest.MonkeyPatch):
+    moto = pytest.importorskip("moto")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("S3_REGION", "us-east-1")
+    monkeypatch.delenv("AWS_NO_SIGN_REQUEST", raising=False)
+    with moto.mock_aws():
+        client = make_s3_client()
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+@pytest.fixture
+def transfer(s3):
+    transfer = S3Transfer(BUCKET, client=s3)
+    yield transfer
+    transfer.close()
+
+
+def _keys(s3, prefix: str) -> list[str]:
+    pages = s3.get_paginator("list_objects_v2").paginate(Bucket=BUCKET, Prefix=prefix)
+    return sorted(obj["Key"] for page in pages for obj in page.get("Contents", []))
+
+
+class TestS3Transfer:
+    def test_no_sign(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("AWS_NO_SIGN_REQUEST", "true")
+        from botocore import UNSIGNED
+
+        assert make_s3_client().meta.config.signature_version is UNSIGNED
+
+    def test_list_wheels_paginates(self, s3, transfer):
+        # More than the 1000 keys of a listing page
+        names = [f"pkg-{i}.0-py3-none-any.whl" for i in range(1005)]
+        for name in names:
+            s3.put_object(Bucket=BUCKET, Key=f"cpu/{name}", Body=b"")
+        s3.put_object(Bucket=BUCKET, Key="cpu/index.html", Body=b"")
+        s3.put_object(Bucket=BUCKET, Key="cpu/old/pkg-0.1-py3-none-any.whl", Body=b"")
+        s3.put_object(Bucket=BUCKET, Key="cu128/pkg-0.0-py3-none-any.whl", Body=b"")
+        assert sorted(fetch_existing_wheels(transfer, "cpu")) == sorted(names)
+        assert fetch_existing_wheels(transfer, "rocm") == []
+
+    def test_list_wheels_failure(self, s3):
+        transfer = S3Transfer("missing-bucket", client=s3)
+        try:
+            assert transfer.list_wheels("cpu/") == []
+        finally:
+            transfer.close()
+
+    def test_download_wants(self, s3, transfer, tmp_path: Path):
+        s3.put_object(Bucket=BUCKET, Key="wants/a.txt", Body=b"foo==1.0\nbar==2.0\n")
+        s3.put_object(Bucket=BUCKET, Key="wants/b.txt", Body=b"# c\nfoo==1.0\n")
+        packages_file = tmp_path / "packages.txt"
+        packages = download_and_merge_wants(transfer, tmp_path / "wants", packages_file)
+        assert packages == ["bar==2.0", "foo==1.0"]
+        assert packages_file.read_text() == "bar==2.0\nfoo==1.0\n"
+
+    def test_upload_in_background(self, s3, transfer, tmp_path: Path):
+        whl = tmp_path / "pkg-1.0-py3-none-any.whl"
+        whl.write_bytes(b"wheel")
+        transfer.submit_upload(whl, "cpu/")
+        # Moved out of the build directory, which can go away right away
+        assert not whl.exists()
+        assert transfer.wait() == 1
+        body = s3.get_object(Bucket=BUCKET, Key=f"cpu/{whl.name}")["Body"].read()
+        assert body == b"wheel"
+
+    def test_dry_run(self, s3, tmp_path: Path):
+        transfer = S3Transfer(BUCKET, client=s3, dry_run=True)
+        whl = tmp_path / "pkg-1.0-py3-none-any.whl"
+        whl.write_bytes(b"wheel")
+        try:
+            transfer.submit_upload(whl, "cpu/")
+            assert transfer.wait() == 0
+        finally:
+            transfer.close()
+        assert _keys(s3, "cpu/") == []
+
+    def test_upload_failure(self, s3, tmp_path: Path):
+        transfer = S3Transfer("missing-bucket", client=s3)
+        whl = tmp_path / "pkg-1.0-py3-none-any.whl"
+        whl.write_bytes(b"wheel")
+        try:
+            transfer.submit_upload(whl, "cpu/")
+            with pytest.raises(S3UploadFailedError, match="NoSuchBucket"):
+                transfer.wait()
+        finally:
+            transfer.close()
+
+    def test_build_all_uploads(self, s3, transfer, tmp_path: Path):
+        summary = build_all(
+            make_packages(8),
+            make_interpreters(tmp_path, sleep=0),
+            arch="x86_64",
+            existing_wheels=WheelIndex(),
+            skip_set=set(),
+            force_rebuild="",
+            wheel_dir=tmp_path / "wheels",
+            script_dir=tmp_path,
+            upload=lambda whl: transfer.submit_upload(whl, "cpu/"),
+            jobs=4,
+        )
+        assert transfer.wait() == summary.built
+        assert len(_keys(s3, "cpu/")) == summary.built
+        assert "cpu/pure_2-2.0-py3-none-any.whl" in _keys(s3, "cpu/")
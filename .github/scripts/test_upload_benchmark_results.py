@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+import gzip
+import hashlib
+import json
+import os
+import resource
+import sys
+import tempfile
+import unittest
+import warnings
+from typing import Any, Dict, Iterator, List
+from unittest import mock
+
+import boto3
+import upload_benchmark_results as ubr
+from moto import mock_aws
+
+
+METADATA = {
+    "timestamp": 1700000000,
+    "schema_version": "v3",
+    "name": "benchmark",
+    "repo": "pytorch/pytorch",
+    "head_branch": "main",
+    "head_sha": "abcdef",
+    "workflow_id": 100,
+    "run_attempt": 1,
+    "job_id": 200,
+}
+RUNNERS = [{"name": "linux.2xlarge", "type": "cpu", "cpu_info": "x86_64"}]
+DEPENDENCIES = {"pytorch": {"repo": "pytorch/pytorch", "version": "2.6.0"}}
+
+# Large inputs can be tested with e.g. UPLOAD_BENCHMARK_RESULTS_TEST_SIZE_MB=300
+LARGE_INPUT_MB = int(os.getenv("UPLOAD_BENCHMARK_RESULTS_TEST_SIZE_MB", "32"))
+
+
+def result(i: int) -> Dict[str, Any]:
+    return {
+        "benchmark": {"name": "pr_time_benchmarks", "extra_info": {"shard": i % 7}},
+        "model": {"name": f"model_{i}", "type": "add_loop", "backend": "eager"},
+        "metric": {"name": "compile_time", "benchmark_values": [i * 1.5, i / 3]},
+    }
+
+
+def expected_record(r: Dict[str, Any]) -> Dict[str, Any]:
+    return {**METADATA, **r, "runners": RUNNERS, "dependencies": DEPENDENCIES}
+
+
+class TestReadBenchmarkResults(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def write(self, content: str) -> str:
+        path = os.path.join(self.dir, "results.json")
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def read(self, path: str) -> List[Any]:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            try:
+                return list(ubr.process_benchmark_results(path))
+            except json.JSONDecodeError:
+                return list(ubr.process_benchmark_results(path, json_each_row=True))
+
+    def test_json_documents(self) -> None:
+        results = [result(i) for i in range(5)]
+        for content in (json.dumps(results), json.dumps(results, indent=2)):
+            self.assertEqual(self.read(self.write(content)), results)
+        self.assertEqual(
+            self.read(self.write(json.dumps(result(1), indent=2))), [result(1)]
+        )
+        self.assertEqual(self.read(self.write("[]")), [])
+
+    def test_json_each_row(self) -> None:
+        rows = [
+            json.dumps(result(0)),
+            "not json",
+            json.dumps([result(1), result(2)]),
+            "5",
+            json.dumps(result(3)),
+        ]
+        self.assertEqual(
+            self.read(self.write("\n".join(rows))), [result(i) for i in range(4)]
+        )
+        # The first row is a list, so the file looks like a JSON document at first
+        content = "\n".join(json.dumps([result(i)]) for i in range(3))
+        self.assertEqual(self.read(self.write(content)), [result(i) for i in range(3)])
+
+    def test_skips_non_records(self) -> None:
+        content = json.dumps([{"model": {}}, "metric", 1, result(1)])
+        self.assertEqual(self.read(self.write(content)), [result(1)])
+
+    def test_array_split_across_chunks(self) -> None:
+        results = [result(i) for i in range(50)] + [12345, 1.5]
+        with mock.patch.object(ubr, "JSON_CHUNK_SIZE", 7):
+            path = self.write(json.dumps(results))
+            with open(path) as f:
+                self.assertEqual(list(ubr._iter_json_array(f)), results)
+
+    def test_benchmark_name_override(self) -> None:
+        with mock.patch.dict(os.environ, {"BENCHMARK_NAME": "renamed"}):
+            records = self.read(self.write(json.dumps([result(1)])))
+        self.assertEqual(records[0]["benchmark"]["name"], "renamed")
+
+
+class TestBenchmarkRecordEncoder(unittest.TestCase):
+    def test_encode_matches_record(self) -> None:
+        for metadata in (METADATA, {}):
+            encoder = ubr.BenchmarkRecordEncoder(metadata, RUNNERS, DEPENDENCIES)
+            for r in (
+                result(1),
+                {**result(1), "repo": "pytorch/executorch"},
+                {**result(1), "runners": [{"name": "mine"}]},
+                {"metric": {}, "dependencies": {}, "job_id": 0},
+            ):
+                with self.subTest(metadata=bool(metadata), result=r):
+                    self.assertEqual(encoder.encode(r), json.dumps(encoder.record(r)))
+
+
+@mock_aws
+class TestUploadBenchmarkResults(unittest.TestCase):
+    def setUp(self) -> None:
+        env = mock.patch.dict(os.environ, {"AWS_DEFAULT_REGION": "us-east-1"})
+        env.start()
+        self.addCleanup(env.stop)
+        self.s3 = boto3.client("s3")
+        self.s3.create_bucket(Bucket=ubr.OSSCI_BENCHMARKS_BUCKET)
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def run_main(self, *extra_args: str) -> None:
+        argv = [
+            "upload_benchmark_results.py",
+            "--benchmark-results-dir",
+            self.dir,
+            "--metadata",
+            json.dumps(METADATA),
+            "--runners",
+            json.dumps(RUNNERS),
+            "--dependencies",
+            json.dumps(DEPENDENCIES),
+            *extra_args,
+        ]
+        with mock.patch.object(sys, "argv", argv), warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            ubr.main()
+
+    def object_lines(self, filename: str) -> Iterator[bytes]:
+        key = f"v3/pytorch/pytorch/100/200/{filename}"
+        obj = self.s3.get_object(Bucket=ubr.OSSCI_BENCHMARKS_BUCKET, Key=key)
+        self.assertEqual(obj["ContentEncoding"], "gzip")
+        self.assertEqual(obj["ContentType"], "application/json")
+        with gzip.GzipFile(fileobj=obj["Body"]) as f:
+            yield from f
+
+    def test_uploads_each_file(self) -> None:
+        results = [result(i) for i in range(10)]
+        with open(os.path.join(self.dir, "document.json"), "w") as f:
+            json.dump(results, f, indent=2)
+        with open(os.path.join(self.dir, "each_row.json"), "w") as f:
+            f.write("\n".join(json.dumps(r) for r in results))
+        with open(os.path.join(self.dir, "no_records.json"), "w") as f:
+            json.dump([{"model": {}}], f)
+        with open(os.path.join(self.dir, "ignored.txt"), "w") as f:
+            json.dump(results, f)
+
+        self.run_main("--dry-run")
+        self.assertNotIn(
+            "Contents", self.s3.list_objects_v2(Bucket=ubr.OSSCI_BENCHMARKS_BUCKET)
+        )
+
+        self.run_main()
+        keys = [
+            obj["Key"]
+            for obj in self.s3.list_objects_v2(Bucket=ubr.OSSCI_BENCHMARKS_BUCKET)[
+                "Contents"
+            ]
+        ]
+        self.assertEqual(
+            sorted(keys),
+            [
+                "v3/pytorch/pytorch/100/200/document.json",
+                "v3/pytorch/pytorch/100/200/each_row.json",
+            ],
+        )
+        expected = "\n".join(json.dumps(expected_record(r)) for r in results)
+        for filename in ("document.json", "each_row.json"):
+            body = b"".join(self.object_lines(filename)).decode()
+            self.assertEqual(body, expected)
+
+    def test_no_results(self) -> None:
+        with mock.patch.dict(os.environ, {"IF_NO_FILES_FOUND": "error"}):
+            with self.assertRaises(SystemExit):
+                self.run_main()
+
+    def test_large_inputs_are_streamed(self) -> None:
+        # A JSON document and a JSONEachRow file, LARGE_INPUT_MB in total
+        digests = {}
+        for filename, each_row in (("document.json", False), ("each_row.json", True)):
+            expected = hashlib.sha256()
+            with open(os.path.join(self.dir, filename), "w") as f:
+                f.write("" if each_row else "[")
+                i = 0
+                while f.tell() < LARGE_INPUT_MB * 2**19:
+                    if i:
+                        f.write("\n" if each_row else ",\n")
+                        expected.update(b"\n")
+                    f.write(json.dumps(result(i)))
+                    expected.update(json.dumps(expected_record(result(i))).encode())
+                    i += 1
+                f.write("" if each_row else "]")
+            digests[filename] = expected.hexdigest()
+
+        maxrss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self.run_main()
+        growth_mb = (
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - maxrss_kb
+        ) / 1024
+        # The records are never all in memory
+        self.assertLess(growth_mb, max(LARGE_INPUT_MB / 2, 64))
+
+        for filename, digest in digests.items():
+            actual = hashlib.sha256()
+            for line in self.object_lines(filename):
+                actual.update(line)
+            self.assertEqual(actual.hexdigest(), digest)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,16 +7,31 @@
 
 import gzip
 import hashlib
+import itertools
 import json
 import logging
 import os
+import re
 import sys
+import tempfile
 import time
 from argparse import Action, ArgumentParser, Namespace
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 from json.decoder import JSONDecodeError
 from logging import info
-from typing import Any, Callable, Dict, List, Optional
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    IO,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TextIO,
+    Tuple,
+)
 from warnings import warn
 
 import boto3  # type: ignore[import-not-found]
@@ -26,6 +41,13 @@ logging.basicConfig(level=logging.INFO)
 
 
 OSSCI_BENCHMARKS_BUCKET = "ossci-benchmarks"
+# How much of a results file is read at a time when it's a JSON document
+JSON_CHUNK_SIZE = 1 << 20
+JSON_DECODER = json.JSONDecoder()
+JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# Records are compressed in batches of this size
+UPLOAD_BATCH_SIZE = 1024
+GZIP_COMPRESS_LEVEL = 6
 
 
 class ValidateDir(Action):
@@ -136,6 +158,12 @@ def parse_args() -> Any:
         action=ValidateJSON,
         help="the information about the benchmark dependencies in JSON format",
     )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=4,
+        help="the number of benchmark results files to upload concurrently",
+    )
 
     return parser.parse_args()
 
@@ -177,7 +205,9 @@ def upload_to_dynamodb(
     info(msg)
     if not dry_run:
         # https://boto3.amazonaws.com/v1/documentation/api/latest/guide/dynamodb.html#batch-writing
-        with boto3.resource("dynamodb").Table(dynamodb_table).batch_writer() as batch:
+        # A session per call, boto3 resources are not thread safe
+        dynamodb = boto3.session.Session().resource("dynamodb")
+        with dynamodb.Table(dynamodb_table).batch_writer() as batch:
             for doc in docs:
                 doc["timestamp"] = int(round(time.time() * 1000))
                 if generate_partition_key:
@@ -185,76 +215,201 @@ def upload_to_dynamodb(
                 batch.put_item(Item=doc)
 
 
-def read_benchmark_results(filepath: str) -> List[Dict[str, Any]]:
-    benchmark_results: List[Dict[str, Any]] = []
-    with open(filepath) as f:
+def _iter_json_array(f: TextIO) -> Iterator[Any]:
+    """
+    Yield the elements of the JSON array that makes up the whole of f, reading
+    it in chunks so that only one element has to be in memory at a time. Raise
+    JSONDecodeError, possibly after some elements were yielded, if f isn't a
+    single JSON array
+    """
+    buf = ""
+    pos = 0
+    eof = False
+
+    def read_more(size: int) -> None:
+        nonlocal buf, pos, eof
+        chunk = f.read(size)
+        eof = not chunk
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    def next_char() -> str:
+        # The next non-whitespace character, or "" at the end of the file
+        nonlocal pos
+        while True:
+            pos = JSON_WHITESPACE.match(buf, pos).end()  # type: ignore[union-attr]
+            if pos < len(buf):
+                return buf[pos]
+            if eof:
+                return ""
+            read_more(JSON_CHUNK_SIZE)
+
+    def next_value() -> Any:
+        nonlocal pos
+        size = JSON_CHUNK_SIZE
+        while True:
+            try:
+                value, end = JSON_DECODER.raw_decode(buf, pos)
+                # A value that ends with the buffer, e.g. a number, may go on
+                # in the next chunk
+                if end < len(buf) or eof:
+                    pos = end
+                    return value
+            except JSONDecodeError:
+                if eof:
+                    raise
+            read_more(size)
+            size *= 2
+
+    if next_char() != "[":
+        raise JSONDecodeError("Expecting '['", buf, pos)
+    pos += 1
+    if next_char() == "]":
+        pos += 1
+    else:
+        while True:
+            next_char()
+            yield next_value()
+            delimiter = next_char()
+            pos += 1
+            if delimiter == "]":
+                break
+            if delimiter != ",":
+                raise JSONDecodeError("Expecting ',' delimiter", buf, pos - 1)
+    if next_char():
+        raise JSONDecodeError("Extra data", buf, pos)
+
+
+def _iter_json_each_row(f: TextIO) -> Iterator[Any]:
+    """
+    Read f in ClickHouse JSONEachRow format
+    """
+    for line in f:
         try:
-            r = json.load(f)
-            # Handle the JSONEachRow case where there is only one record in the
-            # JSON file, it can still be loaded normally, but will need to be
-            # added into the list of benchmark results with the length of 1
-            if isinstance(r, dict):
-                benchmark_results.append(r)
-            elif isinstance(r, list):
-                benchmark_results = r
-
+            r = json.loads(line)
         except JSONDecodeError:
-            f.seek(0)
+            warn(f"Invalid JSON {line}, skipping")
+            continue
+
+        # Each row needs to be a dictionary in JSON format or a list
+        if isinstance(r, dict):
+            yield r
+        elif isinstance(r, list):
+            yield from r
+        else:
+            warn(f"Not a JSON dict or list {line}, skipping")
 
-            # Try again in ClickHouse JSONEachRow format
-            for line in f:
-                try:
-                    r = json.loads(line)
-                    # Each row needs to be a dictionary in JSON format or a list
-                    if isinstance(r, dict):
-                        benchmark_results.append(r)
-                    elif isinstance(r, list):
-                        benchmark_results.extend(r)
-                    else:
-                        warn(f"Not a JSON dict or list {line}, skipping")
-                        continue
 
+def read_benchmark_results(
+    filepath: str, json_each_row: bool = False
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the benchmark results of a file that is either a JSON document (a
+    list of results or a single one) or in JSONEachRow format.
+
+    A file that starts like a JSON list is read as a JSON document; if it turns
+    out not to be one, JSONDecodeError is raised once the problem is reached,
+    and the file has to be read again with json_each_row=True.
+    """
+    with open(filepath) as f:
+        first_char = f.read(JSON_CHUNK_SIZE).lstrip()[:1]
+        f.seek(0)
+
+        results: Iterable[Any]
+        if json_each_row:
+            results = _iter_json_each_row(f)
+        elif first_char == "[":
+            results = _iter_json_array(f)
+        else:
+            # A single result can be a JSON document that spans several lines,
+            # otherwise this is JSONEachRow
+            try:
+                json.loads(f.readline())
+                f.seek(0)
+                results = _iter_json_each_row(f)
+            except JSONDecodeError:
+                f.seek(0)
+                try:
+                    r = json.load(f)
+                    results = [r] if isinstance(r, dict) else []
                 except JSONDecodeError:
-                    warn(f"Invalid JSON {line}, skipping")
+                    f.seek(0)
+                    results = _iter_json_each_row(f)
 
-    # Overwrite the benchmark name if needed
-    if os.getenv("BENCHMARK_NAME"):
+        # Overwrite the benchmark name if needed
         benchmark_name = os.getenv("BENCHMARK_NAME")
-        for bresult in benchmark_results:
-            if bresult.get("benchmark", {}) and bresult.get("benchmark", {}).get(
-                "name"
+        for bresult in results:
+            if (
+                benchmark_name
+                and isinstance(bresult, dict)
+                and bresult.get("benchmark", {})
+                and bresult.get("benchmark", {}).get("name")
             ):
                 bresult["benchmark"]["name"] = benchmark_name
+            yield bresult
 
-    return benchmark_results
 
+class BenchmarkRecordEncoder:
+    """
+    Turn benchmark results into records by adding the metadata, runners and
+    dependencies of the run, and serialize them. The parts shared by all the
+    records are serialized only once
+    """
 
-def process_benchmark_results(
-    filepath: str,
-    metadata: Dict[str, Any],
-    runners: List[Any],
-    dependencies: Dict[str, Any],
-) -> List[Dict[str, Any]]:
-    benchmark_results = read_benchmark_results(filepath)
-    if not benchmark_results or not isinstance(benchmark_results, (list, tuple)):
-        return []
-
-    processed_benchmark_results: List[Dict[str, Any]] = []
-    for result in benchmark_results:
-        # This is a required field
-        if "metric" not in result:
-            warn(f"{result} from {filepath} is not a benchmark record, skipping")
-            continue
-
-        record: Dict[str, Any] = {**metadata, **result}
+    def __init__(
+        self,
+        metadata: Dict[str, Any],
+        runners: List[Any],
+        dependencies: Dict[str, Any],
+    ) -> None:
+        self.metadata = metadata
+        self.runners = runners
+        self.dependencies = dependencies
+        # Without the braces, to be spliced into the records
+        self._metadata_json = json.dumps(metadata)[1:-1]
+        self._runners_json = f'"runners": {json.dumps(runners)}'
+        self._dependencies_json = f'"dependencies": {json.dumps(dependencies)}'
+
+    def record(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        record: Dict[str, Any] = {**self.metadata, **result}
         # Gather all the information about the benchmark
         if "runners" not in record:
-            record["runners"] = runners
+            record["runners"] = self.runners
         if "dependencies" not in record:
-            record["dependencies"] = dependencies
+            record["dependencies"] = self.dependencies
+        return record
+
+    def encode(self, result: Dict[str, Any]) -> str:
+        """
+        The same as json.dumps(self.record(result))
+        """
+        if not self.metadata.keys().isdisjoint(result):
+            # The result overrides some metadata, keep the order of the keys
+            return json.dumps(self.record(result))
+
+        parts = [self._metadata_json] if self.metadata else []
+        if result:
+            parts.append(json.dumps(result)[1:-1])
+        if "runners" not in result and "runners" not in self.metadata:
+            parts.append(self._runners_json)
+        if "dependencies" not in result and "dependencies" not in self.metadata:
+            parts.append(self._dependencies_json)
+        return "{" + ", ".join(parts) + "}"
 
-        processed_benchmark_results.append(record)
-    return processed_benchmark_results
+
+def process_benchmark_results(
+    filepath: str, json_each_row: bool = False
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the benchmark results of a file that are benchmark records, see
+    read_benchmark_results
+    """
+    for result in read_benchmark_results(filepath, json_each_row):
+        # This is a required field
+        if not isinstance(result, dict) or "metric" not in result:
+            warn(f"{result} from {filepath} is not a benchmark record, skipping")
+            continue
+        yield result
 
 
 def generate_s3_path(
@@ -295,78 +450,161 @@ def generate_s3_path(
     return f"{schema_version}/{repo}/{workflow_id}/{job_id}/{filename}"
 
 
+def _spool_benchmark_results(
+    spool: IO[bytes],
+    filepath: str,
+    schema_version: str,
+    encoder: BenchmarkRecordEncoder,
+    json_each_row: bool,
+    dry_run: bool,
+) -> Tuple[Optional[str], bool]:
+    """
+    Write the records of a file to spool as gzipped JSONEachRow, unless it's a
+    dry run or they have no S3 path. Return the S3 path and whether there are
+    any records
+    """
+    results = process_benchmark_results(filepath, json_each_row)
+
+    # Only the first records are needed to find the S3 path
+    head: List[Dict[str, Any]] = []
+    for result in results:
+        head.append(result)
+        record = encoder.record(result)
+        if (
+            record.get("repo", "")
+            and (record.get("workflow_id") or record.get("servicelab_experiment_id"))
+            and (record.get("job_id") or record.get("servicelab_trial_id"))
+        ):
+            break
+    s3_path = generate_s3_path(
+        [encoder.record(result) for result in head], filepath, schema_version
+    )
+
+    if dry_run or not s3_path:
+        # Still go through the records, to warn about the invalid ones
+        for _ in results:
+            pass
+        return s3_path, bool(head)
+
+    with gzip.GzipFile(
+        fileobj=spool, mode="wb", compresslevel=GZIP_COMPRESS_LEVEL
+    ) as gz:
+        batch: List[str] = []
+        separator = ""
+        for result in itertools.chain(head, results):
+            batch.append(encoder.encode(result))
+            if len(batch) == UPLOAD_BATCH_SIZE:
+                gz.write((separator + "\n".join(batch)).encode())
+                batch.clear()
+                separator = "\n"
+        if batch:
+            gz.write((separator + "\n".join(batch)).encode())
+    return s3_path, bool(head)
+
+
 def upload_to_s3(
     s3_bucket: str,
     filepath: str,
     schema_version: str,
-    benchmark_results: List[Dict[str, Any]],
+    encoder: BenchmarkRecordEncoder,
     dry_run: bool = True,
-) -> None:
+    s3_client: Any = None,
+) -> bool:
     """
-    Upload the benchmark results to S3
+    Upload the benchmark results of a file to S3. The records are streamed
+    from the file through a gzip-compressed temporary file, so that only a few
+    of them are in memory at a time. Return whether the file has any records
     """
-    s3_path = generate_s3_path(benchmark_results, filepath, schema_version)
-    if not s3_path:
-        msg = f"Could not generate an S3 path for {filepath}, skipping..."
-        info(msg)
-        return
+    with tempfile.TemporaryFile() as spool:
+        try:
+            s3_path, has_records = _spool_benchmark_results(
+                spool, filepath, schema_version, encoder, False, dry_run
+            )
+        except JSONDecodeError:
+            # Not a JSON document, try again in ClickHouse JSONEachRow format
+            spool.seek(0)
+            spool.truncate()
+            s3_path, has_records = _spool_benchmark_results(
+                spool, filepath, schema_version, encoder, True, dry_run
+            )
 
-    msg = f"Upload {filepath} to s3://{s3_bucket}/{s3_path}"
-    info(msg)
-    if not dry_run:
-        # Write in JSONEachRow format
-        data = "\n".join([json.dumps(result) for result in benchmark_results])
-        boto3.resource("s3").Object(
-            f"{s3_bucket}",
-            f"{s3_path}",
-        ).put(
-            Body=gzip.compress(data.encode()),
-            ContentEncoding="gzip",
-            ContentType="application/json",
-        )
+        if not has_records:
+            return False
 
+        if not s3_path:
+            msg = f"Could not generate an S3 path for {filepath}, skipping..."
+            info(msg)
+            return True
 
-def main() -> None:
-    args = parse_args()
+        msg = f"Upload {filepath} to s3://{s3_bucket}/{s3_path}"
+        info(msg)
+        if not dry_run:
+            spool.seek(0)
+            if s3_client is None:
+                s3_client = boto3.session.Session().client("s3")
+            s3_client.upload_fileobj(
+                spool,
+                s3_bucket,
+                s3_path,
+                ExtraArgs={
+                    "ContentEncoding": "gzip",
+                    "ContentType": "application/json",
+                },
+            )
+    return True
 
-    has_results_uploaded = False
-    for file in os.listdir(args.benchmark_results_dir):
-        if not file.endswith(".json"):
-            continue
 
-        filepath = os.path.join(args.benchmark_results_dir, file)
-        schema_version = args.metadata["schema_version"]
-
-        # NB: This is for backward compatibility before we move to schema v3
-        if schema_version == "v2":
-            with open(filepath) as f:
-                msg = f"Uploading {filepath} to dynamoDB ({schema_version})"
-                info(msg)
-                upload_to_dynamodb(
-                    dynamodb_table=args.dynamodb_table,
-                    # NB: DynamoDB only accepts decimal number, not float
-                    docs=json.load(f, parse_float=Decimal),
-                    generate_partition_key=generate_partition_key,
-                    dry_run=args.dry_run,
-                )
+def upload_benchmark_results_file(
+    filepath: str, args: Namespace, s3_client: Any = None
+) -> bool:
+    """
+    Upload a benchmark results file, return whether it has any records
+    """
+    schema_version = args.metadata["schema_version"]
+
+    # NB: This is for backward compatibility before we move to schema v3
+    if schema_version == "v2":
+        with open(filepath) as f:
+            msg = f"Uploading {filepath} to dynamoDB ({schema_version})"
+            info(msg)
+            upload_to_dynamodb(
+                dynamodb_table=args.dynamodb_table,
+                # NB: DynamoDB only accepts decimal number, not float
+                docs=json.load(f, parse_float=Decimal),
+                generate_partition_key=generate_partition_key,
+                dry_run=args.dry_run,
+            )
 
-        benchmark_results = process_benchmark_results(
-            filepath=filepath,
-            metadata=args.metadata,
-            runners=args.runners,
-            dependencies=args.dependencies,
-        )
+    return upload_to_s3(
+        s3_bucket=OSSCI_BENCHMARKS_BUCKET,
+        filepath=filepath,
+        schema_version=schema_version,
+        encoder=BenchmarkRecordEncoder(args.metadata, args.runners, args.dependencies),
+        dry_run=args.dry_run,
+        s3_client=s3_client,
+    )
 
-        if not benchmark_results:
-            continue
 
-        has_results_uploaded = True
-        upload_to_s3(
-            s3_bucket=OSSCI_BENCHMARKS_BUCKET,
-            filepath=filepath,
-            schema_version=schema_version,
-            benchmark_results=benchmark_results,
-            dry_run=args.dry_run,
+def main() -> None:
+    args = parse_args()
+
+    filepaths = [
+        os.path.join(args.benchmark_results_dir, file)
+        for file in os.listdir(args.benchmark_results_dir)
+        if file.endswith(".json")
+    ]
+    # boto3 clients, unlike sessions and resources, can be shared by threads
+    s3_client = None if args.dry_run else boto3.session.Session().client("s3")
+    with ThreadPoolExecutor(max_workers=args.max_workers) as executor:
+        has_results_uploaded = any(
+            list(
+                executor.map(
+                    lambda filepath: upload_benchmark_results_file(
+                        filepath, args, s3_client
+                    ),
+                    filepaths,
+                )
+            )
         )
 
     # Remember to keep ignore as the default behavior
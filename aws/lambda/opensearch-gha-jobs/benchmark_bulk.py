@@ -0,0 +1,150 @@
+"""
+Compare the per-record indexing path with the batched _bulk path against a local
+OpenSearch stand-in that charges a fixed round-trip latency per request plus a
+small per-document cost, roughly what the lambda sees from the AWS domain.
+
+    python benchmark_bulk.py --jobs 100 --events-per-job 10 --latency-ms 20
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import time
+from typing import Any, Dict, List
+
+from lambda_function import (
+    bulk_index,
+    collect_actions,
+    ensure_indices,
+    remove_document,
+    upsert_document,
+)
+
+
+ARN = "arn:aws:dynamodb:us-east-1:123:table/torchci-workflow-job/stream/456"
+
+
+class FakeIndices:
+    def __init__(self, server: "FakeOpenSearch") -> None:
+        self.server = server
+        self.created: set = set()
+
+    def exists(self, index: str) -> bool:
+        self.server.request()
+        return index in self.created
+
+    def create(self, index: str, body: Any = None) -> None:
+        self.server.request()
+        self.created.add(index)
+
+
+class FakeOpenSearch:
+    def __init__(self, latency: float, per_doc: float) -> None:
+        self.latency = latency
+        self.per_doc = per_doc
+        self.requests = 0
+        self.docs: Dict[str, Any] = {}
+        self.indices = FakeIndices(self)
+
+    def request(self, docs: int = 0) -> None:
+        self.requests += 1
+        time.sleep(self.latency + docs * self.per_doc)
+
+    def index(self, index: str, body: Any, id: str, refresh: bool) -> None:
+        self.request(1)
+        self.docs[id] = body
+
+    def delete(self, index: str, id: str, refresh: bool) -> None:
+        self.request(1)
+        self.docs.pop(id, None)
+
+    def bulk(self, body: bytes, refresh: bool) -> Dict[str, Any]:
+        lines = body.decode().splitlines()
+        items: List[Dict[str, Any]] = []
+        i = 0
+        while i < len(lines):
+            op, meta = next(iter(json.loads(lines[i]).items()))
+            if op == "index":
+                self.docs[meta["_id"]] = json.loads(lines[i + 1])
+                i += 2
+            else:
+                self.docs.pop(meta["_id"], None)
+                i += 1
+            items.append({op: {"_id": meta["_id"], "status": 200}})
+        self.request(len(items))
+        return {"errors": False, "items": items}
+
+
+def make_records(jobs: int, events_per_job: int) -> List[Dict[str, Any]]:
+    """
+    Interleave the events of many jobs the way a busy stream shard does: each job
+    is inserted and then modified once per completed step
+    """
+    records = []
+    for step in range(events_per_job):
+        for job in range(jobs):
+            records.append(
+                {
+                    "eventName": "INSERT" if step == 0 else "MODIFY",
+                    "eventSourceARN": ARN,
+                    "dynamodb": {
+                        "Keys": {"dynamoKey": {"S": f"pytorch/pytorch/{job}"}},
+                        "NewImage": {
+                            "created_at": {"S": "2023-08-11T02:55:33Z"},
+                            "status": {"S": "in_progress"},
+                            "steps": {
+                                "L": [
+                                    {"M": {"number": {"N": str(n)}}}
+                                    for n in range(step)
+                                ]
+                            },
+                        },
+                    },
+                }
+            )
+    return records
+
+
+def run_single(client: FakeOpenSearch, records: List[Dict[str, Any]]) -> None:
+    # The single-document path logs every document, keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        for record in records:
+            if record["eventName"] == "REMOVE":
+                remove_document(client, record)
+            else:
+                upsert_document(client, record)
+
+
+def run_bulk(client: FakeOpenSearch, records: List[Dict[str, Any]]) -> None:
+    _, actions = collect_actions(records)
+    ensure_indices(
+        client, {meta["index"]["_index"] for meta, _ in actions if "index" in meta}
+    )
+    bulk_index(client, actions)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=100)
+    parser.add_argument("--events-per-job", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--per-doc-ms", type=float, default=0.05)
+    args = parser.parse_args()
+
+    records = make_records(args.jobs, args.events_per_job)
+    print(f"{len(records)} stream records for {args.jobs} jobs")
+    final_docs = None
+    for name, run in (("single", run_single), ("bulk", run_bulk)):
+        client = FakeOpenSearch(args.latency_ms / 1000, args.per_doc_ms / 1000)
+        start = time.perf_counter()
+        run(client, records)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>6}: {client.requests:6d} requests {elapsed:8.2f}s")
+        if final_docs is None:
+            final_docs = client.docs
+        assert client.docs == final_docs, "bulk path indexed different documents"
+
+
+if __name__ == "__main__":
+    main()
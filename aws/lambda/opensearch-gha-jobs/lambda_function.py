@@ -1,8 +1,9 @@
 import json
 import re
+import time
 from collections import defaultdict
 from enum import Enum
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
 from warnings import warn
 
 import boto3
@@ -16,6 +17,15 @@ OPENSEARCH_REGION = "us-east-1"
 DYNAMODB_TABLE_REGEX = re.compile(
     "arn:aws:dynamodb:.*?:.*?:table/(?P<table>[0-9a-zA-Z_-]+)/.+"
 )
+# Cap on the NDJSON payload of a single _bulk request. AWS recommends 5-15MB per
+# bulk request, well below the domain's http.max_content_length
+MAX_BULK_BYTES = 5 * 1024 * 1024
+# How many times items rejected with a retryable status (429 / 5xx) are resent
+MAX_BULK_RETRIES = 3
+BULK_RETRY_BACKOFF_SECONDS = 1.0
+
+# A _bulk action line and its document source (None for deletes)
+BulkAction = Tuple[Dict[str, Any], Optional[Dict[str, Any]]]
 
 
 class EventType(Enum):
@@ -35,19 +45,53 @@ def lambda_handler(event: Any, context: Any) -> None:
         connection_class=RequestsHttpConnection,
     )
 
-    counts = defaultdict(int)
     # The input of this lambda is a stream of DynamoDB event that we want to
-    # indexed on OpenSearch
-    for record in event["Records"]:
+    # indexed on OpenSearch. A busy job emits many MODIFY events as its steps
+    # progress, so the batch is collapsed to the latest image per document and
+    # sent with the _bulk API instead of one request per event
+    counts, actions = collect_actions(event["Records"])
+    ensure_indices(
+        opensearch_client,
+        {meta["index"]["_index"] for meta, _ in actions if "index" in meta},
+    )
+    succeeded, failed = bulk_index(opensearch_client, actions)
+    counts["BULK_SUCCEEDED"] = succeeded
+    counts["BULK_FAILED"] = failed
+
+    print(f"Finish processing {json.dumps(counts)}")
+
+
+def collect_actions(
+    records: List[Any],
+) -> Tuple[Dict[str, int], List[BulkAction]]:
+    """
+    Turn a batch of stream records into bulk actions, keeping only the last event
+    for each document. Records arrive in stream order, so the last one wins
+    """
+    counts: Dict[str, int] = defaultdict(int)
+    latest: Dict[Tuple[str, str], BulkAction] = {}
+    for record in records:
         event_name = record.get("eventName", "")
         try:
             if (
                 event_name == EventType.INSERT.value
                 or event_name == EventType.MODIFY.value
             ):
-                upsert_document(opensearch_client, record)
+                target = upsert_target(record)
+                if target:
+                    index, id, body = target
+                    key = (extract_dynamodb_table(record) or "", id)
+                    if latest.pop(key, None) is not None:
+                        counts["COLLAPSED"] += 1
+                    latest[key] = ({"index": {"_index": index, "_id": id}}, body)
             elif event_name == EventType.REMOVE.value:
-                remove_document(opensearch_client, record)
+                target = remove_target(record)
+                if target:
+                    index, id = target
+                    key = (index, id)
+                    if latest.pop(key, None) is not None:
+                        counts["COLLAPSED"] += 1
+                    latest[key] = ({"delete": {"_index": index, "_id": id}}, None)
             else:
                 warn(f"Unrecognized event type {event_name} in {json.dumps(record)}")
 
@@ -55,7 +99,105 @@ def lambda_handler(event: Any, context: Any) -> None:
         except Exception as error:
             warn(f"Failed to process {json.dumps(record)}: {error}")
 
-    print(f"Finish processing {json.dumps(counts)}")
+    return counts, list(latest.values())
+
+
+def ensure_indices(client: OpenSearch, indices: Set[str]) -> None:
+    """
+    Create the monthly indices used by the batch once, instead of checking for
+    every record
+    """
+    for index in sorted(indices):
+        try:
+            if not client.indices.exists(index):
+                # https://www.elastic.co/guide/en/elasticsearch/reference/current/coerce.html
+                client.indices.create(
+                    index, body={"settings": {"index.mapping.coerce": True}}
+                )
+        except Exception as error:
+            # Another invocation may have created it concurrently, the bulk request
+            # reports the documents that really could not be indexed
+            warn(f"Failed to create index {index}: {error}")
+
+
+def chunk_actions(
+    actions: List[BulkAction],
+    max_bytes: int = MAX_BULK_BYTES,
+) -> Iterator[List[BulkAction]]:
+    """
+    Split the actions into _bulk requests whose NDJSON payload stays under
+    max_bytes. A single action larger than the cap is still sent on its own
+    """
+    chunk: List[BulkAction] = []
+    size = 0
+    for action in actions:
+        action_size = len(_to_ndjson([action]))
+        if chunk and size + action_size > max_bytes:
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(action)
+        size += action_size
+    if chunk:
+        yield chunk
+
+
+def _to_ndjson(actions: List[BulkAction]) -> bytes:
+    lines = []
+    for meta, body in actions:
+        lines.append(json.dumps(meta))
+        if body is not None:
+            lines.append(json.dumps(body))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _is_retryable(status: int) -> bool:
+    return status == 429 or status >= 500
+
+
+def bulk_index(
+    client: OpenSearch,
+    actions: List[BulkAction],
+    max_bytes: int = MAX_BULK_BYTES,
+    max_retries: int = MAX_BULK_RETRIES,
+) -> Tuple[int, int]:
+    """
+    Send the actions with the _bulk API, resending only the items that failed
+    with a retryable status. Return the number of succeeded and failed items
+    """
+    succeeded = 0
+    failed = 0
+    pending = actions
+    for attempt in range(max_retries + 1):
+        if not pending:
+            break
+        if attempt:
+            time.sleep(BULK_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+
+        retry: List[BulkAction] = []
+        for chunk in chunk_actions(pending, max_bytes):
+            try:
+                response = client.bulk(body=_to_ndjson(chunk), refresh=True)
+            except Exception as error:
+                warn(f"Bulk request of {len(chunk)} items failed: {error}")
+                retry.extend(chunk)
+                continue
+
+            for action, item in zip(chunk, response.get("items", [])):
+                op, result = next(iter(item.items()))
+                status = result.get("status", 500)
+                if status < 300 or (op == "delete" and status == 404):
+                    succeeded += 1
+                elif _is_retryable(status):
+                    retry.append(action)
+                else:
+                    warn(f"Failed to {op} {result.get('_id')}: {result.get('error')}")
+                    failed += 1
+        pending = retry
+
+    if pending:
+        warn(f"Giving up on {len(pending)} items after {max_retries} retries")
+        failed += len(pending)
+    return succeeded, failed
 
 
 def extract_dynamodb_table(record: Any) -> Optional[str]:
@@ -184,6 +326,23 @@ def upsert_document(client: OpenSearch, record: Any) -> None:
             "eventSourceARN": "arn:aws:dynamodb:us-east-1:...:table/torchci-workflow-job/stream/..."
         }
     """
+    target = upsert_target(record)
+    if not target:
+        return
+    index, id, body = target
+
+    # Create index using the table name if it's not there yet
+    ensure_indices(client, {index})
+
+    print(f"UPSERTING {id} INTO {index}")
+    client.index(index=index, body=body, id=id, refresh=True)
+
+
+def upsert_target(record: Any) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+    """
+    Return the (monthly index, id, document) an INSERT or MODIFY record is written
+    to, or None if the record is not a valid document
+    """
     index = extract_dynamodb_table(record)
     if not index:
         return
@@ -197,11 +356,6 @@ def upsert_document(client: OpenSearch, record: Any) -> None:
     )
     index += "-" + month.replace("-", ".")
 
-    # Create index using the table name if it's not there yet
-    if not client.indices.exists(index):
-        # https://www.elastic.co/guide/en/elasticsearch/reference/current/coerce.html
-        client.indices.create(index, body={"settings": {"index.mapping.coerce": True}})
-
     body = unmarshal({"M": record.get("dynamodb", {}).get("NewImage", {})})
     if not body:
         return
@@ -210,14 +364,26 @@ def upsert_document(client: OpenSearch, record: Any) -> None:
     if not id:
         return
 
-    print(f"UPSERTING {id} INTO {index}")
-    client.index(index=index, body=body, id=id, refresh=True)
+    return index, id, body
 
 
 def remove_document(client: OpenSearch, record: Any) -> None:
     """
     Remove a document. This is here for completeness as we don't remove records from DynamoDB
     """
+    target = remove_target(record)
+    if not target:
+        return
+    index, id = target
+
+    print(f"DELETING {id} FROM {index}")
+    client.delete(index=index, id=id, refresh=True)
+
+
+def remove_target(record: Any) -> Optional[Tuple[str, str]]:
+    """
+    Return the (index, id) a REMOVE record deletes, or None if it is not valid
+    """
     index = extract_dynamodb_table(record)
     if not index:
         return
@@ -226,5 +392,4 @@ def remove_document(client: OpenSearch, record: Any) -> None:
     if not id:
         return
 
-    print(f"DELETING {id} FROM {index}")
-    client.delete(index=index, id=id, refresh=True)
+    return index, id
@@ -1,7 +1,12 @@
+import json
 from unittest import TestCase
 from unittest.mock import Mock
 
+import lambda_function
 from lambda_function import (
+    bulk_index,
+    chunk_actions,
+    collect_actions,
     extract_dynamodb_key,
     extract_dynamodb_table,
     remove_document,
@@ -11,6 +16,23 @@ from lambda_function import (
 )
 
 
+ARN = "arn:aws:dynamodb:us-east-1:123:table/torchci-workflow-job/stream/456"
+
+
+def make_record(event_name, key, status="queued"):
+    return {
+        "eventName": event_name,
+        "eventSourceARN": ARN,
+        "dynamodb": {
+            "Keys": {"dynamoKey": {"S": key}},
+            "NewImage": {
+                "created_at": {"S": "2023-08-11T02:55:33Z"},
+                "status": {"S": status},
+            },
+        },
+    }
+
+
 def test_extract_dynamodb_table():
     cases = [
         {
@@ -312,3 +334,117 @@ def test_upsert_document():
             mock_client.index.assert_called_once()
         else:
             mock_client.index.assert_not_called()
+
+
+def test_collect_actions_collapses_to_latest_image():
+    records = [
+        make_record("INSERT", "pytorch/pytorch/1", "queued"),
+        make_record("MODIFY", "pytorch/pytorch/2", "queued"),
+        make_record("MODIFY", "pytorch/pytorch/1", "in_progress"),
+        make_record("MODIFY", "pytorch/pytorch/1", "completed"),
+        make_record("REMOVE", "pytorch/pytorch/2"),
+        {"eventName": "UNKNOWN"},
+    ]
+
+    counts, actions = collect_actions(records)
+
+    TestCase().assertEqual(
+        [
+            (
+                {
+                    "index": {
+                        "_index": "torchci-workflow-job-2023.08",
+                        "_id": "pytorch/pytorch/1",
+                    }
+                },
+                {"created_at": "2023-08-11T02:55:33Z", "status": "completed"},
+            ),
+            (
+                {
+                    "delete": {
+                        "_index": "torchci-workflow-job",
+                        "_id": "pytorch/pytorch/2",
+                    }
+                },
+                None,
+            ),
+        ],
+        actions,
+    )
+    TestCase().assertEqual(3, counts["MODIFY"])
+    TestCase().assertEqual(1, counts["REMOVE"])
+    TestCase().assertEqual(3, counts["COLLAPSED"])
+
+
+def test_chunk_actions_caps_payload_size():
+    actions = [
+        ({"index": {"_index": "i", "_id": f"{i:02d}"}}, {"payload": "x" * 100})
+        for i in range(50)
+    ]
+    one = len(lambda_function._to_ndjson(actions[:1]))
+
+    chunks = list(chunk_actions(actions, max_bytes=one * 4))
+
+    TestCase().assertEqual([4] * 12 + [2], [len(c) for c in chunks])
+    TestCase().assertEqual(actions, [a for c in chunks for a in c])
+    # An action bigger than the cap still goes out on its own
+    TestCase().assertEqual(
+        [[a] for a in actions[:2]], list(chunk_actions(actions[:2], max_bytes=1))
+    )
+
+
+def _bulk_response(body, statuses):
+    ids = [
+        next(iter(json.loads(line).values()))["_id"]
+        for line in body.decode().splitlines()
+        if line.startswith('{"index"') or line.startswith('{"delete"')
+    ]
+    return {
+        "errors": any(statuses.get(id, 200) >= 300 for id in ids),
+        "items": [
+            {"index": {"_id": id, "status": statuses.get(id, 200), "error": "boom"}}
+            for id in ids
+        ],
+    }
+
+
+def test_bulk_index_retries_only_failed_items(monkeypatch):
+    monkeypatch.setattr(lambda_function, "BULK_RETRY_BACKOFF_SECONDS", 0)
+    actions = [({"index": {"_index": "i", "_id": str(i)}}, {"n": i}) for i in range(5)]
+    sent = []
+    # "1" is throttled once, "3" is rejected for good (mapping error)
+    responses = [{"1": 429, "3": 400}, {}]
+
+    def bulk(body, refresh):
+        sent.append(body)
+        return _bulk_response(body, responses.pop(0))
+
+    client = Mock()
+    client.bulk.side_effect = bulk
+
+    succeeded, failed = bulk_index(client, actions)
+
+    TestCase().assertEqual((4, 1), (succeeded, failed))
+    TestCase().assertEqual(2, client.bulk.call_count)
+    TestCase().assertEqual(lambda_function._to_ndjson(actions[1:2]), sent[1])
+
+
+def test_bulk_index_gives_up_after_retries(monkeypatch):
+    monkeypatch.setattr(lambda_function, "BULK_RETRY_BACKOFF_SECONDS", 0)
+    actions = [({"delete": {"_index": "i", "_id": "gone"}}, None)]
+    client = Mock()
+    client.bulk.side_effect = ConnectionError("unreachable")
+
+    TestCase().assertEqual((0, 1), bulk_index(client, actions, max_retries=2))
+    TestCase().assertEqual(3, client.bulk.call_count)
+
+
+def test_bulk_index_delete_not_found_is_success():
+    actions = [({"delete": {"_index": "i", "_id": "gone"}}, None)]
+    client = Mock()
+    client.bulk.return_value = {
+        "errors": True,
+        "items": [{"delete": {"_id": "gone", "status": 404}}],
+    }
+
+    TestCase().assertEqual((1, 0), bulk_index(client, actions))
@@ -0,0 +1,172 @@
+"""
+Time the stages of the autorevert v2 flow (testers/autorevert_v2.py) on a
+fixture of recorded ClickHouse query results, without network access.
+
+Record the datasource queries of one run once (needs the CLICKHOUSE_* env vars,
+.env is loaded):
+
+    python -m pytorch_auto_revert.benchmark_autorevert record run.json.gz \\
+        --as-of 2025-01-01T12:00:00 --hours 24 trunk pull
+
+Then replay it as often as needed; every run sees the same data:
+
+    python -m pytorch_auto_revert.benchmark_autorevert replay run.json.gz --repeat 5
+
+Stages: signal extraction (queries answered from the fixture), outcome
+processing with bisection planning, action grouping, state JSON building and
+HUD rendering. Actions are only grouped, never executed.
+
+Pending jobs get a synthetic event timestamped "now" during extraction, so
+fixtures that contain them render slightly differently from run to run.
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .hud_renderer import render_html_from_state
+from .run_state_logger import RunStateLogger
+from .signal import Signal
+from .signal_actions import SignalActionProcessor, SignalProcOutcome
+from .signal_extraction import SignalExtractor
+from .signal_extraction_replay import RecordingDatasource, ReplayDatasource
+from .signal_extraction_types import RunContext
+from .utils import AdvisorAction, RestartAction, RevertAction
+
+
+def record(args: argparse.Namespace) -> None:
+    from dotenv import load_dotenv
+
+    from .clickhouse_client_helper import CHCliFactory
+
+    load_dotenv()
+    CHCliFactory.setup_client(
+        os.environ.get("CLICKHOUSE_HOST", "localhost"),
+        int(os.environ.get("CLICKHOUSE_PORT", 8443)),
+        os.environ.get("CLICKHOUSE_USERNAME", ""),
+        os.environ.get("CLICKHOUSE_PASSWORD", ""),
+        os.environ.get("CLICKHOUSE_DATABASE", "default"),
+    )
+    recorder = RecordingDatasource()
+    signals = SignalExtractor(
+        workflows=args.workflows,
+        lookback_hours=args.hours,
+        repo_full_name=args.repo_full_name,
+        as_of=args.as_of,
+        datasource=recorder,
+    ).extract()
+    recorder.save(
+        args.fixture,
+        repo_full_name=args.repo_full_name,
+        workflows=args.workflows,
+        lookback_hours=args.hours,
+        as_of=args.as_of,
+    )
+    print(
+        f"{len(recorder.calls)} queries, {len(signals)} signals,"
+        f" {os.path.getsize(args.fixture)} bytes -> {args.fixture}"
+    )
+
+
+def _timed(timings: Dict[str, List[float]], stage: str, fn: Callable[[], Any]) -> Any:
+    start = time.perf_counter()
+    result = fn()
+    timings.setdefault(stage, []).append(time.perf_counter() - start)
+    return result
+
+
+def replay(args: argparse.Namespace) -> None:
+    timings: Dict[str, List[float]] = {}
+    for _ in range(args.repeat):
+        datasource = _timed(timings, "load", lambda: ReplayDatasource(args.fixture))
+        meta = datasource.meta
+        extractor = SignalExtractor(
+            workflows=meta["workflows"],
+            lookback_hours=meta["lookback_hours"],
+            repo_full_name=meta["repo_full_name"],
+            as_of=meta["as_of"],
+            datasource=datasource,
+        )
+        signals: List[Signal] = _timed(timings, "extract", extractor.extract)
+        pairs: List[Tuple[Signal, SignalProcOutcome]] = _timed(
+            timings,
+            "process",
+            lambda: [
+                (
+                    s,
+                    s.process_valid_autorevert_pattern(
+                        bisection_limit=args.bisection_limit
+                    ),
+                )
+                for s in signals
+            ],
+        )
+        groups = _timed(
+            timings, "group", lambda: SignalActionProcessor().group_actions(pairs)
+        )
+        ctx = RunContext(
+            lookback_hours=meta["lookback_hours"],
+            notify_issue_number=0,
+            repo_full_name=meta["repo_full_name"],
+            restart_action=RestartAction.LOG,
+            revert_action=RevertAction.LOG,
+            advisor_action=AdvisorAction.LOG,
+            ts=meta["as_of"] or datetime.now(timezone.utc),
+            workflows=meta["workflows"],
+        )
+        state = _timed(
+            timings,
+            "state",
+            lambda: json.loads(
+                json.dumps(
+                    RunStateLogger()._build_state_json(
+                        repo=meta["repo_full_name"], ctx=ctx, pairs=pairs
+                    )
+                )
+            ),
+        )
+        html = _timed(timings, "render", lambda: render_html_from_state(state))
+
+    print(
+        f"{len(signals)} signals, {len(groups)} action groups,"
+        f" {len(html)} bytes of HTML; best of {args.repeat}:"
+    )
+    for stage, samples in timings.items():
+        print(f"{stage:>8}: {min(samples):8.3f}s")
+    print(f"{'total':>8}: {sum(min(s) for s in timings.values()):8.3f}s")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="Record the datasource queries of a run")
+    rec.add_argument("fixture")
+    rec.add_argument("workflows", nargs="+")
+    rec.add_argument(
+        "--as-of",
+        type=datetime.fromisoformat,
+        required=True,
+        help="End of the lookback window (ISO 8601); fixes the recorded data",
+    )
+    rec.add_argument("--hours", type=int, default=16)
+    rec.add_argument("--repo-full-name", default="pytorch/pytorch")
+    rec.set_defaults(func=record)
+
+    rep = sub.add_parser("replay", help="Time the pipeline stages on a fixture")
+    rep.add_argument("fixture")
+    rep.add_argument("--repeat", type=int, default=3)
+    rep.add_argument("--bisection-limit", type=int, default=None)
+    rep.set_defaults(func=replay)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
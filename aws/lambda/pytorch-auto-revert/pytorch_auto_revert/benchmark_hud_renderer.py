@@ -0,0 +1,204 @@
+"""
+Compare render_html_from_state on a synthetic legacy HUD state (columns
+without an "outcomes" map, so outcomes are derived from the columns) between
+the previous outcome derivation, which scanned the commit list to resolve
+every sha prefix and rescanned every commit's events for each column, and the
+indexed one. Both have to render the same HTML.
+
+    python -m pytorch_auto_revert.benchmark_hud_renderer --commits 2000 --columns 1000
+"""
+
+import argparse
+import random
+import re
+import time
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+from unittest import mock
+
+from . import hud_renderer
+
+
+def _legacy_outcomes_from_columns_linear(
+    columns: Sequence[Mapping[str, Any]], commits: Sequence[str]
+) -> Dict[str, Dict[str, Any]]:
+    """The previous _legacy_outcomes_from_columns"""
+    mapping: Dict[str, Dict[str, Any]] = {}
+    commit_index = {sha: idx for idx, sha in enumerate(commits)}
+
+    def _resolve(prefix: Optional[str]) -> Optional[str]:
+        if not prefix:
+            return None
+        prefix = prefix.strip()
+        if not prefix:
+            return None
+        for sha in commits:
+            if sha.startswith(prefix):
+                return sha
+        return prefix
+
+    for col in columns:
+        workflow = str(col.get("workflow", ""))
+        key = str(col.get("key", ""))
+        sig = f"{workflow}:{key}" if key else workflow
+        outcome = str(col.get("outcome", "ineligible"))
+        highlights: Mapping[str, Sequence[str]] = col.get("highlights", {}) or {}
+        note = str(col.get("note", ""))
+        cells: Mapping[str, Sequence[Mapping[str, Any]]] = col.get("cells", {}) or {}
+
+        def _has_status(sha: str, status: str, _cells=cells) -> bool:
+            return any(ev.get("status") == status for ev in _cells.get(sha, []) or [])
+
+        if outcome == "revert":
+            suspected = next(
+                (sha for sha, c in highlights.items() if "hl-suspected" in c), None
+            )
+            baseline = next(
+                (sha for sha, c in highlights.items() if "hl-baseline" in c), None
+            )
+            newer = [sha for sha, c in highlights.items() if "hl-newer-fail" in c]
+            if not suspected:
+                m = re.search(r"suspect\s+([0-9a-fA-F]{6,40})", note)
+                suspected = _resolve(m.group(1) if m else None)
+            if not baseline:
+                m = re.search(r"baseline\s+([0-9a-fA-F]{6,40})", note)
+                baseline = _resolve(m.group(1) if m else None)
+            failed_commits = [sha for sha in commits if _has_status(sha, "failure")]
+            if not suspected and failed_commits:
+                suspected = failed_commits[-1]
+            if not newer and failed_commits:
+                newer = [sha for sha in failed_commits if sha != suspected]
+            if not baseline and suspected and suspected in commit_index:
+                for sha in commits[commit_index[suspected] + 1 :]:
+                    if _has_status(sha, "success"):
+                        baseline = sha
+                        break
+            newer = [sha for sha in newer if sha]
+            newer.sort(key=lambda sha: commit_index.get(sha, float("inf")))
+            mapping[sig] = {
+                "type": "AutorevertPattern",
+                "data": {
+                    "suspected_commit": suspected,
+                    "older_successful_commit": baseline,
+                    "newer_failing_commits": newer,
+                },
+            }
+        elif outcome == "restart":
+            restart_shas = sorted(
+                sha for sha, c in highlights.items() if "hl-restart" in c
+            )
+            if not restart_shas:
+                restart_shas = [
+                    _resolve(match)
+                    for match in re.findall(r"([0-9a-fA-F]{6,40})", note)
+                ]
+                restart_shas = [sha for sha in restart_shas if sha]
+            if not restart_shas:
+                restart_shas = [sha for sha in commits if _has_status(sha, "failure")]
+            seen: List[str] = []
+            for sha in restart_shas:
+                if sha and sha not in seen:
+                    seen.append(sha)
+            restart_shas = sorted(
+                seen, key=lambda sha: commit_index.get(sha, float("inf"))
+            )
+            mapping[sig] = {
+                "type": "RestartCommits",
+                "data": {"commit_shas": restart_shas},
+            }
+        else:
+            ineligible = col.get("ineligible", {}) or {}
+            reason = ineligible.get("reason")
+            message = ineligible.get("message")
+            if not reason and note:
+                m = re.search(r"Ineligible:\s*([^—]+)", note)
+                if m:
+                    reason = m.group(1).strip()
+            if not message and "—" in note:
+                message = note.split("—", 1)[1].strip()
+            mapping[sig] = {
+                "type": "Ineligible",
+                "data": {"reason": reason, "message": message},
+            }
+    return mapping
+
+
+def make_state(commits: int, columns: int, seed: int) -> Dict[str, Any]:
+    """
+    Columns of sparse events, a third of them reverts and restarts whose
+    outcome has to be recovered from the note or from the events
+    """
+    rng = random.Random(seed)
+    shas = [f"{rng.getrandbits(160):040x}" for _ in range(commits)]
+    cols: List[Dict[str, Any]] = []
+    for c in range(columns):
+        cells: Dict[str, List[Dict[str, Any]]] = {}
+        for sha in rng.sample(shas, k=min(len(shas), 20)):
+            cells[sha] = [
+                {
+                    "name": f"wf=trunk kind=job id=j{c} run={rng.randrange(10**6)} attempt=1",
+                    "status": rng.choice(["success", "success", "failure", "pending"]),
+                    "started_at": "2025-01-01T00:00:00",
+                    "job_id": rng.choice([None, rng.randrange(10**6)]),
+                }
+            ]
+        outcome = ("revert", "restart", "ineligible")[c % 3]
+        note = ""
+        if outcome == "revert" and c % 2:
+            suspect = rng.choice(shas)
+            note = f"Pattern: suspect {suspect[:7]} vs baseline {rng.choice(shas)[:7]}"
+        elif outcome == "restart" and c % 2:
+            note = "Suggest restart: " + ", ".join(
+                sha[:7] for sha in rng.sample(shas, k=3)
+            )
+        elif outcome == "ineligible":
+            note = "Ineligible: flaky — failures are not consistent"
+        cols.append(
+            {
+                "workflow": "trunk",
+                "key": f"job {c}",
+                "job_base_name": f"job {c}",
+                "outcome": outcome,
+                "note": note,
+                "cells": cells,
+            }
+        )
+    return {
+        "commits": shas,
+        "commit_times": dict.fromkeys(shas, "2025-01-01T00:00:00Z"),
+        "columns": cols,
+        "meta": {"repo": "pytorch/pytorch", "workflows": ["trunk"]},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--commits", type=int, default=2000)
+    parser.add_argument("--columns", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    state = make_state(args.commits, args.columns, args.seed)
+    print(f"{args.commits} commits, {args.columns} columns")
+
+    outputs = {}
+    for name, outcomes in (
+        ("linear", _legacy_outcomes_from_columns_linear),
+        ("indexed", hud_renderer._legacy_outcomes_from_columns),
+    ):
+        start = time.perf_counter()
+        outcomes(state["columns"], state["commits"])
+        derive = time.perf_counter() - start
+        with mock.patch.object(hud_renderer, "_legacy_outcomes_from_columns", outcomes):
+            start = time.perf_counter()
+            outputs[name] = hud_renderer.render_html_from_state(state)
+            render = time.perf_counter() - start
+        print(
+            f"{name:>8}: outcomes {derive:7.3f}s, render {render:7.2f}s,"
+            f" {len(outputs[name])} bytes of HTML"
+        )
+
+    assert outputs["linear"] == outputs["indexed"], "rendered HTML differs"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Compare signal extraction over a lazily aggregated JobAggIndex, rebuilt for
+each of the three signal builders as before, against the single precomputed
+index that SignalExtractor.extract now shares between them, on a synthetic job
+set. Both have to produce the same signals and the same per-attempt JobMeta.
+
+    python -m pytorch_auto_revert.benchmark_job_agg_index --rows 200000
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from .job_agg_index import JobAggIndex
+from .signal import Signal
+from .signal_extraction import _attempt_key, _commit_wf_base, SignalExtractor
+from .signal_extraction_types import (
+    JobId,
+    JobName,
+    JobRow,
+    RunAttempt,
+    Sha,
+    TestRow,
+    WfRunId,
+    WorkflowName,
+)
+
+
+START = datetime(2025, 1, 1)
+WORKFLOWS = ["trunk", "pull", "inductor"]
+CONFIGS = ["default", "distributed", "slow", "crossref"]
+SHARDS = 4
+
+
+def make_jobs(
+    rows: int, commits: int, seed: int
+) -> Tuple[List[Tuple[Sha, datetime]], List[JobRow], List[TestRow]]:
+    """
+    Sharded test and build jobs of every workflow on every commit, with ~2%
+    failures (most of them test failures, some retried in a second attempt),
+    and a few pending, cancelled and skipped jobs
+    """
+    rng = random.Random(seed)
+    per_commit = rows // commits
+    # (workflow, name) of every job on a commit, shards included
+    names: List[Tuple[str, str]] = []
+    env = 0
+    while len(names) < per_commit:
+        workflow = WORKFLOWS[env % len(WORKFLOWS)]
+        build_env = f"linux-jammy-py3.{env % 4 + 10}-env{env}"
+        names.append((workflow, f"{build_env} / build"))
+        for config in CONFIGS:
+            for shard in range(1, SHARDS + 1):
+                names.append(
+                    (
+                        workflow,
+                        f"{build_env} / test ({config}, {shard}, {SHARDS}, runner)",
+                    )
+                )
+        env += 1
+    names = names[:per_commit]
+
+    commit_list: List[Tuple[Sha, datetime]] = []
+    jobs: List[JobRow] = []
+    tests: List[TestRow] = []
+    job_id = 0
+    for c in range(commits):
+        sha = Sha(f"{c:040x}")
+        created = START + timedelta(minutes=30 * c)
+        # newest first, like the datasource
+        commit_list.insert(0, (sha, created))
+        for w, workflow in enumerate(WORKFLOWS):
+            wf_run_id = WfRunId(c * len(WORKFLOWS) + w)
+            for workflow_name, name in names:
+                if workflow_name != workflow:
+                    continue
+                roll = rng.random()
+                attempts = 2 if roll < 0.005 else 1
+                for attempt in range(1, attempts + 1):
+                    job_id += 1
+                    status, conclusion, rule = "completed", "success", ""
+                    if attempt < attempts or 0.005 <= roll < 0.02:
+                        conclusion = "failure"
+                        rule = "pytest failure" if rng.random() < 0.8 else "build"
+                    elif roll > 0.998:
+                        status, conclusion = "in_progress", ""
+                    elif roll > 0.996:
+                        conclusion = rng.choice(["cancelled", "skipped"])
+                    started = created + timedelta(minutes=attempt * 60 + w)
+                    jobs.append(
+                        JobRow(
+                            head_sha=sha,
+                            workflow_name=WorkflowName(workflow),
+                            wf_run_id=wf_run_id,
+                            job_id=JobId(job_id),
+                            run_attempt=RunAttempt(attempt),
+                            name=JobName(name),
+                            status=status,
+                            conclusion=conclusion,
+                            started_at=started,
+                            created_at=created,
+                            rule=rule,
+                        )
+                    )
+                    if rule == "pytest failure":
+                        tests.append(
+                            TestRow(
+                                job_id=JobId(job_id),
+                                wf_run_id=wf_run_id,
+                                workflow_run_attempt=RunAttempt(attempt),
+                                file=f"test_{rng.randrange(20)}.py",
+                                classname="TestCase",
+                                name=f"test_{rng.randrange(5)}",
+                                failure_runs=1,
+                                success_runs=0,
+                            )
+                        )
+    return commit_list, jobs, tests
+
+
+def fingerprint(signals: List[Signal]) -> List[Any]:
+    return [
+        (
+            s.key,
+            s.workflow_name,
+            s.job_base_name,
+            s.source,
+            s.test_file,
+            s.test_classname,
+            s.test_name,
+            [
+                (c.head_sha, c.timestamp, [sorted(vars(e).items()) for e in c.events])
+                for c in s.commits
+            ],
+        )
+        for s in signals
+    ]
+
+
+def extract(
+    extractor: SignalExtractor,
+    jobs: List[JobRow],
+    tests: List[TestRow],
+    commits: List[Tuple[Sha, datetime]],
+    precompute: bool,
+) -> List[Signal]:
+    """The three signal builders of SignalExtractor.extract"""
+    if precompute:
+        shared = JobAggIndex.from_rows(jobs, key_fn=_attempt_key, precompute=True)
+        indexes = [shared, shared, shared]
+    else:
+        # Built lazily, as each builder used to, one index per builder
+        indexes = [JobAggIndex.from_rows(jobs, key_fn=_attempt_key) for _ in range(3)]
+    return (
+        extractor._build_test_signals(jobs, tests, commits, index=indexes[0])
+        + extractor._build_non_test_signals(jobs, commits, index=indexes[1])
+        + extractor._build_non_test_signals(
+            jobs, commits, test_failures=True, index=indexes[2]
+        )
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--commits", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    commits, jobs, tests = make_jobs(args.rows, args.commits, args.seed)
+    print(f"{len(jobs)} job rows, {len(tests)} test rows, {len(commits)} commits")
+
+    # The stats of every attempt key and the groupings the builders use
+    lazy = JobAggIndex.from_rows(jobs, key_fn=_attempt_key)
+    precomputed = JobAggIndex.from_rows(jobs, key_fn=_attempt_key, precompute=True)
+    assert list(lazy.keys()) == list(precomputed.keys())
+    assert all(lazy.stats(k) == precomputed.stats(k) for k in lazy.keys())
+    assert lazy.group_keys_by(_commit_wf_base) == precomputed.group_keys_by(
+        _commit_wf_base
+    )
+
+    extractor = SignalExtractor(workflows=WORKFLOWS)
+    results: Dict[str, List[Any]] = {}
+    for name, precompute in (("lazy", False), ("precomputed", True)):
+        # Fresh rows, so neither run starts with the other's cached JobRow properties
+        commits, jobs, tests = make_jobs(args.rows, args.commits, args.seed)
+        start = time.perf_counter()
+        signals = extract(extractor, jobs, tests, commits, precompute)
+        elapsed = time.perf_counter() - start
+        results[name] = fingerprint(signals)
+        print(f"{name:>12}: {elapsed:7.2f}s  {len(signals)} signals")
+
+    assert results["lazy"] == results["precomputed"], "signals differ"
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
+import bisect
 import re
 from datetime import datetime
-from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
 
 from .signal import SignalStatus
 from .utils import build_pytorch_hud_url
@@ -133,22 +134,61 @@ def _event_title_from_dict(event: Mapping[str, Any]) -> str:
     return "\n".join(parts)
 
 
-def _legacy_outcomes_from_columns(
-    columns: Sequence[Mapping[str, Any]], commits: Sequence[str]
-) -> Dict[str, Dict[str, Any]]:
-    mapping: Dict[str, Dict[str, Any]] = {}
-    commit_index = {sha: idx for idx, sha in enumerate(commits)}
-
-    def _resolve(prefix: Optional[str]) -> Optional[str]:
+class _CommitLookup:
+    """
+    Lookups over the HUD commit list (newest -> older), built once per render
+    so that resolving sha prefixes and ordering commits don't rescan the list
+    for every column.
+    """
+
+    def __init__(self, commits: Sequence[str]) -> None:
+        self.commits = commits
+        self.index = {sha: idx for idx, sha in enumerate(commits)}
+        # every position of each sha, in case the list repeats one
+        self._positions: Dict[str, List[int]] = {}
+        for idx, sha in enumerate(commits):
+            self._positions.setdefault(sha, []).append(idx)
+        self._sorted = sorted(self._positions)
+
+    def resolve(self, prefix: Optional[str]) -> Optional[str]:
+        """The first (newest) commit starting with prefix, else prefix itself."""
         if not prefix:
             return None
         prefix = prefix.strip()
         if not prefix:
             return None
-        for sha in commits:
-            if sha.startswith(prefix):
-                return sha
-        return prefix
+        # shas starting with prefix are contiguous in sorted order
+        best: Optional[int] = None
+        i = bisect.bisect_left(self._sorted, prefix)
+        while i < len(self._sorted) and self._sorted[i].startswith(prefix):
+            first = self._positions[self._sorted[i]][0]
+            if best is None or first < best:
+                best = first
+            i += 1
+        return self.commits[best] if best is not None else prefix
+
+    def positions(self, shas: Iterable[str]) -> List[int]:
+        """Sorted positions in the commit list of every occurrence of shas."""
+        return sorted(idx for sha in shas for idx in self._positions.get(sha, ()))
+
+
+def _shas_with_status(
+    cells: Mapping[str, Sequence[Mapping[str, Any]]], status: str
+) -> List[str]:
+    return [
+        sha
+        for sha, events in cells.items()
+        if any(ev.get("status") == status for ev in events or [])
+    ]
+
+
+def _legacy_outcomes_from_columns(
+    columns: Sequence[Mapping[str, Any]], commits: Sequence[str]
+) -> Dict[str, Dict[str, Any]]:
+    mapping: Dict[str, Dict[str, Any]] = {}
+    lookup = _CommitLookup(commits)
+    commit_index = lookup.index
+    _resolve = lookup.resolve
 
     def _sig_key(col: Mapping[str, Any]) -> str:
         workflow = str(col.get("workflow", ""))
@@ -162,8 +202,12 @@ def _legacy_outcomes_from_columns(
         note = str(col.get("note", ""))
         cells: Mapping[str, Sequence[Mapping[str, Any]]] = col.get("cells", {}) or {}
 
-        def _has_status(sha: str, status: str, _cells=cells) -> bool:
-            return any(ev.get("status") == status for ev in _cells.get(sha, []) or [])
+        def _failed_commits(_cells=cells) -> List[str]:
+            # commits (newest -> older) with a failure event in this column
+            return [
+                commits[idx]
+                for idx in lookup.positions(_shas_with_status(_cells, "failure"))
+            ]
 
         if outcome == "revert":
             suspected = next(
@@ -192,17 +236,18 @@ def _legacy_outcomes_from_columns(
                 m = re.search(r"baseline\s+([0-9a-fA-F]{6,40})", note)
                 baseline = _resolve(m.group(1) if m else None)
 
-            failed_commits = [sha for sha in commits if _has_status(sha, "failure")]
+            failed_commits = _failed_commits()
             if not suspected and failed_commits:
                 # suspect is the oldest failing commit (last in list since commits newest->older)
                 suspected = failed_commits[-1]
             if not newer and failed_commits:
                 newer = [sha for sha in failed_commits if sha != suspected]
             if not baseline and suspected and suspected in commit_index:
-                for sha in commits[commit_index[suspected] + 1 :]:
-                    if _has_status(sha, "success"):
-                        baseline = sha
-                        break
+                # the newest successful commit older than the suspect
+                successes = lookup.positions(_shas_with_status(cells, "success"))
+                i = bisect.bisect_right(successes, commit_index[suspected])
+                if i < len(successes):
+                    baseline = commits[successes[i]]
             newer = [sha for sha in newer if sha]
             newer.sort(key=lambda sha: commit_index.get(sha, float("inf")))
             mapping[sig] = {
@@ -225,11 +270,9 @@ def _legacy_outcomes_from_columns(
                 restart_shas = [sha for sha in restart_shas if sha]
             if not restart_shas:
                 # fall back to commits that had failures but not marked success
-                restart_shas = [sha for sha in commits if _has_status(sha, "failure")]
-            seen: List[str] = []
-            for sha in restart_shas:
-                if sha and sha not in seen:
-                    seen.append(sha)
+                restart_shas = _failed_commits()
+            # dedup, keeping first appearance
+            seen = list(dict.fromkeys(sha for sha in restart_shas if sha))
             restart_shas = sorted(
                 seen, key=lambda sha: commit_index.get(sha, float("inf"))
             )
@@ -457,20 +500,31 @@ def render_html_from_state(
     html_parts.append("</tr>")
     html_parts.append("</thead>")
 
+    # Per-column lookups, resolved once instead of once per commit row
+    column_lookups: List[
+        Tuple[Mapping[str, Any], Mapping[str, Any], str, Mapping[str, List[str]]]
+    ] = []
+    for col in columns:
+        workflow = str(col.get("workflow", ""))
+        key = str(col.get("key", ""))
+        sig_key = f"{workflow}:{key}" if key else workflow
+        column_lookups.append(
+            (
+                col.get("cells", {}) or {},
+                # Forward-compatible: advisor_results may not exist in older states
+                col.get("advisor_results", {}) or {},
+                sig_key,
+                highlight_lookup.get(sig_key, {}),
+            )
+        )
+
     html_parts.append("<tbody>")
     for sha in commits:
         html_parts.append("<tr>")
         label = _format_commit_label_from_state(sha, commit_times)
         html_parts.append(f'<td class="commit"><code>{label}</code></td>')
-        for col in columns:
-            cells_map = col.get("cells", {}) or {}
+        for cells_map, advisor_results, sig_key, highlights_map in column_lookups:
             events = cells_map.get(sha, []) or []
-            # Forward-compatible: advisor_results may not exist in older states
-            advisor_results = col.get("advisor_results", {}) or {}
-            workflow = str(col.get("workflow", ""))
-            key = str(col.get("key", ""))
-            sig_key = f"{workflow}:{key}" if key else workflow
-            highlights_map = highlight_lookup.get(sig_key, {})
             cell_classes = " ".join(sorted(highlights_map.get(sha, [])))
 
             # Render advisor verdict badge for this cell (if available)
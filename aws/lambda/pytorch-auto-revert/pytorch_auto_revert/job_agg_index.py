@@ -5,6 +5,7 @@ from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
 from typing import (
+    Any,
     Callable,
     DefaultDict,
     Dict,
@@ -82,6 +83,64 @@ class JobMeta:
         return SignalStatus.PENDING
 
 
+class _MetaAccumulator:
+    """
+    Running JobMeta aggregation for one group, fed one row at a time in input
+    order. `freeze()` yields exactly what `JobAggIndex.stats` computes from the
+    complete group.
+    """
+
+    __slots__ = (
+        "started_at",
+        "is_pending",
+        "is_cancelled",
+        "all_skipped",
+        "has_failures",
+        "all_completed_success",
+        "has_non_test_failures",
+        "job_id",
+    )
+
+    def __init__(self) -> None:
+        self.started_at: Optional[datetime] = None
+        self.is_pending = False
+        self.is_cancelled = False
+        self.all_skipped = True
+        self.has_failures = False
+        self.all_completed_success = True
+        self.has_non_test_failures = False
+        self.job_id: Optional[int] = None
+
+    def add(self, r: JobRow) -> None:
+        if self.started_at is None or r.started_at < self.started_at:
+            self.started_at = r.started_at
+        is_failure = r.is_failure
+        # pick job_id from the group: failing takes priority
+        if self.job_id is None or is_failure:
+            self.job_id = int(r.job_id)
+        if is_failure:
+            self.has_failures = True
+            if not r.is_test_failure:
+                self.has_non_test_failures = True
+        self.is_pending = self.is_pending or r.is_pending
+        self.is_cancelled = self.is_cancelled or r.is_cancelled
+        self.all_skipped = self.all_skipped and r.is_skipped
+        self.all_completed_success = self.all_completed_success and r.is_success
+
+    def freeze(self) -> JobMeta:
+        assert self.started_at is not None, "no rows were added"
+        return JobMeta(
+            started_at=self.started_at,
+            is_pending=self.is_pending,
+            is_cancelled=self.is_cancelled,
+            is_skipped=self.all_skipped,
+            has_failures=self.has_failures,
+            all_completed_success=self.all_completed_success,
+            has_non_test_failures=self.has_non_test_failures,
+            job_id=self.job_id,
+        )
+
+
 # -------------------------------------------------------------------
 # Generic, typed index keyed by a single typed KeyT
 # -------------------------------------------------------------------
@@ -106,6 +165,12 @@ class JobAggIndex(Generic[KeyT]):
                 run_attempt=row.run_attempt,
             ),
         )
+
+    With `precompute=True` the index is meant to be built once and queried many
+    times: the JobMeta of every key is aggregated in the same pass that groups
+    the rows, and `group_keys_by` / `group_map_values_by` memoize their result
+    per key function (pass the same function object to hit the memo; the
+    memoized dicts are shared and must not be mutated by callers).
     """
 
     def __init__(
@@ -113,12 +178,18 @@ class JobAggIndex(Generic[KeyT]):
         *,
         groups: Dict[KeyT, List[JobRow]],
         ordered_pairs: List[Tuple[KeyT, JobRow]],
+        metas: Optional[Dict[KeyT, JobMeta]] = None,
+        memoize_groupings: bool = False,
     ) -> None:
         # `groups` is a dict built in key-first-seen order; Python dict preserves insertion order.
         self._groups: Dict[KeyT, List[JobRow]] = groups
         # Global, original row order, paired with its group key.
         self._ordered: List[Tuple[KeyT, JobRow]] = ordered_pairs
-        self._meta_cache: Dict[KeyT, JobMeta] = {}
+        self._meta_cache: Dict[KeyT, JobMeta] = metas if metas is not None else {}
+        # Alternate groupings keyed by their key (and value) functions; None disables memoization.
+        self._groupings: Optional[Dict[Tuple[Any, ...], Any]] = (
+            {} if memoize_groupings else None
+        )
 
     @classmethod
     def from_rows(
@@ -126,23 +197,39 @@ class JobAggIndex(Generic[KeyT]):
         rows: Iterable[JobRow],
         *,
         key_fn: Callable[[JobRow], KeyT],
+        precompute: bool = False,
     ) -> JobAggIndex[KeyT]:
         """
         Group directly from JobRow—no intermediary structs.
         All order-sensitive structures are derived from the input iteration order.
+
+        precompute=True also aggregates every key's JobMeta in this single pass
+        and memoizes alternate groupings (see class docstring).
         """
         grouped: Dict[KeyT, List[JobRow]] = {}
         ordered_pairs: List[Tuple[KeyT, JobRow]] = []
+        accumulators: Dict[KeyT, _MetaAccumulator] = {}
 
         for r in rows:
             k = key_fn(r)
             # Preserve first-seen key order
             if k not in grouped:
                 grouped[k] = []
+                if precompute:
+                    accumulators[k] = _MetaAccumulator()
             grouped[k].append(r)  # preserves per-key row order
             ordered_pairs.append((k, r))  # preserves global row order
-
-        return cls(groups=grouped, ordered_pairs=ordered_pairs)
+            if precompute:
+                accumulators[k].add(r)
+
+        if not precompute:
+            return cls(groups=grouped, ordered_pairs=ordered_pairs)
+        return cls(
+            groups=grouped,
+            ordered_pairs=ordered_pairs,
+            metas={k: acc.freeze() for k, acc in accumulators.items()},
+            memoize_groupings=True,
+        )
 
     # ---- Query API ----
 
@@ -158,6 +245,9 @@ class JobAggIndex(Generic[KeyT]):
         return self._groups[key]
 
     def get_stats(self, key: KeyT, default: Optional[JobMeta] = None) -> JobMeta:
+        meta = self._meta_cache.get(key)
+        if meta is not None:
+            return meta
         if key in self._groups:
             return self.stats(key)
         if default is not None:
@@ -211,6 +301,9 @@ class JobAggIndex(Generic[KeyT]):
             )
             job_ids: list[JobId] = groups[(sha, wf_name, base_name)]
         """
+        memo_key = ("values", key_fn, value_fn)
+        if self._groupings is not None and memo_key in self._groupings:
+            return self._groupings[memo_key]
         out: DefaultDict[K2, List[K3]] = defaultdict(list)
         seen_per_bucket: Dict[K2, set[K3]] = {}
 
@@ -222,6 +315,8 @@ class JobAggIndex(Generic[KeyT]):
                 out[k2].append(v3)
                 bucket_seen.add(v3)
 
+        if self._groupings is not None:
+            self._groupings[memo_key] = out
         return out
 
     # ---- Alternate grouping (generic enumeration) ----
@@ -243,6 +338,9 @@ class JobAggIndex(Generic[KeyT]):
             )
             attempt_keys: list[AttemptKey] = groups[(sha, wf_name, base_name)]
         """
+        memo_key = ("keys", key_fn)
+        if self._groupings is not None and memo_key in self._groupings:
+            return self._groupings[memo_key]
         out: DefaultDict[K2, List[KeyT]] = defaultdict(list)
         seen_per_bucket: Dict[K2, set[KeyT]] = {}
 
@@ -253,6 +351,8 @@ class JobAggIndex(Generic[KeyT]):
                 out[k2].append(key)
                 bucket_seen.add(key)
 
+        if self._groupings is not None:
+            self._groupings[memo_key] = out
         return out
 
     # (Aggregation helpers removed; logic is inlined in stats())
@@ -43,6 +43,30 @@ class TestOutcome:
     job_id: int
 
 
+# Group key of one attempt of a job base: shards of one (wf_run_id, run_attempt)
+# aggregate together.
+AttemptKey = Tuple[Sha, WorkflowName, JobBaseName, WfRunId, RunAttempt]
+
+
+# Key functions shared by every query against the attempt index, so that its
+# memoized alternate groupings are computed once per extraction.
+def _attempt_key(j: JobRow) -> AttemptKey:
+    return (j.head_sha, j.workflow_name, j.base_name, j.wf_run_id, j.run_attempt)
+
+
+def _commit_wf_base(j: JobRow) -> Tuple[Sha, WorkflowName, JobBaseName]:
+    return (j.head_sha, j.workflow_name, j.base_name)
+
+
+def _run_attempt(j: JobRow) -> Tuple[WfRunId, RunAttempt]:
+    return (j.wf_run_id, j.run_attempt)
+
+
+def _build_attempt_index(jobs: Iterable[JobRow]) -> JobAggIndex[AttemptKey]:
+    """Index jobs by attempt, with every attempt's JobMeta precomputed."""
+    return JobAggIndex.from_rows(jobs, key_fn=_attempt_key, precompute=True)
+
+
 class SignalExtractor:
     def __init__(
         self,
@@ -50,13 +74,14 @@ class SignalExtractor:
         lookback_hours: int = 24,
         repo_full_name: str = "pytorch/pytorch",
         as_of: Optional[datetime] = None,
+        datasource: Optional[SignalExtractionDatasource] = None,
     ) -> None:
         self.workflows = list(workflows)
         self.lookback_hours = lookback_hours
         self.repo_full_name = repo_full_name
         self.as_of = as_of
-        # Datasource for DB access
-        self._datasource = SignalExtractionDatasource()
+        # Datasource for DB access (a ReplayDatasource runs extraction offline)
+        self._datasource = datasource or SignalExtractionDatasource()
 
     def _fmt_event_name(
         self,
@@ -99,10 +124,12 @@ class SignalExtractor:
             lookback_hours=self.lookback_hours,
         )
 
-        test_signals = self._build_test_signals(jobs, test_rows, commits)
-        job_signals = self._build_non_test_signals(jobs, commits)
+        # One attempt index serves all three signal builders
+        index = _build_attempt_index(jobs)
+        test_signals = self._build_test_signals(jobs, test_rows, commits, index=index)
+        job_signals = self._build_non_test_signals(jobs, commits, index=index)
         job_test_signals = self._build_non_test_signals(
-            jobs, commits, test_failures=True
+            jobs, commits, test_failures=True, index=index
         )
         # Deduplicate events within commits across all signals as a final step
         # GitHub-specific behavior like "rerun failed" can reuse job instances for reruns.
@@ -303,6 +330,8 @@ class SignalExtractor:
         jobs: List[JobRow],
         test_rows: List[TestRow],
         commits: List[Tuple[Sha, datetime]],
+        *,
+        index: Optional[JobAggIndex[AttemptKey]] = None,
     ) -> List[Signal]:
         """Build per-test Signals across commits, scoped to job base.
 
@@ -319,27 +348,18 @@ class SignalExtractor:
             jobs: List of job rows from the datasource
             test_rows: List of test rows from the datasource
             commits: Ordered list of (sha, timestamp) tuples (newest → older)
+            index: Attempt index over `jobs` (see _build_attempt_index), built if not given
         """
 
         jobs_by_id = {j.job_id: j for j in jobs}
         commit_timestamps = dict(commits)
 
-        index_by_commit_job_base_wf_run_attempt: JobAggIndex[
-            Tuple[Sha, WorkflowName, JobBaseName, WfRunId, RunAttempt]
-        ] = JobAggIndex.from_rows(
-            jobs,
-            key_fn=lambda j: (
-                j.head_sha,
-                j.workflow_name,
-                j.base_name,
-                j.wf_run_id,
-                j.run_attempt,
-            ),
+        index_by_commit_job_base_wf_run_attempt = (
+            index if index is not None else _build_attempt_index(jobs)
         )
 
         run_ids_attempts = index_by_commit_job_base_wf_run_attempt.group_map_values_by(
-            key_fn=lambda j: (j.head_sha, j.workflow_name, j.base_name),
-            value_fn=lambda j: (j.wf_run_id, j.run_attempt),
+            key_fn=_commit_wf_base, value_fn=_run_attempt
         )
 
         # Index tests.all_test_runs rows per (commit, job_base, wf_run, attempt, test_id)
@@ -532,6 +552,7 @@ class SignalExtractor:
         commits: List[Tuple[Sha, datetime]],
         *,
         test_failures: bool = False,
+        index: Optional[JobAggIndex[AttemptKey]] = None,
     ) -> List[Signal]:
         """Build Signals keyed by normalized job base name per workflow.
 
@@ -551,25 +572,16 @@ class SignalExtractor:
             jobs: List of job rows from the datasource
             commits: Ordered list of (sha, timestamp) tuples (newest → older)
             test_failures: If True, track test-caused failures instead of non-test failures
+            index: Attempt index over `jobs` (see _build_attempt_index), built if not given
         """
 
         commit_timestamps = dict(commits)
 
-        index = JobAggIndex.from_rows(
-            jobs,
-            key_fn=lambda j: (
-                j.head_sha,
-                j.workflow_name,
-                j.base_name,
-                j.wf_run_id,
-                j.run_attempt,
-            ),
-        )
+        if index is None:
+            index = _build_attempt_index(jobs)
 
         # Map (sha, workflow, base) -> [attempt_keys]
-        groups_index = index.group_keys_by(
-            key_fn=lambda j: (j.head_sha, j.workflow_name, j.base_name)
-        )
+        groups_index = index.group_keys_by(key_fn=_commit_wf_base)
 
         # Collect all (workflow, base) keys we need to produce signals for
         wf_base_keys: Set[Tuple[WorkflowName, JobBaseName]] = {
@@ -582,9 +594,9 @@ class SignalExtractor:
             has_relevant_failures = False
 
             for sha, _ in commits:
-                attempt_keys: List[
-                    Tuple[Sha, WorkflowName, JobBaseName, WfRunId, RunAttempt]
-                ] = groups_index.get((sha, wf_name, base_name), [])
+                attempt_keys: List[AttemptKey] = groups_index.get(
+                    (sha, wf_name, base_name), []
+                )
                 events: List[SignalEvent] = []
 
                 for akey in attempt_keys:
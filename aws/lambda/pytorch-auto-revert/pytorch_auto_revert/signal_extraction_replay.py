@@ -0,0 +1,198 @@
+"""
+Record and replay the signal extraction datasource.
+
+RecordingDatasource wraps a datasource and captures every query result, so
+that a run can be saved to a gzip-compressed JSON fixture. ReplayDatasource
+loads such a fixture and answers the same calls from it without touching
+ClickHouse, which makes extraction reproducible offline (see
+benchmark_autorevert.py).
+
+Calls are matched by method name and arguments. List arguments are IN-filters
+(shas, workflows, job ids, signal keys), so they are compared as sets: the
+extractor may enumerate them in a different order from one process to the
+next.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import gzip
+import inspect
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from .signal_extraction_datasource import SignalExtractionDatasource
+from .signal_extraction_types import JobRow, TestRow
+
+
+FIXTURE_VERSION = 1
+
+_ROW_TYPES = {cls.__name__: cls for cls in (JobRow, TestRow)}
+
+
+def _encode(value: Any) -> Any:
+    """Encode query results and arguments into JSON-compatible values."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, tuple):
+        return {"__tuple__": [_encode(v) for v in value]}
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    if isinstance(value, dict):
+        return {"__dict__": [[_encode(k), _encode(v)] for k, v in value.items()]}
+    if type(value).__name__ in _ROW_TYPES:
+        return {
+            f"__{type(value).__name__}__": {
+                f.name: _encode(getattr(value, f.name))
+                for f in dataclasses.fields(value)
+            }
+        }
+    raise TypeError(f"Cannot record value of type {type(value).__name__}")
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    ((tag, payload),) = value.items()
+    if tag == "__datetime__":
+        return datetime.fromisoformat(payload)
+    if tag == "__tuple__":
+        return tuple(_decode(v) for v in payload)
+    if tag == "__dict__":
+        return {_decode(k): _decode(v) for k, v in payload}
+    row_type = _ROW_TYPES[tag.strip("_")]
+    return row_type(**{k: _decode(v) for k, v in payload.items()})
+
+
+def _call_key(method: str, arguments: Dict[str, Any]) -> str:
+    canonical = {}
+    for name, value in _encode(arguments)["__dict__"]:
+        if isinstance(value, list):
+            # IN-filter: order doesn't matter
+            value = sorted(value, key=lambda v: json.dumps(v, sort_keys=True))
+        canonical[name] = value
+    return json.dumps([method, canonical], sort_keys=True)
+
+
+def _bind(method: str, args: Iterable[Any], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """All arguments of a datasource call by name, defaults included."""
+    signature = inspect.signature(getattr(SignalExtractionDatasource, method))
+    bound = signature.bind(None, *args, **kwargs)
+    bound.apply_defaults()
+    arguments = dict(bound.arguments)
+    arguments.pop("self")
+    return arguments
+
+
+class RecordingDatasource(SignalExtractionDatasource):
+    """
+    Forward every call to `delegate` (the ClickHouse datasource by default)
+    and keep its arguments and result for `save()`.
+    """
+
+    def __init__(self, delegate: Optional[SignalExtractionDatasource] = None) -> None:
+        self._delegate = delegate or SignalExtractionDatasource()
+        self.calls: List[Dict[str, Any]] = []
+
+    def _call(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        arguments = _bind(method, args, kwargs)
+        result = getattr(self._delegate, method)(**arguments)
+        self.calls.append(
+            {
+                "method": method,
+                "arguments": _encode(arguments),
+                "result": _encode(result),
+            }
+        )
+        return result
+
+    def fetch_commits_in_time_range(self, **kwargs: Any) -> Any:
+        return self._call("fetch_commits_in_time_range", **kwargs)
+
+    def fetch_jobs_for_workflows(self, **kwargs: Any) -> Any:
+        return self._call("fetch_jobs_for_workflows", **kwargs)
+
+    def fetch_tests_for_job_ids(self, *args: Any, **kwargs: Any) -> Any:
+        return self._call("fetch_tests_for_job_ids", *args, **kwargs)
+
+    def fetch_advisor_verdicts(self, **kwargs: Any) -> Any:
+        return self._call("fetch_advisor_verdicts", **kwargs)
+
+    def fetch_autorevert_state_rows(self, **kwargs: Any) -> Any:
+        return self._call("fetch_autorevert_state_rows", **kwargs)
+
+    def fetch_latest_non_dry_run_timestamp(self, **kwargs: Any) -> Any:
+        return self._call("fetch_latest_non_dry_run_timestamp", **kwargs)
+
+    def save(self, path: str, **meta: Any) -> None:
+        """
+        Write the recorded calls to a gzip-compressed JSON fixture, along with
+        the run parameters in `meta` (e.g. as_of, workflows) for the replay.
+        """
+        doc = {
+            "version": FIXTURE_VERSION,
+            "meta": _encode(meta),
+            "calls": self.calls,
+        }
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            json.dump(doc, f, separators=(",", ":"))
+        logging.getLogger(__name__).info(
+            "[replay] Recorded %d datasource calls to %s", len(self.calls), path
+        )
+
+
+class ReplayDatasource(SignalExtractionDatasource):
+    """
+    Answer datasource calls from a fixture written by RecordingDatasource.
+
+    A call that was recorded several times replays its results in recording
+    order, then keeps returning the last one. A call that was never recorded
+    raises KeyError rather than reaching ClickHouse.
+    """
+
+    def __init__(self, path: str) -> None:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            doc = json.load(f)
+        if doc.get("version") != FIXTURE_VERSION:
+            raise ValueError(
+                f"Unsupported fixture version {doc.get('version')} in {path}"
+            )
+        self.meta: Dict[str, Any] = _decode(doc["meta"])
+        self._results: Dict[str, List[Any]] = {}
+        for call in doc["calls"]:
+            key = _call_key(call["method"], _decode(call["arguments"]))
+            self._results.setdefault(key, []).append(_decode(call["result"]))
+        self._replayed: Dict[str, int] = {}
+
+    def _call(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        key = _call_key(method, _bind(method, args, kwargs))
+        results = self._results.get(key)
+        if not results:
+            raise KeyError(f"No recorded {method} call matches {key}")
+        n = self._replayed.get(key, 0)
+        self._replayed[key] = n + 1
+        return results[min(n, len(results) - 1)]
+
+    def fetch_commits_in_time_range(self, **kwargs: Any) -> Any:
+        return self._call("fetch_commits_in_time_range", **kwargs)
+
+    def fetch_jobs_for_workflows(self, **kwargs: Any) -> Any:
+        return self._call("fetch_jobs_for_workflows", **kwargs)
+
+    def fetch_tests_for_job_ids(self, *args: Any, **kwargs: Any) -> Any:
+        return self._call("fetch_tests_for_job_ids", *args, **kwargs)
+
+    def fetch_advisor_verdicts(self, **kwargs: Any) -> Any:
+        return self._call("fetch_advisor_verdicts", **kwargs)
+
+    def fetch_autorevert_state_rows(self, **kwargs: Any) -> Any:
+        return self._call("fetch_autorevert_state_rows", **kwargs)
+
+    def fetch_latest_non_dry_run_timestamp(self, **kwargs: Any) -> Any:
+        return self._call("fetch_latest_non_dry_run_timestamp", **kwargs)
@@ -0,0 +1,69 @@
+import unittest
+
+from pytorch_auto_revert.hud_renderer import (
+    _legacy_outcomes_from_columns,
+    render_html_from_state,
+)
+
+
+# newest -> older
+COMMITS = ["abc1230000", "abc1239999", "def4560000", "0123456789", "fedcba9876"]
+
+
+def col(outcome: str, note: str = "", **cells_status: str) -> dict:
+    """A legacy column; cells_status maps a commit position (c0..c4) to a status."""
+    return {
+        "workflow": "trunk",
+        "key": "linux / test",
+        "outcome": outcome,
+        "note": note,
+        "cells": {
+            COMMITS[int(pos[1:])]: [{"status": status, "name": "ev"}]
+            for pos, status in cells_status.items()
+        },
+    }
+
+
+class LegacyOutcomesTest(unittest.TestCase):
+    def outcome(self, column: dict) -> dict:
+        return _legacy_outcomes_from_columns([column], COMMITS)["trunk:linux / test"]
+
+    def test_prefix_resolves_to_newest_matching_commit(self):
+        data = self.outcome(col("revert", "suspect abc123 baseline 012345"))["data"]
+        self.assertEqual(data["suspected_commit"], "abc1230000")
+        self.assertEqual(data["older_successful_commit"], "0123456789")
+
+    def test_unknown_prefix_is_kept(self):
+        data = self.outcome(col("revert", "suspect 999999 baseline fedcba"))["data"]
+        self.assertEqual(data["suspected_commit"], "999999")
+        self.assertEqual(data["older_successful_commit"], "fedcba9876")
+
+    def test_revert_from_events(self):
+        data = self.outcome(
+            col("revert", c0="failure", c1="success", c2="failure", c4="success")
+        )["data"]
+        # the oldest failure is suspected, the first success older than it is the baseline
+        self.assertEqual(
+            data,
+            {
+                "suspected_commit": "def4560000",
+                "older_successful_commit": "fedcba9876",
+                "newer_failing_commits": ["abc1230000"],
+            },
+        )
+
+    def test_restart_from_note_or_events(self):
+        data = self.outcome(col("restart", "restart fedcba, abc123 and fedcba"))
+        self.assertEqual(data["data"]["commit_shas"], ["abc1230000", "fedcba9876"])
+        data = self.outcome(col("restart", c3="failure", c1="failure", c2="success"))
+        self.assertEqual(data["data"]["commit_shas"], ["abc1239999", "0123456789"])
+
+    def test_render_highlights_legacy_outcome(self):
+        html = render_html_from_state(
+            {"commits": COMMITS, "columns": [col("restart", c3="failure")]}
+        )
+        self.assertEqual(html.count('<td class="cell hl-restart">'), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
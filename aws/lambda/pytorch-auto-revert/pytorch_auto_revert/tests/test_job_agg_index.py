@@ -0,0 +1,130 @@
+import unittest
+from datetime import datetime, timedelta
+from itertools import product
+
+from pytorch_auto_revert.job_agg_index import JobAggIndex, JobMeta, SignalStatus
+from pytorch_auto_revert.signal_extraction_types import (
+    JobId,
+    JobName,
+    JobRow,
+    RunAttempt,
+    Sha,
+    WfRunId,
+    WorkflowName,
+)
+
+
+T0 = datetime(2025, 1, 1)
+
+# (status, conclusion, rule) of the rows a group can be made of
+KINDS = [
+    ("completed", "success", ""),
+    ("completed", "failure", "pytest failure"),
+    ("completed", "failure", "build"),
+    ("in_progress", "", ""),
+    ("in_progress", "failure", "pytest failure"),
+    ("completed", "cancelled", ""),
+    ("completed", "skipped", ""),
+]
+
+
+def row(job_id: int, run_attempt: int, kind: int, minutes: int) -> JobRow:
+    status, conclusion, rule = KINDS[kind]
+    return JobRow(
+        head_sha=Sha(f"sha{run_attempt % 2}"),
+        workflow_name=WorkflowName("trunk"),
+        wf_run_id=WfRunId(1),
+        job_id=JobId(job_id),
+        run_attempt=RunAttempt(run_attempt),
+        name=JobName(f"linux / test (default, {job_id % 3 + 1}, 3, runner)"),
+        status=status,
+        conclusion=conclusion,
+        started_at=T0 + timedelta(minutes=minutes),
+        created_at=T0,
+        rule=rule,
+    )
+
+
+def all_groups() -> list[JobRow]:
+    """One attempt per combination of up to three row kinds, out of time order."""
+    rows = []
+    attempt = 0
+    for size in (1, 2, 3):
+        for kinds in product(range(len(KINDS)), repeat=size):
+            attempt += 1
+            for i, kind in enumerate(kinds):
+                rows.append(row(attempt * 10 + i, attempt, kind, (7 * i) % 5))
+    return rows
+
+
+def attempt_key(r: JobRow) -> RunAttempt:
+    return r.run_attempt
+
+
+def sha_key(r: JobRow) -> Sha:
+    return r.head_sha
+
+
+def job_id_value(r: JobRow) -> JobId:
+    return r.job_id
+
+
+class TestJobAggIndexPrecompute(unittest.TestCase):
+    def setUp(self) -> None:
+        self.rows = all_groups()
+        self.lazy = JobAggIndex.from_rows(self.rows, key_fn=attempt_key)
+        self.precomputed = JobAggIndex.from_rows(
+            self.rows, key_fn=attempt_key, precompute=True
+        )
+
+    def test_stats_match_lazy_aggregation(self) -> None:
+        self.assertEqual(list(self.lazy.keys()), list(self.precomputed.keys()))
+        for key in self.lazy.keys():
+            with self.subTest(key=key):
+                self.assertEqual(self.lazy.stats(key), self.precomputed.stats(key))
+                self.assertEqual(
+                    self.lazy.get_stats(key), self.precomputed.get_stats(key)
+                )
+
+    def test_job_id_prefers_last_failure(self) -> None:
+        # success, test failure, build failure, success: the last failure wins
+        rows = [row(1, 1, 0, 0), row(2, 1, 1, 0), row(3, 1, 2, 0), row(4, 1, 0, 0)]
+        idx = JobAggIndex.from_rows(rows, key_fn=attempt_key, precompute=True)
+        meta = idx.stats(RunAttempt(1))
+        self.assertEqual(meta.job_id, 3)
+        self.assertEqual(meta.status, SignalStatus.FAILURE)
+        self.assertTrue(meta.has_non_test_failures)
+
+    def test_missing_keys(self) -> None:
+        default = JobMeta(is_pending=True)
+        self.assertIs(self.precomputed.get_stats(RunAttempt(-1), default), default)
+        self.assertEqual(self.precomputed.get_stats(RunAttempt(-1)), JobMeta())
+        with self.assertRaises(KeyError):
+            self.precomputed.stats(RunAttempt(-1))
+
+    def test_groupings_match_and_are_memoized(self) -> None:
+        keys = self.precomputed.group_keys_by(sha_key)
+        self.assertEqual(keys, self.lazy.group_keys_by(sha_key))
+        self.assertIs(self.precomputed.group_keys_by(sha_key), keys)
+        # The lazy index builds a new grouping every time
+        self.assertIsNot(
+            self.lazy.group_keys_by(sha_key), self.lazy.group_keys_by(sha_key)
+        )
+
+        values = self.precomputed.group_map_values_by(sha_key, job_id_value)
+        self.assertEqual(values, self.lazy.group_map_values_by(sha_key, job_id_value))
+        self.assertIs(
+            self.precomputed.group_map_values_by(sha_key, job_id_value), values
+        )
+        # Memoized per (key_fn, value_fn), not per key_fn
+        self.assertEqual(
+            list(self.precomputed.group_map_values_by(sha_key, attempt_key)),
+            list(values),
+        )
+        self.assertIsNot(
+            self.precomputed.group_map_values_by(sha_key, attempt_key), values
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from typing import Any, List
+
+from pytorch_auto_revert.signal import Signal
+from pytorch_auto_revert.signal_extraction import SignalExtractor
+from pytorch_auto_revert.signal_extraction_datasource import SignalExtractionDatasource
+from pytorch_auto_revert.signal_extraction_replay import (
+    _decode,
+    _encode,
+    RecordingDatasource,
+    ReplayDatasource,
+)
+from pytorch_auto_revert.signal_extraction_types import (
+    JobId,
+    JobName,
+    JobRow,
+    RunAttempt,
+    Sha,
+    TestRow,
+    WfRunId,
+    WorkflowName,
+)
+
+
+T0 = datetime(2025, 8, 20, 12, 0, 0)
+AS_OF = datetime(2025, 8, 21, tzinfo=timezone.utc)
+
+
+def job(sha: str, job_id: int, minutes: int, conclusion: str, rule: str = "") -> JobRow:
+    return JobRow(
+        head_sha=Sha(sha),
+        workflow_name=WorkflowName("trunk"),
+        wf_run_id=WfRunId(job_id * 10),
+        job_id=JobId(job_id),
+        run_attempt=RunAttempt(1),
+        name=JobName("linux-test / test (default, 1, 2, runner)"),
+        status="completed",
+        conclusion=conclusion,
+        started_at=T0 + timedelta(minutes=minutes),
+        created_at=T0 + timedelta(minutes=minutes),
+        rule=rule,
+    )
+
+
+JOBS = [
+    job("C3", 3, 20, "failure", "pytest failure"),
+    job("C2", 2, 10, "failure", "pytest failure"),
+    job("C1", 1, 0, "success"),
+]
+TESTS = [
+    TestRow(
+        job_id=JobId(j),
+        wf_run_id=WfRunId(j * 10),
+        workflow_run_attempt=RunAttempt(1),
+        file="test_a.py",
+        classname="TestA",
+        name="test_x",
+        failure_runs=1,
+        success_runs=0,
+    )
+    for j in (2, 3)
+]
+
+
+class FakeDatasource(SignalExtractionDatasource):
+    """Serves JOBS and TESTS and counts the queries it answers."""
+
+    def __init__(self) -> None:
+        self.queries = 0
+
+    def fetch_commits_in_time_range(
+        self, *, repo_full_name, lookback_hours, as_of=None
+    ):
+        self.queries += 1
+        return [(j.head_sha, j.started_at) for j in JOBS]
+
+    def fetch_jobs_for_workflows(
+        self, *, repo_full_name, workflows, lookback_hours, head_shas, as_of=None
+    ):
+        self.queries += 1
+        return list(JOBS)
+
+    def fetch_tests_for_job_ids(self, job_ids, *, failed_job_ids, lookback_hours):
+        self.queries += 1
+        return [t for t in TESTS if t.job_id in job_ids]
+
+    def fetch_advisor_verdicts(
+        self, *, repo_full_name, head_shas, signal_keys, lookback_hours
+    ):
+        self.queries += 1
+        return {("C2", "test_a.py::TestA::test_x"): ("revert", 0.9, T0)}
+
+
+def fingerprint(signals: List[Signal]) -> List[Any]:
+    return [
+        (
+            s.workflow_name,
+            s.key,
+            s.source,
+            [
+                (c.head_sha, c.timestamp, [sorted(vars(e).items()) for e in c.events])
+                for c in s.commits
+            ],
+        )
+        for s in signals
+    ]
+
+
+def extractor(datasource: SignalExtractionDatasource) -> SignalExtractor:
+    return SignalExtractor(workflows=["trunk"], as_of=AS_OF, datasource=datasource)
+
+
+class TestSignalExtractionReplay(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "run.json.gz")
+
+    def test_replay_reproduces_recorded_extraction(self) -> None:
+        live = FakeDatasource()
+        recorder = RecordingDatasource(live)
+        recorded = extractor(recorder).extract()
+        recorder.save(self.path, workflows=["trunk"], as_of=AS_OF)
+        self.assertEqual(len(recorder.calls), live.queries)
+
+        replay = ReplayDatasource(self.path)
+        self.assertEqual(replay.meta, {"workflows": ["trunk"], "as_of": AS_OF})
+        for _ in range(2):
+            replayed = extractor(replay).extract()
+            self.assertEqual(fingerprint(replayed), fingerprint(recorded))
+        self.assertEqual(live.queries, len(recorder.calls))
+
+    def test_list_arguments_match_in_any_order(self) -> None:
+        recorder = RecordingDatasource(FakeDatasource())
+        rows = recorder.fetch_tests_for_job_ids(
+            [JobId(2), JobId(3)], failed_job_ids=[JobId(3)], lookback_hours=24
+        )
+        recorder.save(self.path)
+
+        replay = ReplayDatasource(self.path)
+        self.assertEqual(
+            replay.fetch_tests_for_job_ids(
+                job_ids=[JobId(3), JobId(2)],
+                failed_job_ids=[JobId(3)],
+                lookback_hours=24,
+            ),
+            rows,
+        )
+        with self.assertRaisesRegex(KeyError, "fetch_tests_for_job_ids"):
+            replay.fetch_tests_for_job_ids(
+                [JobId(2)], failed_job_ids=[JobId(3)], lookback_hours=24
+            )
+        with self.assertRaises(KeyError):
+            replay.fetch_latest_non_dry_run_timestamp(repo_full_name="pytorch/pytorch")
+
+    def test_codec_roundtrip(self) -> None:
+        value = {
+            ("a", "b"): ("revert", 0.5, AS_OF),
+            "naive": T0,
+            "rows": [JOBS[0], TESTS[0]],
+            "none": None,
+        }
+        decoded = _decode(_encode(value))
+        self.assertEqual(decoded, value)
+        self.assertEqual(decoded[("a", "b")][2].tzinfo, timezone.utc)
+        self.assertIsNone(decoded["naive"].tzinfo)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,15 @@
+import codecs
 import csv
 import json
 import os
 import re
 from collections import defaultdict
+from concurrent.futures import as_completed, ThreadPoolExecutor
+from datetime import datetime, timezone
 from enum import Enum
-from typing import Any, Dict, Optional
+from functools import lru_cache
+from itertools import chain
+from typing import Any, Callable, Dict, Iterator, List, Optional
 from warnings import warn
 
 import boto3
@@ -16,6 +21,10 @@ CLICKHOUSE_ENDPOINT = os.getenv("CLICKHOUSE_ENDPOINT", "")
 CLICKHOUSE_USERNAME = os.getenv("CLICKHOUSE_USERNAME", "default")
 CLICKHOUSE_PASSWORD = os.getenv("CLICKHOUSE_PASSWORD", "")
 CLICKHOUSE_TABLE = "servicelab_torch_dynamo_perf_stats"
+# Rows sent per native insert, a CSV is streamed and inserted in batches of this size
+BATCH_SIZE = 10000
+# The S3 records in one event are ingested concurrently
+MAX_WORKERS = 8
 
 S3_CLIENT = boto3.client("s3")
 # https://clickhouse.com/docs/en/integrations/python
@@ -24,6 +33,9 @@ CLICKHOUSE_CLIENT = clickhouse_connect.get_client(
     user=CLICKHOUSE_USERNAME,
     password=CLICKHOUSE_PASSWORD,
     secure=True,
+    # The client is shared by the worker threads, and a session only allows one
+    # query at a time
+    autogenerate_session_id=False,
 )
 
 METADATA_REGEX = re.compile(
@@ -37,17 +49,23 @@ class EventType(Enum):
 
 def lambda_handler(event: Any, context: Any) -> None:
     counts = defaultdict(int)
-    for record in event["Records"]:
-        event_name = record.get("eventName", "")
-        try:
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {}
+        for record in event["Records"]:
+            event_name = record.get("eventName", "")
             if event_name.startswith(EventType.PUT.value):
-                upsert_document(record)
+                futures[executor.submit(upsert_document, record)] = record
             else:
                 warn(f"Unrecognized event type {event_name} in {json.dumps(record)}")
+                counts[event_name] += 1
 
-            counts[event_name] += 1
-        except Exception as error:
-            warn(f"Failed to process {json.dumps(record)}: {error}")
+        for future in as_completed(futures):
+            record = futures[future]
+            try:
+                future.result()
+                counts[record.get("eventName", "")] += 1
+            except Exception as error:
+                warn(f"Failed to process {json.dumps(record)}: {error}")
 
     print(f"Finish processing {json.dumps(counts)}")
 
@@ -85,18 +103,130 @@ def extract_metadata(record: Any) -> Dict[str, Any]:
     }
 
 
-def read_csv(bucket: str, key: str):
+def read_csv(bucket: str, key: str) -> Iterator[Dict[str, str]]:
+    """
+    Stream the CSV rows from S3 without holding the whole object in memory
+    """
     response = S3_CLIENT.get_object(Bucket=bucket, Key=key)
-    for r in csv.DictReader(
-        response["Body"].read().decode("utf-8").split("\n"), delimiter=","
-    ):
-        yield r
+    reader = codecs.getreader("utf-8")(response["Body"])
+    # DictReader skips blank lines, e.g. the trailing newline
+    yield from csv.DictReader(reader, delimiter=",")
+
+
+def _to_int(v: Any) -> int:
+    try:
+        return int(v)
+    except ValueError:
+        return int(float(v))
+
+
+def _to_bool(v: Any) -> bool:
+    if isinstance(v, str):
+        return v.strip().lower() in ("1", "true")
+    return bool(v)
+
+
+def _to_datetime(v: Any) -> datetime:
+    if isinstance(v, (int, float)):
+        return datetime.fromtimestamp(v, tz=timezone.utc)
+    return parser.parse(v)
+
+
+def _base_type(column_type: str) -> str:
+    """The type inside the LowCardinality and Nullable wrappers"""
+    t = column_type
+    for wrapper in ("LowCardinality(", "Nullable("):
+        if t.startswith(wrapper):
+            t = t[len(wrapper) : -1]
+    return t
+
+
+def _scalar_converter(t: str) -> Optional[Callable[[Any], Any]]:
+    if t.startswith(("Int", "UInt")):
+        return _to_int
+    if t.startswith(("Float", "Decimal")):
+        return float
+    if t == "Bool":
+        return _to_bool
+    if t.startswith(("DateTime", "Date")):
+        return _to_datetime
+    if t.startswith(("String", "FixedString", "Enum")):
+        return str
+    # Arrays, maps and the like
+    return None
+
+
+def make_converter(column_type: str) -> Callable[[Any], Any]:
+    """
+    Return a function converting a CSV value (a string) into the Python type the
+    native insert expects for a ClickHouse column type. An empty value becomes
+    None, which the server replaces with the column DEFAULT unless the column is
+    Nullable (see insert_type), like JSONEachRow did
+    """
+    convert = _scalar_converter(_base_type(column_type))
+    if convert is None:
+        # Passed through as is
+        return lambda v: v
+
+    def _convert(v: Any) -> Any:
+        if v is None or v == "":
+            return None
+        return convert(v)
+
+    return _convert
+
+
+def insert_type(column_type: str) -> str:
+    """
+    The type a column is sent as. Scalar columns are sent as Nullable so that an
+    empty value can be sent as NULL, which input_format_null_as_default turns
+    into the column DEFAULT when the column itself isn't Nullable
+    """
+    t = _base_type(column_type)
+    if _scalar_converter(t) is None:
+        return column_type
+    return f"Nullable({t})"
+
+
+@lru_cache
+def get_column_types(table: str) -> Dict[str, str]:
+    """
+    Describe the table once per lambda container to know how to type each column
+    """
+    result = CLICKHOUSE_CLIENT.query(f"DESCRIBE TABLE `{table}`")
+    return {row[0]: row[1] for row in result.result_rows}
+
+
+def insert_batch(
+    table: str,
+    column_names: List[str],
+    column_types: List[str],
+    columns: List[List[Any]],
+    deduplication_token: str,
+) -> None:
+    CLICKHOUSE_CLIENT.insert(
+        table,
+        columns,
+        column_names=column_names,
+        column_type_names=column_types,
+        column_oriented=True,
+        settings={
+            "input_format_null_as_default": 1,
+            # The server drops a batch it has already inserted with this token
+            "insert_deduplication_token": deduplication_token,
+        },
+    )
 
 
 def upsert_document(record: Any) -> None:
     """
     Insert a new doc or modify an existing document. Note that ClickHouse doesn't really
-    update the document in place, but rather adding a new record for the update
+    update the document in place, but rather adding a new record for the update.
+
+    The batches of a file aren't inserted atomically: when a batch fails, the
+    record is retried from the start. Every batch carries a deduplication token
+    made of the object key, its ETag and the batch number, so the retry doesn't
+    insert the batches that made it the first time again
     """
     bucket, key = extract_bucket(record), extract_key(record)
     if not bucket or not key:
@@ -106,20 +236,54 @@ def upsert_document(record: Any) -> None:
     if not metadata:
         return
 
+    types = get_column_types(CLICKHOUSE_TABLE)
+    rows = read_csv(bucket, key)
+    first = next(rows, None)
+    if first is None:
+        return
+
+    # Columns missing from the table are dropped like JSONEachRow skips unknown
+    # fields, and the metadata takes precedence over the CSV columns
+    csv_names = [k for k in first if k in types and k not in metadata]
+    meta_names = [k for k in metadata if k in types]
+    column_names = csv_names + meta_names
+    if not column_names:
+        print(f"No column in {key} matches {CLICKHOUSE_TABLE}")
+        return
+    column_types = [insert_type(types[k]) for k in column_names]
+    csv_converters = [make_converter(types[k]) for k in csv_names]
+    # The metadata is the same for every row of the file, convert it once
+    meta_values = [make_converter(types[k])(metadata[k]) for k in meta_names]
+    etag = record.get("s3", {}).get("object", {}).get("eTag", "")
+
+    def _empty_batch() -> List[List[Any]]:
+        return [[] for _ in column_names]
+
+    def _insert(columns: List[List[Any]], batch: int) -> None:
+        insert_batch(
+            CLICKHOUSE_TABLE,
+            column_names,
+            column_types,
+            columns,
+            f"{key}:{etag}:{batch}",
+        )
+
     count = 0
-    body_str = ""
-    for r in read_csv(bucket, key):
+    columns = _empty_batch()
+    for r in chain([first], rows):
+        for column, name, convert in zip(columns, csv_names, csv_converters):
+            column.append(convert(r.get(name)))
+        for column, value in zip(columns[len(csv_names) :], meta_values):
+            column.append(value)
         count += 1
 
-        # Populate the record metadata
-        r.update(metadata)
-        body_str += json.dumps(r) + "\n"
+        if count % BATCH_SIZE == 0:
+            _insert(columns, count // BATCH_SIZE - 1)
+            columns = _empty_batch()
 
-    if body_str:
-        print(f"INSERTING {count} records into {CLICKHOUSE_TABLE}")
-        CLICKHOUSE_CLIENT.query(
-            f"INSERT INTO `{CLICKHOUSE_TABLE}` FORMAT JSONEachRow {body_str}"
-        )
+    if columns[0]:
+        _insert(columns, count // BATCH_SIZE)
+    print(f"INSERTED {count} records from {key} into {CLICKHOUSE_TABLE}")
 
 
 if os.getenv("DEBUG", "0") == "1":
@@ -0,0 +1,227 @@
+import importlib.util
+import io
+import os
+import unittest
+from datetime import datetime, timezone
+from typing import Any, List, Tuple
+from unittest.mock import MagicMock, patch
+
+from .common import MockClickHouseQuery, setup_mock_db_client
+
+
+# The lambda directory isn't a valid package name
+LAMBDA_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "servicelab-ingestor",
+    "lambda_function.py",
+)
+
+
+def load_lambda() -> Any:
+    spec = importlib.util.spec_from_file_location("servicelab_ingestor", LAMBDA_FILE)
+    module = importlib.util.module_from_spec(spec)
+    # The S3 and ClickHouse clients are created at import
+    with patch("boto3.client"), patch("clickhouse_connect.get_client"):
+        spec.loader.exec_module(module)
+    return module
+
+
+ingestor = load_lambda()
+
+KEY = "pytorch/benchmarks/dynamo/manifold/3901375723/3902231115/defaults-nanogpt-training-performance-benchmark_torchbench_run_nanogpt_training.benchmark_torchbench_run_nanogpt_training.3902231115_1.a-tmp694bm90e.csv"
+
+
+def get_record(key: str = KEY) -> Any:
+    return {
+        "eventTime": "2024-08-16T17:03:21.686Z",
+        "eventName": "ObjectCreated:Put",
+        "s3": {
+            "bucket": {"name": "ossci-benchmarks"},
+            "object": {"key": key, "eTag": "cb5cc0599d7a8283606316f2ff58b49c"},
+        },
+    }
+
+
+class DescribeMockQuery(MockClickHouseQuery):
+    def get_response_for_query(
+        self, query: str, parameters: None, type: str = ""
+    ) -> Tuple[Tuple[str, ...], List[Tuple]]:
+        return ("name", "type"), [
+            ("name", "String"),
+            ("batch_size", "UInt32"),
+            ("speedup", "Nullable(Float64)"),
+            ("accuracy", "LowCardinality(String)"),
+            ("servicelab_experiment_id", "UInt64"),
+            ("epoch_timestamp", "UInt64"),
+            ("compiler", "String"),
+        ]
+
+
+class TestConverters(unittest.TestCase):
+    def test_values(self) -> None:
+        cases = [
+            ("Int64", "3", 3),
+            ("UInt32", "3.0", 3),
+            ("Float64", "1.5", 1.5),
+            ("Bool", "True", True),
+            ("Bool", "0", False),
+            ("LowCardinality(String)", "pass", "pass"),
+            ("Nullable(Int32)", "7", 7),
+            (
+                "DateTime",
+                "2024-08-16T17:03:21Z",
+                datetime(2024, 8, 16, 17, 3, 21, tzinfo=timezone.utc),
+            ),
+            ("DateTime64(3)", 0, datetime.fromtimestamp(0, tz=timezone.utc)),
+            ("Array(String)", ["a"], ["a"]),
+        ]
+        for column_type, value, expected in cases:
+            with self.subTest(column_type=column_type, value=value):
+                self.assertEqual(ingestor.make_converter(column_type)(value), expected)
+
+    def test_empty_values_are_null(self) -> None:
+        # The server fills in the column DEFAULT for non-Nullable columns
+        for column_type in (
+            "Int64",
+            "Float64",
+            "Bool",
+            "DateTime",
+            "String",
+            "LowCardinality(String)",
+            "Nullable(Float64)",
+        ):
+            with self.subTest(column_type=column_type):
+                convert = ingestor.make_converter(column_type)
+                self.assertIsNone(convert(""))
+                self.assertIsNone(convert(None))
+
+    def test_insert_type(self) -> None:
+        cases = [
+            ("Int64", "Nullable(Int64)"),
+            ("Nullable(Float64)", "Nullable(Float64)"),
+            ("LowCardinality(String)", "Nullable(String)"),
+            ("LowCardinality(Nullable(String))", "Nullable(String)"),
+            ("DateTime64(3, 'UTC')", "Nullable(DateTime64(3, 'UTC'))"),
+            ("Array(String)", "Array(String)"),
+        ]
+        for column_type, expected in cases:
+            with self.subTest(column_type=column_type):
+                self.assertEqual(ingestor.insert_type(column_type), expected)
+
+
+class TestExtractMetadata(unittest.TestCase):
+    def test_epoch_timestamp(self) -> None:
+        metadata = ingestor.extract_metadata(get_record())
+        # Milliseconds since the epoch of the S3 event time
+        self.assertEqual(metadata["epoch_timestamp"], 1723827801686)
+        self.assertEqual(metadata["servicelab_experiment_id"], "3901375723")
+        self.assertEqual(metadata["compiler"], "defaults")
+
+    def test_unknown_key(self) -> None:
+        self.assertEqual(ingestor.extract_metadata(get_record("foo.csv")), {})
+
+
+class TestUpsertDocument(unittest.TestCase):
+    def setUp(self) -> None:
+        ingestor.get_column_types.cache_clear()
+        self.addCleanup(ingestor.get_column_types.cache_clear)
+
+        self.mock_cc = MagicMock()
+        setup_mock_db_client(self.mock_cc, DescribeMockQuery(), is_patch=False)
+        for name, mock in (
+            ("CLICKHOUSE_CLIENT", self.mock_cc),
+            ("S3_CLIENT", MagicMock()),
+            ("BATCH_SIZE", 2),
+        ):
+            patcher = patch.object(ingestor, name, mock)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def set_csv(self, content: str) -> None:
+        ingestor.S3_CLIENT.get_object.side_effect = lambda **kwargs: {
+            "Body": io.BytesIO(content.encode())
+        }
+
+    def inserts(self) -> List[Any]:
+        return [c.kwargs for c in self.mock_cc.insert.call_args_list]
+
+    def test_batches(self) -> None:
+        self.set_csv(
+            "name,batch_size,speedup,accuracy,unknown,compiler\n"
+            "a,1,1.5,pass,x,inductor\n"
+            "b,,,,x,inductor\n"
+            "c,3,2,fail,x,inductor\n"
+            "d,4,0.5,pass,x,inductor\n"
+            "e,5,1,pass,x,inductor\n"
+        )
+        ingestor.upsert_document(get_record())
+
+        # One DESCRIBE, then 5 rows in batches of 2
+        self.assertEqual(self.mock_cc.query.call_count, 1)
+        inserts = self.inserts()
+        self.assertEqual(len(inserts), 3)
+        for insert in inserts:
+            # Unknown columns are dropped, the metadata wins over the CSV
+            self.assertEqual(
+                insert["column_names"],
+                [
+                    "name",
+                    "batch_size",
+                    "speedup",
+                    "accuracy",
+                    "servicelab_experiment_id",
+                    "epoch_timestamp",
+                    "compiler",
+                ],
+            )
+            self.assertEqual(
+                insert["column_type_names"],
+                [
+                    "Nullable(String)",
+                    "Nullable(UInt32)",
+                    "Nullable(Float64)",
+                    "Nullable(String)",
+                    "Nullable(UInt64)",
+                    "Nullable(UInt64)",
+                    "Nullable(String)",
+                ],
+            )
+            self.assertTrue(insert["column_oriented"])
+            self.assertEqual(insert["settings"]["input_format_null_as_default"], 1)
+
+        columns = [c.args[1] for c in self.mock_cc.insert.call_args_list]
+        self.assertEqual(
+            columns[0],
+            [
+                ["a", "b"],
+                [1, None],
+                [1.5, None],
+                ["pass", None],
+                [3901375723, 3901375723],
+                [1723827801686, 1723827801686],
+                ["defaults", "defaults"],
+            ],
+        )
+        self.assertEqual(columns[1][0], ["c", "d"])
+        self.assertEqual(columns[2][:3], [["e"], [5], [1.0]])
+
+    def test_retry_reuses_deduplication_tokens(self) -> None:
+        self.set_csv("name\na\nb\nc\nd\n")
+        ingestor.upsert_document(get_record())
+        ingestor.upsert_document(get_record())
+
+        tokens = [i["settings"]["insert_deduplication_token"] for i in self.inserts()]
+        self.assertEqual(len(tokens), 4)
+        # Each batch of the file has its own token, the same on every attempt
+        self.assertEqual(len(set(tokens[:2])), 2)
+        self.assertEqual(tokens[:2], tokens[2:])
+        self.assertTrue(tokens[0].startswith(KEY))
+
+    def test_empty_csv(self) -> None:
+        self.set_csv("name,batch_size\n")
+        ingestor.upsert_document(get_record())
+        self.mock_cc.insert.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,14 +5,18 @@ Aggregate usage logs on S3 GHA artifacts bucket for fun and profit!
 import asyncio
 import io
 import json
+import math
 import os
 import re
+import tempfile
 import zipfile
+from array import array
+from datetime import datetime, timezone
 from json import JSONDecodeError
-from typing import Any, AsyncGenerator, Dict, List, Tuple
+from typing import Any, AsyncGenerator, Dict, Iterable, List, NamedTuple, Tuple
 from warnings import warn
 
-import pandas as pd
+import numpy as np
 from aiobotocore.session import get_session
 
 
@@ -23,11 +27,182 @@ MAX_ARTIFACTS = 50
 JOB_NAME_REGEX = re.compile(
     r"^(?P<job>.+)\s/\s.+\((?P<s_name>[^,]+),\s(?P<s_id>[^,]+),\s(?P<s_count>[^,]+),\s(?P<platform>[^,]+)\)$"
 )
-# One minute according to the rule https://pandas.pydata.org/docs/reference/api/pandas.Series.resample.html
-RESAMPLING_WINDOW = "1T"
+# Datapoints are averaged over one minute buckets
+RESAMPLING_UNIT = "m"
 DATETIME_FORMAT = "%Y-%m-%d %X"
-# NB: This is a work around to handle the case where requested job is retried
-MAX_RUN_ATTEMPT_TO_SCAN = 10
+# Usage logs downloaded at the same time
+MAX_CONCURRENT_DOWNLOADS = 16
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class UsageLog(NamedTuple):
+    workflow_id: str
+    job_id: str
+    # One entry per datapoint, datetime64[us] timestamps and float64 values where
+    # a missing value is NaN
+    timestamps: np.ndarray
+    cpu: np.ndarray
+    mem: np.ndarray
+    gpu: np.ndarray
+    gpu_mem: np.ndarray
+    # The raw time of the first and last datapoints, or 0 if there are none
+    start_time: Any
+    stop_time: Any
+
+
+def _to_float(value: Any) -> float:
+    # The value can be None
+    return math.nan if value is None else float(value)
+
+
+def _to_datetime64(timestamps: List[str]) -> np.ndarray:
+    try:
+        # NumPy doesn't take the UTC designator, the times are all UTC anyway
+        return np.array(
+            [t[:-1] if t.endswith("Z") else t for t in timestamps],
+            dtype="datetime64[us]",
+        )
+    except ValueError:
+        # Other ISO 8601 spellings, e.g. with an explicit +00:00 offset
+        return np.array(
+            [
+                datetime.fromisoformat(t.replace("Z", "+00:00"))
+                .astimezone(timezone.utc)
+                .replace(tzinfo=None)
+                for t in timestamps
+            ],
+            dtype="datetime64[us]",
+        )
+
+
+def parse_usage_log(workflow_id: str, job_id: str, lines: Iterable[str]) -> UsageLog:
+    """
+    Decode the JSON lines of a usage log one at a time into typed arrays, only
+    keeping the totals of each datapoint
+    """
+    timestamps: List[str] = []
+    total_cpu_percent = array("d")
+    total_mem_usage = array("d")
+    total_gpu_utilization = array("d")
+    total_gpu_mem_usage = array("d")
+
+    for line in lines:
+        try:
+            datapoint = json.loads(line)
+        except json.decoder.JSONDecodeError as error:
+            # This is to handle invalid lines on the log, it's ok to ingore them
+            warn(f"Failed to load {line}: {error}")
+            continue
+
+        if (
+            not isinstance(datapoint, dict)
+            or "time" not in datapoint
+            or "total_cpu_percent" not in datapoint
+            or "per_process_cpu_info" not in datapoint
+        ):
+            continue
+
+        timestamps.append(datapoint["time"])
+        # Get the basic CPU and memory info
+        total_cpu_percent.append(_to_float(datapoint["total_cpu_percent"]))
+        # Use rss_memory to include all the shared libraries
+        total_mem_usage.append(
+            sum(
+                e.get("rss_memory") or 0
+                for e in datapoint["per_process_cpu_info"] or []
+            )
+        )
+
+        gpu_key = (
+            "total_gpu_utilization"
+            if "total_gpu_utilization" in datapoint
+            else "total_gpu_utilizaiton"
+        )
+        total_gpu_utilization.append(_to_float(datapoint.get(gpu_key, 0)))
+        total_gpu_mem_usage.append(
+            sum(
+                e.get("gpu_memory") or 0
+                for e in datapoint.get("per_process_gpu_info") or []
+            )
+        )
+
+    return UsageLog(
+        workflow_id=workflow_id,
+        job_id=job_id,
+        timestamps=_to_datetime64(timestamps),
+        cpu=np.frombuffer(total_cpu_percent, dtype=np.float64),
+        mem=np.frombuffer(total_mem_usage, dtype=np.float64),
+        gpu=np.frombuffer(total_gpu_utilization, dtype=np.float64),
+        gpu_mem=np.frombuffer(total_gpu_mem_usage, dtype=np.float64),
+        # Let's also keep the starting time and ending time of the job run, so
+        # the usage can be mapped to the timeline if necessary
+        start_time=timestamps[0] if timestamps else 0,
+        stop_time=timestamps[-1] if timestamps else 0,
+    )
+
+
+async def _list(
+    s3_client: Any, prefix: str, delimiter: str = ""
+) -> Tuple[List[str], List[str]]:
+    """The keys and, with a delimiter, the common prefixes under prefix."""
+    kwargs = {"Bucket": ARTIFACTS_S3_BUCKET, "Prefix": prefix}
+    if delimiter:
+        kwargs["Delimiter"] = delimiter
+    keys: List[str] = []
+    prefixes: List[str] = []
+    while True:
+        response = await s3_client.list_objects_v2(**kwargs)
+        keys.extend(obj["Key"] for obj in response.get("Contents", []))
+        prefixes.extend(p["Prefix"] for p in response.get("CommonPrefixes", []))
+        if not response.get("IsTruncated"):
+            return keys, prefixes
+        kwargs["ContinuationToken"] = response["NextContinuationToken"]
+
+
+async def _find_usage_logs(
+    s3_client: Any, owner: str, repo: str, prefix: str, workflow_id: str
+) -> Dict[str, str]:
+    """
+    The usage log key of every job of a workflow. The key is as follows
+    OWNER/REPO/WORKFLOW_ID/RUN_ATTEMPT/artifact/PREFIX_JOB_ID.zip; a job that
+    was retried keeps the log of its first run attempt that has one
+    """
+    _, attempt_prefixes = await _list(
+        s3_client, f"{owner}/{repo}/{workflow_id}/", delimiter="/"
+    )
+    attempt_prefixes = sorted(
+        (p for p in attempt_prefixes if p.rstrip("/").rsplit("/", 1)[-1].isdigit()),
+        key=lambda p: int(p.rstrip("/").rsplit("/", 1)[-1]),
+    )
+    listings = await asyncio.gather(
+        *(_list(s3_client, f"{p}artifact/{prefix}_") for p in attempt_prefixes)
+    )
+
+    found: Dict[str, str] = {}
+    for keys, _ in listings:
+        for key in keys:
+            filename = key.rsplit("/", 1)[-1]
+            if filename.endswith(".zip"):
+                found.setdefault(filename[len(prefix) + 1 : -len(".zip")], key)
+    return found
+
+
+async def _fetch_usage_log(
+    s3_client: Any, s3_path: str, workflow_id: str, job_id: str
+) -> UsageLog:
+    # Spill the zip to disk, and parse the log inside it as it's decompressed
+    with tempfile.TemporaryFile() as f:
+        content = await s3_client.get_object(Bucket=ARTIFACTS_S3_BUCKET, Key=s3_path)
+        while chunk := await content["Body"].read(DOWNLOAD_CHUNK_SIZE):
+            f.write(chunk)
+
+        def parse() -> UsageLog:
+            with zipfile.ZipFile(f) as z, z.open(USAGE_LOG_FILENAME) as member:
+                lines = io.TextIOWrapper(member, encoding="utf-8")
+                return parse_usage_log(workflow_id, job_id, lines)
+
+        # Off the event loop, so the other downloads keep going meanwhile
+        return await asyncio.to_thread(parse)
 
 
 async def get_usage_log(
@@ -39,39 +214,34 @@ async def get_usage_log(
     job_ids: List[str],
 ) -> AsyncGenerator:
     """
-    Get the usage log. The key is as follows OWNER/REPO/WORKFLOW_ID/RUN_ATTEMPT/artifact/PREFIX_JOB_ID.zip, for
+    Get the parsed usage logs, in the order of the jobs. Each workflow is listed
+    once to find its jobs' logs, which are then all fetched concurrently, for
     example pytorch/pytorch/3154788075/1/artifact/usage-log-test-distributed-1-2-linux.2xlarge_8628515238.zip
     """
-    for i in range(len(workflow_ids)):
-        workflow_id = workflow_ids[i]
-        job_id = job_ids[i]
-
-        content = {}
-        for run_attempt in range(1, MAX_RUN_ATTEMPT_TO_SCAN):
-            s3_path = f"{owner}/{repo}/{workflow_id}/{run_attempt}/artifact/{prefix}_{job_id}.zip"
-            print(f"Checking {s3_path}")
-
-            try:
-                content = await s3_client.get_object(
-                    Bucket=ARTIFACTS_S3_BUCKET, Key=s3_path
-                )
-            except s3_client.exceptions.NoSuchKey as error:
-                warn(f"Fail to find the artifact at {s3_path}: {error}")
-                continue
-
-            if content:
-                break
-
-        if not content:
-            yield workflow_id, job_id, ""
-        else:
-            try:
-                zip_data = await content["Body"].read()
-                with zipfile.ZipFile(io.BytesIO(zip_data)) as z:
-                    yield workflow_id, job_id, z.read(name=USAGE_LOG_FILENAME).decode()
-            except Exception as error:
-                warn(f"Fail to extract the usage log from {s3_path}: {error}")
-                yield workflow_id, job_id, ""
+    workflows = list(dict.fromkeys(str(w) for w in workflow_ids))
+    found = await asyncio.gather(
+        *(_find_usage_logs(s3_client, owner, repo, prefix, w) for w in workflows)
+    )
+    usage_log_keys = dict(zip(workflows, found))
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+
+    async def fetch(workflow_id: str, job_id: str) -> UsageLog:
+        s3_path = usage_log_keys[str(workflow_id)].get(str(job_id))
+        if s3_path is None:
+            warn(f"Fail to find the usage log of job {job_id} in {workflow_id}")
+            return parse_usage_log(workflow_id, job_id, [])
+        print(f"Fetching {s3_path}")
+        try:
+            async with semaphore:
+                return await _fetch_usage_log(s3_client, s3_path, workflow_id, job_id)
+        except Exception as error:
+            warn(f"Fail to extract the usage log from {s3_path}: {error}")
+            return parse_usage_log(workflow_id, job_id, [])
+
+    for usage_log in await asyncio.gather(
+        *(fetch(w, j) for w, j in zip(workflow_ids, job_ids))
+    ):
+        yield usage_log
 
 
 async def _get_usage_log_prefix(job_name: str) -> str:
@@ -91,106 +261,73 @@ async def _get_usage_log_prefix(job_name: str) -> str:
     return f"logs-test-{shard_name}-{shard_id}-{shard_count}-{platform}"
 
 
-async def _process_raw_logs(raw_logs: List[Tuple[str, str, str]]) -> Dict[str, str]:
+def _aggregate_usage_logs(usage_logs: List[UsageLog]) -> Dict[str, Any]:
     """
-    Parse and process raw usage logs from different jobs
+    Re-sample the datapoints of all the jobs into one minute buckets, averaging
+    each metric over the datapoints that have it
     """
-    timestamps = []
-    jobs = {}
-    total_cpu_percent = []
-    total_mem_usage = []
-    total_gpu_utilization = []
-    total_gpu_mem_usage = []
-
-    for workflow_id, job_id, usage_log in raw_logs:
-        start_time = 0
-        stop_time = 0
-
-        for line in usage_log.splitlines():
-            try:
-                datapoint = json.loads(line)
-            except json.decoder.JSONDecodeError as error:
-                # This is to handle invalid lines on the log, it's ok to ingore them
-                warn(f"Failed to load {line}: {error}")
-                continue
-
-            if (
-                "time" not in datapoint
-                or "total_cpu_percent" not in datapoint
-                or "per_process_cpu_info" not in datapoint
-            ):
-                continue
-
-            stop_time = datapoint["time"]
-            timestamps.append(stop_time)
-            if not start_time:
-                start_time = stop_time
-
-            # Get the basic CPU and memory info
-            total_cpu_percent.append(datapoint.get("total_cpu_percent", 0))
-            # Use rss_memory to include all the shared libraries
-            if "per_process_cpu_info" not in datapoint:
-                total_mem_usage.append(0)
-            else:
-                s = 0
-                for e in datapoint["per_process_cpu_info"]:
-                    v = e.get("rss_memory", 0)
-                    # The value can be None
-                    if not v:
-                        v = 0
-                    s += v
-                total_mem_usage.append(s)
-
-            gpu_key = (
-                "total_gpu_utilization"
-                if "total_gpu_utilization" in datapoint
-                else "total_gpu_utilizaiton"
-            )
-            total_gpu_utilization.append(datapoint.get(gpu_key, 0))
-
-            if "per_process_gpu_info" not in datapoint:
-                total_gpu_mem_usage.append(0)
-            else:
-                s = 0
-                for e in datapoint["per_process_gpu_info"]:
-                    v = e.get("gpu_memory", 0)
-                    # The value can be None
-                    if not v:
-                        v = 0
-                    s += v
-                total_gpu_mem_usage.append(s)
-
-        uniq_id = f"{workflow_id} / {job_id}"
-        # Let's also keep the starting time and ending time of the job run, so the usage can be mapped to
-        # the timeline if necessary
-        jobs[uniq_id] = {
-            "start_time": start_time,
-            "stop_time": stop_time,
+    jobs = {
+        f"{log.workflow_id} / {log.job_id}": {
+            "start_time": log.start_time,
+            "stop_time": log.stop_time,
+        }
+        for log in usage_logs
+    }
+    timestamps = np.concatenate(
+        [log.timestamps for log in usage_logs] or [np.array([], "datetime64[us]")]
+    )
+    if not timestamps.size:
+        return {
+            "timestamp": [],
+            "cpu": [],
+            "mem": [],
+            "gpu": [],
+            "gpu_mem": [],
+            "jobs": jobs,
         }
 
-    idx = pd.to_datetime(timestamps)
-
-    cpu = pd.Series(data=total_cpu_percent, index=idx)
-    mem = pd.Series(data=total_mem_usage, index=idx)
-    gpu = pd.Series(data=total_gpu_utilization, index=idx)
-    gpu_mem = pd.Series(data=total_gpu_mem_usage, index=idx)
+    buckets = timestamps.astype(f"datetime64[{RESAMPLING_UNIT}]")
+    first = buckets.min()
+    bucket_index = (buckets - first).astype(np.int64)
+    num_buckets = int(bucket_index.max()) + 1
 
-    # Re-sampling the raw data into x minute bucket
-    resampled_cpu = cpu.resample(RESAMPLING_WINDOW).mean().round().fillna(0)
-    resampled_mem = mem.resample(RESAMPLING_WINDOW).mean().round().fillna(0)
-    resampled_gpu = gpu.resample(RESAMPLING_WINDOW).mean().round().fillna(0)
-    resampled_gpu_mem = gpu_mem.resample(RESAMPLING_WINDOW).mean().round().fillna(0)
+    def resample(metric: str) -> List[float]:
+        values = np.concatenate([getattr(log, metric) for log in usage_logs])
+        valid = ~np.isnan(values)
+        sums = np.bincount(
+            bucket_index[valid], weights=values[valid], minlength=num_buckets
+        )
+        counts = np.bincount(bucket_index[valid], minlength=num_buckets)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = np.round(sums / counts)
+        # Empty buckets are 0
+        return np.nan_to_num(means, nan=0.0).tolist()
 
+    bucket_times = first + np.arange(num_buckets)
     return {
-        "timestamp": resampled_cpu.index.strftime(DATETIME_FORMAT).to_list(),
-        "cpu": resampled_cpu.to_list(),
-        "mem": resampled_mem.to_list(),
-        "gpu": resampled_gpu.to_list(),
-        "gpu_mem": resampled_gpu_mem.to_list(),
+        "timestamp": [
+            t.strftime(DATETIME_FORMAT) for t in bucket_times.astype(datetime)
+        ],
+        "cpu": resample("cpu"),
+        "mem": resample("mem"),
+        "gpu": resample("gpu"),
+        "gpu_mem": resample("gpu_mem"),
         "jobs": jobs,
     }
 
 
+async def _process_raw_logs(raw_logs: List[Tuple[str, str, str]]) -> Dict[str, str]:
+    """
+    Parse and process raw usage logs from different jobs
+    """
+    return _aggregate_usage_logs(
+        [
+            parse_usage_log(workflow_id, job_id, usage_log.splitlines())
+            for workflow_id, job_id, usage_log in raw_logs
+        ]
+    )
+
+
 async def aggregate(body: str, context: Any) -> str:
     """
     Aggregate all the usage logs specified by the provided parameters
@@ -236,7 +373,7 @@ async def aggregate(body: str, context: Any) -> str:
         "s3",
         region_name="us-east-1",
     ) as s3_client:
-        raw_logs = [
+        usage_logs = [
             entry
             async for entry in get_usage_log(
                 s3_client=s3_client,
@@ -248,7 +385,7 @@ async def aggregate(body: str, context: Any) -> str:
             )
         ]
 
-    results = await _process_raw_logs(raw_logs=raw_logs)
+    results = _aggregate_usage_logs(usage_logs)
     return json.dumps(results)
 
 
@@ -1,3 +1,5 @@
+import io
+import json
 import os
 from unittest.mock import AsyncMock
 
@@ -7,6 +9,7 @@ from lambda_function import (
     _process_raw_logs,
     ARTIFACTS_S3_BUCKET,
     get_usage_log,
+    parse_usage_log,
     PYTORCH,
 )
 
@@ -74,26 +77,50 @@ async def test_process_raw_logs():
     }
 
 
-@pytest.mark.asyncio
-async def test_get_usage_log():
-    def _effect(Bucket: str, Key: str):
+class FakeBody:
+    def __init__(self, data: bytes):
+        self.stream = io.BytesIO(data)
+
+    async def read(self, size: int = -1) -> bytes:
+        return self.stream.read(size)
+
+
+def _fake_s3_client(keys):
+    def _get_object(Bucket: str, Key: str):
         # Get the filename
         filename = Key.split("/")[-1]
-        filepath = os.path.join(TEST_SAMPLES_DIR, filename)
+        with open(os.path.join(TEST_SAMPLES_DIR, filename), "rb") as f:
+            return {"Body": FakeBody(f.read())}
+
+    def _list_objects_v2(Bucket: str, Prefix: str, Delimiter: str = ""):
+        assert Bucket == ARTIFACTS_S3_BUCKET
+        matches = sorted(k for k in keys if k.startswith(Prefix))
+        if not Delimiter:
+            return {"Contents": [{"Key": k} for k in matches]}
+        prefixes = {
+            Prefix + k[len(Prefix) :].split(Delimiter)[0] + Delimiter for k in matches
+        }
+        return {"CommonPrefixes": [{"Prefix": p} for p in sorted(prefixes)]}
 
-        if not os.path.exists(filepath):
-            return
+    m = AsyncMock()
+    m.get_object.side_effect = _get_object
+    m.list_objects_v2.side_effect = _list_objects_v2
+    return m
 
-        with open(filepath, "rb") as f:
-            another_mock = AsyncMock()
-            another_mock.read.return_value = f.read()
-            return {"Body": another_mock}
 
+@pytest.mark.asyncio
+async def test_get_usage_log():
     ids = [str(i) for i in range(NUMBER_OF_SAMPLES)]
-    m = AsyncMock()
-    m.get_object.side_effect = _effect
+    keys = [
+        # Retried, the log of the first attempt is used
+        f"{PYTORCH}/{PYTORCH}/1/2/artifact/{TEST_PREFIX}_1.zip",
+        f"{PYTORCH}/{PYTORCH}/1/10/artifact/{TEST_PREFIX}_1.zip",
+        f"{PYTORCH}/{PYTORCH}/1/1/artifact/{TEST_PREFIX}_1.zip",
+        f"{PYTORCH}/{PYTORCH}/1/1/artifact/other_{TEST_PREFIX}_1.zip",
+    ]
+    m = _fake_s3_client(keys)
 
-    async for _, job_id, content in get_usage_log(
+    async for usage_log in get_usage_log(
         s3_client=m,
         owner=PYTORCH,
         repo=PYTORCH,
@@ -101,16 +128,60 @@ async def test_get_usage_log():
         workflow_ids=ids,
         job_ids=ids,
     ):
+        job_id = usage_log.job_id
         expected_filepath = os.path.join(
             TEST_SAMPLES_DIR, f"{TEST_PREFIX}_{job_id}.txt"
         )
 
         if not os.path.exists(expected_filepath):
-            assert content == ""
+            expected = parse_usage_log(job_id, job_id, [])
         else:
             with open(expected_filepath) as f:
-                assert content == f.read()
+                expected = parse_usage_log(job_id, job_id, f.read().splitlines())
+        assert usage_log.start_time == expected.start_time
+        assert usage_log.stop_time == expected.stop_time
+        for metric in ("timestamps", "cpu", "mem", "gpu", "gpu_mem"):
+            assert (getattr(usage_log, metric) == getattr(expected, metric)).all()
+
+    m.get_object.assert_called_once_with(Bucket=ARTIFACTS_S3_BUCKET, Key=keys[2])
+    # One listing of the run attempts per workflow, one of each attempt's logs
+    assert m.list_objects_v2.call_count == 2 + 3
 
-    for i in range(NUMBER_OF_SAMPLES):
-        key = f"{PYTORCH}/{PYTORCH}/{i}/1/artifact/{TEST_PREFIX}_{i}.zip"
-        m.get_object.assert_any_call(Bucket=ARTIFACTS_S3_BUCKET, Key=key)
+
+@pytest.mark.asyncio
+async def test_process_raw_logs_resampling():
+    def _line(time: str, cpu, gpu=None, rss=0) -> str:
+        return json.dumps(
+            {
+                "time": time,
+                "total_cpu_percent": cpu,
+                "per_process_cpu_info": [{"rss_memory": rss}, {"rss_memory": None}],
+                "total_gpu_utilization": gpu,
+            }
+        )
+
+    log = "\n".join(
+        [
+            _line("2022-09-27T23:05:10Z", 10, 1, rss=100),
+            _line("2022-09-27T23:05:50Z", None, 2, rss=300),
+            "not json",
+            _line("2022-09-27T23:08:00Z", 3),
+        ]
+    )
+    r = await _process_raw_logs(raw_logs=[("w", "j", log)])
+    # Missing values don't count towards the mean, empty minutes are 0
+    assert r["timestamp"] == [
+        "2022-09-27 23:05:00",
+        "2022-09-27 23:06:00",
+        "2022-09-27 23:07:00",
+        "2022-09-27 23:08:00",
+    ]
+    assert r["cpu"] == [10.0, 0.0, 0.0, 3.0]
+    assert r["mem"] == [200.0, 0.0, 0.0, 0.0]
+    assert r["gpu"] == [2.0, 0.0, 0.0, 0.0]
+    assert r["jobs"] == {
+        "w / j": {
+            "start_time": "2022-09-27T23:05:10Z",
+            "stop_time": "2022-09-27T23:08:00Z",
+        }
+    }
@@ -1,5 +1,3 @@
-import os
-import zipfile
 from functools import cache
 from typing import Any
 from urllib.parse import unquote
@@ -7,6 +5,7 @@ from urllib.parse import unquote
 import boto3  # type: ignore[import-not-found]
 from botocore import UNSIGNED  # type: ignore[import-not-found]
 from botocore.config import Config  # type: ignore[import-not-found]
+from wheel_metadata import fetch_wheel_metadata
 
 
 @cache
@@ -16,14 +15,15 @@ def get_client(read_only: bool) -> Any:
     return boto3.client("s3")
 
 
-def upload_s3(bucket: str, key: str, filename: str, dry_run: bool) -> None:
+def upload_s3(bucket: str, key: str, body: bytes, dry_run: bool) -> None:
     print(f"Uploading to {bucket}/{key}")
     if not dry_run:
-        get_client(False).upload_file(
-            filename,
-            bucket,
-            key,
-            ExtraArgs={"ChecksumAlgorithm": "sha256", "ACL": "public-read"},
+        get_client(False).put_object(
+            Bucket=bucket,
+            Key=key,
+            Body=body,
+            ChecksumAlgorithm="SHA256",
+            ACL="public-read",
         )
 
 
@@ -34,8 +34,6 @@ def delete_s3(bucket: str, key: str, dry_run: bool) -> None:
 
 
 def lambda_handler(event: Any, context: Any, dry_run: bool = False) -> None:
-    zip_location = "/tmp/wheel.zip"
-    metadata_location = "/tmp/METADATA"
     for record in event["Records"]:
         bucket = record["s3"]["bucket"]["name"]
         key = unquote(record["s3"]["object"]["key"])
@@ -48,18 +46,10 @@ def lambda_handler(event: Any, context: Any, dry_run: bool = False) -> None:
         # new one, we don't want to leave the old one around.
         delete_s3(bucket, f"{key}.metadata", dry_run)
 
-        if os.path.exists(zip_location):
-            os.remove(zip_location)
-
-        get_client(dry_run).download_file(bucket, key, zip_location)
-
-        if os.path.exists(metadata_location):
-            os.remove(metadata_location)
-
-        with zipfile.ZipFile(zip_location, "r") as zip_ref:
-            for filename in zip_ref.infolist():
-                if filename.filename.endswith(".dist-info/METADATA"):
-                    filename.filename = "METADATA"
-                    zip_ref.extract(filename, "/tmp")
-                    upload_s3(bucket, f"{key}.metadata", metadata_location, dry_run)
-                    break
+        # Only the zip directory and the METADATA entry are fetched, not the
+        # whole (possibly multi-GB) wheel.
+        metadata = fetch_wheel_metadata(get_client(dry_run), bucket, key)
+        if metadata is None:
+            print(f"No .dist-info/METADATA found in {bucket}/{key}")
+            continue
+        upload_s3(bucket, f"{key}.metadata", metadata, dry_run)
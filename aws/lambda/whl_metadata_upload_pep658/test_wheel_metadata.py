@@ -0,0 +1,166 @@
+import io
+import os
+import re
+import unittest
+import zipfile
+from typing import Any, Dict, List, Tuple
+from unittest import mock
+
+from wheel_metadata import (
+    extract_metadata,
+    fetch_wheel_metadata,
+    MalformedWheel,
+    TAIL_SIZE,
+)
+
+
+METADATA = b"Metadata-Version: 2.1\nName: torch\nVersion: 2.6.0\n" + b"x" * 4096
+
+
+def make_wheel(
+    members: Dict[str, bytes],
+    compression: int = zipfile.ZIP_DEFLATED,
+    comment: bytes = b"",
+) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=compression) as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+        zf.comment = comment
+    return buf.getvalue()
+
+
+def default_members() -> Dict[str, bytes]:
+    return {
+        "torch/__init__.py": b"import os\n" * 100,
+        # Incompressible payload, so METADATA at the end is far from the start.
+        "torch/lib/libtorch.so": os.urandom(3 * TAIL_SIZE),
+        "torch-2.6.0.dist-info/METADATA": METADATA,
+        "torch-2.6.0.dist-info/RECORD": b"",
+    }
+
+
+class BytesReader:
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.ranges: List[Tuple[int, int]] = []
+
+    def tail(self, length: int) -> Tuple[bytes, int]:
+        start = max(0, len(self.data) - length)
+        self.ranges.append((start, len(self.data)))
+        return self.data[start:], len(self.data)
+
+    def read(self, start: int, length: int) -> bytes:
+        self.ranges.append((start, start + length))
+        return self.data[start : start + length]
+
+    @property
+    def bytes_read(self) -> int:
+        return sum(end - start for start, end in self.ranges)
+
+
+class FakeS3Client:
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.downloads = 0
+
+    def get_object(self, Bucket: str, Key: str, Range: str) -> Dict[str, Any]:
+        size = len(self.data)
+        m = re.fullmatch(r"bytes=(\d*)-(\d*)", Range)
+        assert m is not None
+        if m.group(1):
+            start, end = int(m.group(1)), min(int(m.group(2)), size - 1)
+        else:
+            start, end = max(0, size - int(m.group(2))), size - 1
+        return {
+            "Body": io.BytesIO(self.data[start : end + 1]),
+            "ContentRange": f"bytes {start}-{end}/{size}",
+        }
+
+    def download_fileobj(self, bucket: str, key: str, f: Any) -> None:
+        self.downloads += 1
+        f.write(self.data)
+
+
+class TestExtractMetadata(unittest.TestCase):
+    def test_metadata_in_tail_read_with_one_range(self) -> None:
+        data = make_wheel(default_members())
+        reader = BytesReader(data)
+        self.assertEqual(extract_metadata(reader), METADATA)
+        self.assertEqual(len(reader.ranges), 1)
+        self.assertLess(reader.bytes_read, len(data) // 2)
+
+    def test_metadata_before_payload(self) -> None:
+        members = {"torch-2.6.0.dist-info/METADATA": METADATA, **default_members()}
+        reader = BytesReader(make_wheel(members))
+        self.assertEqual(extract_metadata(reader), METADATA)
+        # tail, METADATA entry
+        self.assertEqual(len(reader.ranges), 2)
+
+    def test_central_directory_larger_than_tail(self) -> None:
+        members = {f"torch/include/header_{i:05d}.h": b"" for i in range(3000)}
+        members["torch-2.6.0.dist-info/METADATA"] = METADATA
+        reader = BytesReader(make_wheel(members))
+        self.assertEqual(extract_metadata(reader), METADATA)
+        # tail, central directory, METADATA entry
+        self.assertEqual(len(reader.ranges), 3)
+
+    def test_stored_entry(self) -> None:
+        data = make_wheel(default_members(), compression=zipfile.ZIP_STORED)
+        self.assertEqual(extract_metadata(BytesReader(data)), METADATA)
+
+    def test_archive_comment(self) -> None:
+        data = make_wheel(default_members(), comment=b"PK\x05\x06" + b"c" * 60000)
+        self.assertEqual(extract_metadata(BytesReader(data)), METADATA)
+
+    def test_zip64(self) -> None:
+        # Lower the zip64 threshold so every offset and the end record use zip64.
+        with mock.patch.object(zipfile, "ZIP64_LIMIT", 16):
+            data = make_wheel(default_members())
+        self.assertIn(b"PK\x06\x06", data[-TAIL_SIZE:])
+        self.assertEqual(extract_metadata(BytesReader(data)), METADATA)
+
+    def test_prefers_top_level_dist_info(self) -> None:
+        members = {
+            "torch/_vendor/dep-1.0.dist-info/METADATA": b"Name: dep\n",
+            **default_members(),
+        }
+        data = make_wheel(members)
+        self.assertEqual(extract_metadata(BytesReader(data)), METADATA)
+
+    def test_no_metadata(self) -> None:
+        data = make_wheel({"torch/__init__.py": b""})
+        self.assertIsNone(extract_metadata(BytesReader(data)))
+
+    def test_malformed(self) -> None:
+        data = make_wheel(default_members())
+        with self.assertRaises(MalformedWheel):
+            extract_metadata(BytesReader(data[: -TAIL_SIZE // 2]))
+        with self.assertRaises(MalformedWheel):
+            extract_metadata(BytesReader(b"not a zip" * 1000))
+        # A corrupted entry fails the CRC check.
+        stored = make_wheel(default_members(), compression=zipfile.ZIP_STORED)
+        corrupt = bytearray(stored)
+        offset = stored.index(b"Metadata-Version")
+        corrupt[offset : offset + 4] = b"\0\0\0\0"
+        with self.assertRaises(MalformedWheel):
+            extract_metadata(BytesReader(bytes(corrupt)))
+
+
+class TestFetchWheelMetadata(unittest.TestCase):
+    def test_ranged_reads(self) -> None:
+        client = FakeS3Client(make_wheel(default_members()))
+        self.assertEqual(fetch_wheel_metadata(client, "b", "k.whl"), METADATA)
+        self.assertEqual(client.downloads, 0)
+
+    def test_falls_back_to_download(self) -> None:
+        # A zip nested after garbage is readable by zipfile but its offsets are
+        # shifted, which the ranged reader refuses.
+        data = b"\0" * 1000 + make_wheel(default_members())
+        client = FakeS3Client(data)
+        self.assertEqual(fetch_wheel_metadata(client, "b", "k.whl"), METADATA)
+        self.assertEqual(client.downloads, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -10,7 +10,7 @@ import os
 import sys
 from typing import TYPE_CHECKING
 
-from greenlight import github_client, merge_authz, review, verdict
+from greenlight import github_client, merge_authz, review, state, verdict
 from greenlight.config import Config
 from greenlight.constants import (
     BOT_LOGIN_SUFFIX,
@@ -225,6 +225,10 @@ def main(argv: Sequence[str] | None = None) -> int:
         build_client=lambda: _build_authz_client(config),
         ttl_seconds=config.merge_rules_ttl_seconds,
     )
+    # Likewise one state snapshot for a --loop daemon: each scan refreshes only the state rows
+    # inserted since the previous one instead of re-reading every candidate PR's history. A
+    # one-shot run reads once, so it keeps the direct read, filtered to the PRs it looks at.
+    read_state = state.StateSnapshot().read if args.loop else state.read_latest_states
     run = functools.partial(
         review.run,
         pr=args.pr,
@@ -236,5 +240,6 @@ def main(argv: Sequence[str] | None = None) -> int:
         allow_untrusted_author=args.allow_untrusted_author,
         bot_login=bot_login,
         resolve_authorized=authorized_cache.get,
+        read_state=read_state,
     )
     return _dispatch(config, run, loop=args.loop, lock_path=lock_path)
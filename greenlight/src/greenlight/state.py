@@ -10,13 +10,16 @@ time: ``ORDER BY pr_number, run_id DESC, version DESC LIMIT 1 BY pr_number`` kee
 highest ``run_id`` and, within that run, the latest ``version``. Ordering by ``run_id``
 ahead of ``version`` is race-proof: a superseded slower dispatch that happens to finish
 with a later ``version`` still loses to the newer dispatch's higher ``run_id``.
+
+``StateSnapshot`` keeps that selection in memory across the scans of a ``--loop`` daemon and
+refreshes it incrementally, reading only the rows inserted since its previous refresh.
 """
 
 from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import UTC
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 
 from greenlight import clickhouse_client
 
@@ -26,13 +29,18 @@ if TYPE_CHECKING:
 
     from clickhouse_connect.driver.client import Client
 
-__all__ = ["PRState", "naive_utc", "read_latest_states"]
+__all__ = ["PRState", "StateSnapshot", "naive_utc", "read_latest_states"]
 
 _QUERY = (
     "SELECT pr_number, status, eval_hash, head_sha, version, run_id FROM misc.greenlight_pr_state WHERE repo = %(repo)s"
 )
 _PR_FILTER = " AND pr_number IN %(pr_numbers)s"
 _ORDER_LIMIT = " ORDER BY pr_number, run_id DESC, version DESC LIMIT 1 BY pr_number"
+_INSERTED_SINCE = " AND _inserted_at >= toDateTime(%(since)s)"
+# Taken on the server before the rows are read, so the watermark and ``_inserted_at`` share
+# one clock. The margin re-reads rows whose insert was stamped just before the watermark
+# but only became visible after the read; re-reading a row is harmless (see ``_newer``).
+_WATERMARK_QUERY = "SELECT toUnixTimestamp(now()) - 60"
 
 
 @dataclass(frozen=True, slots=True)
@@ -79,14 +87,80 @@ def read_latest_states(
         result = client.query(query, parameters=params)
     finally:
         client.close()
-    return {
-        int(row["pr_number"]): PRState(
-            pr_number=int(row["pr_number"]),
-            status=row["status"],
-            eval_hash=row["eval_hash"],
-            head_sha=row["head_sha"],
-            version=naive_utc(row["version"]),
-            run_id=int(row["run_id"]),
-        )
-        for row in result.named_results()
-    }
+    return {state.pr_number: state for state in map(_to_state, result.named_results())}
+
+
+def _to_state(row: dict[str, Any]) -> PRState:
+    return PRState(
+        pr_number=int(row["pr_number"]),
+        status=row["status"],
+        eval_hash=row["eval_hash"],
+        head_sha=row["head_sha"],
+        version=naive_utc(row["version"]),
+        run_id=int(row["run_id"]),
+    )
+
+
+def _newer(candidate: PRState, current: PRState | None) -> bool:
+    # The read-time selection rule, applied in memory: highest run_id, then latest version.
+    return current is None or (candidate.run_id, candidate.version) > (current.run_id, current.version)
+
+
+class StateSnapshot:
+    """In-memory latest ``misc.greenlight_pr_state`` row per PR, refreshed incrementally.
+
+    The first read for a repo loads every PR's latest row; each later read queries only the
+    rows inserted since the previous refresh and merges them under the same
+    ``run_id``-then-``version`` rule the full read applies, so ``read`` returns exactly what
+    ``read_latest_states`` would. The high-water mark is the server's ``_inserted_at``, not
+    ``version``: ``version`` is stamped by the emitter before the S3 -> replicator hop, so a
+    late-replicated row can carry a ``version`` older than rows already seen.
+
+    ``read`` has the ``read_latest_states`` signature so it can be bound as ``review.run``'s
+    ``read_state``; every call refreshes once over a single connection, then answers the
+    per-PR lookups from memory. Errors propagate like ``read_latest_states`` and leave the
+    snapshot and its high-water mark untouched, so the next read retries the same window.
+    Not thread-safe by design: one snapshot per process, read from the scan loop only.
+    """
+
+    def __init__(self, *, connect: Callable[[], Client] = clickhouse_client.connect) -> None:
+        self._connect = connect
+        self._states: dict[str, dict[int, PRState]] = {}
+        self._high_water: dict[str, int] = {}
+
+    def read(self, repo: str, pr_numbers: Sequence[int] | None = None) -> dict[int, PRState]:
+        """Refresh ``repo``'s snapshot and return the latest state per PR, keyed by ``pr_number``.
+
+        ``pr_numbers`` behaves as in ``read_latest_states``: None for every PR, an empty
+        sequence for ``{}`` without a query.
+        """
+        if pr_numbers is not None and not pr_numbers:
+            return {}
+        states = self._refresh(repo)
+        if pr_numbers is None:
+            return dict(states)
+        return {n: states[n] for n in pr_numbers if n in states}
+
+    def _refresh(self, repo: str) -> dict[int, PRState]:
+        query = _QUERY
+        params: dict[str, object] = {"repo": repo}
+        since = self._high_water.get(repo)
+        if since is not None:
+            query += _INSERTED_SINCE
+            params["since"] = since
+        query += _ORDER_LIMIT
+        client = self._connect()
+        try:
+            watermark = client.command(_WATERMARK_QUERY)
+            if not isinstance(watermark, (int, str)):
+                raise TypeError(f"unexpected watermark from ClickHouse: {watermark!r}")
+            high_water = int(watermark)
+            result = client.query(query, parameters=params)
+        finally:
+            client.close()
+        states = self._states.setdefault(repo, {})
+        for state in map(_to_state, result.named_results()):
+            if _newer(state, states.get(state.pr_number)):
+                states[state.pr_number] = state
+        self._high_water[repo] = high_water
+        return states
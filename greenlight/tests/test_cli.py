@@ -10,7 +10,7 @@ from unittest.mock import Mock
 
 import pytest
 
-from greenlight import cli, github_client, merge_authz, review, verdict
+from greenlight import cli, github_client, merge_authz, review, state, verdict
 from greenlight.config import Config
 from greenlight.constants import DEFAULT_DISPATCH_REF, DEFAULT_TIMEOUT_MINUTES, TARGET_REPO
 from greenlight.exit_codes import EXIT_ALREADY_RUNNING, EXIT_FAILURE, EXIT_OK
@@ -25,17 +25,26 @@ def _noop_lock(path):
     yield
 
 
-def _pop_resolve_authorized(kwargs: Mapping[str, object]) -> dict[str, object]:
-    """Assert ``resolve_authorized`` is a shared cache's ``.get`` and return the remaining kwargs.
+def _pop_process_caches(kwargs: Mapping[str, object], *, loop: bool = False) -> dict[str, object]:
+    """Assert the process-wide caches are bound and return the remaining kwargs.
 
-    Every review path must bind the process-wide ``AuthorizedLoginsCache.get`` as the resolver;
-    stripping it here lets the caller compare the rest of the bound scan flags by value.
+    Every review path must bind the process-wide ``AuthorizedLoginsCache.get`` as the resolver.
+    A ``--loop`` daemon reads state through the process-wide ``StateSnapshot.read``, a one-shot
+    run through ``read_latest_states``. Stripping them here lets the caller compare the rest of
+    the bound scan flags by value.
     """
     remaining = dict(kwargs)
     resolve = remaining.pop("resolve_authorized")
     assert isinstance(resolve, MethodType)
     assert isinstance(resolve.__self__, merge_authz.AuthorizedLoginsCache)
     assert resolve.__func__ is merge_authz.AuthorizedLoginsCache.get
+    read_state = remaining.pop("read_state")
+    if loop:
+        assert isinstance(read_state, MethodType)
+        assert isinstance(read_state.__self__, state.StateSnapshot)
+        assert read_state.__func__ is state.StateSnapshot.read
+    else:
+        assert read_state is state.read_latest_states
     return remaining
 
 
@@ -103,7 +112,7 @@ def test_main_loop_calls_run_forever_with_phase(monkeypatch):
     bound = captured["run"]
     assert isinstance(bound, functools.partial)
     assert bound.func is review.run
-    assert _pop_resolve_authorized(bound.keywords) == {
+    assert _pop_process_caches(bound.keywords, loop=True) == {
         "pr": None,
         "max_dispatches": None,
         "ref": "main",
@@ -538,7 +547,7 @@ def test_main_review_binds_scan_flags_into_run(monkeypatch):
     assert rc == EXIT_OK
     review_mock.assert_called_once()
     assert isinstance(review_mock.call_args.args[0], Config)
-    assert _pop_resolve_authorized(review_mock.call_args.kwargs) == {
+    assert _pop_process_caches(review_mock.call_args.kwargs) == {
         "pr": 5,
         "max_dispatches": 2,
         "ref": "release/2.9",
@@ -550,6 +559,26 @@ def test_main_review_binds_scan_flags_into_run(monkeypatch):
     }
 
 
+def test_main_review_oneshot_reads_state_filtered_to_its_prs(monkeypatch):
+    review_mock = Mock()
+    monkeypatch.setattr(review, "run", review_mock)
+    monkeypatch.setattr(cli, "single_instance_lock", _noop_lock)
+    monkeypatch.setattr(cli, "configure_logging", Mock())
+
+    assert cli.main(["review", "--pr", "5"]) == EXIT_OK
+
+    client = Mock()
+    client.query.return_value.named_results.return_value = iter([])
+    read_state = review_mock.call_args.kwargs["read_state"]
+    assert read_state(TARGET_REPO, [5], connect=lambda: client) == {}
+    # One pr_number IN (...) query, not every PR's latest row for the repo
+    client.query.assert_called_once()
+    query = client.query.call_args.args[0]
+    assert "pr_number IN %(pr_numbers)s" in query
+    assert client.query.call_args.kwargs["parameters"] == {"repo": TARGET_REPO, "pr_numbers": (5,)}
+    client.command.assert_not_called()
+
+
 def test_main_review_defaults_bind_into_run(monkeypatch):
     review_mock = Mock()
     monkeypatch.setattr(review, "run", review_mock)
@@ -559,7 +588,7 @@ def test_main_review_defaults_bind_into_run(monkeypatch):
     rc = cli.main(["review"])
 
     assert rc == EXIT_OK
-    assert _pop_resolve_authorized(review_mock.call_args.kwargs) == {
+    assert _pop_process_caches(review_mock.call_args.kwargs) == {
         "pr": None,
         "max_dispatches": None,
         "ref": DEFAULT_DISPATCH_REF,
@@ -600,7 +629,7 @@ def test_main_review_force_binds_into_run(monkeypatch):
     rc = cli.main(["review", "--pr", "5", "--force"])
 
     assert rc == EXIT_OK
-    assert _pop_resolve_authorized(review_mock.call_args.kwargs) == {
+    assert _pop_process_caches(review_mock.call_args.kwargs) == {
         "pr": 5,
         "max_dispatches": None,
         "ref": DEFAULT_DISPATCH_REF,
@@ -621,7 +650,7 @@ def test_main_review_binds_requester_and_override_into_run(monkeypatch):
     rc = cli.main(["review", "--pr", "5", "--requester", "albanD", "--allow-untrusted-author"])
 
     assert rc == EXIT_OK
-    assert _pop_resolve_authorized(review_mock.call_args.kwargs) == {
+    assert _pop_process_caches(review_mock.call_args.kwargs) == {
         "pr": 5,
         "max_dispatches": None,
         "ref": DEFAULT_DISPATCH_REF,
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import dataclasses
 from datetime import datetime, timedelta, timezone
-from typing import TYPE_CHECKING, cast
+from typing import TYPE_CHECKING, Any, cast
 
 import pytest
 
@@ -212,3 +212,152 @@ def test_prstate_is_frozen():
 
     with pytest.raises(dataclasses.FrozenInstanceError):
         st.status = "NO_LAND"  # type: ignore[misc]
+
+
+class _FakeTable:
+    """A ``connect`` target that evaluates the state queries against in-memory rows.
+
+    Rows carry the ``_inserted_at`` unix second they were inserted at; ``now`` is the server
+    clock. The ORDER BY/LIMIT 1 BY selection is applied here, so ``read_latest_states`` and
+    ``StateSnapshot`` can be compared against one table as rows arrive.
+    """
+
+    def __init__(self) -> None:
+        self.rows: list[tuple[int, dict[str, object]]] = []
+        self.now = 1_000
+        self.queries: list[tuple[str, dict[str, object]]] = []
+        self.connects = 0
+        self.closed = 0
+        self.fail = False
+
+    def insert(self, row: dict[str, object]) -> None:
+        self.rows.append((self.now, row))
+
+    def connect(self) -> Client:
+        self.connects += 1
+        return cast("Client", self)
+
+    def command(self, query: str) -> int:
+        assert query == "SELECT toUnixTimestamp(now()) - 60"
+        return self.now - 60
+
+    def query(self, query: str, parameters: dict[str, object]) -> _FakeResult:
+        self.queries.append((query, parameters))
+        if self.fail:
+            raise RuntimeError("query boom")
+        since = cast("int | None", parameters.get("since"))
+        prs = cast("tuple[int, ...] | None", parameters.get("pr_numbers"))
+        latest: dict[int, dict[str, Any]] = {}
+        for inserted_at, row in self.rows:
+            pr_number = cast("int", row["pr_number"])
+            if (since is not None and inserted_at < since) or (prs is not None and pr_number not in prs):
+                continue
+            current = latest.get(pr_number)
+            if current is None or (row["run_id"], row["version"]) > (current["run_id"], current["version"]):
+                latest[pr_number] = row
+        return _FakeResult([latest[n] for n in sorted(latest)])
+
+    def close(self) -> None:
+        self.closed += 1
+
+
+def test_snapshot_matches_read_latest_states_as_rows_arrive():
+    table = _FakeTable()
+    snapshot = state.StateSnapshot(connect=table.connect)
+    table.insert(_row(7, "AI_REVIEW_STARTED", "a" * 64, "sha7", _V1, 100))
+    table.insert(_row(11, "LAND", "b" * 64, "sha11", _V1, 50))
+
+    def assert_parity() -> None:
+        for prs in (None, [7], [7, 11, 13], [99]):
+            assert snapshot.read(_REPO, prs) == state.read_latest_states(_REPO, prs, connect=table.connect)
+
+    assert_parity()
+    table.now += 300
+    # Same run: the terminal verdict's later version replaces the in-flight row.
+    table.insert(_row(7, "LAND", "a" * 64, "sha7", _V2, 100))
+    # A new PR appears between scans.
+    table.insert(_row(13, "NO_LAND", "c" * 64, "sha13", _V1, 60))
+    assert_parity()
+    table.now += 300
+    # Replicated late: the emitter stamped these before rows already seen. The higher run_id
+    # still wins; the superseded run's row still loses despite arriving last.
+    table.insert(_row(11, "AI_REVIEW_STARTED", "d" * 64, "sha11b", _V1 - timedelta(hours=1), 51))
+    table.insert(_row(7, "NO_LAND", "a" * 64, "sha7", _V2 + timedelta(hours=1), 99))
+    assert_parity()
+
+    assert snapshot.read(_REPO)[11].run_id == 51
+    assert snapshot.read(_REPO)[7].status == "LAND"
+
+
+def test_snapshot_reads_only_rows_inserted_since_previous_refresh():
+    table = _FakeTable()
+    snapshot = state.StateSnapshot(connect=table.connect)
+    table.insert(_row(7, "LAND", "a" * 64, "sha7", _V1, 100))
+
+    snapshot.read(_REPO, [7])
+    table.now += 300
+    snapshot.read(_REPO, [7])
+
+    (first, first_params), (second, second_params) = table.queries
+    # The first read loads every PR, whichever PRs were asked for; the refresh is
+    # bounded by the server-side watermark taken during the first read.
+    assert "_inserted_at" not in first
+    assert first_params == {"repo": _REPO}
+    assert "_inserted_at >= toDateTime(%(since)s)" in second
+    assert second.index("_inserted_at") < second.index("ORDER BY")
+    assert second.rstrip().endswith("LIMIT 1 BY pr_number")
+    assert second_params == {"repo": _REPO, "since": 1_000 - 60}
+    # One connection per read, always closed.
+    assert table.connects == 2
+    assert table.closed == 2
+
+
+def test_snapshot_empty_pr_numbers_returns_empty_dict_without_connecting():
+    table = _FakeTable()
+    snapshot = state.StateSnapshot(connect=table.connect)
+
+    assert snapshot.read(_REPO, []) == {}
+    assert table.connects == 0
+
+
+def test_snapshot_keeps_repos_apart():
+    table = _FakeTable()
+    snapshot = state.StateSnapshot(connect=table.connect)
+
+    snapshot.read(_REPO)
+    snapshot.read("pytorch/vision")
+
+    assert [params for _, params in table.queries] == [
+        {"repo": _REPO},
+        {"repo": "pytorch/vision"},
+    ]
+
+
+def test_snapshot_query_error_propagates_and_keeps_high_water_mark():
+    table = _FakeTable()
+    snapshot = state.StateSnapshot(connect=table.connect)
+    snapshot.read(_REPO)
+    table.now += 300
+    table.insert(_row(7, "LAND", "a" * 64, "sha7", _V1, 100))
+    table.fail = True
+
+    with pytest.raises(RuntimeError, match="query boom"):
+        snapshot.read(_REPO)
+
+    assert table.closed == 2
+    table.fail = False
+    assert snapshot.read(_REPO) == state.read_latest_states(_REPO, connect=table.connect)
+    # The failed refresh did not advance the watermark, so the retry covers the same window.
+    assert table.queries[1][1] == table.queries[2][1] == {"repo": _REPO, "since": 1_000 - 60}
+
+
+def test_snapshot_rejects_non_scalar_watermark():
+    class _RowsWatermark(_FakeTable):
+        def command(self, query: str) -> int:
+            return cast("int", ["940"])
+
+    table = _RowsWatermark()
+    snapshot = state.StateSnapshot(connect=table.connect)
+    with pytest.raises(TypeError, match="watermark"):
+        snapshot.read(_REPO)
+    assert table.closed == 1
@@ -32,6 +32,11 @@
 #     is scanned; with no value, all accelerator subfolders (cu*/rocm*/cpu/xpu)
 #     under the prefix are scanned (nightly/test excluded). Combine with
 #     --package-name / --package-version to scope to a single release.
+#   - --backfill-pep658: scan the prefix for .whl files without a PEP 658
+#     <wheel>.metadata sibling and extract/upload it in parallel, reading only
+#     the zip directory and METADATA entry of each wheel with ranged GETs
+#     (wheel_metadata.py, shared with the whl_metadata_upload_pep658 lambda).
+#     Honours --do-not-upload.
 #   - --recompute-missing-sha256: scan the entire prefix for .whl files that
 #     are missing x-amz-meta-checksum-sha256 metadata and compute/set it.
 #     Example: python s3_management/manage_v2.py channel --recompute-missing-sha256
@@ -58,6 +63,9 @@
 #   python s3_management/manage_v2.py whl/test --set-checksum \
 #       --package-name torch --package-version 2.5.0+cu121
 #
+#   # Backfill missing PEP 658 .metadata files for a channel:
+#   python s3_management/manage_v2.py whl/nightly --backfill-pep658
+#
 #   # Recompute missing SHA256 checksums for a channel:
 #   python s3_management/manage_v2.py whl/nightly --recompute-missing-sha256
 #
@@ -85,6 +93,10 @@ import boto3  # type: ignore[import]
 import botocore  # type: ignore[import]
 from packaging.version import InvalidVersion, parse as _parse_version, Version
 
+# Also packaged into the whl_metadata_upload_pep658 lambda, which extracts PEP
+# 658 metadata for newly uploaded wheels.
+from wheel_metadata import fetch_wheel_metadata
+
 
 # S3 client for reading
 S3 = boto3.resource("s3")
@@ -1403,6 +1415,24 @@ class S3Index:
             if obj.key.endswith(".whl") and obj.checksum is None
         ]
 
+    def collect_missing_pep658(self) -> List[str]:
+        """Return orig_keys of .whl objects without a <wheel>.metadata sibling.
+
+        The siblings are found by listing the prefix, so this works on a plain
+        from_S3(with_metadata=False) index without a HEAD request per wheel.
+        """
+        metadata_keys = {
+            obj.key
+            for obj in BUCKET.objects.filter(Prefix=self.prefix)
+            if obj.key.endswith(".metadata")
+        }
+        return [
+            obj.orig_key
+            for obj in self.objects
+            if obj.key.endswith(".whl")
+            and f"{obj.orig_key}.metadata" not in metadata_keys
+        ]
+
     def compute_sha256(self) -> None:
         for obj in self.objects:
             if obj.checksum is not None:
@@ -1702,6 +1732,61 @@ def _compute_and_set_checksums(matching_objects: List[str]) -> None:
     )
 
 
+def backfill_pep658_metadata(keys: List[str], dry_run: bool = False) -> None:
+    """Extract and upload <wheel>.metadata (PEP 658) for each wheel key.
+
+    Only the zip directory and METADATA entry of each wheel are read, so the
+    backfill runs in parallel without downloading whole wheels.
+
+    Args:
+        keys: List of .whl object keys missing a .metadata sibling
+        dry_run: Extract the metadata but do not upload it
+    """
+
+    def _backfill(key: str) -> bool:
+        metadata = fetch_wheel_metadata(CLIENT, BUCKET.name, key)
+        if metadata is None:
+            print(f"WARNING: {key} has no .dist-info/METADATA")
+            return False
+        if dry_run:
+            print(f"INFO: Would upload {key}.metadata ({len(metadata)} bytes)")
+        else:
+            CLIENT.put_object(
+                Bucket=BUCKET.name,
+                Key=f"{key}.metadata",
+                Body=metadata,
+                ChecksumAlgorithm="SHA256",
+                ACL="public-read",
+            )
+            print(f"SUCCESS: Uploaded {key}.metadata")
+        return True
+
+    uploaded = 0
+    failed: List[str] = []
+    max_workers = min(20, len(keys)) if keys else 1
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_backfill, key): key for key in keys}
+        for future in concurrent.futures.as_completed(futures):
+            key = futures[future]
+            try:
+                if future.result():
+                    uploaded += 1
+                else:
+                    failed.append(key)
+            except Exception as e:
+                print(f"ERROR: Failed to backfill {key}: {e}")
+                failed.append(key)
+
+    print(
+        f"\nINFO: Summary - {'Extracted' if dry_run else 'Uploaded'}: {uploaded}, "
+        f"Failed: {len(failed)}"
+    )
+    if failed:
+        raise RuntimeError(
+            f"Failed to backfill PEP 658 metadata for {len(failed)} wheel(s)"
+        )
+
+
 def set_checksum_metadata(prefix: str, package_name: str, version: str) -> None:
     """Compute and set x-amz-meta-checksum-sha256 metadata for all objects matching package-version.
 
@@ -1971,6 +2056,12 @@ def create_parser() -> argparse.ArgumentParser:
         "prefix are scanned (nightly/test excluded). Combine with --package-name / "
         "--package-version to scope to a single release. Existing checksums are skipped.",
     )
+    parser.add_argument(
+        "--backfill-pep658",
+        action="store_true",
+        help="Scan the prefix for .whl files missing a PEP 658 <wheel>.metadata file "
+        "and extract/upload it using ranged reads. Honours --do-not-upload.",
+    )
     parser.add_argument(
         "--recompute-missing-sha256",
         action="store_true",
@@ -2007,6 +2098,25 @@ def main() -> None:
         )
         return
 
+    # Handle --backfill-pep658 command
+    if args.backfill_pep658:
+        prefixes = PREFIXES if args.prefix == "all" else [args.prefix]
+        missing_keys = []
+        for prefix in prefixes:
+            if not prefix.startswith("whl"):
+                continue
+            print(f"INFO: Scanning '{prefix}' for .whl files missing .metadata...")
+            idx = S3Index.from_S3(prefix=prefix, with_metadata=False)
+            missing_keys.extend(idx.collect_missing_pep658())
+        if not missing_keys:
+            print("INFO: All .whl files already have PEP 658 .metadata")
+            return
+        print(f"INFO: Found {len(missing_keys)} .whl file(s) missing .metadata")
+        backfill_pep658_metadata(
+            list(dict.fromkeys(missing_keys)), dry_run=args.do_not_upload
+        )
+        return
+
     # Handle --recompute-missing-sha256 command
     if args.recompute_missing_sha256:
         print(
@@ -0,0 +1,295 @@
+"""Extract a wheel's .dist-info/METADATA from S3 without downloading the wheel.
+
+A wheel is a zip archive, so the METADATA file can be located from the end of
+central directory (EOCD) record at the tail of the file. This reads, with ranged
+GETs:
+
+  1. the tail of the object (EOCD, and the zip64 locator/record if present),
+  2. the central directory,
+  3. the local file header and compressed bytes of the METADATA entry,
+
+skipping any range already covered by the tail, and inflates the entry in memory. For multi-GB wheels that is a few hundred KB
+of transfer instead of the whole object.
+
+Archives the ranged reader cannot make sense of fall back to downloading the
+whole wheel and reading it with zipfile, so behaviour never regresses compared
+to the full-download extractor.
+
+Used by manage_v2.py --backfill-pep658 and, packaged into its zip, by the
+whl_metadata_upload_pep658 lambda.
+"""
+
+import re
+import struct
+import tempfile
+import zipfile
+import zlib
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+
+# Enough for the EOCD, a maximum-length (64 KiB) comment and the zip64 locator and
+# record in front of it, so the tail is always fetched in a single request.
+TAIL_SIZE = 22 + 0xFFFF + 20 + 56
+# Extra bytes fetched after the compressed data estimate when reading the local
+# header: its name/extra fields can differ in length from the central directory.
+LOCAL_HEADER_SLACK = 1024
+
+_EOCD = struct.Struct("<4sHHHHIIH")
+_EOCD_SIG = b"PK\x05\x06"
+_ZIP64_LOCATOR = struct.Struct("<4sIQI")
+_ZIP64_LOCATOR_SIG = b"PK\x06\x07"
+_ZIP64_EOCD = struct.Struct("<4sQHHIIQQQQ")
+_ZIP64_EOCD_SIG = b"PK\x06\x06"
+_CDIR = struct.Struct("<4sHHHHHHIIIHHHHHII")
+_CDIR_SIG = b"PK\x01\x02"
+_LOCAL = struct.Struct("<4sHHHHHIIIHH")
+_LOCAL_SIG = b"PK\x03\x04"
+_ZIP64_EXTRA_ID = 0x0001
+
+# A top-level "<name>-<version>.dist-info/METADATA"; vendored dist-info
+# directories deeper in the tree are only used if there is no top-level one.
+_TOP_LEVEL_METADATA = re.compile(r"^[^/]+\.dist-info/METADATA$")
+
+
+class MalformedWheel(Exception):
+    """The archive could not be read with ranged requests."""
+
+
+class _Entry(NamedTuple):
+    name: str
+    flags: int
+    method: int
+    crc: int
+    compressed_size: int
+    size: int
+    local_offset: int
+
+
+class S3RangeReader:
+    """Reads byte ranges of a single S3 object."""
+
+    def __init__(self, client: Any, bucket: str, key: str) -> None:
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.requests = 0
+        self.bytes_read = 0
+
+    def _get(self, range_header: str) -> Tuple[bytes, str]:
+        response = self.client.get_object(
+            Bucket=self.bucket, Key=self.key, Range=range_header
+        )
+        data = response["Body"].read()
+        self.requests += 1
+        self.bytes_read += len(data)
+        return data, response.get("ContentRange", "")
+
+    def tail(self, length: int) -> Tuple[bytes, int]:
+        """Returns the last length bytes and the total object size."""
+        data, content_range = self._get(f"bytes=-{length}")
+        # "bytes <start>-<end>/<total>"; a suffix range longer than the object
+        # returns the whole object.
+        total = content_range.rpartition("/")[2]
+        return data, int(total) if total.isdigit() else len(data)
+
+    def read(self, start: int, length: int) -> bytes:
+        if length <= 0:
+            return b""
+        data, _ = self._get(f"bytes={start}-{start + length - 1}")
+        return data
+
+
+def _find_eocd(tail: bytes, tail_start: int, size: int) -> Tuple[int, int, int]:
+    """Returns (entries, cd_size, cd_offset), following zip64 records if needed."""
+    # The record is followed only by its comment; anything else (trailing data,
+    # a signature inside the comment) is left to the zipfile fallback.
+    pos = tail.rfind(_EOCD_SIG)
+    while pos >= 0:
+        if pos + _EOCD.size <= len(tail):
+            fields = _EOCD.unpack_from(tail, pos)
+            if pos + _EOCD.size + fields[7] == len(tail):
+                break
+        pos = tail.rfind(_EOCD_SIG, 0, pos)
+    if pos < 0:
+        raise MalformedWheel("end of central directory record not found")
+
+    _, disk, cd_disk, _, entries, cd_size, cd_offset, _ = fields
+    if disk != 0 or cd_disk != 0:
+        raise MalformedWheel("multi-disk archives are not supported")
+    if entries != 0xFFFF and cd_size != 0xFFFFFFFF and cd_offset != 0xFFFFFFFF:
+        return entries, cd_size, cd_offset
+
+    locator_pos = pos - _ZIP64_LOCATOR.size
+    if locator_pos < 0:
+        raise MalformedWheel("zip64 locator not found")
+    sig, _, eocd64_offset, _ = _ZIP64_LOCATOR.unpack_from(tail, locator_pos)
+    if sig != _ZIP64_LOCATOR_SIG:
+        raise MalformedWheel("zip64 locator not found")
+    rel = eocd64_offset - tail_start
+    if rel < 0 or rel + _ZIP64_EOCD.size > len(tail):
+        raise MalformedWheel("zip64 end of central directory outside of tail")
+    fields64 = _ZIP64_EOCD.unpack_from(tail, rel)
+    if fields64[0] != _ZIP64_EOCD_SIG:
+        raise MalformedWheel("bad zip64 end of central directory signature")
+    entries, cd_size, cd_offset = fields64[7], fields64[8], fields64[9]
+    if cd_offset + cd_size > size:
+        raise MalformedWheel("central directory extends past end of file")
+    return entries, cd_size, cd_offset
+
+
+def _zip64_extra(
+    extra: bytes, size: int, compressed_size: int, local_offset: int
+) -> Tuple[int, int, int]:
+    pos = 0
+    while pos + 4 <= len(extra):
+        header_id, data_len = struct.unpack_from("<HH", extra, pos)
+        pos += 4
+        if header_id == _ZIP64_EXTRA_ID:
+            # Only the fields saturated in the fixed header are present, in order.
+            values = iter(struct.unpack_from(f"<{data_len // 8}Q", extra, pos))
+            if size == 0xFFFFFFFF:
+                size = next(values)
+            if compressed_size == 0xFFFFFFFF:
+                compressed_size = next(values)
+            if local_offset == 0xFFFFFFFF:
+                local_offset = next(values)
+            break
+        pos += data_len
+    return size, compressed_size, local_offset
+
+
+def _parse_central_directory(cdir: bytes, entries: int) -> List[_Entry]:
+    out: List[_Entry] = []
+    pos = 0
+    for _ in range(entries):
+        if pos + _CDIR.size > len(cdir):
+            raise MalformedWheel("truncated central directory")
+        fields = _CDIR.unpack_from(cdir, pos)
+        if fields[0] != _CDIR_SIG:
+            raise MalformedWheel("bad central directory entry signature")
+        flags, method = fields[3], fields[4]
+        crc, compressed_size, size = fields[7], fields[8], fields[9]
+        name_len, extra_len, comment_len = fields[10], fields[11], fields[12]
+        local_offset = fields[16]
+        name_end = pos + _CDIR.size + name_len
+        extra_end = name_end + extra_len
+        raw_name = cdir[pos + _CDIR.size : name_end]
+        # Bit 11: the name is UTF-8, otherwise cp437 (as zipfile decodes it).
+        name = raw_name.decode("utf-8" if flags & 0x800 else "cp437")
+        size, compressed_size, local_offset = _zip64_extra(
+            cdir[name_end:extra_end], size, compressed_size, local_offset
+        )
+        out.append(
+            _Entry(name, flags, method, crc, compressed_size, size, local_offset)
+        )
+        pos = extra_end + comment_len
+    return out
+
+
+def _pick_metadata(entries: List[_Entry]) -> Optional[_Entry]:
+    candidates = [e for e in entries if e.name.endswith(".dist-info/METADATA")]
+    for entry in candidates:
+        if _TOP_LEVEL_METADATA.match(entry.name):
+            return entry
+    return candidates[0] if candidates else None
+
+
+def _read(reader: Any, tail: bytes, tail_start: int, start: int, length: int) -> bytes:
+    # Serve ranges that fall inside the already fetched tail without a request;
+    # wheels put .dist-info last, so METADATA usually lives there.
+    if start >= tail_start:
+        return tail[start - tail_start : start - tail_start + length]
+    return reader.read(start, length)
+
+
+def _read_entry(reader: Any, tail: bytes, tail_start: int, entry: _Entry) -> bytes:
+    if entry.flags & 0x1:
+        raise MalformedWheel(f"{entry.name} is encrypted")
+    guess = _LOCAL.size + len(entry.name.encode()) + LOCAL_HEADER_SLACK
+    blob = _read(
+        reader, tail, tail_start, entry.local_offset, guess + entry.compressed_size
+    )
+    if len(blob) < _LOCAL.size:
+        raise MalformedWheel("truncated local file header")
+    fields = _LOCAL.unpack_from(blob, 0)
+    if fields[0] != _LOCAL_SIG:
+        raise MalformedWheel("bad local file header signature")
+    data_start = _LOCAL.size + fields[9] + fields[10]
+    data_end = data_start + entry.compressed_size
+    if data_end > len(blob):
+        blob += _read(
+            reader,
+            tail,
+            tail_start,
+            entry.local_offset + len(blob),
+            data_end - len(blob),
+        )
+    data = blob[data_start:data_end]
+    if len(data) != entry.compressed_size:
+        raise MalformedWheel(f"truncated data for {entry.name}")
+
+    if entry.method == zipfile.ZIP_STORED:
+        contents = data
+    elif entry.method == zipfile.ZIP_DEFLATED:
+        try:
+            contents = zlib.decompress(data, -zlib.MAX_WBITS)
+        except zlib.error as exc:
+            raise MalformedWheel(f"cannot inflate {entry.name}: {exc}") from exc
+    else:
+        raise MalformedWheel(f"unsupported compression method {entry.method}")
+    if len(contents) != entry.size or zlib.crc32(contents) != entry.crc:
+        raise MalformedWheel(f"size or CRC mismatch for {entry.name}")
+    return contents
+
+
+def extract_metadata(reader: Any) -> Optional[bytes]:
+    """Returns the METADATA of the wheel behind reader, or None if it has none.
+
+    reader provides tail(length) -> (bytes, total_size) and
+    read(start, length) -> bytes. Raises MalformedWheel if the archive cannot be
+    read this way.
+    """
+    try:
+        tail, size = reader.tail(TAIL_SIZE)
+        tail_start = size - len(tail)
+        entries, cd_size, cd_offset = _find_eocd(tail, tail_start, size)
+        cdir = _read(reader, tail, tail_start, cd_offset, cd_size)
+        entry = _pick_metadata(_parse_central_directory(cdir, entries))
+        if entry is None:
+            return None
+        return _read_entry(reader, tail, tail_start, entry)
+    except (struct.error, UnicodeDecodeError, StopIteration) as exc:
+        raise MalformedWheel(f"{type(exc).__name__}: {exc}") from exc
+
+
+def _download_metadata(client: Any, bucket: str, key: str) -> Optional[bytes]:
+    with tempfile.TemporaryFile() as f:
+        client.download_fileobj(bucket, key, f)
+        f.seek(0)
+        with zipfile.ZipFile(f) as zf:
+            entries = [
+                _Entry(i.filename, 0, 0, 0, 0, 0, 0)
+                for i in zf.infolist()
+                if not i.is_dir()
+            ]
+            entry = _pick_metadata(entries)
+            return zf.read(entry.name) if entry is not None else None
+
+
+def fetch_wheel_metadata(client: Any, bucket: str, key: str) -> Optional[bytes]:
+    """Returns the METADATA of an S3 wheel, or None if the wheel has none.
+
+    Uses ranged reads, falling back to downloading the whole wheel when the
+    archive is malformed.
+    """
+    reader = S3RangeReader(client, bucket, key)
+    try:
+        metadata = extract_metadata(reader)
+    except MalformedWheel as exc:
+        print(f"Ranged read of {bucket}/{key} failed ({exc}), downloading it")
+        return _download_metadata(client, bucket, key)
+    print(
+        f"Read {bucket}/{key} METADATA with {reader.requests} ranged requests "
+        f"({reader.bytes_read} bytes)"
+    )
+    return metadata
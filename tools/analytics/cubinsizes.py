@@ -1,11 +1,17 @@
 #!/usr/bin/env python3
 # Tool for analyzing sizes of CUDA kernels for various GPU architectures
+import argparse
+import mmap
 import os
+import re
+import shutil
 import struct
 import subprocess
 import sys
-from tempfile import TemporaryDirectory
-from typing import Dict
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from tempfile import NamedTemporaryFile, TemporaryDirectory
+from typing import Callable, Dict, IO, List, Optional, Tuple
 
 
 # Try to auto-import elftools
@@ -34,48 +40,174 @@ def sizeof_fmt(num, suffix="B"):
     return "%.1f%s%s" % (num, "Yi", suffix)
 
 
-def compute_cubin_sizes(file_name, section_name=".nv_fatbin", debug=False):
-    with open(file_name, "rb") as f:
-        elf_file = ELFFile(f)
-        nv_fatbin = elf_file.get_section_by_name(section_name)
-        if nv_fatbin is None:
-            return {}
-        data = nv_fatbin.data()
-        idx, offs = 0, 0
-        elf_sizes = {}
-        while offs < len(data):
-            (magic, version, header_size, fatbin_size) = struct.unpack(
-                "IHHL", data[offs : offs + 16]
+SECTION_NAMES = [".nv_fatbin", "__nv_relfatbin"]
+# Shared libraries inside a wheel, including versioned ones like libcudnn.so.9
+SHARED_LIBRARY_RE = re.compile(r"\.so(\.[0-9]+)*$")
+SHF_COMPRESSED = 0x800
+
+# Explicit little-endian layouts of the fatbin and cubin headers
+FATBIN_HEADER = struct.Struct("<IHHQ")
+CUBIN_HEADER = struct.Struct("<HHIQQIH")
+# ELF64 file and section headers, enough to locate sections without pyelftools
+ELF64_HEADER = struct.Struct("<16sHHIQQQIHHHHHH")
+ELF64_SECTION_HEADER = struct.Struct("<IIQQQQIIQQ")
+
+# section name -> sm_XX/ptx_XX -> size
+SectionSizes = Dict[str, Dict[str, int]]
+
+
+def walk_fatbins(
+    read: Callable[[int, int], bytes], size: int, debug: bool = False
+) -> Dict[str, int]:
+    """
+    Sums the cubin sizes per arch of a section, given a read(offset, size)
+    function. Only the headers are read and offsets only ever grow, so the
+    section can be a stream that is cheap to seek forward.
+    """
+    idx, offs = 0, 0
+    elf_sizes: Dict[str, int] = {}
+    while offs < size:
+        (magic, version, header_size, fatbin_size) = FATBIN_HEADER.unpack(
+            read(offs, FATBIN_HEADER.size)
+        )
+        if magic != 0xBA55ED50 or version != 1:
+            raise RuntimeError(
+                f"Unexpected fatbin magic {hex(magic)} or version {version}"
             )
-            if magic != 0xBA55ED50 or version != 1:
+        if debug:
+            print(
+                f"Found fatbin at {offs}  header_size={header_size} fatbin_size={fatbin_size}"
+            )
+        offs += header_size
+        fatbin_end = offs + fatbin_size
+        while offs < fatbin_end:
+            (kind, version, hdr_size, elf_size, empty, code_ver, sm_ver) = (
+                CUBIN_HEADER.unpack(read(offs, CUBIN_HEADER.size))
+            )
+            if version != 0x0101 or kind not in [1, 2]:
                 raise RuntimeError(
-                    f"Unexpected fatbin magic {hex(magic)} or version {version}"
+                    f"Unexpected cubin version {hex(version)} or kind {kind}"
                 )
+            sm_ver = f"{'ptx' if kind == 1 else 'sm'}_{sm_ver}"
             if debug:
                 print(
-                    f"Found fatbin at {offs}  header_size={header_size} fatbin_size={fatbin_size}"
+                    f"    {idx}: elf_size={elf_size} code_ver={hex(code_ver)} sm={sm_ver}"
                 )
-            offs += header_size
-            fatbin_end = offs + fatbin_size
-            while offs < fatbin_end:
-                (kind, version, hdr_size, elf_size, empty, code_ver, sm_ver) = (
-                    struct.unpack("HHILLIH", data[offs : offs + 30])
-                )
-                if version != 0x0101 or kind not in [1, 2]:
-                    raise RuntimeError(
-                        f"Unexpected cubin version {hex(version)} or kind {kind}"
-                    )
-                sm_ver = f"{'ptx' if kind == 1 else 'sm'}_{sm_ver}"
-                if debug:
-                    print(
-                        f"    {idx}: elf_size={elf_size} code_ver={hex(code_ver)} sm={sm_ver}"
-                    )
-                if sm_ver not in elf_sizes:
-                    elf_sizes[sm_ver] = 0
-                elf_sizes[sm_ver] += elf_size
-                idx, offs = idx + 1, offs + hdr_size + elf_size
-            offs = fatbin_end
-        return elf_sizes
+            elf_sizes[sm_ver] = elf_sizes.get(sm_ver, 0) + elf_size
+            idx, offs = idx + 1, offs + hdr_size + elf_size
+        offs = fatbin_end
+    return elf_sizes
+
+
+def fatbin_sizes(data: memoryview, debug: bool = False) -> Dict[str, int]:
+    """Walks the fatbin headers of an in-memory section."""
+    return walk_fatbins(lambda offs, n: data[offs : offs + n], len(data), debug)
+
+
+def compute_cubin_sizes(file_name, section_name=".nv_fatbin", debug=False):
+    return compute_all_cubin_sizes(file_name, [section_name], debug)[section_name]
+
+
+def compute_all_cubin_sizes(
+    file_name: str, section_names: List[str] = SECTION_NAMES, debug: bool = False
+) -> SectionSizes:
+    """
+    Cubin sizes of every section of an ELF file. The file is memory-mapped and
+    the headers are read in place, so the (often GBs large) sections are never
+    copied into memory.
+    """
+    results: SectionSizes = {name: {} for name in section_names}
+    with open(file_name, "rb") as f:
+        elf_file = ELFFile(f)
+        sections = {}
+        for section_name in section_names:
+            section = elf_file.get_section_by_name(section_name)
+            if section is not None:
+                sections[section_name] = section
+        if not sections:
+            return results
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                for section_name, section in sections.items():
+                    if section["sh_flags"] & SHF_COMPRESSED:
+                        data = memoryview(section.data())
+                    else:
+                        start = section["sh_offset"]
+                        data = view[start : start + section["sh_size"]]
+                    try:
+                        results[section_name] = fatbin_sizes(data, debug)
+                    finally:
+                        data.release()
+            finally:
+                view.release()
+    return results
+
+
+def analyze_file(path: str, name: str) -> Tuple[str, SectionSizes]:
+    return name, compute_all_cubin_sizes(path)
+
+
+def read_elf_sections(f: IO[bytes]) -> Optional[Dict[str, Tuple[int, int, int]]]:
+    """
+    Section name -> (sh_flags, sh_offset, sh_size) of a little-endian ELF64
+    stream, or None for any other kind of file.
+    """
+    header = f.read(ELF64_HEADER.size)
+    if len(header) < ELF64_HEADER.size or header[:6] != b"\x7fELF\x02\x01":
+        return None
+    (*_, e_shoff, _, _, _, _, e_shentsize, e_shnum, e_shstrndx) = ELF64_HEADER.unpack(
+        header
+    )
+    if e_shnum == 0 or e_shstrndx >= e_shnum:
+        return None
+    f.seek(e_shoff)
+    table = f.read(e_shnum * e_shentsize)
+    headers = [
+        ELF64_SECTION_HEADER.unpack_from(table, i * e_shentsize) for i in range(e_shnum)
+    ]
+    strtab = headers[e_shstrndx]
+    f.seek(strtab[4])
+    names = f.read(strtab[5])
+    sections = {}
+    for sh_name, _, sh_flags, _, sh_offset, sh_size, *_ in headers:
+        name = names[sh_name : names.index(b"\0", sh_name)].decode()
+        sections[name] = (sh_flags, sh_offset, sh_size)
+    return sections
+
+
+def analyze_wheel_member(archive: str, member: str) -> Tuple[str, SectionSizes]:
+    """
+    Cubin sizes of a single library of a wheel, read from the (decompressing)
+    zip member stream without extracting it. Seeking backwards restarts the
+    decompression, so the member is inflated up to three times: to reach the
+    section table, the section names and then the fatbins in file order.
+    Libraries with compressed sections, or that aren't little-endian ELF64,
+    are still extracted to a temporary file and parsed with pyelftools.
+    """
+    results: SectionSizes = {name: {} for name in SECTION_NAMES}
+    with zipfile.ZipFile(archive) as zf, zf.open(member) as f:
+        sections = read_elf_sections(f)
+        if sections is not None:
+            found = sorted(
+                (sections[name][1], name) for name in SECTION_NAMES if name in sections
+            )
+            if not any(sections[name][0] & SHF_COMPRESSED for _, name in found):
+                for start, name in found:
+
+                    def read(offs: int, n: int, start: int = start) -> bytes:
+                        f.seek(start + offs)
+                        return f.read(n)
+
+                    results[name] = walk_fatbins(read, sections[name][2])
+                return member, results
+
+    with zipfile.ZipFile(archive) as zf, NamedTemporaryFile(suffix=".so") as tmp:
+        with zf.open(member) as src:
+            shutil.copyfileobj(src, tmp, 1 << 20)
+        tmp.flush()
+        return analyze_file(tmp.name, member)
 
 
 class ArFileCtx:
@@ -86,7 +218,7 @@ class ArFileCtx:
     def __enter__(self) -> str:
         self._pwd = os.getcwd()
         rc = self._tmpdir.__enter__()
-        subprocess.check_call(["ar", "x", self.ar_name])
+        subprocess.check_call(["ar", "x", self.ar_name], cwd=rc)
         return rc
 
     def __exit__(self, ex, value, tb) -> None:
@@ -100,44 +232,154 @@ def dict_add(rc: Dict[str, int], b: Dict[str, int]) -> Dict[str, int]:
     return rc
 
 
+def analyze(fname: str, jobs: int) -> Dict[str, SectionSizes]:
+    """
+    Cubin sizes per library of a shared library, an .a archive, or a wheel (or
+    any zip), with the libraries analyzed in parallel processes
+    """
+    if fname.endswith(".a"):
+        with ArFileCtx(fname) as tmpdir:
+            objects = sorted(f for f in os.listdir(tmpdir) if f.endswith(".o"))
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                results = executor.map(
+                    analyze_file,
+                    [os.path.join(tmpdir, f) for f in objects],
+                    objects,
+                )
+                return dict(results)
+
+    if zipfile.is_zipfile(fname):
+        with zipfile.ZipFile(fname) as zf:
+            # Largest first, so that the biggest library doesn't start last
+            members = [
+                info.filename
+                for info in sorted(zf.infolist(), key=lambda i: -i.file_size)
+                if SHARED_LIBRARY_RE.search(info.filename)
+            ]
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = executor.map(
+                analyze_wheel_member, [fname] * len(members), members
+            )
+            return dict(sorted(results))
+
+    return dict([analyze_file(fname, os.path.basename(fname))])
+
+
+def section_totals(libraries: Dict[str, SectionSizes]) -> SectionSizes:
+    totals: SectionSizes = {name: {} for name in SECTION_NAMES}
+    for sections in libraries.values():
+        for section_name, elf_sizes in sections.items():
+            dict_add(totals[section_name], elf_sizes)
+    return totals
+
+
+def print_sizes(sections: SectionSizes, indent: str = "") -> None:
+    for section_name, elf_sizes in sections.items():
+        print(f"{indent}{section_name} size {sizeof_fmt(sum(elf_sizes.values()))}")
+        for sm_ver, total_size in elf_sizes.items():
+            print(f"{indent}  {sm_ver}: {sizeof_fmt(total_size)}")
+
+
+def print_report(libraries: Dict[str, SectionSizes]) -> None:
+    if len(libraries) > 1:
+        for name, sections in libraries.items():
+            if any(sections.values()):
+                print(name)
+                print_sizes(sections, indent="  ")
+        print("Total")
+    print_sizes(section_totals(libraries))
+
+
+def sizeof_delta(old: int, new: int) -> str:
+    sign = "+" if new >= old else "-"
+    return (
+        f"{sizeof_fmt(old)} -> {sizeof_fmt(new)} ({sign}{sizeof_fmt(abs(new - old))})"
+    )
+
+
+def print_diff(old: Dict[str, SectionSizes], new: Dict[str, SectionSizes]) -> None:
+    """Per library and per arch size changes between two analyzed files."""
+
+    def diff_sections(
+        old_sections: SectionSizes, new_sections: SectionSizes, indent: str
+    ) -> None:
+        for section_name in SECTION_NAMES:
+            old_sizes = old_sections.get(section_name, {})
+            new_sizes = new_sections.get(section_name, {})
+            old_total, new_total = sum(old_sizes.values()), sum(new_sizes.values())
+            if old_sizes == new_sizes:
+                continue
+            print(f"{indent}{section_name} {sizeof_delta(old_total, new_total)}")
+            for sm_ver in sorted(old_sizes.keys() | new_sizes.keys()):
+                old_size, new_size = old_sizes.get(sm_ver, 0), new_sizes.get(sm_ver, 0)
+                if old_size != new_size:
+                    print(f"{indent}  {sm_ver}: {sizeof_delta(old_size, new_size)}")
+
+    for name in sorted(old.keys() | new.keys()):
+        old_sections, new_sections = old.get(name, {}), new.get(name, {})
+        if old_sections == new_sections:
+            continue
+        status = (
+            " (removed)" if name not in new else " (added)" if name not in old else ""
+        )
+        print(f"{name}{status}")
+        diff_sections(old_sections, new_sections, "  ")
+    print("Total")
+    diff_sections(section_totals(old), section_totals(new), "  ")
+
+
 def main():
     if sys.platform != "linux":
         print("This script only works with Linux ELF files")
         return
-    if len(sys.argv) < 2:
+    parser = argparse.ArgumentParser(
+        description="Sizes of the CUDA kernels per GPU architecture in a shared "
+        "library, an .a archive or all the libraries of a wheel"
+    )
+    parser.add_argument(
+        "files",
+        nargs="*",
+        help="file to analyze, defaults to the installed libtorch_cuda.so",
+    )
+    parser.add_argument(
+        "--diff",
+        action="store_true",
+        help="compare two files (e.g. two wheels): OLD NEW",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="number of processes analyzing libraries",
+    )
+    args = parser.parse_args()
+
+    if not args.files:
         print(
             f"{sys.argv[0]} invoked without any arguments trying to infer location of libtorch_cuda"
         )
         import torch
 
-        fname = os.path.join(os.path.dirname(torch.__file__), "lib", "libtorch_cuda.so")
-    else:
-        fname = sys.argv[1]
+        args.files = [
+            os.path.join(os.path.dirname(torch.__file__), "lib", "libtorch_cuda.so")
+        ]
+    if len(args.files) != (2 if args.diff else 1):
+        parser.error("expected OLD NEW with --diff, a single file otherwise")
 
-    if not os.path.exists(fname):
-        print(f"Can't find {fname}")
-        sys.exit(-1)
+    for fname in args.files:
+        if not os.path.exists(fname):
+            print(f"Can't find {fname}")
+            sys.exit(-1)
 
-    section_names = [".nv_fatbin", "__nv_relfatbin"]
-    results = {name: {} for name in section_names}
-    print(f"Analyzing {fname}")
-    if os.path.splitext(fname)[1] == ".a":
-        with ArFileCtx(fname):
-            for fname in os.listdir("."):
-                if not fname.endswith(".o"):
-                    continue
-                for section_name in section_names:
-                    elf_sizes = compute_cubin_sizes(fname, section_name)
-                    dict_add(results[section_name], elf_sizes)
-    else:
-        for section_name in [".nv_fatbin", "__nv_relfatbin"]:
-            dict_add(results[section_name], compute_cubin_sizes(fname, section_name))
+    results = []
+    for fname in args.files:
+        print(f"Analyzing {fname}")
+        results.append(analyze(fname, args.jobs))
 
-    for section_name in section_names:
-        elf_sizes = results[section_name]
-        print(f"{section_name} size {sizeof_fmt(sum(elf_sizes.values()))}")
-        for sm_ver, total_size in elf_sizes.items():
-            print(f"  {sm_ver}: {sizeof_fmt(total_size)}")
+    if args.diff:
+        print_diff(*results)
+    else:
+        print_report(results[0])
 
 
 if __name__ == "__main__":
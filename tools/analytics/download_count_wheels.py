@@ -1,11 +1,15 @@
 # mypy: disable-error-code="var-annotated"
 
+import argparse
 import gzip
 import os
 import re
-import urllib
-from collections import defaultdict
+import sys
+import urllib.parse
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional
 
 import boto3
 from tqdm import tqdm  # type: ignore[import-untyped]
@@ -15,94 +19,131 @@ S3 = boto3.resource("s3")
 CLIENT = boto3.client("s3")
 BUCKET = S3.Bucket("pytorch")
 
+LOG_PREFIX = "cflogs"
+
+
+class WheelKey(NamedTuple):
+    package_name: str
+    package_version: Optional[str]
+    os_type: str
+    target_arch: str
+
+
+def get_os_type(download_uri: str) -> str:
+    os_type = "linux"
+    if "win" in download_uri:
+        os_type = "windows"
+    elif "macosx" in download_uri:
+        os_type = "macos"
+    return os_type
+
+
+def get_target_arch(download_uri: str) -> str:
+    target_arch = "cpu"
+    result = re.search(r"cu[0-9]+", download_uri)
+    if result:
+        target_arch = result[0]
+    return target_arch
+
+
+def get_package_name(download_uri: str) -> str:
+    filename_contents = os.path.basename(download_uri).split("-")
+    return filename_contents[0]
+
+
+def get_package_version(download_uri: str) -> Optional[str]:
+    if "dev" in download_uri:
+        results = re.search(r"[0-9]+\.[0-9]+\.[0-9]+\.dev[0-9]+", download_uri)
+    else:
+        results = re.search(r"[0-9]+\.[0-9]+\.[0-9]+", download_uri)
+    return results[0] if results else None
+
+
+def classify(download_uri: str) -> WheelKey:
+    # Interned, so the many URIs that map to the same key share its strings
+    version = get_package_version(download_uri)
+    return WheelKey(
+        sys.intern(get_package_name(download_uri)),
+        sys.intern(version) if version else None,
+        sys.intern(get_os_type(download_uri)),
+        sys.intern(get_target_arch(download_uri)),
+    )
+
+
+def parse_log(path: str) -> Counter:
+    """
+    Bytes sent per downloaded wheel/zip URI in one gzipped CloudFront log,
+    decompressed and parsed line by line
+    """
+    bytes_sent = Counter()
+    with gzip.open(path, "rt", encoding="utf-8") as gf:
+        for entry in gf:
+            # #Version and #Fields headers
+            if entry.startswith("#"):
+                continue
+            columns = entry.split("\t")
+            status = columns[8]
+            if not status.startswith("2"):
+                continue
+            download_uri = urllib.parse.unquote(urllib.parse.unquote(columns[7]))
+            if not download_uri.endswith((".whl", ".zip")):
+                continue
+            bytes_sent[sys.intern(download_uri)] += int(columns[3])
+    return bytes_sent
+
+
+def parse_logs(paths: List[str], workers: int) -> Counter:
+    """Bytes sent per download URI over all the logs, parsed in parallel."""
+    bytes_sent = Counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for counts in tqdm(
+            executor.map(parse_log, paths, chunksize=16), total=len(paths)
+        ):
+            for download_uri, sent in counts.items():
+                bytes_sent[sys.intern(download_uri)] += sent
+    return bytes_sent
+
+
+def get_object_sizes(download_uris: Iterable[str]) -> Dict[str, int]:
+    """
+    Size of the S3 object behind every download URI, from a single listing of
+    each top-level prefix the URIs live under rather than a request per URI
+    """
+    wanted = {uri.lstrip("/"): uri for uri in download_uris}
+    prefixes = {key.split("/", 1)[0] + "/" if "/" in key else key for key in wanted}
+    sizes = {}
+    paginator = CLIENT.get_paginator("list_objects_v2")
+    for prefix in sorted(prefixes):
+        for page in tqdm(
+            paginator.paginate(Bucket="pytorch", Prefix=prefix), desc=prefix
+        ):
+            for obj in page.get("Contents", []):
+                uri = wanted.get(obj["Key"])
+                if uri is not None:
+                    sizes[uri] = obj["Size"]
+    return sizes
+
+
+def count_downloads(bytes_sent: Counter, sizes: Dict[str, int]) -> Counter:
+    """Downloads per (package, version, os, arch), as bytes sent over size."""
+    downloads = Counter()
+    for download_uri, sent in bytes_sent.items():
+        size = sizes.get(download_uri)
+        if not size:
+            continue
+        downloads[classify(download_uri)] += sent // size
+    return downloads
+
 
-class CacheEntry:
-    _size = None
-
-    def __init__(self, download_uri: str):
-        self.download_uri = download_uri
-        self.bytes_sent = 0
-
-    @property
-    def os_type(self) -> str:
-        os_type = "linux"
-        if "win" in self.download_uri:
-            os_type = "windows"
-        elif "macosx" in self.download_uri:
-            os_type = "macos"
-        return os_type
-
-    @property
-    def target_arch(self) -> str:
-        target_arch = "cpu"
-        result = re.search(r"cu[0-9]+", self.download_uri)
-        if result:
-            target_arch = result[0]
-        return target_arch
-
-    @property
-    def package_name(self) -> str:
-        filename_contents = os.path.basename(self.download_uri).split("-")
-        return filename_contents[0]
-
-    @property
-    def package_version(self) -> str:
-        if "dev" in self.download_uri:
-            results = re.search(r"[0-9]+\.[0-9]+\.[0-9]+\.dev[0-9]+", self.download_uri)
-        else:
-            results = re.search(r"[0-9]+\.[0-9]+\.[0-9]+", self.download_uri)
-        if not results:
-            raise Exception("Wtf there's no version o.O")
-        return results[0]
-
-    @property
-    def size(self) -> int:
-        if self._size is None:
-            for key in BUCKET.objects.filter(Prefix=self.download_uri.lstrip("/")):
-                self._size = key.size
-            if self._size is None:
-                raise Exception(f"No object found for prefix {self.download_uri}")
-        return self._size
-
-    @property
-    def downloads(self):
-        return self.bytes_sent // self.size
-
-
-def parse_logs(log_directory: str) -> dict:
-    bytes_cache = {}
-    for dirpath, _, filenames in os.walk(log_directory):
-        for filename in tqdm(filenames):
-            with gzip.open(os.path.join(dirpath, filename), "r") as gf:
-                string = gf.read().decode("utf-8")
-                entries = []
-                entries += string.splitlines()[2:]
-            for entry in entries:
-                columns = entry.split("\t")
-                bytes_sent = int(columns[3])
-                download_uri = urllib.parse.unquote(urllib.parse.unquote(columns[7]))
-                status = columns[8]
-                if not all(
-                    [status.startswith("2"), download_uri.endswith((".whl", ".zip"))]
-                ):
-                    continue
-                if not bytes_cache.get(download_uri):
-                    bytes_cache[download_uri] = CacheEntry(download_uri)
-                bytes_cache[download_uri].bytes_sent += bytes_sent
-    return bytes_cache
-
-
-def output_results(bytes_cache: dict) -> None:
+def output_results(downloads: Counter) -> None:
     os_results = defaultdict(int)
     arch_results = defaultdict(int)
     package_results = defaultdict(lambda: defaultdict(int))
-    for _, val in tqdm(bytes_cache.items()):
-        try:
-            os_results[val.os_type] += val.downloads
-            arch_results[val.target_arch] += val.downloads
-            package_results[val.package_name][val.package_version] += val.downloads
-        except Exception:
-            pass
+    for key, num in downloads.items():
+        os_results[key.os_type] += num
+        arch_results[key.target_arch] += num
+        if key.package_version is not None:
+            package_results[key.package_name][key.package_version] += num
     print("=-=-= Results =-=-=")
     print("=-=-= OS =-=-=")
     total_os_num = sum(os_results.values())
@@ -124,31 +165,88 @@ def output_results(bytes_cache: dict) -> None:
             )
 
 
-def download_logs(log_directory: str, since: float):
-    dt_now = datetime.now(timezone.utc)
-    dt_end = datetime(dt_now.year, dt_now.month, dt_now.day, tzinfo=timezone.utc)
-    dt_start = dt_end - timedelta(
-        days=1, hours=1
-    )  # Add 1 hour padding to account for potentially missed logs due to timing
-    for key in tqdm(BUCKET.objects.filter(Prefix="cflogs")):
-        remote_fname = key.key
-        local_fname = os.path.join(log_directory, remote_fname)
-        # Only download things from yesterday
+def download_log(remote_fname: str, local_fname: str) -> None:
+    os.makedirs(os.path.dirname(local_fname), exist_ok=True)
+    # Download next to the final name, so an interrupted run doesn't leave a
+    # truncated log behind that would be reused
+    CLIENT.download_file("pytorch", remote_fname, local_fname + ".tmp")
+    os.replace(local_fname + ".tmp", local_fname)
+
+
+def download_logs(
+    log_directory: str, dt_start: datetime, dt_end: datetime, workers: int
+) -> List[str]:
+    """
+    Downloads, concurrently, the logs modified within [dt_start, dt_end) that
+    aren't already in log_directory and returns the local paths of all of them
+    """
+    to_download = []
+    paths = []
+    for key in tqdm(BUCKET.objects.filter(Prefix=LOG_PREFIX)):
         dt_modified = key.last_modified.replace(tzinfo=timezone.utc)
         if dt_start >= dt_modified or dt_end < dt_modified:
             continue
-        # TODO: Do this in parallel
+        local_fname = os.path.join(log_directory, key.key)
+        paths.append(local_fname)
         if not os.path.exists(local_fname):
-            dirname = os.path.dirname(local_fname)
-            if not os.path.exists(dirname):
-                os.makedirs(dirname)
-            CLIENT.download_file("pytorch", remote_fname, local_fname)
+            to_download.append((key.key, local_fname))
+
+    print(f"{len(paths)} logs in range, {len(to_download)} to download")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(download_log, *args) for args in to_download]
+        for future in tqdm(futures):
+            future.result()
+    return paths
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Count wheel downloads from the pytorch bucket CloudFront logs",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "--days", type=int, default=1, help="number of days to count, up to --end"
+    )
+    parser.add_argument(
+        "--end",
+        type=lambda s: datetime.strptime(s, "%Y-%m-%d").replace(tzinfo=timezone.utc),
+        default=None,
+        help="last day to count (YYYY-MM-DD), defaults to yesterday",
+    )
+    parser.add_argument(
+        "--log-directory", default="cache", help="where the logs are downloaded"
+    )
+    parser.add_argument(
+        "--download-workers", type=int, default=32, help="concurrent log downloads"
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=os.cpu_count(),
+        help="processes parsing the logs",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.end is None:
+        dt_now = datetime.now(timezone.utc)
+        dt_end = datetime(dt_now.year, dt_now.month, dt_now.day, tzinfo=timezone.utc)
+    else:
+        dt_end = args.end + timedelta(days=1)
+    # Add 1 hour padding to account for potentially missed logs due to timing
+    dt_start = dt_end - timedelta(days=args.days, hours=1)
+
+    print(f"Downloading logs from {dt_start} to {dt_end}")
+    paths = download_logs(args.log_directory, dt_start, dt_end, args.download_workers)
+    print("Parsing logs")
+    bytes_sent = parse_logs(paths, args.parse_workers)
+    print(f"Listing the sizes of {len(bytes_sent)} objects")
+    sizes = get_object_sizes(bytes_sent)
+    print("Calculating results")
+    output_results(count_downloads(bytes_sent, sizes))
 
 
 if __name__ == "__main__":
-    print("Downloading logs")
-    download_logs("cache", 1)
-    print("Parsing logs")
-    cache = parse_logs("cache/cflogs/")
-    print("Calculating results")
-    output_results(cache)
+    main()
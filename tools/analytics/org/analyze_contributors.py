@@ -65,7 +65,13 @@ from typing import Any, Dict, List, Optional, Set, Tuple
 
 import requests
 import yaml
-from cache_manager import get_cache_stats, make_cached_request
+from cache_manager import (
+    cache_result,
+    DAY,
+    fetch_all_pages,
+    get_cache_stats,
+    make_cached_request,
+)
 from dotenv import load_dotenv
 
 
@@ -136,27 +142,24 @@ COMPANY_DOMAINS = {
 }
 
 BASE_URL = "https://api.github.com"
-COMMIT_LOOKBACK = (
-    datetime.utcnow() - timedelta(days=180)
-).isoformat() + "Z"  # 6 months
+# Whole days, so that reruns on the same day request (and cache) the same URLs
+COMMIT_LOOKBACK = (datetime.utcnow() - timedelta(days=180)).strftime(
+    "%Y-%m-%dT00:00:00Z"
+)  # 6 months
+# 1000 commits
+MAX_COMMIT_PAGES = 10
 
 
 def get_repos(org: str) -> List[str]:
     logging.info(f"[get_repos] Start fetching repositories for org: {org}")
     repos = []
-    page = 1
-    while True:
-        url = f"{BASE_URL}/orgs/{org}/repos?per_page=100&page={page}"
-        logging.debug(f"[get_repos] Requesting URL: {url}")
-        data = make_cached_request(url, HEADERS)
-        if data is None:
-            logging.error(f"[get_repos] Failed to fetch page {page} for org: {org}")
-            break
-        if not data:
-            logging.info(
-                f"[get_repos] No more repositories found on page {page} for org: {org}"
-            )
-            break
+    url = f"{BASE_URL}/orgs/{org}/repos?per_page=100"
+    logging.debug(f"[get_repos] Requesting URL: {url}")
+    pages = fetch_all_pages(url, HEADERS)
+    if pages is None:
+        logging.error(f"[get_repos] Failed to fetch repositories for org: {org}")
+        pages = []
+    for page, data in enumerate(pages, start=1):
         logging.info(
             f"[get_repos] Page {page}: Found {len(data)} repositories for org: {org}"
         )
@@ -168,7 +171,6 @@ def get_repos(org: str) -> List[str]:
         logging.info(
             f"[get_repos] Page {page}: Excluded {len(data) - len(non_archived_repos)} archived repositories"
         )
-        page += 1
     logging.info(
         f"[get_repos] Finished fetching repositories for org: {org}. Total: {len(repos)} (excluding archived)"
     )
@@ -179,30 +181,21 @@ def get_commits(org: str, repo: str) -> List[Dict]:
     """Get commits for a repository from the past 6 months."""
     logging.info(f"[get_commits] Start fetching commits for repo: {repo} in org: {org}")
     all_commits = []
-    page = 1
-
-    while True:
-        url = f"{BASE_URL}/repos/{org}/{repo}/commits?per_page=100&page={page}&since={COMMIT_LOOKBACK}"
-        logging.debug(f"[get_commits] Requesting URL: {url}")
-        data = make_cached_request(url, HEADERS)
-        if data is None:
-            logging.error(f"[get_commits] Failed to fetch page {page} for repo: {repo}")
-            break
-        if not data:
-            logging.info(
-                f"[get_commits] No more commits found for repo: {repo} on page {page}"
-            )
-            break
+
+    url = f"{BASE_URL}/repos/{org}/{repo}/commits?per_page=100&since={COMMIT_LOOKBACK}"
+    logging.debug(f"[get_commits] Requesting URL: {url}")
+    # Limit to reasonable number of commits to avoid API rate limits
+    pages = fetch_all_pages(url, HEADERS, max_pages=MAX_COMMIT_PAGES)
+    if pages is None:
+        logging.error(f"[get_commits] Failed to fetch commits for repo: {repo}")
+        pages = []
+    for page, data in enumerate(pages, start=1):
         logging.info(
             f"[get_commits] Page {page}: Found {len(data)} commits for repo: {repo}"
         )
         all_commits.extend(data)
-        page += 1
-
-        # Limit to reasonable number of commits to avoid API rate limits
-        if len(all_commits) >= 1000:
-            logging.info(f"[get_commits] Limiting to 1000 commits for repo: {repo}")
-            break
+    if len(pages) == MAX_COMMIT_PAGES:
+        logging.info(f"[get_commits] Limiting to 1000 commits for repo: {repo}")
 
     logging.info(
         f"[get_commits] Finished fetching commits for repo: {repo}. Total: {len(all_commits)}"
@@ -317,91 +310,7 @@ def extract_company_from_profile(profile: Dict) -> Optional[str]:
     return company.title()
 
 
-def cache_to_disk(func):
-    """
-    A decorator that caches the result of a function to disk.
-    The cache key is generated from the function name, its arguments, and today's date.
-    Handles complex types like lists and dictionaries properly.
-    """
-    import hashlib
-    import json
-    import os
-    from datetime import date
-    from functools import wraps
-
-    def make_hashable(obj):
-        """Convert a container to a frozen/hashable form for reliable caching."""
-        if isinstance(obj, dict):
-            return tuple(sorted((k, make_hashable(v)) for k, v in obj.items()))
-        elif isinstance(obj, (list, tuple)):
-            return tuple(make_hashable(x) for x in obj)
-        # For sets, convert to sorted tuples
-        elif isinstance(obj, set):
-            return tuple(sorted(make_hashable(x) for x in obj))
-        # Handle string representation for other objects that might not be JSON serializable
-        elif not isinstance(obj, (str, int, float, bool, type(None))):
-            return str(obj)
-        return obj
-
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        # Create cache directory if it doesn't exist
-        cache_dir = "cache"
-        os.makedirs(cache_dir, exist_ok=True)
-
-        # Generate a cache key based on function name and args
-        func_name = func.__name__
-        # Create a function-specific subdirectory for better organization
-        func_cache_dir = os.path.join(cache_dir, func_name)
-        os.makedirs(func_cache_dir, exist_ok=True)
-
-        # Get today's date for cache versioning
-        today = date.today().isoformat()  # Format: YYYY-MM-DD
-
-        # Make args and kwargs hashable before serializing
-        hashable_args = tuple(make_hashable(arg) for arg in args)
-        hashable_kwargs = {k: make_hashable(v) for k, v in kwargs.items()}
-
-        try:
-            # Try to serialize with standard JSON, including today's date
-            arg_representation = {
-                "date": today,
-                "args": hashable_args,
-                "kwargs": sorted(hashable_kwargs.items()),
-            }
-            serialized_args = json.dumps(arg_representation, sort_keys=True)
-        except (TypeError, ValueError):
-            # If serialization fails, use string representation as fallback
-            serialized_args = (
-                today + str(hashable_args) + str(sorted(hashable_kwargs.items()))
-            )
-
-        arg_hash = hashlib.sha256(serialized_args.encode()).hexdigest()
-        key = f"{func_name}_{today}_{arg_hash}"
-
-        # Check if cached result exists
-        filepath = os.path.join(func_cache_dir, f"{today}_{arg_hash}.json")
-        if os.path.exists(filepath):
-            logging.debug(f"Cache hit for function: {func_name} (cached on {today})")
-            with open(filepath, "r") as f:
-                return json.load(f)
-
-        # If not cached, call the function
-        result = func(*args, **kwargs)
-
-        # Cache the result
-        with open(filepath, "w") as f:
-            json.dump(result, f)
-        logging.debug(
-            f"Cached result for function: {func_name}, saved to: {filepath} (date: {today})"
-        )
-
-        return result
-
-    return wrapper
-
-
-@cache_to_disk
+@cache_result(ttl=DAY)
 def analyze_contributors(
     org: str, repos: List[str]
 ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, List[Dict[str, Any]]]]:
@@ -574,7 +483,7 @@ def main():
     # Show cache stats at start
     cache_stats = get_cache_stats()
     logging.info(
-        f"[main] Cache stats: {cache_stats['total_files']} files, {cache_stats['total_size_mb']} MB"
+        f"[main] Cache stats: {cache_stats['total_entries']} entries, {cache_stats['total_size_mb']} MB"
     )
 
     # Get repositories
@@ -680,7 +589,7 @@ def main():
     # Show final cache stats
     final_cache_stats = get_cache_stats()
     logging.info(
-        f"[main] Final cache stats: {final_cache_stats['total_files']} files, {final_cache_stats['total_size_mb']} MB"
+        f"[main] Final cache stats: {final_cache_stats['total_entries']} entries, {final_cache_stats['total_size_mb']} MB"
     )
 
     # Print summary
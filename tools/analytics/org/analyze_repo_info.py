@@ -55,7 +55,7 @@ from pathlib import Path
 from typing import Dict, List, Optional
 
 import requests
-from cache_manager import get_cache_stats, make_cached_request
+from cache_manager import fetch_all_pages, get_cache_stats, make_cached_request
 from dotenv import load_dotenv
 
 
@@ -91,26 +91,19 @@ def get_repos_with_info(org: str) -> List[Dict]:
     """
     logging.info(f"[get_repos_with_info] Start fetching repositories for org: {org}")
     repos = []
-    page = 1
-    while True:
-        url = f"{BASE_URL}/orgs/{org}/repos?per_page=100&page={page}"
-        logging.debug(f"[get_repos_with_info] Requesting URL: {url}")
-        data = make_cached_request(url, HEADERS)
-        if data is None:
-            logging.error(
-                f"[get_repos_with_info] Failed to fetch page {page} for org: {org}"
-            )
-            break
-        if not data:
-            logging.info(
-                f"[get_repos_with_info] No more repositories found on page {page} for org: {org}"
-            )
-            break
+    url = f"{BASE_URL}/orgs/{org}/repos?per_page=100"
+    logging.debug(f"[get_repos_with_info] Requesting URL: {url}")
+    pages = fetch_all_pages(url, HEADERS)
+    if pages is None:
+        logging.error(
+            f"[get_repos_with_info] Failed to fetch repositories for org: {org}"
+        )
+        pages = []
+    for page, data in enumerate(pages, start=1):
         logging.info(
             f"[get_repos_with_info] Page {page}: Found {len(data)} repositories for org: {org}"
         )
         repos.extend(data)
-        page += 1
     logging.info(
         f"[get_repos_with_info] Finished fetching repositories for org: {org}. Total: {len(repos)}"
     )
@@ -247,7 +240,7 @@ def main():
     # Show cache stats at start
     cache_stats = get_cache_stats()
     logging.info(
-        f"[main] Cache stats: {cache_stats['total_files']} files, {cache_stats['total_size_mb']} MB"
+        f"[main] Cache stats: {cache_stats['total_entries']} entries, {cache_stats['total_size_mb']} MB"
     )
 
     # Step 1: Get all repositories with their metadata
@@ -262,7 +255,7 @@ def main():
     # Show final cache stats
     final_cache_stats = get_cache_stats()
     logging.info(
-        f"[main] Final cache stats: {final_cache_stats['total_files']} files, {final_cache_stats['total_size_mb']} MB"
+        f"[main] Final cache stats: {final_cache_stats['total_entries']} entries, {final_cache_stats['total_size_mb']} MB"
     )
     logging.info("[main] Script completed successfully.")
 
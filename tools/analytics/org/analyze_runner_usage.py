@@ -64,7 +64,7 @@ from typing import Dict, List, Optional
 
 import requests
 import yaml
-from cache_manager import get_cache_stats, make_cached_request
+from cache_manager import fetch_all_pages, get_cache_stats, make_cached_request
 from dotenv import load_dotenv
 
 
@@ -152,19 +152,13 @@ WORKFLOW_RUN_LOOKBACK = (datetime.utcnow() - timedelta(days=180)).isoformat() +
 def get_repos(org: str) -> List[str]:
     logging.info(f"[get_repos] Start fetching repositories for org: {org}")
     repos = []
-    page = 1
-    while True:
-        url = f"{BASE_URL}/orgs/{org}/repos?per_page=100&page={page}"
-        logging.debug(f"[get_repos] Requesting URL: {url}")
-        data = make_cached_request(url, HEADERS)
-        if data is None:
-            logging.error(f"[get_repos] Failed to fetch page {page} for org: {org}")
-            break
-        if not data:
-            logging.info(
-                f"[get_repos] No more repositories found on page {page} for org: {org}"
-            )
-            break
+    url = f"{BASE_URL}/orgs/{org}/repos?per_page=100"
+    logging.debug(f"[get_repos] Requesting URL: {url}")
+    pages = fetch_all_pages(url, HEADERS)
+    if pages is None:
+        logging.error(f"[get_repos] Failed to fetch repositories for org: {org}")
+        pages = []
+    for page, data in enumerate(pages, start=1):
         logging.info(
             f"[get_repos] Page {page}: Found {len(data)} repositories for org: {org}"
         )
@@ -176,7 +170,6 @@ def get_repos(org: str) -> List[str]:
         logging.info(
             f"[get_repos] Page {page}: Excluded {len(data) - len(non_archived_repos)} archived repositories"
         )
-        page += 1
     logging.info(
         f"[get_repos] Finished fetching repositories for org: {org}. Total: {len(repos)} (excluding archived)"
     )
@@ -188,27 +181,20 @@ def get_workflow_runs(org: str, repo: str) -> List[Dict]:
         f"[get_workflow_runs] Start fetching workflow runs for repo: {repo} in org: {org}"
     )
     all_runs = []
-    page = 1
-    while True:
-        url = f"{BASE_URL}/repos/{org}/{repo}/actions/runs?per_page=100&page={page}&created=>={WORKFLOW_RUN_LOOKBACK}"
-        logging.debug(f"[get_workflow_runs] Requesting URL: {url}")
-        response_data = make_cached_request(url, HEADERS)
-        if response_data is None:
-            logging.error(
-                f"[get_workflow_runs] Failed to fetch page {page} for repo: {repo}"
-            )
-            break
+    url = f"{BASE_URL}/repos/{org}/{repo}/actions/runs?per_page=100&created=>={WORKFLOW_RUN_LOOKBACK}"
+    logging.debug(f"[get_workflow_runs] Requesting URL: {url}")
+    pages = fetch_all_pages(url, HEADERS)
+    if pages is None:
+        logging.error(
+            f"[get_workflow_runs] Failed to fetch workflow runs for repo: {repo}"
+        )
+        pages = []
+    for page, response_data in enumerate(pages, start=1):
         data = response_data.get("workflow_runs", [])
-        if not data:
-            logging.info(
-                f"[get_workflow_runs] No more workflow runs found for repo: {repo} on page {page}"
-            )
-            break
         logging.info(
             f"[get_workflow_runs] Page {page}: Found {len(data)} workflow runs for repo: {repo}"
         )
         all_runs.extend(data)
-        page += 1
 
     # --- FILTERING LOGIC START ---
     filtered_runs = []
@@ -463,7 +449,7 @@ def main():
     # Show cache stats at start
     cache_stats = get_cache_stats()
     logging.info(
-        f"[main] Cache stats: {cache_stats['total_files']} files, {cache_stats['total_size_mb']} MB"
+        f"[main] Cache stats: {cache_stats['total_entries']} entries, {cache_stats['total_size_mb']} MB"
     )
 
     repos = get_repos(ORG_NAME)
@@ -561,7 +547,7 @@ def main():
         # Show final cache stats
         final_cache_stats = get_cache_stats()
         logging.info(
-            f"[main] Final cache stats: {final_cache_stats['total_files']} files, {final_cache_stats['total_size_mb']} MB"
+            f"[main] Final cache stats: {final_cache_stats['total_entries']} entries, {final_cache_stats['total_size_mb']} MB"
         )
         logging.info("[main] Script completed successfully.")
 
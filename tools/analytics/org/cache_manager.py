@@ -1,28 +1,127 @@
+"""
+Cache for the GitHub API requests made by the org analytics scripts.
+
+Responses are stored, with their ETag/Last-Modified validators, in a single
+SQLite file under cache/. An entry is served from the cache until the TTL of its
+endpoint class runs out; after that it is revalidated with a conditional
+request. GitHub answers 304 Not Modified for unchanged resources, which costs
+neither rate limit nor bandwidth.
+
+Paginated endpoints are fetched concurrently: the first page tells (through its
+Link header) how many pages there are and the rest are requested in parallel,
+holding requests back whenever the remaining rate limit gets low.
+"""
+
+import atexit
+import hashlib
 import json
 import logging
 import re
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Pattern, Tuple
+from urllib.parse import parse_qs, urlparse
 
 import requests
 
 
 # Cache configuration
 CACHE_DIR = Path("cache")
+CACHE_DB = CACHE_DIR / "github_cache.sqlite"
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# How long a response is used without revalidation, by endpoint class. The
+# first pattern matching the URL path wins.
+TTL_RULES: List[Tuple[Pattern[str], int]] = [
+    # remove_pytorch_labs.py edits these, always revalidate
+    (re.compile(r"/contents/|/git/"), 0),
+    (re.compile(r"^/users/[^/]+$"), 7 * DAY),
+    (re.compile(r"/actions/runs/\d+/jobs$"), DAY),
+    (re.compile(r"/actions/runs$"), HOUR),
+    (re.compile(r"/commits$"), 6 * HOUR),
+]
+DEFAULT_TTL = DAY
+
+# Entries that haven't been used for this long are dropped, and then the least
+# recently used ones until the bodies fit in MAX_CACHE_SIZE_MB
+MAX_AGE = 30 * DAY
+MAX_CACHE_SIZE_MB = 1024
+
+# Concurrent requests when fetching the pages of an endpoint
+MAX_WORKERS = 8
+# Requests left in the rate limit window below which requests wait for the reset
+RATE_LIMIT_RESERVE = 50
+
+
+class CacheEntry(NamedTuple):
+    data: Any
+    etag: Optional[str]
+    last_modified: Optional[str]
+    # Number of pages of a paginated endpoint, from the Link header
+    last_page: Optional[int]
+    fetched_at: float
+
+
+def get_ttl(url: str) -> int:
+    """Seconds a response for url is used before it is revalidated."""
+    path = urlparse(url).path
+    for pattern, ttl in TTL_RULES:
+        if pattern.search(path):
+            return ttl
+    return DEFAULT_TTL
+
+
+def _encode(data: Any) -> bytes:
+    return zlib.compress(json.dumps(data).encode())
+
+
+def _decode(blob: bytes) -> Any:
+    return json.loads(zlib.decompress(blob))
 
 
 class CacheManager:
     """Manages caching of GitHub API responses using URL as cache key."""
 
-    def __init__(self, cache_dir: Path = CACHE_DIR):
-        CACHE_DIR.mkdir(exist_ok=True)
-
-        self.cache_dir = cache_dir
-        self.cache_dir.mkdir(exist_ok=True)
+    def __init__(self, db_path: Path = CACHE_DB):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.db_path = db_path
+        # Shared by the threads fetching pages
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=60, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                last_page INTEGER,
+                body BLOB NOT NULL,
+                fetched_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at);
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                body BLOB NOT NULL,
+                fetched_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            );
+            """
+        )
 
     def _get_cache_key(self, url: str) -> str:
         """Generate a human-readable cache key from URL."""
-        from urllib.parse import parse_qs, urlencode, urlparse
+        from urllib.parse import urlencode
 
         # Parse the URL to separate path and query parameters
         parsed = urlparse(url)
@@ -69,101 +168,391 @@ class CacheManager:
 
         return key
 
-    def _get_cache_path(self, url: str) -> Path:
-        """Get the cache file path for a given URL."""
-        cache_key = self._get_cache_key(url)
-        return self.cache_dir / f"{cache_key}.json"
+    def get_entry(self, url: str) -> Optional[CacheEntry]:
+        """Retrieve the cached response for a URL, fresh or not."""
+        key = self._get_cache_key(url)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT body, etag, last_modified, last_page, fetched_at"
+                " FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                logging.debug(f"[CacheManager] Cache miss for URL: {url}")
+                return None
+            self.conn.execute(
+                "UPDATE responses SET used_at = ? WHERE key = ?", (time.time(), key)
+            )
+            self.conn.commit()
+        try:
+            data = _decode(row[0])
+        except (zlib.error, json.JSONDecodeError) as e:
+            logging.warning(f"[CacheManager] Failed to read cache for {url}: {e}")
+            return None
+        logging.debug(f"[CacheManager] Cache hit for URL: {url}")
+        return CacheEntry(data, *row[1:])
 
     def get(self, url: str) -> Optional[Dict]:
         """Retrieve cached response for a URL."""
-        cache_path = self._get_cache_path(url)
-        if cache_path.exists():
-            try:
-                with open(cache_path, "r") as f:
-                    cached_data = json.load(f)
-                logging.debug(f"[CacheManager] Cache hit for URL: {url}")
-                return cached_data
-            except (json.JSONDecodeError, IOError) as e:
-                logging.warning(f"[CacheManager] Failed to read cache for {url}: {e}")
-                return None
-        logging.debug(f"[CacheManager] Cache miss for URL: {url}")
-        return None
-
-    def set(self, url: str, data: Dict) -> None:
+        entry = self.get_entry(url)
+        return entry.data if entry is not None else None
+
+    def set(
+        self,
+        url: str,
+        data: Any,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        last_page: Optional[int] = None,
+    ) -> None:
         """Cache response data for a URL."""
-        cache_path = self._get_cache_path(url)
-        try:
-            with open(cache_path, "w") as f:
-                json.dump(data, f, indent=2)
-            logging.debug(f"[CacheManager] Cached response for URL: {url}")
-        except IOError as e:
-            logging.error(f"[CacheManager] Failed to write cache for {url}: {e}")
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses"
+                " (key, etag, last_modified, last_page, body, fetched_at, used_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self._get_cache_key(url),
+                    etag,
+                    last_modified,
+                    last_page,
+                    _encode(data),
+                    now,
+                    now,
+                ),
+            )
+            self.conn.commit()
+        logging.debug(f"[CacheManager] Cached response for URL: {url}")
+
+    def refresh(self, url: str) -> None:
+        """Mark the cached response for a URL as just revalidated."""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE responses SET fetched_at = ? WHERE key = ?",
+                (time.time(), self._get_cache_key(url)),
+            )
+            self.conn.commit()
+
+    def get_result(self, key: str, ttl: float) -> Tuple[bool, Any]:
+        """(found, value) of a function result cached less than ttl ago."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT body FROM results WHERE key = ? AND fetched_at >= ?",
+                (key, time.time() - ttl),
+            ).fetchone()
+            if row is not None:
+                self.conn.execute(
+                    "UPDATE results SET used_at = ? WHERE key = ?", (time.time(), key)
+                )
+                self.conn.commit()
+        if row is None:
+            return False, None
+        return True, _decode(row[0])
+
+    def set_result(self, key: str, name: str, value: Any) -> None:
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO results (key, name, body, fetched_at, used_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, name, _encode(value), now, now),
+            )
+            self.conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            (entries,) = self.conn.execute(
+                "SELECT (SELECT COUNT(*) FROM responses) + (SELECT COUNT(*) FROM results)"
+            ).fetchone()
+        total_size = sum(
+            path.stat().st_size
+            for path in self.db_path.parent.glob(f"{self.db_path.name}*")
+        )
+        return {
+            "total_entries": entries,
+            "total_size_mb": round(total_size / (1024 * 1024), 2),
+        }
+
+    def prune(self) -> None:
+        """Drop old entries, then the least recently used over the size limit."""
+        with self.lock:
+            for table in ("responses", "results"):
+                self.conn.execute(
+                    f"DELETE FROM {table} WHERE used_at < ?", (time.time() - MAX_AGE,)
+                )
+            rows = self.conn.execute(
+                "SELECT key, LENGTH(body) FROM responses ORDER BY used_at DESC"
+            ).fetchall()
+            budget = MAX_CACHE_SIZE_MB * 1024 * 1024
+            evicted = []
+            for key, size in rows:
+                budget -= size
+                if budget < 0:
+                    evicted.append((key,))
+            self.conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+            self.conn.commit()
+        if evicted:
+            logging.info(f"[CacheManager] Evicted {len(evicted)} cached responses")
+
+    def clear(self) -> None:
+        with self.lock:
+            self.conn.execute("DELETE FROM responses")
+            self.conn.execute("DELETE FROM results")
+            self.conn.commit()
+            self.conn.execute("VACUUM")
+
+    def close(self) -> None:
+        self.prune()
+        with self.lock:
+            self.conn.close()
 
 
 # Global cache manager instance
 cache_manager = CacheManager()
+atexit.register(cache_manager.close)
 
 
 def get_cache_stats():
     """Get statistics about the cache."""
-    if not CACHE_DIR.exists():
-        return {"total_files": 0, "total_size_mb": 0}
-
-    cache_files = list(CACHE_DIR.glob("*.json"))
-    total_size = sum(f.stat().st_size for f in cache_files)
-
-    return {
-        "total_files": len(cache_files),
-        "total_size_mb": round(total_size / (1024 * 1024), 2),
-    }
+    return cache_manager.stats()
 
 
 def clear_cache():
     """Clear all cached data."""
-    import shutil
-
-    if CACHE_DIR.exists():
-        shutil.rmtree(CACHE_DIR)
-        CACHE_DIR.mkdir(exist_ok=True)
-        logging.info(f"[clear_cache] Cleared cache directory: {CACHE_DIR}")
-    else:
-        logging.info(f"[clear_cache] Cache directory does not exist: {CACHE_DIR}")
+    cache_manager.clear()
+    logging.info(f"[clear_cache] Cleared cache: {CACHE_DB}")
 
 
-def make_cached_request(url: str, headers: Dict[str, str]) -> Optional[Dict]:
+class RateLimiter:
+    """
+    Tracks the GitHub rate limit from the X-RateLimit-* response headers and
+    blocks all requests until the window resets once fewer than reserve
+    requests are left
     """
-    Make an HTTP request with caching. Returns the JSON response if successful.
 
-    Args:
-        url: The URL to request
-        headers: Headers for the request (required)
+    def __init__(self, reserve: int = RATE_LIMIT_RESERVE):
+        self.reserve = reserve
+        self.lock = threading.Lock()
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+
+    def acquire(self) -> None:
+        with self.lock:
+            if self.remaining is None:
+                return
+            if self.remaining <= self.reserve:
+                delay = self.reset_at - time.time()
+                if delay > 0:
+                    logging.warning(
+                        f"[RateLimiter] {self.remaining} requests left, waiting {delay:.0f}s for the reset"
+                    )
+                    # Holding the lock holds back every other request too
+                    time.sleep(delay + 1)
+                self.remaining = None
+            else:
+                # Count the requests in flight, their responses come later
+                self.remaining -= 1
+
+    def update(self, response: requests.Response) -> None:
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset_at = response.headers.get("X-RateLimit-Reset")
+        if remaining is None or reset_at is None:
+            return
+        with self.lock:
+            # Responses arrive out of order, within a window only trust the lowest
+            if self.remaining is not None and float(reset_at) == self.reset_at:
+                self.remaining = min(self.remaining, int(remaining))
+            else:
+                self.remaining = int(remaining)
+            self.reset_at = float(reset_at)
+
+
+rate_limiter = RateLimiter()
+_local = threading.local()
+
+
+def _session() -> requests.Session:
+    # Sessions keep connections alive, but aren't meant to be shared by threads
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def _get(url: str, headers: Dict[str, str]) -> requests.Response:
+    rate_limiter.acquire()
+    response = _session().get(url, headers=headers)
+    rate_limiter.update(response)
+    if (
+        response.status_code in (403, 429)
+        and response.headers.get("X-RateLimit-Remaining") == "0"
+    ):
+        # Exhausted by someone else sharing the token, wait for the reset once
+        rate_limiter.acquire()
+        response = _session().get(url, headers=headers)
+        rate_limiter.update(response)
+    return response
+
+
+def _last_page(response: requests.Response) -> Optional[int]:
+    last = response.links.get("last")
+    if last is None:
+        return None
+    page = parse_qs(urlparse(last["url"]).query).get("page")
+    return int(page[0]) if page else None
 
-    Returns:
-        JSON response data if successful, None if failed
+
+def fetch(url: str, headers: Dict[str, str]) -> Optional[CacheEntry]:
+    """
+    The response for url, from the cache while it is fresh and revalidated
+    with a conditional request after that. None if the request fails and
+    nothing is cached.
     """
-    # Check cache first
-    cached_response = cache_manager.get(url)
-    if cached_response:
+    entry = cache_manager.get_entry(url)
+    if entry is not None and time.time() - entry.fetched_at < get_ttl(url):
         logging.info(f"[make_cached_request] Using cached response for: {url}")
-        return cached_response
+        return entry
+
+    conditional_headers = dict(headers)
+    if entry is not None:
+        if entry.etag:
+            conditional_headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            conditional_headers["If-Modified-Since"] = entry.last_modified
 
     # Make actual HTTP request
     logging.info(f"[make_cached_request] Making HTTP request to: {url}")
     try:
-        response = requests.get(url, headers=headers)
+        response = _get(url, conditional_headers)
+        if response.status_code == 304 and entry is not None:
+            cache_manager.refresh(url)
+            logging.info(f"[make_cached_request] Cached response still valid: {url}")
+            return entry
         response.raise_for_status()
         data = response.json()
-
-        # Cache successful response
-        cache_manager.set(url, data)
-        logging.info(f"[make_cached_request] Successfully cached response for: {url}")
-        return data
-
     except requests.exceptions.RequestException as e:
         logging.error(f"[make_cached_request] HTTP request failed for {url}: {e}")
-        return None
+        return entry
     except json.JSONDecodeError as e:
         logging.error(
             f"[make_cached_request] Failed to parse JSON response for {url}: {e}"
         )
+        return entry
+
+    # Cache successful response
+    entry = CacheEntry(
+        data,
+        response.headers.get("ETag"),
+        response.headers.get("Last-Modified"),
+        _last_page(response),
+        time.time(),
+    )
+    cache_manager.set(url, data, entry.etag, entry.last_modified, entry.last_page)
+    logging.info(f"[make_cached_request] Successfully cached response for: {url}")
+    return entry
+
+
+def make_cached_request(url: str, headers: Dict[str, str]) -> Optional[Dict]:
+    """
+    Make an HTTP request with caching. Returns the JSON response if successful.
+
+    Args:
+        url: The URL to request
+        headers: Headers for the request (required)
+
+    Returns:
+        JSON response data if successful, None if failed
+    """
+    entry = fetch(url, headers)
+    return entry.data if entry is not None else None
+
+
+def fetch_all_pages(
+    url: str,
+    headers: Dict[str, str],
+    max_pages: Optional[int] = None,
+    max_workers: int = MAX_WORKERS,
+) -> Optional[List[Any]]:
+    """
+    Fetch the pages of a paginated endpoint, the first one and then the rest
+    concurrently.
+
+    Args:
+        url: The URL to request, without the page parameter
+        headers: Headers for the requests (required)
+        max_pages: Stop after this many pages
+        max_workers: Concurrent requests
+
+    Returns:
+        The JSON response of every page in order, None if any page failed.
+    """
+    separator = "&" if "?" in url else "?"
+
+    def fetch_page(page: int) -> Optional[CacheEntry]:
+        return fetch(f"{url}{separator}page={page}", headers)
+
+    first = fetch_page(1)
+    if first is None:
         return None
+    pages = [first.data]
+    last_page = first.last_page or 1
+    if max_pages is not None:
+        last_page = min(last_page, max_pages)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while len(pages) < last_page:
+            last = first
+            for entry in executor.map(fetch_page, range(len(pages) + 1, last_page + 1)):
+                if entry is None:
+                    logging.error(
+                        f"[fetch_all_pages] Failed to fetch page {len(pages) + 1} of {url}"
+                    )
+                    return None
+                pages.append(entry.data)
+                last = entry
+            # Pages can have been added since a cached first page was fetched;
+            # only the actual last page has no "last" link
+            if last.last_page is None or last.last_page <= last_page:
+                break
+            last_page = last.last_page
+            if max_pages is not None:
+                last_page = min(last_page, max_pages)
+    return pages
+
+
+def cache_result(ttl: float = DEFAULT_TTL) -> Callable:
+    """
+    A decorator that caches the JSON serializable result of a function for ttl
+    seconds, keyed by the function and its arguments
+    """
+
+    def default(obj: Any) -> Any:
+        # Sets are compared by contents, whatever their iteration order
+        if isinstance(obj, (set, frozenset)):
+            return sorted(obj, key=str)
+        return str(obj)
+
+    def decorator(func: Callable) -> Callable:
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            serialized_args = json.dumps(
+                {"func": name, "args": args, "kwargs": kwargs},
+                sort_keys=True,
+                default=default,
+            )
+            key = hashlib.sha256(serialized_args.encode()).hexdigest()
+            found, result = cache_manager.get_result(key, ttl)
+            if found:
+                logging.debug(f"Cache hit for function: {name}")
+                return result
+
+            result = func(*args, **kwargs)
+            cache_manager.set_result(key, name, result)
+            logging.debug(f"Cached result for function: {name}")
+            return result
+
+        return wrapper
+
+    return decorator
@@ -584,7 +584,7 @@ def main():
     # Show cache stats at start
     cache_stats = get_cache_stats()
     logging.info(
-        f"[main] Cache stats: {cache_stats['total_files']} files, {cache_stats['total_size_mb']} MB"
+        f"[main] Cache stats: {cache_stats['total_entries']} entries, {cache_stats['total_size_mb']} MB"
     )
 
     # Get target repositories (only those with files containing "pytorch-labs")
@@ -655,7 +655,7 @@ def main():
     # Show final cache stats
     final_cache_stats = get_cache_stats()
     logging.info(
-        f"[main] Final cache stats: {final_cache_stats['total_files']} files, {final_cache_stats['total_size_mb']} MB"
+        f"[main] Final cache stats: {final_cache_stats['total_entries']} entries, {final_cache_stats['total_size_mb']} MB"
     )
 
     logging.info("[main] Script completed successfully.")
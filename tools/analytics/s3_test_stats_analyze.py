@@ -1,13 +1,30 @@
+"""
+Download the test time stats of the recent pytorch/pytorch commits and convert
+them to a Parquet dataset partitioned by commit:
+
+    <output>/sha=<commit sha>/part-0.parquet
+
+Each partition records the stats files it was converted from, so later runs
+only convert new commits and commits whose stats changed, e.g. that were still
+being uploaded. Analyses read just the columns and commits they need with
+read_stats, e.g.
+
+    read_stats("cache/test_time_file", ["file", "file_total_sec"], shas).to_pandas()
+"""
+
 import argparse
 import bz2
+import glob
 import json
 import os
-import re
+from concurrent.futures import as_completed, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import boto3
-import pandas as pd  # type: ignore[import-untyped]
+import pyarrow as pa  # type: ignore[import-untyped]
+import pyarrow.dataset as ds  # type: ignore[import-untyped]
+import pyarrow.parquet as pq  # type: ignore[import-untyped]
 import requests
 from tqdm import tqdm  # type: ignore[import-untyped]
 
@@ -20,98 +37,208 @@ GITHUB_API_BASE = "https://api.github.com/"
 GITHUB_COMMITS_API = "repos/pytorch/pytorch/commits"
 STRF_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
 
-CACHE_PICKLE = "cache/test_time/dataframe.pickle"
+# Columns of the dataset at each granularity, the sha partition key aside
+SCHEMAS = {
+    "file": pa.schema(
+        [("job", pa.string()), ("file", pa.string()), ("file_total_sec", pa.float64())]
+    ),
+    "suite": pa.schema(
+        [
+            ("job", pa.string()),
+            ("suite", pa.string()),
+            ("suite_total_sec", pa.float64()),
+        ]
+    ),
+    "case": pa.schema(
+        [
+            ("job", pa.string()),
+            ("case", pa.string()),
+            ("case_status", pa.string()),
+            ("case_sec", pa.float64()),
+        ]
+    ),
+}
+
 
+# The sha partition key is a string, even when it happens to be all digits
+PARTITIONING = ds.partitioning(pa.schema([("sha", pa.string())]), flavor="hive")
 
-def _get_latests_git_commit_sha_list(lookback: int):
+# Parquet metadata key listing the stats files (<job>/<file>) of a partition
+SOURCES_KEY = b"sources"
+
+
+def _get_latests_git_commit_sha_list(lookback: int) -> List[str]:
     sha_since = (datetime.utcnow() - timedelta(hours=lookback)).strftime(STRF_FORMAT)
-    resp = requests.get(GITHUB_API_BASE + GITHUB_COMMITS_API + f"?since={sha_since}")
-    if resp.status_code == 200:
-        return [e.get("sha") for e in resp.json()]
-    else:
-        return []
+    url: Optional[str] = (
+        GITHUB_API_BASE + GITHUB_COMMITS_API + f"?since={sha_since}&per_page=100"
+    )
+    shas: List[str] = []
+    # Follow the pages, long lookbacks span thousands of commits
+    while url:
+        resp = requests.get(url)
+        if resp.status_code != 200:
+            break
+        shas.extend(e.get("sha") for e in resp.json())
+        url = resp.links.get("next", {}).get("url")
+    return shas
 
 
-def _json_to_df(data: Dict[str, Any], granularity: str) -> pd.DataFrame:
-    reformed_data = list()
+def _decode_stats(
+    data: Dict[str, Any], job: str, granularity: str, columns: Dict[str, List[Any]]
+) -> None:
+    """Appends the rows of one job's stats to columns, one list per column."""
     for fname, fdata in data["files"].items():
         if granularity == "file":
-            reformed_data.append(
-                {
-                    "job": data["job"],
-                    "sha": data["sha"],
-                    "file": fname,
-                    "file_total_sec": fdata["total_seconds"],
-                }
-            )
-        else:
-            for sname, sdata in fdata["suites"].items():
-                if granularity == "suite":
-                    reformed_data.append(
-                        {
-                            "job": data["job"],
-                            "sha": data["sha"],
-                            "suite": sname,
-                            "suite_total_sec": sdata["total_seconds"],
-                        }
-                    )
-                else:
-                    for cname, cdata in sdata["cases"].items():
-                        reformed_data.append(
-                            {
-                                "job": data["job"],
-                                "sha": data["sha"],
-                                "case": cname,
-                                "case_status": cdata["status"],
-                                "case_sec": cdata["seconds"],
-                            }
-                        )
-    df = pd.json_normalize(reformed_data)
-    return df
-
-
-def download_stats(folder: str, lookback: int):
+            columns["job"].append(job)
+            columns["file"].append(fname)
+            columns["file_total_sec"].append(fdata["total_seconds"])
+            continue
+        for sname, sdata in fdata["suites"].items():
+            if granularity == "suite":
+                columns["job"].append(job)
+                columns["suite"].append(sname)
+                columns["suite_total_sec"].append(sdata["total_seconds"])
+                continue
+            for cname, cdata in sdata["cases"].items():
+                columns["job"].append(job)
+                columns["case"].append(cname)
+                columns["case_status"].append(cdata["status"])
+                columns["case_sec"].append(cdata["seconds"])
+
+
+def _sources(paths: List[str]) -> List[str]:
+    return sorted(
+        os.path.join(os.path.basename(os.path.dirname(path)), os.path.basename(path))
+        for path in paths
+    )
+
+
+def _exported_sources(output: str, sha: str) -> Optional[List[str]]:
+    """The sources of the commit's partition, None if it wasn't exported."""
+    fname = os.path.join(output, f"sha={sha}", "part-0.parquet")
+    if not os.path.exists(fname):
+        return None
+    # Only the footer is read
+    metadata = pq.read_schema(fname).metadata or {}
+    if SOURCES_KEY not in metadata:
+        return None
+    return json.loads(metadata[SOURCES_KEY])
+
+
+def export_commit(
+    paths: List[str], sha: str, granularity: str, output: str
+) -> Tuple[str, int]:
+    """
+    Decodes the stats files of a commit straight into typed columns and writes
+    them as the commit's partition of the dataset. Returns (sha, rows).
+    """
+    schema = SCHEMAS[granularity].with_metadata(
+        {SOURCES_KEY: json.dumps(_sources(paths))}
+    )
+    columns: Dict[str, List[Any]] = {name: [] for name in schema.names}
+    for path in paths:
+        # <folder>/test_time/<sha>/<job>/<file>
+        job = os.path.basename(os.path.dirname(path))
+        with bz2.open(path, "rb") as zf:
+            _decode_stats(json.load(zf), job, granularity, columns)
+    table = pa.table(
+        [pa.array(columns[field.name], field.type) for field in schema], schema=schema
+    )
+
+    partition = os.path.join(output, f"sha={sha}")
+    os.makedirs(partition, exist_ok=True)
+    # Write next to the final name, a partition is either complete or missing
+    tmp_fname = os.path.join(partition, "part-0.parquet.tmp")
+    pq.write_table(table, tmp_fname, compression="zstd")
+    os.replace(tmp_fname, os.path.join(partition, "part-0.parquet"))
+    return sha, table.num_rows
+
+
+def read_stats(
+    output: str, columns: Optional[List[str]] = None, shas: Optional[List[str]] = None
+) -> pa.Table:
+    """Reads the given columns (all by default) of the given commits' stats."""
+    # Complete partitions only, not the .tmp files of an interrupted export
+    fnames = sorted(glob.glob(os.path.join(output, "sha=*", "part-0.parquet")))
+    dataset = ds.dataset(
+        fnames,
+        format="parquet",
+        partitioning=PARTITIONING,
+        partition_base_dir=output,
+    )
+    return dataset.to_table(
+        columns=columns,
+        filter=ds.field("sha").isin(shas) if shas is not None else None,
+    )
+
+
+def _download(remote_fname: str, local_fname: str) -> None:
+    os.makedirs(os.path.dirname(local_fname), exist_ok=True)
+    CLIENT.download_file("ossci-metrics", remote_fname, local_fname + ".tmp")
+    os.replace(local_fname + ".tmp", local_fname)
+
+
+def _list_commit(commit_sha: str) -> List[str]:
+    return [key.key for key in BUCKET.objects.filter(Prefix=f"test_time/{commit_sha}/")]
+
+
+def download_stats(
+    folder: str, lookback: int, workers: int = 32
+) -> Dict[str, List[str]]:
+    """
+    Downloads, concurrently, the stats of the commits in the lookback window
+    that aren't in folder yet. Returns the local paths of each commit's stats.
+    """
     commit_sha_list = _get_latests_git_commit_sha_list(lookback)
-    for commit_sha in commit_sha_list:
-        for key in tqdm(BUCKET.objects.filter(Prefix=f"test_time/{commit_sha}")):
-            remote_fname = key.key
-            local_fname = os.path.join(folder, remote_fname)
-            # TODO: Do this in parallel
-            if not os.path.exists(local_fname):
-                dirname = os.path.dirname(local_fname)
-                if not os.path.exists(dirname):
-                    os.makedirs(dirname)
+    stats: Dict[str, List[str]] = {}
+    to_download = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for commit_sha, keys in zip(
+            commit_sha_list, executor.map(_list_commit, commit_sha_list)
+        ):
+            if not keys:
+                continue
+            stats[commit_sha] = []
+            for remote_fname in keys:
+                local_fname = os.path.join(folder, remote_fname)
+                stats[commit_sha].append(local_fname)
                 # only download when there's a cache miss
-                if not os.path.exists(local_fname) or not os.path.isfile(local_fname):
-                    print(f"\nDownloading {remote_fname}...")
-                    CLIENT.download_file("ossci-metrics", remote_fname, local_fname)
+                if not os.path.isfile(local_fname):
+                    to_download.append((remote_fname, local_fname))
+
+        print(f"{len(stats)} commits with stats, {len(to_download)} files to download")
+        futures = [executor.submit(_download, *args) for args in to_download]
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            future.result()
+    return stats
 
 
 def parse_and_export_stats(
-    folder: str, granularity: str, commit_sha_lists: Optional[List[str]] = None
-):
-    dataframe = None
-    for dirpath, _, filenames in os.walk(folder):
-        for filename in tqdm(filenames):
-            splits = dirpath.split("/")
-            job_name = splits[-1]
-            sha = splits[-2]
-            if not commit_sha_lists or sha in commit_sha_lists:
-                with bz2.open(os.path.join(dirpath, filename), "r") as zf:
-                    string = zf.read().decode("utf-8")
-                    data = json.loads(string)
-                    # create a deep json with sha and job info
-                    data["sha"] = sha
-                    data["job"] = job_name
-                    df = _json_to_df(data, granularity)
-                    dataframe = df if dataframe is None else dataframe.append(df)  # type: ignore[attr-defined]
-    return dataframe
+    stats: Dict[str, List[str]], granularity: str, output: str, workers: int
+) -> None:
+    """
+    Converts, in parallel, the commits that aren't in the output dataset yet or
+    whose stats files changed since they were exported.
+    """
+    todo = {
+        sha: paths
+        for sha, paths in stats.items()
+        if _exported_sources(output, sha) != _sources(paths)
+    }
+    print(f"{len(stats) - len(todo)} commits up to date, {len(todo)} to (re-)export")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(export_commit, paths, sha, granularity, output)
+            for sha, paths in todo.items()
+        ]
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            future.result()
 
 
 def main():
     parser = argparse.ArgumentParser(
         __file__,
-        description="download and cache test stats locally, both raw and pandas format",
+        description="download and cache test stats locally, both raw and as a Parquet dataset",
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
     )
     parser.add_argument(
@@ -122,8 +249,8 @@ def main():
     )
     parser.add_argument(
         "--output",
-        help="output filename",
-        default="cache/df.pickle",
+        help="output dataset directory, defaults to <cache_folder>/test_time_<granularity>",
+        default=None,
     )
     parser.add_argument(
         "--cache_folder",
@@ -136,19 +263,29 @@ def main():
         help="granularity of stats summary",
         default="file",
     )
+    parser.add_argument(
+        "--download-workers",
+        type=int,
+        help="concurrent downloads",
+        default=32,
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        help="processes converting the stats",
+        default=os.cpu_count(),
+    )
     args = parser.parse_args()
 
     lookback = args.lookback
     cache_folder = args.cache_folder
-    output = args.output
     granularity = args.granularity
+    output = args.output or os.path.join(cache_folder, f"test_time_{granularity}")
 
     print("Downloading test stats")
-    download_stats(cache_folder, lookback)
-    print("Parsing test stats and write to pd dataframe")
-    if not os.path.exists(output):
-        dataframe = parse_and_export_stats(f"{cache_folder}/test_time/", granularity)
-        dataframe.to_pickle(output)
+    stats = download_stats(cache_folder, lookback, args.download_workers)
+    print(f"Parsing test stats and writing them to {output}")
+    parse_and_export_stats(stats, granularity, output, args.parse_workers)
 
 
 if __name__ == "__main__":
@@ -2,15 +2,25 @@ import argparse
 import csv
 import logging
 import sys
-from datetime import date, datetime, timedelta
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
 from typing import Dict, List, Optional, Set, Tuple
 
 from dotenv import load_dotenv  # type: ignore[import-not-found]
 
 from .client import get_clickhouse_client
-from .logic import build_rows, COLUMNS, iter_time_chunks
+from .logic import (
+    build_rows,
+    COLUMNS,
+    contiguous_ranges,
+    iter_days,
+    iter_time_chunks,
+    row_sort_key,
+)
 from .premerge import (
-    classify_with_context,
+    classify_many_with_context,
     parse_pr_from_message,
     PremergeContext,
     resolve_premerge_context,
@@ -22,11 +32,20 @@ from .queries import (
     fetch_flaky_for_day,
     fetch_regressions,
 )
+from .store import DayStore
 
 
 EVENT_PAD_DAYS = 2
 FLAKY_PAD_DAYS = 1
 FLAKY_CHUNK_HOURS = 6
+# Flaky chunks are fetched concurrently, each on its own client (a clickhouse_connect
+# session cannot run concurrent queries). Kept small: every chunk query already uses
+# max_threads = 4 on the shared cluster.
+FLAKY_MAX_WORKERS = 4
+# A landing day is settled (safe to persist in --store) once its padded event and
+# flaky windows are fully in the past; until then a later revert or flaky snapshot
+# can still add rows for it, so unsettled days are re-fetched on every run.
+SETTLE_DAYS = EVENT_PAD_DAYS + 1
 
 
 def parse_date(value: str) -> date:
@@ -53,7 +72,22 @@ def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     )
     parser.add_argument("--repo", default="pytorch/pytorch")
     parser.add_argument("--output", default=None)
+    parser.add_argument(
+        "--store",
+        default=None,
+        help=(
+            "SQLite day-partition store: settled days already in it are read back "
+            "instead of re-queried, and newly fetched settled days are added"
+        ),
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="with --store, re-fetch and overwrite every day in the range",
+    )
     args = parser.parse_args(argv)
+    if args.refresh and not args.store:
+        parser.error("--refresh requires --store")
     if args.start > args.end:
         parser.error(f"--start ({args.start}) must be <= --end ({args.end})")
     return args
@@ -84,19 +118,27 @@ def collect(args: argparse.Namespace) -> List[dict]:
     flaky: Dict[str, Set[Tuple[str, str]]] = {}
     flaky_start = args.start - timedelta(days=FLAKY_PAD_DAYS)
     flaky_end = args.end + timedelta(days=FLAKY_PAD_DAYS)
-    for chunk_start, chunk_end in iter_time_chunks(
-        flaky_start, flaky_end, FLAKY_CHUNK_HOURS
-    ):
-        for workflow, signal_key, commit_sha in fetch_flaky_for_day(
-            client, args.repo, chunk_start, chunk_end
-        ):
-            flaky.setdefault(commit_sha, set()).add((workflow, signal_key))
-        n_pairs = sum(len(v) for v in flaky.values())
-        logging.info(
-            "flaky scan %s: %d distinct (workflow, signal) pairs so far",
-            chunk_start.isoformat(),
-            n_pairs,
-        )
+    chunks = list(iter_time_chunks(flaky_start, flaky_end, FLAKY_CHUNK_HOURS))
+    worker_clients = threading.local()
+
+    def fetch_chunk(chunk: Tuple[datetime, datetime]) -> Set[Tuple[str, str, str]]:
+        worker_client = getattr(worker_clients, "client", None)
+        if worker_client is None:
+            worker_client = get_clickhouse_client()
+            worker_clients.client = worker_client
+        return fetch_flaky_for_day(worker_client, args.repo, chunk[0], chunk[1])
+
+    with ThreadPoolExecutor(max_workers=FLAKY_MAX_WORKERS) as pool:
+        # map yields in chunk order, so progress logging stays chronological.
+        for (chunk_start, _), found in zip(chunks, pool.map(fetch_chunk, chunks)):
+            for workflow, signal_key, commit_sha in found:
+                flaky.setdefault(commit_sha, set()).add((workflow, signal_key))
+            n_pairs = sum(len(v) for v in flaky.values())
+            logging.info(
+                "flaky scan %s: %d distinct (workflow, signal) pairs so far",
+                chunk_start.isoformat(),
+                n_pairs,
+            )
 
     candidate_shas = sorted(set(regressions.by_commit) | set(flaky))
     commit_times = fetch_commit_times(client, candidate_shas)
@@ -128,32 +170,77 @@ def collect(args: argparse.Namespace) -> List[dict]:
     for r in rows:
         r["premerge_status"] = ""
 
-    total = len(qualifying)
     # head_sha/merge_ts/job_ids depend only on the commit, so resolve the per-commit
-    # context once and reuse it for every failing signal on that commit.
-    context_cache: Dict[str, PremergeContext] = {}
-    for i, r in enumerate(qualifying, start=1):
+    # context once and classify every failing signal on that commit in bulk.
+    by_commit: Dict[str, List[Tuple[dict, Tuple[str, str]]]] = {}
+    for r in qualifying:
         file, sep, name = r["signal_key"].partition("::")
         if not sep:
             continue
-        message = messages.get(r["commit_sha"], "")
-        pr = parse_pr_from_message(message)
-        context = context_cache.get(r["commit_sha"])
-        if context is None:
-            context = resolve_premerge_context(client, r["commit_sha"], repo=args.repo)
-            context_cache[r["commit_sha"]] = context
-        status = classify_with_context(client, context, file, name)
-        r["premerge_status"] = status
+        by_commit.setdefault(r["commit_sha"], []).append((r, (file, name)))
+
+    total = len(by_commit)
+    for i, (commit_sha, commit_rows) in enumerate(by_commit.items(), start=1):
+        pr = parse_pr_from_message(messages.get(commit_sha, ""))
+        context: PremergeContext = resolve_premerge_context(
+            client, commit_sha, repo=args.repo
+        )
+        statuses = classify_many_with_context(
+            client, context, [test for _, test in commit_rows]
+        )
+        for r, test in commit_rows:
+            r["premerge_status"] = statuses[test]
         logging.info(
-            "premerge %d/%d commit=%s pr=%s signal=%s -> %s",
+            "premerge %d/%d commit=%s pr=%s signals=%d -> %s",
             i,
             total,
-            r["commit_sha"][:10],
+            commit_sha[:10],
             pr,
-            r["signal_key"],
-            status,
+            len(commit_rows),
+            ", ".join(
+                f"{status}={n}"
+                for status, n in sorted(Counter(statuses.values()).items())
+            ),
+        )
+
+    return rows
+
+
+def collect_incremental(
+    args: argparse.Namespace, store: DayStore, today: date
+) -> List[dict]:
+    settled_through = today - timedelta(days=SETTLE_DAYS)
+    stored = (
+        set() if args.refresh else store.stored_days(args.repo, args.start, args.end)
+    )
+    missing = [d for d in iter_days(args.start, args.end) if d not in stored]
+    logging.info(
+        "store %s: %d/%d days stored, fetching %d",
+        store.path,
+        len(stored),
+        len(stored) + len(missing),
+        len(missing),
+    )
+
+    fresh: List[dict] = []
+    for range_start, range_end in contiguous_ranges(missing):
+        range_args = argparse.Namespace(**vars(args))
+        range_args.start, range_args.end = range_start, range_end
+        rows = collect(range_args)
+        settled_days = {
+            d.isoformat()
+            for d in iter_days(range_start, range_end)
+            if d <= settled_through
+        }
+        store.replace_days(
+            args.repo,
+            map(date.fromisoformat, settled_days),
+            [r for r in rows if r["commit_time"][:10] in settled_days],
         )
+        fresh.extend(r for r in rows if r["commit_time"][:10] not in settled_days)
 
+    rows = store.load_rows(args.repo, args.start, args.end) + fresh
+    rows.sort(key=row_sort_key)
     return rows
 
 
@@ -166,7 +253,11 @@ def main(argv: Optional[List[str]] = None) -> int:
     load_dotenv()
     args = parse_args(argv)
 
-    rows = collect(args)
+    if args.store:
+        with DayStore(args.store) as store:
+            rows = collect_incremental(args, store, datetime.now(timezone.utc).date())
+    else:
+        rows = collect(args)
 
     output = args.output or default_output(args.start, args.end)
     write_csv(output, rows)
@@ -1,5 +1,5 @@
 from datetime import date, datetime as dt, timedelta, timezone
-from typing import Dict, Iterator, List, Mapping, Optional, Set, Tuple
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple
 
 
 COLUMNS = [
@@ -36,6 +36,24 @@ def day_bounds(day: date) -> Tuple[dt, dt]:
     return start, dt(nxt.year, nxt.month, nxt.day)
 
 
+def iter_days(start_date: date, end_date: date) -> Iterator[date]:
+    day = start_date
+    while day <= end_date:
+        yield day
+        day += timedelta(days=1)
+
+
+def contiguous_ranges(days: Iterable[date]) -> List[Tuple[date, date]]:
+    """Collapse days into sorted, inclusive (start, end) runs of consecutive days."""
+    ranges: List[Tuple[date, date]] = []
+    for day in sorted(set(days)):
+        if ranges and ranges[-1][1] + timedelta(days=1) == day:
+            ranges[-1] = (ranges[-1][0], day)
+        else:
+            ranges.append((day, day))
+    return ranges
+
+
 def iter_time_chunks(
     start_date: date, end_date: date, chunk_hours: int
 ) -> Iterator[Tuple[dt, dt]]:
@@ -49,6 +67,16 @@ def iter_time_chunks(
         chunk_start = chunk_end
 
 
+def row_sort_key(row: Mapping[str, str]) -> Tuple[str, str, str, str, str]:
+    return (
+        row["commit_time"],
+        row["category"],
+        row["workflow"],
+        row["signal_key"],
+        row["commit_sha"],
+    )
+
+
 def _naive_utc(value: dt) -> dt:
     if value.tzinfo is not None:
         value = value.astimezone(timezone.utc).replace(tzinfo=None)
@@ -121,13 +149,5 @@ def build_rows(
                 }
             )
 
-    rows.sort(
-        key=lambda r: (
-            r["commit_time"],
-            r["category"],
-            r["workflow"],
-            r["signal_key"],
-            r["commit_sha"],
-        )
-    )
+    rows.sort(key=row_sort_key)
     return rows
@@ -24,7 +24,7 @@ test did not run at all.
 import logging
 import re
 from datetime import datetime, timedelta, timezone
-from typing import List, NamedTuple, Optional, Tuple
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
 
 from clickhouse_connect.driver import Client  # type: ignore[import-not-found]
 
@@ -36,6 +36,9 @@ logger = logging.getLogger(__name__)
 LOOKBACK_DAYS = 30  # job created_at lower bound around merge window
 PARTITION_MARGIN_DAYS = 2  # extra skew buffer below the job window floor for tests.all_test_runs partition prune
 
+# Bounds the IN-list sizes of one bulk classification query.
+PREMERGE_PAIR_CHUNK_SIZE = 500
+
 _PR_RE = re.compile(r"\(#(\d+)\)")
 
 
@@ -163,6 +166,35 @@ WHERE job_id IN {job_ids:Array(Int64)}
 """
 
 
+# Bulk variants of Step B and the file probe: one query covers every failing test of a
+# commit. file/name are filtered independently (a superset of the requested pairs);
+# the caller picks the requested (file, name) groups out of the result.
+PREMERGE_TESTS_BULK_SQL = """
+SELECT
+    file,
+    name,
+    sum(failure_count + error_count) AS fails,
+    sum(if(failure_count = 0 AND error_count = 0 AND skipped_count = 0, 1, 0)) AS successes,
+    sum(if(skipped_count > 0 AND failure_count = 0 AND error_count = 0, 1, 0)) AS skips,
+    count() AS rows
+FROM tests.all_test_runs
+WHERE job_id IN {job_ids:Array(Int64)}
+  AND toDate(time_inserted) >= toDate({tlow:DateTime})
+  AND file IN {files:Array(String)}
+  AND name IN {names:Array(String)}
+GROUP BY file, name
+"""
+
+PREMERGE_FILES_BULK_SQL = """
+SELECT file, count() AS rows
+FROM tests.all_test_runs
+WHERE job_id IN {job_ids:Array(Int64)}
+  AND toDate(time_inserted) >= toDate({tlow:DateTime})
+  AND file IN {files:Array(String)}
+GROUP BY file
+"""
+
+
 class PremergeContext(NamedTuple):
     """Per-commit pre-merge resolution shared across all of a commit's test signals.
     head_sha/merge_ts/job_ids depend only on the commit, so they are resolved once.
@@ -344,6 +376,103 @@ def classify_with_context(
         return "ERROR"
 
 
+def classify_many_with_context(
+    client: Client,
+    context: PremergeContext,
+    tests: Sequence[Tuple[str, str]],
+) -> Dict[Tuple[str, str], str]:
+    """Bulk classify_with_context: classify every test (file, name) of one commit with
+    one aggregate query (plus one file probe for tests without a verdict) per chunk of
+    PREMERGE_PAIR_CHUNK_SIZE tests, instead of up to two queries per test. Produces the
+    same statuses as classify_with_context; a failed query maps the tests it covered
+    to ERROR."""
+    if context.terminal_reason is not None:
+        return dict.fromkeys(tests, context.terminal_reason)
+
+    unique = sorted(set(tests))
+    statuses: Dict[Tuple[str, str], str] = {}
+    for i in range(0, len(unique), PREMERGE_PAIR_CHUNK_SIZE):
+        chunk = unique[i : i + PREMERGE_PAIR_CHUNK_SIZE]
+        statuses.update(_classify_chunk(client, context, chunk))
+    return statuses
+
+
+def _classify_chunk(
+    client: Client,
+    context: PremergeContext,
+    tests: List[Tuple[str, str]],
+) -> Dict[Tuple[str, str], str]:
+    files = sorted({file for file, _ in tests})
+    try:
+        test_rows = run_query(
+            client,
+            PREMERGE_TESTS_BULK_SQL,
+            {
+                "job_ids": context.job_ids,
+                "tlow": context.tlow,
+                "files": files,
+                "names": sorted({name for _, name in tests}),
+            },
+        )
+    except Exception as exc:
+        logger.warning(
+            "premerge bulk classify failed for %d tests: %s",
+            len(tests),
+            exc,
+            exc_info=True,
+        )
+        return dict.fromkeys(tests, "ERROR")
+
+    counts = {(r[0], r[1]): r[2:5] for r in test_rows}
+    statuses: Dict[Tuple[str, str], str] = {}
+    unresolved: List[Tuple[str, str]] = []
+    for test in tests:
+        r = counts.get(test)
+        if r is not None:
+            verdict = classify_counts(int(r[0] or 0), int(r[1] or 0), int(r[2] or 0))
+            if verdict is not None:
+                statuses[test] = verdict
+                continue
+        # Same fallbacks as classify_with_context: force_merge never masks a real
+        # verdict, otherwise the file probe separates td_deselected / not_in_matrix.
+        if context.force_merge:
+            statuses[test] = "NOT_RUN:force_merge"
+        else:
+            unresolved.append(test)
+
+    if not unresolved:
+        return statuses
+
+    try:
+        file_rows_res = run_query(
+            client,
+            PREMERGE_FILES_BULK_SQL,
+            {
+                "job_ids": context.job_ids,
+                "tlow": context.tlow,
+                "files": sorted({file for file, _ in unresolved}),
+            },
+        )
+    except Exception as exc:
+        logger.warning(
+            "premerge bulk file probe failed for %d tests: %s",
+            len(unresolved),
+            exc,
+            exc_info=True,
+        )
+        statuses.update(dict.fromkeys(unresolved, "ERROR"))
+        return statuses
+
+    file_rows = {r[0]: int(r[1] or 0) for r in file_rows_res}
+    for test in unresolved:
+        statuses[test] = (
+            "NOT_RUN:td_deselected"
+            if file_rows.get(test[0], 0) > 0
+            else "NOT_RUN:not_in_matrix"
+        )
+    return statuses
+
+
 def classify_premerge(
     client: Client,
     commit_sha: str,
@@ -353,6 +482,7 @@ def classify_premerge(
 ) -> str:
     """Classify the pre-merge trunk-gate status of test (file, name) for merged commit M.
     Convenience wrapper resolving the per-commit context and classifying one test; the
-    collect loop resolves the context once per commit and calls classify_with_context."""
+    collect loop resolves the context once per commit and calls
+    classify_many_with_context."""
     context = resolve_premerge_context(client, commit_sha, repo)
     return classify_with_context(client, context, file, name)
@@ -3,14 +3,24 @@ import io
 import logging
 import os
 import sys
+from datetime import date, datetime
 from typing import List, Optional
 
 from .aggregate import aggregate
 from .assets import get_chartjs
-from .load import load_records, ReportInputError
+from .load import load_records, load_store_records, ReportInputError
 from .render import render
 
 
+def parse_date(value: str) -> date:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(
+            f"invalid date '{value}', expected YYYY-MM-DD"
+        ) from exc
+
+
 def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         prog="flake-report",
@@ -19,7 +29,27 @@ def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
             "CSV (flakiness and regression rankings and time-series)."
         ),
     )
-    parser.add_argument("--input", required=True, help="path to the source CSV")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="path to the source CSV")
+    source.add_argument(
+        "--store",
+        help="path to a flake-test-fail-autorevert --store file (read directly)",
+    )
+    parser.add_argument(
+        "--repo", default="pytorch/pytorch", help="repo to read from --store"
+    )
+    parser.add_argument(
+        "--start",
+        type=parse_date,
+        default=None,
+        help="with --store, first day YYYY-MM-DD (default: first stored day)",
+    )
+    parser.add_argument(
+        "--end",
+        type=parse_date,
+        default=None,
+        help="with --store, last day YYYY-MM-DD inclusive (default: last stored day)",
+    )
     parser.add_argument(
         "--output",
         default=None,
@@ -39,6 +69,10 @@ def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     args = parser.parse_args(argv)
     if args.top < 1:
         parser.error(f"--top ({args.top}) must be >= 1")
+    if args.input and (args.start or args.end):
+        parser.error("--start/--end only apply to --store")
+    if args.start and args.end and args.start > args.end:
+        parser.error(f"--start ({args.start}) must be <= --end ({args.end})")
     return args
 
 
@@ -66,17 +100,20 @@ def main(argv: Optional[List[str]] = None) -> int:
     )
     args = parse_args(argv)
 
-    text = _read_input(args.input)
+    source_path = args.input or args.store
     try:
-        records = load_records(io.StringIO(text))
+        if args.input:
+            records = load_records(io.StringIO(_read_input(args.input)))
+        else:
+            records = load_store_records(args.store, args.repo, args.start, args.end)
     except ReportInputError as exc:
         raise SystemExit(f"error: {exc}")
 
-    datasets = aggregate(records, source=os.path.basename(args.input))
+    datasets = aggregate(records, source=os.path.basename(source_path))
     chartjs = get_chartjs(args.no_charts)
     html = render(datasets, title=args.title, chartjs=chartjs, top=args.top)
 
-    output = args.output or default_output(args.input)
+    output = args.output or default_output(source_path)
     try:
         with open(output, "w", encoding="utf-8") as f:
             f.write(html)
@@ -1,6 +1,6 @@
 from collections import Counter
 from dataclasses import dataclass, replace
-from typing import Dict, List, Set, Tuple
+from typing import Dict, Iterable, List, Set, Tuple
 
 from .load import Record
 
@@ -156,99 +156,105 @@ class Datasets:
     meta: Meta
 
 
-def _by_category(records: List[Record], category: str) -> List[Record]:
-    return [r for r in records if r.category == category]
-
-
-def _distinct_commits_by_day(records: List[Record], days: List[str]) -> List[int]:
-    seen: Dict[str, Set[str]] = {day: set() for day in days}
-    for r in records:
-        seen[r.day].add(r.commit_sha)
-    return [len(seen[day]) for day in days]
-
-
-def _rows_by_day(records: List[Record], days: List[str]) -> List[int]:
-    counts: Counter = Counter(r.day for r in records)
-    return [counts.get(day, 0) for day in days]
-
-
-def _rank(records: List[Record], attr: str) -> List[RankRow]:
-    counts: Counter = Counter(getattr(r, attr) for r in records)
+class _CategoryAgg:
+    """Per-category counters filled in the single pass over the records."""
+
+    def __init__(self) -> None:
+        self.rows = 0
+        self.commits_by_day: Dict[str, Set[str]] = {}
+        self.rows_by_day: Counter = Counter()
+        self.by_signal: Counter = Counter()
+        self.by_workflow: Counter = Counter()
+        # signal_key -> (commit_time, verdict) of the latest non-blank verdict;
+        # ties go to the later record, as in input order.
+        self.latest_verdict: Dict[str, Tuple[str, str]] = {}
+
+    def add(self, r: Record, day: str) -> None:
+        self.rows += 1
+        self.commits_by_day.setdefault(day, set()).add(r.commit_sha)
+        self.rows_by_day[day] += 1
+        self.by_signal[r.signal_key] += 1
+        self.by_workflow[r.workflow] += 1
+        if r.advisor_verdict:
+            prev = self.latest_verdict.get(r.signal_key)
+            if prev is None or r.commit_time >= prev[0]:
+                self.latest_verdict[r.signal_key] = (r.commit_time, r.advisor_verdict)
+
+    def commits_series(self, days: List[str]) -> List[int]:
+        return [len(self.commits_by_day.get(day, ())) for day in days]
+
+    def rows_series(self, days: List[str]) -> List[int]:
+        return [self.rows_by_day.get(day, 0) for day in days]
+
+    def rank_signals(self, with_verdict: bool = False) -> List[RankRow]:
+        base = _rank(self.by_signal)
+        if not with_verdict:
+            return base
+        return [
+            RankRow(
+                name=row.name,
+                count=row.count,
+                verdict=self.latest_verdict.get(row.name, ("", ""))[1],
+            )
+            for row in base
+        ]
+
+    def rank_workflows(self) -> List[RankRow]:
+        return _rank(self.by_workflow)
+
+
+def _rank(counts: Counter) -> List[RankRow]:
     ordered = sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))
     return [RankRow(name=name, count=count) for name, count in ordered]
 
 
-def _latest_verdict_by_signal(records: List[Record]) -> Dict[str, str]:
-    latest: Dict[str, Tuple[str, str]] = {}
-    for r in records:
-        if not r.advisor_verdict:
-            continue
-        prev = latest.get(r.signal_key)
-        if prev is None or r.commit_time >= prev[0]:
-            latest[r.signal_key] = (r.commit_time, r.advisor_verdict)
-    return {key: verdict for key, (_, verdict) in latest.items()}
-
-
-def _rank_signals_with_verdict(records: List[Record]) -> List[RankRow]:
-    verdicts = _latest_verdict_by_signal(records)
-    base = _rank(records, "signal_key")
-    return [
-        RankRow(name=row.name, count=row.count, verdict=verdicts.get(row.name, ""))
-        for row in base
-    ]
-
-
-def _sorted_union_days(records: List[Record]) -> List[str]:
-    return sorted({r.day for r in records})
-
-
-def _build_meta(source: str, records: List[Record], days: List[str]) -> Meta:
-    regressions = _by_category(records, CATEGORY_REGRESSION)
-    flaky = _by_category(records, CATEGORY_FLAKY)
-    return Meta(
-        source=source,
-        total_rows=len(records),
-        distinct_commits=len({r.commit_sha for r in records}),
-        regression_rows=len(regressions),
-        flaky_rows=len(flaky),
-        min_day=days[0] if days else "",
-        max_day=days[-1] if days else "",
-    )
-
+def aggregate(records: Iterable[Record], source: str) -> Datasets:
+    flaky = _CategoryAgg()
+    regressions = _CategoryAgg()
+    by_category = {CATEGORY_FLAKY: flaky, CATEGORY_REGRESSION: regressions}
+    day_set: Set[str] = set()
+    commits: Set[str] = set()
+    total_rows = 0
+    eligible: List[Record] = []
 
-def _apply_report_remap(records: List[Record]) -> List[Record]:
-    remapped = []
+    # One pass: every dataset is accumulated here instead of re-scanning the
+    # records per category / per series.
     for r in records:
-        target = _REPORT_STATUS_REMAP.get(r.premerge_status)
-        remapped.append(replace(r, premerge_status=target) if target else r)
-    return remapped
-
-
-def aggregate(records: List[Record], source: str) -> Datasets:
-    records = _apply_report_remap(records)
-    days = _sorted_union_days(records)
-    flaky = _by_category(records, CATEGORY_FLAKY)
-    regressions = _by_category(records, CATEGORY_REGRESSION)
-
+        total_rows += 1
+        day = r.day
+        day_set.add(day)
+        commits.add(r.commit_sha)
+        agg = by_category.get(r.category)
+        if agg is not None:
+            agg.add(r, day)
+        if r.premerge_status:
+            target = _REPORT_STATUS_REMAP.get(r.premerge_status)
+            eligible.append(replace(r, premerge_status=target) if target else r)
+
+    days = sorted(day_set)
     return Datasets(
         days=days,
-        flaky_commits_by_day=_distinct_commits_by_day(flaky, days),
-        flaky_signals_by_day=_rows_by_day(flaky, days),
-        flaky_rank_by_signal=_rank(flaky, "signal_key"),
-        flaky_rank_by_workflow=_rank(flaky, "workflow"),
-        regression_commits_by_day=_distinct_commits_by_day(regressions, days),
-        regression_signals_by_day=_rows_by_day(regressions, days),
-        regression_rank_by_signal=_rank_signals_with_verdict(regressions),
-        regression_rank_by_workflow=_rank(regressions, "workflow"),
-        premerge=_build_premerge(records),
-        meta=_build_meta(source, records, days),
+        flaky_commits_by_day=flaky.commits_series(days),
+        flaky_signals_by_day=flaky.rows_series(days),
+        flaky_rank_by_signal=flaky.rank_signals(),
+        flaky_rank_by_workflow=flaky.rank_workflows(),
+        regression_commits_by_day=regressions.commits_series(days),
+        regression_signals_by_day=regressions.rows_series(days),
+        regression_rank_by_signal=regressions.rank_signals(with_verdict=True),
+        regression_rank_by_workflow=regressions.rank_workflows(),
+        premerge=_build_premerge(eligible),
+        meta=Meta(
+            source=source,
+            total_rows=total_rows,
+            distinct_commits=len(commits),
+            regression_rows=regressions.rows,
+            flaky_rows=flaky.rows,
+            min_day=days[0] if days else "",
+            max_day=days[-1] if days else "",
+        ),
     )
 
 
-def _premerge_eligible(records: List[Record]) -> List[Record]:
-    return [r for r in records if r.premerge_status]
-
-
 def _premerge_buckets(eligible: List[Record]) -> PremergeBuckets:
     counts: Counter = Counter(r.premerge_status for r in eligible)
     td_deselected = counts.get(PREMERGE_STATUS_TD_DESELECTED, 0)
@@ -341,8 +347,7 @@ def _premerge_td_commit_counts(eligible: List[Record]) -> Tuple[int, int]:
     return green_would_be_red, td_commits
 
 
-def _build_premerge(records: List[Record]) -> PremergeData:
-    eligible = _premerge_eligible(records)
+def _build_premerge(eligible: List[Record]) -> PremergeData:
     winner = _commit_winning_status(eligible)
     total_eligible_commits = len({r.commit_sha for r in eligible})
     breakdown = _premerge_breakdown(eligible, winner)
@@ -1,9 +1,13 @@
 import csv
+import os
+import sqlite3
 import sys
 from dataclasses import dataclass
-from typing import Iterable, List
+from datetime import date
+from typing import Iterable, List, Optional
 
 from ..logic import COLUMNS as EXPECTED_COLUMNS
+from ..store import DayStore
 
 
 def _raise_field_size_limit() -> None:
@@ -70,3 +74,25 @@ def load_records(lines: Iterable[str]) -> List[Record]:
     except csv.Error as exc:
         raise ReportInputError(f"Malformed CSV: {exc}") from exc
     return records
+
+
+def load_store_records(
+    path: str,
+    repo: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> List[Record]:
+    """Read records for [start, end] straight from a --store file (no CSV round
+    trip). Either bound defaults to the first / last day stored for repo."""
+    if not os.path.isfile(path):
+        raise ReportInputError(f"Store not found: {path}")
+    try:
+        with DayStore(path, readonly=True) as store:
+            stored = store.day_range(repo)
+            if stored is None:
+                return []
+            start = start or stored[0]
+            end = end or stored[1]
+            return [Record(*row) for row in store.iter_rows(repo, start, end)]
+    except sqlite3.DatabaseError as exc:
+        raise ReportInputError(f"Cannot read store {path}: {exc}") from exc
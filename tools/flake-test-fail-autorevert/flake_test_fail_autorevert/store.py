@@ -0,0 +1,132 @@
+"""Per-day partition store for exported rows.
+
+Rows are keyed by (repo, commit landing day). A day is only written once it has
+settled - autorevert can still revert or flag a commit for a few days after it
+lands - so a stored day never needs to be fetched from ClickHouse again and a
+rolling window only queries the days it has not seen yet.
+
+The store is a cache of ClickHouse results: a file written by an older schema
+version is dropped and rebuilt rather than migrated.
+"""
+
+import sqlite3
+from datetime import date, datetime, timezone
+from typing import Iterable, Iterator, List, Mapping, Optional, Set, Tuple
+
+from .logic import COLUMNS
+
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS days (
+    repo TEXT NOT NULL,
+    day TEXT NOT NULL,
+    fetched_at TEXT NOT NULL,
+    PRIMARY KEY (repo, day)
+);
+CREATE TABLE IF NOT EXISTS rows (
+    repo TEXT NOT NULL,
+    day TEXT NOT NULL,
+    {", ".join(f"{c} TEXT NOT NULL" for c in COLUMNS)}
+);
+CREATE INDEX IF NOT EXISTS rows_repo_day ON rows (repo, day);
+"""
+
+# Same order as logic.row_sort_key, so stored rows come back as build_rows emits them.
+_ORDER_BY = "commit_time, category, workflow, signal_key, commit_sha"
+
+
+class DayStore:
+    def __init__(self, path: str, readonly: bool = False) -> None:
+        self.path = path
+        if readonly:
+            self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        else:
+            self._conn = sqlite3.connect(path)
+        self._init_schema(readonly)
+
+    def _init_schema(self, readonly: bool) -> None:
+        (version,) = self._conn.execute("PRAGMA user_version").fetchone()
+        if version == SCHEMA_VERSION:
+            return
+        if readonly:
+            raise sqlite3.DatabaseError(
+                f"store schema version {version}, expected {SCHEMA_VERSION}"
+            )
+        with self._conn:
+            # 0 is a fresh file; anything else is an older layout to rebuild.
+            if version != 0:
+                self._conn.execute("DROP TABLE IF EXISTS rows")
+                self._conn.execute("DROP TABLE IF EXISTS days")
+            self._conn.executescript(_SCHEMA)
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "DayStore":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def stored_days(self, repo: str, start: date, end: date) -> Set[date]:
+        cur = self._conn.execute(
+            "SELECT day FROM days WHERE repo = ? AND day BETWEEN ? AND ?",
+            (repo, start.isoformat(), end.isoformat()),
+        )
+        return {date.fromisoformat(day) for (day,) in cur}
+
+    def day_range(self, repo: str) -> Optional[Tuple[date, date]]:
+        lo, hi = self._conn.execute(
+            "SELECT MIN(day), MAX(day) FROM days WHERE repo = ?", (repo,)
+        ).fetchone()
+        if lo is None:
+            return None
+        return date.fromisoformat(lo), date.fromisoformat(hi)
+
+    def replace_days(
+        self, repo: str, days: Iterable[date], rows: Iterable[Mapping[str, str]]
+    ) -> None:
+        """Atomically replace the partitions for days with rows.
+
+        Every row must land on one of days; a day with no rows is still recorded
+        so it is not fetched again.
+        """
+        keys = {d.isoformat() for d in days}
+        if not keys:
+            return
+        fetched_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        values = []
+        for r in rows:
+            day = r["commit_time"][:10]
+            if day not in keys:
+                raise ValueError(f"row for {day} is outside the replaced days")
+            values.append((repo, day, *(r.get(c, "") for c in COLUMNS)))
+        placeholders = ", ".join("?" * (len(COLUMNS) + 2))
+        with self._conn:
+            self._conn.executemany(
+                "DELETE FROM rows WHERE repo = ? AND day = ?",
+                [(repo, day) for day in sorted(keys)],
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO days (repo, day, fetched_at) VALUES (?, ?, ?)",
+                [(repo, day, fetched_at) for day in sorted(keys)],
+            )
+            self._conn.executemany(
+                f"INSERT INTO rows (repo, day, {', '.join(COLUMNS)}) "
+                f"VALUES ({placeholders})",
+                values,
+            )
+
+    def iter_rows(self, repo: str, start: date, end: date) -> Iterator[Tuple[str, ...]]:
+        """Yield stored rows in [start, end] as tuples in COLUMNS order."""
+        return self._conn.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM rows "
+            f"WHERE repo = ? AND day BETWEEN ? AND ? ORDER BY {_ORDER_BY}",
+            (repo, start.isoformat(), end.isoformat()),
+        )
+
+    def load_rows(self, repo: str, start: date, end: date) -> List[dict]:
+        return [dict(zip(COLUMNS, row)) for row in self.iter_rows(repo, start, end)]
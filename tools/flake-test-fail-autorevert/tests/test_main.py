@@ -1,5 +1,5 @@
 import argparse
-from datetime import date, datetime, timezone
+from datetime import date, datetime, timedelta, timezone
 from typing import Any, Dict, List, Tuple
 
 import flake_test_fail_autorevert.__main__ as m
@@ -22,11 +22,11 @@ def test_context_resolved_once_per_commit_via_collect(monkeypatch) -> None:
         resolves.append(commit_sha)
         return PremergeContext("h", TS, TS, [1], False, None)
 
-    classifies: List[Tuple[str, str]] = []
+    classifies: List[List[Tuple[str, str]]] = []
 
-    def fake_classify(client, context, file, name):
-        classifies.append((file, name))
-        return "RUN_FAILED"
+    def fake_classify_many(client, context, tests):
+        classifies.append(list(tests))
+        return dict.fromkeys(tests, "RUN_FAILED")
 
     sha = "Z" * 40
     rows = [
@@ -48,7 +48,7 @@ def test_context_resolved_once_per_commit_via_collect(monkeypatch) -> None:
     monkeypatch.setattr(m, "build_rows", lambda *a, **k: rows)
     monkeypatch.setattr(m, "iter_time_chunks", lambda *a, **k: iter(()))
     monkeypatch.setattr(m, "resolve_premerge_context", fake_resolve)
-    monkeypatch.setattr(m, "classify_with_context", fake_classify)
+    monkeypatch.setattr(m, "classify_many_with_context", fake_classify_many)
 
     args = argparse.Namespace(
         start=date(2026, 7, 1),
@@ -59,7 +59,8 @@ def test_context_resolved_once_per_commit_via_collect(monkeypatch) -> None:
     result = m.collect(args)
 
     assert resolves == [sha]  # resolved exactly once for all 4 signals
-    assert len(classifies) == 4  # classified per signal
+    # classified in one bulk call covering all 4 signals
+    assert classifies == [[(f"test_{i}.py", "t") for i in range(4)]]
     assert all(r["premerge_status"] == "RUN_FAILED" for r in result)
 
 
@@ -102,3 +103,122 @@ def test_flaky_only_commit_gets_empty_premerge_status(monkeypatch) -> None:
 
     assert resolves == []  # no premerge resolution for flaky rows
     assert result[0]["premerge_status"] == ""
+
+
+def test_flaky_chunks_fetched_concurrently_in_order(monkeypatch) -> None:
+    # Chunks run on a bounded thread pool, each worker on its own client, but are
+    # merged in chunk order so the flaky map matches the sequential scan.
+    day = datetime(2026, 7, 1)
+    chunks = [
+        (day + timedelta(hours=h), day + timedelta(hours=h + 6)) for h in (0, 6, 12, 18)
+    ]
+    fetched: List[datetime] = []
+
+    def fake_fetch(client, repo, chunk_start, chunk_end):
+        fetched.append(chunk_start)
+        return {("trunk", f"test_{chunk_start.hour}.py::t", "S" * 40)}
+
+    captured: Dict[str, Any] = {}
+
+    def fake_build_rows(regressions, single, flaky, *a, **k):
+        captured["flaky"] = flaky
+        return []
+
+    monkeypatch.setattr(m, "get_clickhouse_client", lambda: object())
+    monkeypatch.setattr(m, "fetch_regressions", lambda *a, **k: _StubReg())
+    monkeypatch.setattr(m, "fetch_flaky_for_day", fake_fetch)
+    monkeypatch.setattr(m, "fetch_commit_times", lambda *a, **k: {})
+    monkeypatch.setattr(m, "fetch_advisor_verdicts", lambda *a, **k: {})
+    monkeypatch.setattr(m, "fetch_commit_messages", lambda *a, **k: {})
+    monkeypatch.setattr(m, "build_rows", fake_build_rows)
+    monkeypatch.setattr(m, "iter_time_chunks", lambda *a, **k: iter(chunks))
+
+    args = argparse.Namespace(
+        start=date(2026, 7, 1),
+        end=date(2026, 7, 1),
+        repo="pytorch/pytorch",
+        output=None,
+    )
+    m.collect(args)
+
+    assert sorted(fetched) == [c[0] for c in chunks]
+    assert captured["flaky"] == {
+        "S" * 40: {("trunk", f"test_{h}.py::t") for h in (0, 6, 12, 18)}
+    }
+
+
+def test_store_fetches_only_missing_days_and_persists_settled(
+    monkeypatch, tmp_path
+) -> None:
+    # Days already in the store are read back, each contiguous run of missing days
+    # is collected once, and only settled days are written to the store.
+    store = m.DayStore(str(tmp_path / "s.sqlite"))
+    store.replace_days(
+        "pytorch/pytorch",
+        [date(2026, 7, 2)],
+        [
+            {
+                "commit_sha": "B" * 40,
+                "commit_url": "u",
+                "commit_time": "2026-07-02 10:00:00",
+                "category": "flaky",
+                "workflow": "trunk",
+                "signal_key": "stored.py::t",
+            }
+        ],
+    )
+    collected: List[Tuple[date, date]] = []
+
+    def fake_collect(args):
+        collected.append((args.start, args.end))
+        return [
+            {
+                "commit_sha": "C" * 40,
+                "commit_url": "u",
+                "commit_time": f"{day.isoformat()} 10:00:00",
+                "category": "flaky",
+                "workflow": "trunk",
+                "signal_key": "fetched.py::t",
+                "advisor_verdict": "",
+                "advisor_confidence": "",
+                "premerge_status": "",
+            }
+            for day in m.iter_days(args.start, args.end)
+        ]
+
+    monkeypatch.setattr(m, "collect", fake_collect)
+    args = argparse.Namespace(
+        start=date(2026, 7, 1),
+        end=date(2026, 7, 5),
+        repo="pytorch/pytorch",
+        output=None,
+        store=store.path,
+        refresh=False,
+    )
+    # 07-08 minus SETTLE_DAYS: days up to 07-05 are settled.
+    today = date(2026, 7, 5) + timedelta(days=m.SETTLE_DAYS)
+    rows = m.collect_incremental(args, store, today)
+
+    assert collected == [
+        (date(2026, 7, 1), date(2026, 7, 1)),
+        (date(2026, 7, 3), date(2026, 7, 5)),
+    ]
+    assert [(r["commit_time"][:10], r["signal_key"]) for r in rows] == [
+        ("2026-07-01", "fetched.py::t"),
+        ("2026-07-02", "stored.py::t"),
+        ("2026-07-03", "fetched.py::t"),
+        ("2026-07-04", "fetched.py::t"),
+        ("2026-07-05", "fetched.py::t"),
+    ]
+
+    # Re-running the same range: every day is settled and stored, nothing is fetched.
+    collected.clear()
+    assert m.collect_incremental(args, store, today) == rows
+    assert collected == []
+
+    # An unsettled tail day is fetched but never persisted.
+    args.end = date(2026, 7, 6)
+    m.collect_incremental(args, store, today)
+    m.collect_incremental(args, store, today)
+    assert collected == [(date(2026, 7, 6), date(2026, 7, 6))] * 2
+    store.close()
@@ -4,6 +4,7 @@ from typing import Any, Dict, List, Optional, Tuple
 from flake_test_fail_autorevert.premerge import (
     _to_utc,
     classify_counts,
+    classify_many_with_context,
     classify_premerge,
     parse_pr_from_message,
     resolve_premerge_context,
@@ -78,8 +79,8 @@ class _Result:
 
 class ScriptedClient:
     """Returns canned result_rows keyed by which premerge SQL is executing.
-    responses: dict with keys 'head','head_by_pr','msg','ts','jobs','test','file' ->
-    list of tuples. The 'head'/'head_by_pr' rows are (last_commit_sha,
+    responses: dict with keys 'head','head_by_pr','msg','ts','jobs','test','file',
+    'tests','files' -> list of tuples ('tests'/'files' are the bulk variants). The 'head'/'head_by_pr' rows are (last_commit_sha,
     skip_mandatory_checks) tuples; a bare (sha,) tuple is treated as a non-force merge.
     'msg' rows are (commit_message,) tuples. Missing key defaults to []."""
 
@@ -105,8 +106,12 @@ class ScriptedClient:
             key = "ts"
         elif "default.workflow_job" in query:
             key = "jobs"
+        elif "failure_count + error_count" in query and "name IN" in query:
+            key = "tests"
         elif "failure_count + error_count" in query:
             key = "test"
+        elif "file IN" in query:
+            key = "files"
         else:
             key = "file"
         return _Result(self.responses.get(key, []))
@@ -594,3 +599,96 @@ def test_parse_pr_from_revert_title_returns_original_pr():
     # a pre-merge head by. The guard, not the parser, prevents the misresolution.
     title = 'Revert "[nonstrict trace] use _LeafCallable (#175017)"'
     assert parse_pr_from_message(title) == 175017
+
+
+# --- Part G: bulk classification matches per-test classification ---
+
+_BULK_TESTS = [
+    ("test_a.py", "TestA::test_fail"),
+    ("test_a.py", "TestA::test_pass"),
+    ("test_a.py", "TestA::test_skip"),
+    ("test_a.py", "TestA::test_deselected"),
+    ("test_b.py", "TestB::test_missing"),
+]
+
+
+def _bulk_responses(force: bool) -> Dict[str, List[Tuple[Any, ...]]]:
+    per_test = {
+        "TestA::test_fail": (2, 1, 0, 3),
+        "TestA::test_pass": (0, 2, 0, 2),
+        "TestA::test_skip": (0, 0, 2, 2),
+    }
+    return {
+        "head": [("h", force)],
+        "ts": [(TS,)],
+        "jobs": [(1,), (2,)],
+        "tests": [("test_a.py", name, *counts) for name, counts in per_test.items()]
+        # Cross-product superset row that was not requested must be ignored.
+        + [("test_b.py", "TestA::test_fail", 1, 0, 0, 1)],
+        "files": [("test_a.py", 42)],
+    }
+
+
+def _per_test_client(
+    responses: Dict[str, List[Tuple[Any, ...]]], file: str, name: str
+) -> ScriptedClient:
+    rows = [r for r in responses["tests"] if (r[0], r[1]) == (file, name)]
+    file_rows = [r for r in responses["files"] if r[0] == file]
+    return ScriptedClient(
+        {
+            "head": responses["head"],
+            "ts": responses["ts"],
+            "jobs": responses["jobs"],
+            "test": [r[2:] for r in rows],
+            "file": [(file_rows[0][1],)] if file_rows else [(0,)],
+        }
+    )
+
+
+def test_bulk_matches_per_test_classification():
+    for force in (False, True):
+        responses = _bulk_responses(force)
+        client = ScriptedClient(responses)
+        ctx = resolve_premerge_context(client, "M" * 40)
+        bulk = classify_many_with_context(client, ctx, _BULK_TESTS)
+        for file, name in _BULK_TESTS:
+            expected = classify_premerge(
+                _per_test_client(responses, file, name), "M" * 40, file, name
+            )
+            assert bulk[(file, name)] == expected, (force, file, name)
+
+
+def test_bulk_issues_one_query_per_kind():
+    client = ScriptedClient(_bulk_responses(False))
+    ctx = resolve_premerge_context(client, "M" * 40)
+    n_before = len(client.queries)
+    bulk = classify_many_with_context(client, ctx, _BULK_TESTS)
+    assert len(client.queries) - n_before == 2  # one aggregate + one file probe
+    assert bulk[("test_a.py", "TestA::test_deselected")] == "NOT_RUN:td_deselected"
+    assert bulk[("test_b.py", "TestB::test_missing")] == "NOT_RUN:not_in_matrix"
+
+
+def test_bulk_skips_file_probe_when_all_resolved():
+    client = ScriptedClient(_bulk_responses(True))
+    ctx = resolve_premerge_context(client, "M" * 40)
+    n_before = len(client.queries)
+    classify_many_with_context(client, ctx, _BULK_TESTS)
+    assert len(client.queries) - n_before == 1
+
+
+def test_bulk_terminal_context_no_query():
+    client = ScriptedClient({"head": []})
+    ctx = resolve_premerge_context(client, "M" * 40)
+    n_before = len(client.queries)
+    bulk = classify_many_with_context(client, ctx, _BULK_TESTS)
+    assert len(client.queries) == n_before
+    assert set(bulk.values()) == {"NOT_RUN:no_merge_record"}
+
+
+def test_bulk_error_on_query_exception():
+    ctx = resolve_premerge_context(
+        ScriptedClient({"head": [("h", False)], "ts": [(TS,)], "jobs": [(1,)]}),
+        "M" * 40,
+    )
+    bulk = classify_many_with_context(BoomClient(), ctx, _BULK_TESTS)
+    assert set(bulk.values()) == {"ERROR"}
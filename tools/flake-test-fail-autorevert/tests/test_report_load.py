@@ -1,12 +1,15 @@
 import csv
 import io
+from datetime import date
 
 import pytest
 from flake_test_fail_autorevert.report.load import (
     EXPECTED_COLUMNS,
     load_records,
+    load_store_records,
     ReportInputError,
 )
+from flake_test_fail_autorevert.store import DayStore
 
 
 HEADER = ",".join(EXPECTED_COLUMNS)
@@ -111,3 +114,34 @@ def test_malformed_csv_raises_clean_error():
     csv_text = HEADER + "\n" + '"unterminated quote,field\n'
     with pytest.raises(ReportInputError):
         load_records(io.StringIO(csv_text))
+
+
+def test_store_records_match_csv_records(tmp_path):
+    path = str(tmp_path / "s.sqlite")
+    lines = [
+        HEADER,
+        _row(sha="a" * 40, time="2026-07-01 10:00:00"),
+        _row(sha="b" * 40, time="2026-07-02 10:00:00", category="regression"),
+        _row(sha="c" * 40, time="2026-07-03 10:00:00", premerge="RUN_FAILED"),
+    ]
+    expected = load_records(lines)
+    rows = [dict(zip(EXPECTED_COLUMNS, next(csv.reader([line])))) for line in lines[1:]]
+    with DayStore(path) as store:
+        store.replace_days(
+            "pytorch/pytorch", [date(2026, 7, d) for d in (1, 2, 3)], rows
+        )
+
+    assert load_store_records(path, "pytorch/pytorch") == expected
+    assert load_store_records(
+        path, "pytorch/pytorch", start=date(2026, 7, 2), end=date(2026, 7, 2)
+    ) == [expected[1]]
+    assert load_store_records(path, "other/repo") == []
+
+
+def test_store_missing_or_foreign_file_raises_clean_error(tmp_path):
+    with pytest.raises(ReportInputError):
+        load_store_records(str(tmp_path / "missing.sqlite"), "pytorch/pytorch")
+    foreign = tmp_path / "foreign.sqlite"
+    foreign.write_text("not a database")
+    with pytest.raises(ReportInputError):
+        load_store_records(str(foreign), "pytorch/pytorch")
@@ -0,0 +1,117 @@
+import sqlite3
+from datetime import date
+
+import pytest
+from flake_test_fail_autorevert.logic import COLUMNS, contiguous_ranges, iter_days
+from flake_test_fail_autorevert.store import DayStore, SCHEMA_VERSION
+
+
+REPO = "pytorch/pytorch"
+
+
+def _row(sha, time, category="flaky", signal="f.py::t", workflow="trunk"):
+    return {
+        "commit_sha": sha,
+        "commit_url": f"https://github.com/{REPO}/commit/{sha}",
+        "commit_time": time,
+        "category": category,
+        "workflow": workflow,
+        "signal_key": signal,
+        "advisor_verdict": "",
+        "advisor_confidence": "",
+        "premerge_status": "",
+    }
+
+
+def test_iter_days_inclusive():
+    assert list(iter_days(date(2026, 6, 30), date(2026, 7, 2))) == [
+        date(2026, 6, 30),
+        date(2026, 7, 1),
+        date(2026, 7, 2),
+    ]
+    assert list(iter_days(date(2026, 7, 2), date(2026, 7, 1))) == []
+
+
+def test_contiguous_ranges():
+    days = [date(2026, 7, d) for d in (5, 1, 2, 3, 7, 8)]
+    assert contiguous_ranges(days) == [
+        (date(2026, 7, 1), date(2026, 7, 3)),
+        (date(2026, 7, 5), date(2026, 7, 5)),
+        (date(2026, 7, 7), date(2026, 7, 8)),
+    ]
+    assert contiguous_ranges([]) == []
+
+
+def test_round_trip_sorted_and_empty_days_recorded(tmp_path):
+    path = str(tmp_path / "s.sqlite")
+    rows = [
+        _row("b" * 40, "2026-07-02 09:00:00"),
+        _row("a" * 40, "2026-07-01 10:00:00", category="regression"),
+        _row("a" * 40, "2026-07-01 10:00:00"),
+    ]
+    days = [date(2026, 7, 1), date(2026, 7, 2), date(2026, 7, 3)]
+    with DayStore(path) as store:
+        store.replace_days(REPO, days, rows)
+
+    with DayStore(path) as store:
+        assert store.stored_days(REPO, date(2026, 7, 1), date(2026, 7, 31)) == set(days)
+        assert not store.stored_days("other/repo", date(2026, 7, 1), date(2026, 7, 31))
+        assert store.day_range(REPO) == (date(2026, 7, 1), date(2026, 7, 3))
+        loaded = store.load_rows(REPO, date(2026, 7, 1), date(2026, 7, 3))
+    assert [(r["commit_time"], r["category"]) for r in loaded] == [
+        ("2026-07-01 10:00:00", "flaky"),
+        ("2026-07-01 10:00:00", "regression"),
+        ("2026-07-02 09:00:00", "flaky"),
+    ]
+    assert list(loaded[0]) == COLUMNS
+
+
+def test_replace_days_overwrites_partition_only(tmp_path):
+    with DayStore(str(tmp_path / "s.sqlite")) as store:
+        store.replace_days(
+            REPO,
+            [date(2026, 7, 1), date(2026, 7, 2)],
+            [
+                _row("a" * 40, "2026-07-01 10:00:00", signal="old.py::t"),
+                _row("b" * 40, "2026-07-02 10:00:00"),
+            ],
+        )
+        store.replace_days(
+            REPO,
+            [date(2026, 7, 1)],
+            [_row("a" * 40, "2026-07-01 10:00:00", signal="new.py::t")],
+        )
+        loaded = store.load_rows(REPO, date(2026, 7, 1), date(2026, 7, 2))
+    assert [r["signal_key"] for r in loaded] == ["new.py::t", "f.py::t"]
+
+
+def test_replace_days_rejects_rows_outside_days(tmp_path):
+    with DayStore(str(tmp_path / "s.sqlite")) as store:
+        with pytest.raises(ValueError):
+            store.replace_days(
+                REPO, [date(2026, 7, 1)], [_row("a" * 40, "2026-07-02 10:00:00")]
+            )
+        assert store.day_range(REPO) is None
+
+
+def test_older_schema_is_rebuilt(tmp_path):
+    path = str(tmp_path / "s.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE rows (x TEXT)")
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION + 100}")
+    conn.commit()
+    conn.close()
+
+    with DayStore(path) as store:
+        assert store.day_range(REPO) is None
+        store.replace_days(
+            REPO, [date(2026, 7, 1)], [_row("a" * 40, "2026-07-01 10:00:00")]
+        )
+        assert len(store.load_rows(REPO, date(2026, 7, 1), date(2026, 7, 1))) == 1
+
+
+def test_readonly_rejects_unknown_schema(tmp_path):
+    path = str(tmp_path / "s.sqlite")
+    sqlite3.connect(path).close()
+    with pytest.raises(sqlite3.DatabaseError):
+        DayStore(path, readonly=True)
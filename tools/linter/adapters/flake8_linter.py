@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import argparse
+import glob
 import json
 import logging
 import os
@@ -11,6 +12,8 @@ import time
 from enum import Enum
 from typing import Any, NamedTuple
 
+from lint_cache import config_salt, default_cache_dir, dist_salt, ResultCache
+
 
 IS_WINDOWS: bool = os.name == "nt"
 
@@ -305,6 +308,47 @@ def check_files(
     ]
 
 
+def check_files_cached(
+    filenames: list[str],
+    flake8_plugins_path: str | None,
+    severities: dict[str, LintSeverity],
+    retries: int,
+    cache_dir: str,
+) -> list[LintMessage]:
+    salt = [
+        # flake8 and every installed plugin
+        *dist_salt(
+            lambda dist: dist.metadata["Name"] == "flake8"
+            or any(ep.group.startswith("flake8.") for ep in dist.entry_points)
+        ),
+        *config_salt([".flake8", "setup.cfg", "tox.ini"]),
+        json.dumps(sorted(severities.items())),
+    ]
+    if flake8_plugins_path:
+        salt += config_salt(
+            sorted(
+                glob.glob(
+                    os.path.join(flake8_plugins_path, "**", "*.py"), recursive=True
+                )
+            )
+        )
+
+    with ResultCache(cache_dir, "flake8", salt) as cache:
+        hits, dirty = cache.lookup(filenames)
+        lint_messages = (
+            check_files(dirty, flake8_plugins_path, severities, retries)
+            if dirty
+            else []
+        )
+        cache.store(dirty, [m._asdict() for m in lint_messages])
+
+    return [
+        LintMessage(**{**m, "severity": LintSeverity(m["severity"])})
+        for messages in hits.values()
+        for m in messages
+    ] + lint_messages
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(
         description="Flake8 wrapper linter.",
@@ -325,6 +369,16 @@ def main() -> None:
         type=int,
         help="times to retry timed out flake8",
     )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="reuse the messages of the files that didn't change since the last run",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=default_cache_dir(),
+        help="where to keep the --cache results",
+    )
     parser.add_argument(
         "--verbose",
         action="store_true",
@@ -360,9 +414,18 @@ def main() -> None:
             assert len(parts) == 2, f"invalid severity `{severity}`"
             severities[parts[0]] = LintSeverity(parts[1])
 
-    lint_messages = check_files(
-        args.filenames, flake8_plugins_path, severities, args.retries
-    )
+    if args.cache:
+        lint_messages = check_files_cached(
+            args.filenames,
+            flake8_plugins_path,
+            severities,
+            args.retries,
+            args.cache_dir,
+        )
+    else:
+        lint_messages = check_files(
+            args.filenames, flake8_plugins_path, severities, args.retries
+        )
     for lint_message in lint_messages:
         print(json.dumps(lint_message._asdict()), flush=True)
 
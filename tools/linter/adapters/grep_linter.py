@@ -5,18 +5,42 @@ Generic linter that greps for a pattern and optionally suggests replacements.
 from __future__ import annotations
 
 import argparse
+import concurrent.futures
 import json
 import logging
+import mmap
 import os
+import re
 import subprocess
 import sys
 import time
 from enum import Enum
-from typing import Any, NamedTuple
+from typing import Any, Iterable, NamedTuple
 
 
 IS_WINDOWS: bool = os.name == "nt"
 
+# Below this many files the process pool costs more than it saves
+PARALLEL_MIN_FILES = 64
+
+# POSIX character classes, as the contents of a Python bracket expression
+POSIX_CLASSES = {
+    "alnum": "a-zA-Z0-9",
+    "alpha": "a-zA-Z",
+    "blank": " \\t",
+    "cntrl": "\\x00-\\x1f\\x7f",
+    "digit": "0-9",
+    "graph": "!-~",
+    "lower": "a-z",
+    "print": " -~",
+    "punct": "!-/:-@\\[-`{-~",
+    "space": " \\t\\n\\r\\f\\v",
+    "upper": "A-Z",
+    "xdigit": "0-9A-Fa-f",
+}
+# A bound, like {2} or {1,3}, that makes { a quantifier rather than a literal
+INTERVAL = re.compile(r"\{\d+(,\d*)?\}|\{,\d+\}")
+
 
 def eprint(*args: Any, **kwargs: Any) -> None:
     print(*args, file=sys.stderr, flush=True, **kwargs)
@@ -45,6 +69,240 @@ def as_posix(name: str) -> str:
     return name.replace("\\", "/") if IS_WINDOWS else name
 
 
+class UnsupportedPattern(ValueError):
+    """The pattern uses syntax the in-process engine doesn't translate."""
+
+
+def command_failed(linter_name: str, err: Exception) -> LintMessage:
+    return LintMessage(
+        path=None,
+        line=None,
+        char=None,
+        code=linter_name,
+        severity=LintSeverity.ERROR,
+        name="command-failed",
+        original=None,
+        replacement=None,
+        description=(
+            f"Failed due to {err.__class__.__name__}:\n{err}"
+            if not isinstance(err, subprocess.CalledProcessError)
+            else (
+                "COMMAND (exit code {returncode})\n"
+                "{command}\n\n"
+                "STDERR\n{stderr}\n\n"
+                "STDOUT\n{stdout}"
+            ).format(
+                returncode=err.returncode,
+                command=" ".join(as_posix(x) for x in err.cmd),
+                stderr=err.stderr.decode("utf-8").strip() or "(empty)",
+                stdout=err.stdout.decode("utf-8").strip() or "(empty)",
+            )
+        ),
+    )
+
+
+def translate_ere(pattern: str, escapes: str = "", exact_match: bool = False) -> str:
+    """
+    Translate a POSIX extended regex, as understood by `grep -E` and `sed -r`,
+    into a Python regex. escapes lists the extra backslash escapes (e.g. "tn"
+    for sed) that carry over as is. Raises UnsupportedPattern for anything
+    else, so that the caller can fall back to the real tool.
+
+    Python takes the first match its backtracking finds where POSIX takes the
+    leftmost-longest one. That only changes whether a line matches for nothing
+    but the match itself, so exact_match (for sed, which replaces the match)
+    also rejects alternation and repeated groups, where the two can differ:
+    `(a|ab)` or `a*(ab)*` match "a" of "abc" in Python.
+    """
+    if "\n" in pattern:
+        if exact_match:
+            raise UnsupportedPattern("alternation")
+        # grep treats every line of the pattern as an alternative
+        return "|".join(f"(?:{translate_ere(p, escapes)})" for p in pattern.split("\n"))
+
+    out = []
+    # The kind of the previous token: a quantifier, the end of a group or any
+    # other atom
+    prev = ""
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        interval = INTERVAL.match(pattern, i) if c == "{" else None
+        if c in "*+?" or interval:
+            # ERE reads a* ? as (a*)?, Python as a lazy or possessive a*
+            if prev == "quantifier":
+                raise UnsupportedPattern(f"repeated quantifier {pattern[i:]}")
+            if exact_match and prev == "group":
+                raise UnsupportedPattern(f"repeated group {pattern[: i + 1]}")
+            end = interval.end() if interval else i + 1
+            out.append(pattern[i:end])
+            i = end
+            prev = "quantifier"
+            continue
+        if exact_match and c == "|":
+            raise UnsupportedPattern("alternation")
+        prev = "group" if c == ")" else "atom"
+        if c == "\\":
+            if i + 1 == n:
+                raise UnsupportedPattern("trailing backslash")
+            nxt = pattern[i + 1]
+            if nxt == "<":
+                out.append(r"\b(?=\w)")
+            elif nxt == ">":
+                out.append(r"\b(?<=\w)")
+            elif nxt in "sSwWbB" + escapes or nxt in "123456789":
+                out.append("\\" + nxt)
+            elif nxt.isalnum() or not nxt.isascii():
+                raise UnsupportedPattern(f"escape \\{nxt}")
+            else:
+                out.append(re.escape(nxt))
+            i += 2
+        elif c == "[":
+            i = _translate_bracket(pattern, i, out)
+        elif not c.isascii():
+            raise UnsupportedPattern(f"non-ASCII character {c!r}")
+        else:
+            out.append(c)
+            i += 1
+
+    translated = "".join(out)
+    try:
+        re.compile(translated)
+    except re.error as err:
+        raise UnsupportedPattern(str(err)) from err
+    return translated
+
+
+def _translate_bracket(pattern: str, i: int, out: list[str]) -> int:
+    # Inside a POSIX bracket expression a backslash is a literal character and
+    # a leading "]" doesn't close it
+    j = i + 1
+    negate = pattern.startswith("^", j)
+    if negate:
+        j += 1
+    items = []
+    if pattern.startswith("]", j):
+        items.append("\\]")
+        j += 1
+    while True:
+        if j >= len(pattern):
+            raise UnsupportedPattern("unterminated bracket expression")
+        c = pattern[j]
+        if c == "]":
+            break
+        if pattern.startswith("[:", j):
+            end = pattern.find(":]", j + 2)
+            name = pattern[j + 2 : end]
+            if end < 0 or name not in POSIX_CLASSES:
+                raise UnsupportedPattern(f"character class {pattern[j:]}")
+            items.append(POSIX_CLASSES[name])
+            j = end + 2
+        elif pattern.startswith(("[=", "[."), j) or not c.isascii():
+            raise UnsupportedPattern(f"bracket expression {pattern[i:]}")
+        else:
+            items.append(c if c == "-" or c.isalnum() else re.escape(c))
+            j += 1
+    out.append("[" + ("^" if negate else "") + "".join(items) + "]")
+    return j + 1
+
+
+class SedSubstitution(NamedTuple):
+    regex: re.Pattern[bytes]
+    # Literal bytes and group numbers, in order
+    template: list[bytes | int]
+    # 0 replaces every match (the g flag)
+    max_count: int
+
+    def expand(self, m: re.Match[bytes]) -> bytes:
+        return b"".join(
+            part if isinstance(part, bytes) else (m.group(part) or b"")
+            for part in self.template
+        )
+
+    def apply(self, line: bytes) -> bytes:
+        return self.regex.sub(self.expand, line, count=self.max_count)
+
+
+def parse_sed(script: str) -> SedSubstitution:
+    """
+    Parse a single `s/regex/replacement/flags` sed command. Raises
+    UnsupportedPattern for any other sed script.
+    """
+    if len(script) < 2 or script[0] != "s" or script[1] in "\\\n":
+        raise UnsupportedPattern(f"sed script {script}")
+    delim = script[1]
+    fields: list[str] = []
+    current: list[str] = []
+    i = 2
+    while i < len(script) and len(fields) < 2:
+        c = script[i]
+        if c == "\\" and i + 1 < len(script):
+            nxt = script[i + 1]
+            if nxt == delim:
+                # \<delim> is the delimiter itself, literally
+                current.append(nxt if fields or nxt.isalnum() else "\\" + nxt)
+            else:
+                current.append(c + nxt)
+            i += 2
+        elif c == delim:
+            fields.append("".join(current))
+            current = []
+            i += 1
+        else:
+            current.append(c)
+            i += 1
+    if len(fields) < 2 or not fields[0]:
+        raise UnsupportedPattern(f"sed script {script}")
+
+    max_count, flags = 1, 0
+    for flag in script[i:]:
+        if flag == "g":
+            max_count = 0
+        elif flag in "Ii":
+            flags |= re.IGNORECASE
+        else:
+            raise UnsupportedPattern(f"sed flag {flag}")
+
+    regex = re.compile(
+        translate_ere(fields[0], escapes="tn", exact_match=True).encode(), flags
+    )
+    return SedSubstitution(regex, _parse_replacement(fields[1]), max_count)
+
+
+def _parse_replacement(replacement: str) -> list[bytes | int]:
+    template: list[bytes | int] = []
+    literal = ""
+    i = 0
+    while i < len(replacement):
+        c = replacement[i]
+        group = None
+        if c == "&":
+            group = 0
+        elif c == "\\" and i + 1 < len(replacement):
+            i += 1
+            nxt = replacement[i]
+            if nxt.isdigit():
+                group = int(nxt)
+            elif nxt in "nt":
+                literal += "\n" if nxt == "n" else "\t"
+            elif nxt.isalpha():
+                # Case conversions (\U, \L, ...) are left to sed
+                raise UnsupportedPattern(f"replacement escape \\{nxt}")
+            else:
+                literal += nxt
+        else:
+            literal += c
+        if group is not None:
+            if literal:
+                template.append(literal.encode())
+                literal = ""
+            template.append(group)
+        i += 1
+    if literal:
+        template.append(literal.encode())
+    return template
+
+
 def run_command(
     args: list[str],
 ) -> subprocess.CompletedProcess[bytes]:
@@ -77,31 +335,7 @@ def lint_file(
         try:
             proc = run_command(["grep", "-nEHI", allowlist_pattern, filename])
         except Exception as err:
-            return LintMessage(
-                path=None,
-                line=None,
-                char=None,
-                code=linter_name,
-                severity=LintSeverity.ERROR,
-                name="command-failed",
-                original=None,
-                replacement=None,
-                description=(
-                    f"Failed due to {err.__class__.__name__}:\n{err}"
-                    if not isinstance(err, subprocess.CalledProcessError)
-                    else (
-                        "COMMAND (exit code {returncode})\n"
-                        "{command}\n\n"
-                        "STDERR\n{stderr}\n\n"
-                        "STDOUT\n{stdout}"
-                    ).format(
-                        returncode=err.returncode,
-                        command=" ".join(as_posix(x) for x in err.cmd),
-                        stderr=err.stderr.decode("utf-8").strip() or "(empty)",
-                        stdout=err.stdout.decode("utf-8").strip() or "(empty)",
-                    )
-                ),
-            )
+            return command_failed(linter_name, err)
 
         # allowlist pattern was found, abort lint
         if proc.returncode == 0:
@@ -117,31 +351,7 @@ def lint_file(
             proc = run_command(["sed", "-r", replace_pattern, filename])
             replacement = proc.stdout.decode("utf-8")
         except Exception as err:
-            return LintMessage(
-                path=None,
-                line=None,
-                char=None,
-                code=linter_name,
-                severity=LintSeverity.ERROR,
-                name="command-failed",
-                original=None,
-                replacement=None,
-                description=(
-                    f"Failed due to {err.__class__.__name__}:\n{err}"
-                    if not isinstance(err, subprocess.CalledProcessError)
-                    else (
-                        "COMMAND (exit code {returncode})\n"
-                        "{command}\n\n"
-                        "STDERR\n{stderr}\n\n"
-                        "STDOUT\n{stdout}"
-                    ).format(
-                        returncode=err.returncode,
-                        command=" ".join(as_posix(x) for x in err.cmd),
-                        stderr=err.stderr.decode("utf-8").strip() or "(empty)",
-                        stdout=err.stdout.decode("utf-8").strip() or "(empty)",
-                    )
-                ),
-            )
+            return command_failed(linter_name, err)
 
     return LintMessage(
         path=split[0],
@@ -156,6 +366,207 @@ def lint_file(
     )
 
 
+class GrepEngine:
+    """
+    In-process equivalent of `grep -nEHI` followed by lint_file: the pattern,
+    allowlist and replacement are compiled once and every file is read once.
+    Raises UnsupportedPattern if the pattern or allowlist can't be translated;
+    a replacement sed can't be translated for is still run through sed, once
+    per file.
+    """
+
+    def __init__(
+        self,
+        pattern: str,
+        allowlist_pattern: str | None,
+        replace_pattern: str | None,
+        linter_name: str,
+        error_name: str,
+        error_description: str,
+        match_first_only: bool,
+    ) -> None:
+        # MULTILINE so that a whole-file search agrees with a per-line one on
+        # ^ and $; it only preselects files, lines are then matched one by one
+        self.pattern = re.compile(translate_ere(pattern).encode(), re.MULTILINE)
+        self.allowlist = (
+            re.compile(translate_ere(allowlist_pattern).encode(), re.MULTILINE)
+            if allowlist_pattern
+            else None
+        )
+        self.replace_pattern = replace_pattern
+        self.sed: SedSubstitution | None = None
+        if replace_pattern:
+            try:
+                self.sed = parse_sed(replace_pattern)
+            except UnsupportedPattern as err:
+                logging.debug("Running sed for the replacement: %s", err)
+        self.linter_name = linter_name
+        self.error_name = error_name
+        self.error_description = error_description
+        self.match_first_only = match_first_only
+
+    def lint_file(self, filename: str) -> list[LintMessage]:
+        data = self._read_candidate(filename)
+        if data is None:
+            return []
+
+        lines = data.split(b"\n")
+        if lines[-1] == b"":
+            lines.pop()
+        matches: list[int | None] = [
+            i + 1 for i, line in enumerate(lines) if self.pattern.search(line)
+        ]
+        if not matches:
+            return []
+        if self.match_first_only:
+            matches = [None]
+        # The allowlist covers the whole file, check it once
+        if self.allowlist is not None and self.allowlist.search(data):
+            if any(self.allowlist.search(line) for line in lines):
+                return []
+
+        original = None
+        replacement = None
+        if self.replace_pattern:
+            try:
+                original, replacement = self._replace(filename, data, lines)
+            except Exception as err:
+                return [command_failed(self.linter_name, err)]
+
+        return [
+            LintMessage(
+                path=filename,
+                line=line,
+                char=None,
+                code=self.linter_name,
+                severity=LintSeverity.ERROR,
+                name=self.error_name,
+                original=original,
+                replacement=replacement,
+                description=self.error_description,
+            )
+            for line in matches
+        ]
+
+    def _read_candidate(self, filename: str) -> bytes | None:
+        """
+        Returns the contents of the file if the pattern can match in it, None
+        otherwise, without reading most files beyond one regex scan of the
+        mapped file
+        """
+        try:
+            with open(filename, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return None
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if self.pattern.search(mm) is None:
+                        return None
+                    # Like grep -I, skip binary files
+                    if mm.find(b"\0") != -1:
+                        return None
+                    return mm[:]
+        except OSError as err:
+            # grep reports missing or unreadable files and carries on
+            logging.warning("Skipping %s: %s", filename, err)
+            return None
+
+    def _replace(
+        self, filename: str, data: bytes, lines: list[bytes]
+    ) -> tuple[str, str]:
+        # Same as reading the file in text mode
+        original = data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+        if self.sed is None:
+            assert self.replace_pattern
+            proc = run_command(["sed", "-r", self.replace_pattern, filename])
+            return original, proc.stdout.decode("utf-8")
+
+        replaced = b"\n".join(self.sed.apply(line) for line in lines)
+        if data.endswith(b"\n"):
+            replaced += b"\n"
+        return original, replaced.decode("utf-8")
+
+
+_ENGINE: GrepEngine | None = None
+
+
+def _init_worker(*args: Any) -> None:
+    global _ENGINE
+    _ENGINE = GrepEngine(*args)
+
+
+def _lint_file_in_worker(filename: str) -> list[LintMessage]:
+    assert _ENGINE is not None
+    return _ENGINE.lint_file(filename)
+
+
+def print_messages(results: Iterable[list[LintMessage]]) -> None:
+    for lint_messages in results:
+        if len(lint_messages) > 1 and lint_messages[0].original is not None:
+            # The messages of a file only differ by line, so serialize the whole
+            # file in original and replacement once rather than once per match
+            head, _, tail = json.dumps(
+                lint_messages[0]._replace(line=0)._asdict()
+            ).partition('"line": 0,')
+            for lint_message in lint_messages:
+                print(f'{head}"line": {json.dumps(lint_message.line)},{tail}')
+            sys.stdout.flush()
+            continue
+        for lint_message in lint_messages:
+            print(json.dumps(lint_message._asdict()), flush=True)
+
+
+def lint_files_in_process(
+    filenames: list[str], engine: GrepEngine, engine_args: tuple[Any, ...]
+) -> None:
+    workers = os.cpu_count() or 1
+    if len(filenames) < PARALLEL_MIN_FILES or workers == 1:
+        print_messages(map(engine.lint_file, filenames))
+        return
+
+    # The regex scan holds the GIL, so scale out with processes; each worker
+    # compiles its own engine from engine_args
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=engine_args,
+    ) as executor:
+        # map keeps the file order, so the output is in the same order as grep's
+        print_messages(
+            executor.map(
+                _lint_file_in_worker,
+                filenames,
+                chunksize=max(1, len(filenames) // (workers * 4)),
+            )
+        )
+
+
+def lint_files_with_grep(args: argparse.Namespace) -> None:
+    files_with_matches = []
+    if args.match_first_only:
+        files_with_matches = ["--files-with-matches"]
+
+    try:
+        proc = run_command(
+            ["grep", "-nEHI", *files_with_matches, args.pattern, *args.filenames]
+        )
+    except Exception as err:
+        print(json.dumps(command_failed(args.linter_name, err)._asdict()), flush=True)
+        sys.exit(0)
+
+    lines = proc.stdout.decode().splitlines()
+    for line in lines:
+        lint_message = lint_file(
+            line,
+            args.allowlist_pattern,
+            args.replace_pattern,
+            args.linter_name,
+            args.error_name,
+            args.error_description,
+        )
+        if lint_message is not None:
+            print(json.dumps(lint_message._asdict()), flush=True)
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(
         description="grep wrapper linter.",
@@ -219,55 +630,23 @@ def main() -> None:
         stream=sys.stderr,
     )
 
-    files_with_matches = []
-    if args.match_first_only:
-        files_with_matches = ["--files-with-matches"]
-
+    engine_args = (
+        args.pattern,
+        args.allowlist_pattern,
+        args.replace_pattern,
+        args.linter_name,
+        args.error_name,
+        args.error_description,
+        args.match_first_only,
+    )
     try:
-        proc = run_command(
-            ["grep", "-nEHI", *files_with_matches, args.pattern, *args.filenames]
-        )
-    except Exception as err:
-        err_msg = LintMessage(
-            path=None,
-            line=None,
-            char=None,
-            code=args.linter_name,
-            severity=LintSeverity.ERROR,
-            name="command-failed",
-            original=None,
-            replacement=None,
-            description=(
-                f"Failed due to {err.__class__.__name__}:\n{err}"
-                if not isinstance(err, subprocess.CalledProcessError)
-                else (
-                    "COMMAND (exit code {returncode})\n"
-                    "{command}\n\n"
-                    "STDERR\n{stderr}\n\n"
-                    "STDOUT\n{stdout}"
-                ).format(
-                    returncode=err.returncode,
-                    command=" ".join(as_posix(x) for x in err.cmd),
-                    stderr=err.stderr.decode("utf-8").strip() or "(empty)",
-                    stdout=err.stdout.decode("utf-8").strip() or "(empty)",
-                )
-            ),
-        )
-        print(json.dumps(err_msg._asdict()), flush=True)
-        sys.exit(0)
+        engine = GrepEngine(*engine_args)
+    except UnsupportedPattern as err:
+        logging.info("Falling back to grep: %s", err)
+        lint_files_with_grep(args)
+        return
 
-    lines = proc.stdout.decode().splitlines()
-    for line in lines:
-        lint_message = lint_file(
-            line,
-            args.allowlist_pattern,
-            args.replace_pattern,
-            args.linter_name,
-            args.error_name,
-            args.error_description,
-        )
-        if lint_message is not None:
-            print(json.dumps(lint_message._asdict()), flush=True)
+    lint_files_in_process(args.filenames, engine, engine_args)
 
 
 if __name__ == "__main__":
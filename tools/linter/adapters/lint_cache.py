@@ -0,0 +1,178 @@
+"""
+Content-hash result cache shared by the lint adapters.
+
+The messages a per-file linter (flake8, ruff) reports for a file only depend on
+the file's path and contents and on the linter setup (version, plugins, config,
+flags). They are stored under a hash of all of that, so on the next run every
+unchanged file is answered from the cache and only the dirty files are handed
+to the linter.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import importlib.metadata
+import json
+import logging
+import os
+import sqlite3
+import sys
+import time
+from typing import Any, Callable, Iterable
+
+
+# Entries that haven't been hit for this long are dropped
+MAX_AGE_SECONDS = 30 * 24 * 3600
+# Keep the number of SQL variables per query below SQLite's limit
+QUERY_CHUNK_SIZE = 500
+
+
+def default_cache_dir() -> str:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "pytorch-lint")
+
+
+def file_digest(path: str) -> str | None:
+    try:
+        with open(path, "rb") as f:
+            h = hashlib.sha256()
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+            return h.hexdigest()
+    except OSError:
+        return None
+
+
+def config_salt(paths: Iterable[str]) -> list[str]:
+    """The contents of the config files, a missing file counts too."""
+    return [f"{path}:{file_digest(path)}" for path in paths]
+
+
+def dist_salt(
+    predicate: Callable[[importlib.metadata.Distribution], bool],
+) -> list[str]:
+    """The name and version of every installed distribution matching predicate."""
+    return sorted(
+        f"{dist.metadata['Name']}=={dist.version}"
+        for dist in importlib.metadata.distributions()
+        if predicate(dist)
+    )
+
+
+class ResultCache:
+    """
+    Lint messages (as the JSON dicts printed for lintrunner) keyed by file, in
+    a SQLite file per linter under cache_dir. salt identifies the linter setup;
+    anything that can change a message has to be part of it.
+    """
+
+    def __init__(self, cache_dir: str, linter: str, salt: Iterable[str]) -> None:
+        h = hashlib.sha256(sys.version.encode())
+        for part in salt:
+            h.update(b"\0" + part.encode())
+        self.salt = h.hexdigest()
+        self.keys: dict[str, str] = {}
+
+        os.makedirs(cache_dir, exist_ok=True)
+        # lintrunner runs the linters concurrently, each one has its own file
+        self.conn = sqlite3.connect(
+            os.path.join(cache_dir, f"{linter}.sqlite"), timeout=60
+        )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                messages TEXT NOT NULL,
+                used_at REAL NOT NULL
+            )
+            """
+        )
+
+    def __enter__(self) -> ResultCache:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def _key(self, path: str) -> str | None:
+        digest = file_digest(path)
+        if digest is None:
+            return None
+        return hashlib.sha256(f"{self.salt}\0{path}\0{digest}".encode()).hexdigest()
+
+    def lookup(self, paths: list[str]) -> tuple[dict[str, list[Any]], list[str]]:
+        """
+        Returns the cached messages of the clean paths and, in order, the dirty
+        paths that have to be linted
+        """
+        for path in paths:
+            key = self._key(path)
+            if key is not None:
+                self.keys[path] = key
+
+        keys = list(set(self.keys.values()))
+        found: dict[str, str] = {}
+        for i in range(0, len(keys), QUERY_CHUNK_SIZE):
+            chunk = keys[i : i + QUERY_CHUNK_SIZE]
+            found.update(
+                self.conn.execute(
+                    "SELECT key, messages FROM results WHERE key IN "
+                    f"({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+            )
+        self.conn.executemany(
+            "UPDATE results SET used_at = ? WHERE key = ?",
+            [(time.time(), key) for key in found],
+        )
+        self.conn.commit()
+
+        hits: dict[str, list[Any]] = {}
+        dirty: list[str] = []
+        for path in paths:
+            key = self.keys.get(path)
+            if key is not None and key in found:
+                hits[path] = json.loads(found[key])
+            else:
+                dirty.append(path)
+        logging.info("%d files cached, %d to lint", len(hits), len(dirty))
+        return hits, dirty
+
+    def store(self, paths: list[str], messages: list[dict[str, Any]]) -> None:
+        """
+        Stores the messages of a lint run over paths. Nothing is stored if a
+        message doesn't belong to one of the paths, e.g. the linter failed.
+        """
+        # Linters may report the path made absolute
+        by_path: dict[str, list[dict[str, Any]]] = {
+            os.path.abspath(path): [] for path in paths
+        }
+        for message in messages:
+            path_messages = by_path.get(os.path.abspath(message["path"] or ""))
+            if path_messages is None:
+                logging.info("Not caching, unexpected message %s", message)
+                return
+            path_messages.append(message)
+
+        now = time.time()
+        rows = []
+        for path in paths:
+            path_messages = by_path[os.path.abspath(path)]
+            key = self.keys.get(path)
+            # Skip files that changed while being linted
+            if key is not None and key == self._key(path):
+                rows.append((key, json.dumps(path_messages), now))
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO results (key, messages, used_at) VALUES (?, ?, ?)",
+            rows,
+        )
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.execute(
+            "DELETE FROM results WHERE used_at < ?", (time.time() - MAX_AGE_SECONDS,)
+        )
+        self.conn.commit()
+        self.conn.close()
@@ -1,4 +1,5 @@
 import argparse
+import hashlib
 import json
 import logging
 import os
@@ -10,6 +11,8 @@ from enum import Enum
 from pathlib import Path
 from typing import Any, Dict, List, NamedTuple, Optional, Pattern
 
+from lint_cache import default_cache_dir
+
 
 IS_WINDOWS: bool = os.name == "nt"
 
@@ -82,33 +85,21 @@ severities = {
 }
 
 
-def check_files(
-    filenames: List[str],
-    config: str,
-    retries: int,
-    code: str,
-) -> List[LintMessage]:
-    try:
-        proc = run_command(
-            [sys.executable, "-mmypy", f"--config={config}"] + filenames,
-            extra_env={},
-            retries=retries,
-        )
-    except OSError as err:
-        return [
-            LintMessage(
-                path=None,
-                line=None,
-                char=None,
-                code=code,
-                severity=LintSeverity.ERROR,
-                name="command-failed",
-                original=None,
-                replacement=None,
-                description=(f"Failed due to {err.__class__.__name__}:\n{err}"),
-            )
-        ]
-    stdout = str(proc.stdout, "utf-8").strip()
+def command_failed(code: str, err: Exception) -> LintMessage:
+    return LintMessage(
+        path=None,
+        line=None,
+        char=None,
+        code=code,
+        severity=LintSeverity.ERROR,
+        name="command-failed",
+        original=None,
+        replacement=None,
+        description=(f"Failed due to {err.__class__.__name__}:\n{err}"),
+    )
+
+
+def parse_output(stdout: str, code: str) -> List[LintMessage]:
     return [
         LintMessage(
             path=match["file"],
@@ -127,6 +118,75 @@ def check_files(
     ]
 
 
+def check_files(
+    filenames: List[str],
+    config: str,
+    retries: int,
+    code: str,
+) -> List[LintMessage]:
+    try:
+        proc = run_command(
+            [sys.executable, "-mmypy", f"--config={config}"] + filenames,
+            extra_env={},
+            retries=retries,
+        )
+    except OSError as err:
+        return [command_failed(code, err)]
+    stdout = str(proc.stdout, "utf-8").strip()
+    return parse_output(stdout, code)
+
+
+def dmypy_status_file(config: str, cache_dir: str) -> str:
+    # One daemon per checkout, config and interpreter
+    key = hashlib.sha256(
+        "\0".join([os.getcwd(), os.path.abspath(config), sys.executable]).encode()
+    ).hexdigest()[:16]
+    os.makedirs(cache_dir, exist_ok=True)
+    return os.path.join(cache_dir, f"dmypy-{key}.json")
+
+
+def check_files_with_daemon(
+    filenames: List[str],
+    config: str,
+    retries: int,
+    code: str,
+    cache_dir: str,
+    timeout: int,
+) -> List[LintMessage]:
+    """
+    Same as check_files, through a mypy daemon that keeps the analysis in memory
+    between runs so only the modules affected by a change are rechecked. The
+    daemon is started on first use and exits after timeout idle seconds; it is
+    restarted when the options change.
+    """
+    try:
+        proc = run_command(
+            [
+                sys.executable,
+                "-mmypy.dmypy",
+                f"--status-file={dmypy_status_file(config, cache_dir)}",
+                "run",
+                f"--timeout={timeout}",
+                "--",
+                f"--config-file={config}",
+            ]
+            + filenames,
+            extra_env={},
+            retries=retries,
+        )
+    except OSError as err:
+        return [command_failed(code, err)]
+    # dmypy exits with 2 when the daemon itself fails, mypy's own result is 0/1
+    if proc.returncode not in (0, 1):
+        logging.warning(
+            "dmypy failed, running mypy instead:\n%s",
+            str(proc.stderr or proc.stdout, "utf-8").strip(),
+        )
+        return check_files(filenames, config, retries, code)
+    stdout = str(proc.stdout, "utf-8").strip()
+    return parse_output(stdout, code)
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(
         description="mypy wrapper linter.",
@@ -148,6 +208,22 @@ def main() -> None:
         default="MYPY",
         help="the code this lint should report as",
     )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="check through a long-lived mypy daemon (dmypy), much faster on reruns",
+    )
+    parser.add_argument(
+        "--daemon-timeout",
+        default=3600,
+        type=int,
+        help="seconds the daemon stays alive without any request",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=default_cache_dir(),
+        help="where to keep the daemon status file",
+    )
     parser.add_argument(
         "--verbose",
         action="store_true",
@@ -187,7 +263,19 @@ def main() -> None:
         else:
             filenames[filename] = True
 
-    lint_messages = check_files(list(filenames), args.config, args.retries, args.code)
+    if args.daemon:
+        lint_messages = check_files_with_daemon(
+            list(filenames),
+            args.config,
+            args.retries,
+            args.code,
+            args.cache_dir,
+            args.daemon_timeout,
+        )
+    else:
+        lint_messages = check_files(
+            list(filenames), args.config, args.retries, args.code
+        )
     for lint_message in lint_messages:
         print(json.dumps(lint_message._asdict()), flush=True)
 
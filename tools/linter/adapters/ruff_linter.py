@@ -12,7 +12,9 @@ import os
 import subprocess
 import sys
 import time
-from typing import Any, BinaryIO
+from typing import Any, BinaryIO, Callable
+
+from lint_cache import config_salt, default_cache_dir, dist_salt, ResultCache
 
 
 LINTER_CODE = "RUFF"
@@ -137,6 +139,16 @@ def add_default_options(parser: argparse.ArgumentParser) -> None:
         default=3,
         help="number of times to retry if the linter times out.",
     )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="reuse the messages of the files that didn't change since the last run",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=default_cache_dir(),
+        help="where to keep the --cache results",
+    )
     parser.add_argument(
         "--verbose",
         action="store_true",
@@ -367,6 +379,47 @@ def check_file_for_fixes(
     ]
 
 
+def message_from_dict(message: dict[str, Any]) -> LintMessage:
+    return LintMessage(**{**message, "severity": LintSeverity(message["severity"])})
+
+
+def run_cached(
+    cache: ResultCache | None,
+    filenames: list[str],
+    lint: Callable[[list[str]], list[LintMessage]],
+) -> list[LintMessage]:
+    """Runs lint over the files that aren't in the cache, if there is one."""
+    if cache is None:
+        return lint(filenames)
+    hits, dirty = cache.lookup(filenames)
+    lint_messages = lint(dirty) if dirty else []
+    cache.store(dirty, [m.asdict() for m in lint_messages])
+    return [
+        message_from_dict(m) for messages in hits.values() for m in messages
+    ] + lint_messages
+
+
+def open_caches(
+    args: argparse.Namespace, severities: dict[str, LintSeverity]
+) -> tuple[ResultCache | None, ResultCache | None]:
+    if not args.cache:
+        return None, None
+    if not args.config:
+        # Without --config every file can pick up a different pyproject.toml
+        logging.warning("--cache needs --config, not caching")
+        return None, None
+    salt = [
+        *dist_salt(lambda dist: dist.metadata["Name"] == "ruff"),
+        *config_salt([args.config]),
+        json.dumps(sorted(severities.items())),
+        f"explain={args.explain} show_disable={args.show_disable}",
+    ]
+    return (
+        ResultCache(args.cache_dir, LINTER_CODE, salt),
+        ResultCache(args.cache_dir, f"{LINTER_CODE}-fix", salt),
+    )
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(
         description=f"Ruff linter. Linter code: {LINTER_CODE}. Use with RUFF-FIX to auto-fix issues.",
@@ -423,14 +476,33 @@ def main() -> None:
             assert len(parts) == 2, f"invalid severity `{severity}`"
             severities[parts[0]] = LintSeverity(parts[1])
 
-    lint_messages = check_files(
+    cache, fix_cache = open_caches(args, severities)
+    try:
+        lint_files(args, severities, cache, fix_cache)
+    finally:
+        for c in (cache, fix_cache):
+            if c is not None:
+                c.close()
+
+
+def lint_files(
+    args: argparse.Namespace,
+    severities: dict[str, LintSeverity],
+    cache: ResultCache | None,
+    fix_cache: ResultCache | None,
+) -> None:
+    lint_messages = run_cached(
+        cache,
         args.filenames,
-        severities=severities,
-        config=args.config,
-        retries=args.retries,
-        timeout=args.timeout,
-        explain=args.explain,
-        show_disable=args.show_disable,
+        lambda filenames: check_files(
+            filenames,
+            severities=severities,
+            config=args.config,
+            retries=args.retries,
+            timeout=args.timeout,
+            explain=args.explain,
+            show_disable=args.show_disable,
+        ),
     )
     for lint_message in lint_messages:
         lint_message.display()
@@ -440,6 +512,15 @@ def main() -> None:
         return
 
     files_with_lints = {lint.path for lint in lint_messages if lint.path is not None}
+    fixes = run_cached(
+        fix_cache, sorted(files_with_lints), lambda paths: fix_files(args, paths)
+    )
+    for lint_message in fixes:
+        lint_message.display()
+
+
+def fix_files(args: argparse.Namespace, paths: list[str]) -> list[LintMessage]:
+    fixes: list[LintMessage] = []
     with concurrent.futures.ThreadPoolExecutor(
         max_workers=os.cpu_count(),
         thread_name_prefix="Thread",
@@ -452,15 +533,15 @@ def main() -> None:
                 retries=args.retries,
                 timeout=args.timeout,
             ): path
-            for path in files_with_lints
+            for path in paths
         }
         for future in concurrent.futures.as_completed(futures):
             try:
-                for lint_message in future.result():
-                    lint_message.display()
+                fixes.extend(future.result())
             except Exception:  # Catch all exceptions for lintrunner
                 logging.critical('Failed at "%s".', futures[future])
                 raise
+    return fixes
 
 
 if __name__ == "__main__":
@@ -167,8 +167,11 @@ def execute_job(
     as_json: bool = False,
     no_submodule: bool = False,
     interactive: Optional[int] = None,
+    stacked_patch: bool = False,
 ) -> None:
     """Shared execution logic for run and run-steps commands."""
+    # --stacked-patch is a variant of --patch
+    patch = patch or stacked_patch
     if patch and raw:
         console.print("[red]Error: --raw mode cannot upload patch[/red]")
         sys.exit(1)
@@ -232,6 +235,7 @@ def execute_job(
             follow=follow if not as_json else False,
             dry_run=dry_run,
             as_json=as_json,
+            stacked_patch=stacked_patch,
         )
         # JSON output after successful submission (non-dry-run)
         if as_json and not dry_run and runner.run_id:
@@ -312,6 +316,12 @@ def execute_job(
 @click.option("--name", "-n", default=None, help="Job name")
 @click.option("--follow", "-f", is_flag=True, help="Follow logs")
 @click.option("--patch", "-p", is_flag=True, help="Include local git changes")
+@click.option(
+    "--stacked-patch",
+    is_flag=True,
+    default=False,
+    help="Like --patch, but only send the delta from a previously uploaded patch",
+)
 @click.option(
     "--no-submodule",
     is_flag=True,
@@ -364,6 +374,7 @@ def run_single(
     name,
     follow,
     patch,
+    stacked_patch,
     no_submodule,
     repo_path,
     repo_cache,
@@ -399,6 +410,7 @@ def run_single(
         cfg = load_config_file(config_file)
         follow = follow or cfg.get("follow", False)
         patch = patch or cfg.get("patch", False)
+        stacked_patch = stacked_patch or cfg.get("stacked_patch", False)
         repo_path = repo_path or cfg.get("repo_path")
         repo_cache = repo_cache or cfg.get("repo_cache")
         commit = commit or cfg.get("commit")
@@ -467,6 +479,7 @@ def run_single(
         as_json=as_json,
         no_submodule=no_submodule,
         interactive=interactive,
+        stacked_patch=stacked_patch,
     )
 
 
@@ -543,6 +556,12 @@ def run_single(
     is_flag=True,
     help="Include local git changes",
 )
+@click.option(
+    "--stacked-patch",
+    is_flag=True,
+    default=False,
+    help="Like --patch, but only send the delta from a previously uploaded patch",
+)
 @click.option(
     "--no-submodule",
     is_flag=True,
@@ -615,6 +634,7 @@ def run_steps(
     name,
     follow,
     patch,
+    stacked_patch,
     no_submodule,
     repo_path,
     repo_cache,
@@ -655,6 +675,7 @@ def run_steps(
         # CLI flags override config values
         follow = follow or cfg.get("follow", False)
         patch = patch or cfg.get("patch", False)
+        stacked_patch = stacked_patch or cfg.get("stacked_patch", False)
         repo_path = repo_path or cfg.get("repo_path")
         repo_cache = repo_cache or cfg.get("repo_cache")
         commit = commit or cfg.get("commit")
@@ -708,4 +729,5 @@ def run_steps(
         as_json=as_json,
         no_submodule=no_submodule,
         interactive=interactive,
+        stacked_patch=stacked_patch,
     )
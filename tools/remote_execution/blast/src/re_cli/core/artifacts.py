@@ -179,15 +179,20 @@ def upload_artifacts_to_s3(
             with open(task_json_path, "w") as f:
                 json.dump(task_config, f, indent=2)
 
-        # Write patch file if patch mode was used
-        if patch_metadata and patch_metadata.get("patch_content"):
+        # Write patch chain if patch mode was used: the list of object keys
+        # the worker applies in order, plus any objects not in the patch store
+        if patch_metadata and patch_metadata.get("patch_chain"):
+            chain = patch_metadata.pop("patch_chain")
             git_changes_dir = os.path.join(temp_dir, "git-changes")
             os.makedirs(git_changes_dir, exist_ok=True)
-            patch_file_path = os.path.join(git_changes_dir, "changes.patch")
-            with open(patch_file_path, "w", encoding="utf-8") as f:
-                f.write(patch_metadata["patch_content"])
-            # Remove patch_content from metadata (don't store in job.json)
-            del patch_metadata["patch_content"]
+            with open(os.path.join(git_changes_dir, "patches.txt"), "w") as f:
+                f.write("".join(f"{key}\n" for key in chain.keys))
+            for obj in chain.embedded:
+                object_path = os.path.join(git_changes_dir, "objects", obj.key)
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                with open(object_path, "wb") as f:
+                    f.write(obj.data)
+            patch_metadata["patch_objects"] = [o.to_dict() for o in chain.objects]
 
         # Write job.json
         job_json_path = os.path.join(temp_dir, "job.json")
@@ -250,6 +255,26 @@ def upload_file(file_path: str, signed_url: Optional[str]) -> None:
         response.raise_for_status()
 
 
+def upload_bytes(
+    data: bytes, signed_url: str, content_type: str = "application/octet-stream"
+) -> None:
+    """Upload an in-memory object to S3 using a presigned URL.
+
+    Args:
+        data: Object content
+        signed_url: Presigned URL for S3 upload
+        content_type: Content-Type header for the upload
+    """
+    import requests
+
+    response = requests.put(
+        signed_url,
+        data=data,
+        headers={"Content-Type": content_type},
+    )
+    response.raise_for_status()
+
+
 def build_task_requests(
     artifacts_path: str,
     step_configs: list[StepConfig],
@@ -259,6 +284,7 @@ def build_task_requests(
     commit: Optional[str] = None,
     repo: Optional[str] = None,
     run_id: Optional[str] = None,
+    patch_store_path: Optional[str] = None,
 ) -> list[dict]:
     """Build task update records with runner commands.
 
@@ -271,6 +297,7 @@ def build_task_requests(
         commit: Git commit SHA
         repo: Git repo URL
         run_id: Run ID
+        patch_store_path: S3 prefix holding content-addressed patch objects
 
     Returns:
         List of task update dictionaries
@@ -302,6 +329,8 @@ def build_task_requests(
             env_vars["GIT_REPO"] = repo
         if repo_cache:
             env_vars["REPO_CACHE"] = repo_cache
+        if patch_store_path:
+            env_vars["PATCH_STORE_PATH"] = patch_store_path
 
         # Handle depends_on:
         # - Default (None): depend on previous step if not first
@@ -115,6 +115,40 @@ class GitHelper:
             raise RuntimeError(f"git diff failed: {result.stderr}")
         return result.stdout  # Don't strip - preserve trailing newline
 
+    def create_binary_patch(self, base_commit, head="HEAD"):
+        """Create a binary-safe patch (``git diff --binary``) as raw bytes.
+
+        Unlike create_patch(), the output is not decoded, so binary files and
+        non-UTF-8 content round-trip through ``git apply`` unchanged.
+
+        Args:
+            base_commit: The commit (or earlier patch head) to diff from
+            head: The commit to diff to (defaults to HEAD)
+        """
+        result = subprocess.run(
+            ["git", "diff", "--binary", f"{base_commit}..{head}"],
+            capture_output=True,
+            cwd=self.cwd,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(
+                f"git diff --binary failed: {result.stderr.decode(errors='replace')}"
+            )
+        return result.stdout
+
+    def get_head_commit(self):
+        """Get the full SHA of HEAD."""
+        return self.run_git("rev-parse", "HEAD")
+
+    def is_ancestor(self, ancestor, descendant="HEAD"):
+        """Check whether ancestor is reachable from descendant."""
+        result = subprocess.run(
+            ["git", "merge-base", "--is-ancestor", ancestor, descendant],
+            capture_output=True,
+            cwd=self.cwd,
+        )
+        return result.returncode == 0
+
     def get_changed_files(self, base_commit, committed_only=False):
         """Get list of changed files.
 
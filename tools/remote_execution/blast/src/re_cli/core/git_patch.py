@@ -5,6 +5,7 @@ from typing import Optional
 
 from .core_types import console
 from .git_helper import GitHelper
+from .patch_store import build_patch_chain
 
 
 def check_uncommitted_changes(repo_path: Optional[str] = None) -> bool:
@@ -33,8 +34,15 @@ def get_patch_metadata(
     repo_path: Optional[str] = None,
     commit: Optional[str] = None,
     repo: Optional[str] = None,
+    stacked: bool = False,
 ) -> tuple[dict, str, str]:
     """Get git patch metadata and resolve commit/repo.
+
+    The patch itself is attached as a PatchChain under "patch_chain"; it is
+    removed before the metadata is written to job.json.
+
+    Args:
+        stacked: Only send the delta from a previously uploaded patch
     Returns:
         Tuple of (patch_metadata, resolved_commit, resolved_repo)
     """
@@ -65,12 +73,21 @@ def get_patch_metadata(
     if changed_files:
         console.print(f"[blue]Changed files:[/blue] {len(changed_files)}")
 
-        # Create patch content
-        patch_content = git.create_patch(base_commit, committed_only=True)
-        patch_metadata["patch_content"] = patch_content
+        # Create content-addressed patch objects (binary-safe, compressed)
+        chain = build_patch_chain(git, repo_name, base_commit, stacked=stacked)
+        patch_metadata["patch_chain"] = chain
+        patch_metadata["head_commit"] = chain.head_commit
+        patch_metadata["patch_sha256"] = chain.full.sha256
         console.print(
-            f"  [green]✓[/green] Patch generated ({len(patch_content)} bytes)"
+            f"  [green]✓[/green] Patch generated ({chain.full.size:,} bytes, "
+            f"{len(chain.full.data or b''):,} compressed)"
         )
+        if chain.is_stacked:
+            delta = chain.objects[-1]
+            console.print(
+                f"  [green]✓[/green] Stacked on {len(chain.objects) - 1} stored "
+                f"patch(es), delta {delta.size:,} bytes"
+            )
     else:
         console.print("[yellow]No committed changes - metadata only[/yellow]")
 
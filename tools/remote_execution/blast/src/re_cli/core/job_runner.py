@@ -14,6 +14,7 @@ from .artifacts import (
 from .core_types import compute_topo_deps, console, StepConfig, TaskInfo
 from .git_patch import get_patch_metadata
 from .log_stream import follow_all_steps
+from .patch_store import record_chain, upload_patch_objects
 
 
 class JobRunner:
@@ -41,6 +42,8 @@ class JobRunner:
         self.run_id: Optional[str] = None
         self.artifacts_path: Optional[str] = None
         self.signed_url: Optional[str] = None
+        self.patch_store_path: Optional[str] = None
+        self.patch_upload_urls: dict = {}
         self.tasks_info: list[TaskInfo] = []
         self.raw = False  # Will be set in run()
 
@@ -67,12 +70,14 @@ class JobRunner:
         follow: bool = False,
         dry_run: bool = False,
         as_json: bool = False,
+        stacked_patch: bool = False,
     ):
         """Run the job.
 
         Args:
             raw: Use raw mode (no S3 upload)
             patch: Include git patch
+            stacked_patch: Only send the delta from a previously uploaded patch
             repo_path: Path to git repository
             commit: Git commit SHA
             repo: Git repo URL
@@ -97,16 +102,22 @@ class JobRunner:
                 follow=follow,
                 dry_run=dry_run,
                 as_json=as_json,
+                stacked_patch=stacked_patch,
             )
 
     # =========================================================================
     # API 1: /run/create - get run_id, task_ids, signed_url
     # =========================================================================
-    def _create(self, need_signed_url: bool = True) -> dict:
+    def _create(
+        self,
+        need_signed_url: bool = True,
+        patch_keys: Optional[list[str]] = None,
+    ) -> dict:
         """Call /run/create API.
 
         Args:
             need_signed_url: Whether to request signed URL for upload
+            patch_keys: Content-addressed patch object keys to look up
 
         Returns:
             API response with run_id, tasks, signed_url (if requested)
@@ -115,10 +126,13 @@ class JobRunner:
             name=self.name,
             steps=self.api_steps,
             need_signed_url=need_signed_url,
+            patch_keys=patch_keys,
         )
         self.run_id = result["run_id"]
         self.artifacts_path = result.get("artifacts_path", "")
         self.signed_url = result.get("signed_url")
+        self.patch_store_path = result.get("patch_store_path")
+        self.patch_upload_urls = result.get("patch_upload_urls") or {}
         self.crd_name = result.get("crd_name")  # Save CRD name for reuse
 
         # Build tasks_info
@@ -205,13 +219,15 @@ class JobRunner:
         follow: bool = False,
         dry_run: bool = False,
         as_json: bool = False,
+        stacked_patch: bool = False,
     ):
         """Run in normal mode with S3 upload.
 
         Flow:
-        1. /run/create (get signed_url)
-        2. upload to signed_url
-        3. /run/execute
+        1. build patch objects (if patch mode), so their keys go into create
+        2. /run/create (get signed_url and patch upload URLs)
+        3. upload missing patch objects and inputs.zip to signed URLs
+        4. /run/execute
         """
         # Dry run mode: print what would be done without API calls
         if dry_run:
@@ -222,14 +238,36 @@ class JobRunner:
                 repo=repo,
                 repo_cache=repo_cache,
                 as_json=as_json,
+                stacked_patch=stacked_patch,
             )
             return
 
+        # Handle patch if requested
+        patch_metadata = None
+        patch_chain = None
+        patch_keys = None
+        nonlocal_commit = commit
+        nonlocal_repo = repo
+        if patch:
+            try:
+                patch_metadata, nonlocal_commit, nonlocal_repo = get_patch_metadata(
+                    repo_path, commit, repo, stacked=stacked_patch
+                )
+            except Exception as e:
+                console.print(f"[red]Error creating patch: {e}[/red]")
+                sys.exit(1)
+            patch_chain = patch_metadata.get("patch_chain")
+            if patch_chain:
+                # Also ask for the full patch so a stale stack can fall back
+                patch_keys = list(
+                    dict.fromkeys(patch_chain.keys + [patch_chain.full.key])
+                )
+
         # API 1: /run/create
         console.print("[blue]Creating run...[/blue]", end=" ")
         create_start = time.time()
         try:
-            self._create(need_signed_url=True)
+            self._create(need_signed_url=True, patch_keys=patch_keys)
         except Exception as e:
             console.quiet = False
             console.print(f"\n[red]Error creating run: {e}[/red]")
@@ -239,17 +277,15 @@ class JobRunner:
         console.print(f"[dim]({time.time() - create_start:.1f}s)[/dim]")
         self._print_job_info()
 
-        # Handle patch if requested
-        patch_metadata = None
-        nonlocal_commit = commit
-        nonlocal_repo = repo
-        if patch:
+        # Upload patch objects the store does not have yet
+        if patch_chain:
             try:
-                patch_metadata, nonlocal_commit, nonlocal_repo = get_patch_metadata(
-                    repo_path, commit, repo
+                upload_patch_objects(
+                    patch_chain, self.patch_store_path, self.patch_upload_urls
                 )
             except Exception as e:
-                console.print(f"[red]Error creating patch: {e}[/red]")
+                console.quiet = False
+                console.print(f"\n[red]Error uploading patch: {e}[/red]")
                 sys.exit(1)
 
         # Build artifact data for bucket
@@ -275,6 +311,7 @@ class JobRunner:
             commit=nonlocal_commit,
             repo=nonlocal_repo,
             run_id=self.run_id,
+            patch_store_path=self.patch_store_path if patch_chain else None,
         )
 
         # Upload to S3
@@ -308,6 +345,10 @@ class JobRunner:
             sys.exit(1)
         console.print(f"[dim]({time.time() - create_start:.1f}s)[/dim]")
 
+        # Remember stored patch chains so later --stacked-patch runs reuse them
+        if patch_chain and self.patch_store_path and patch_metadata:
+            record_chain(patch_metadata["repo_name"], patch_chain)
+
         if follow:
             console.quiet = False
             follow_all_steps(
@@ -344,6 +385,7 @@ class JobRunner:
         repo: Optional[str] = None,
         repo_cache: Optional[str] = None,
         as_json: bool = False,
+        stacked_patch: bool = False,
     ):
         """Print dry run information without making API calls."""
         import json
@@ -354,8 +396,13 @@ class JobRunner:
         actual_repo = repo
         if patch:
             patch_metadata, actual_commit, actual_repo = get_patch_metadata(
-                repo_path, commit, repo
+                repo_path, commit, repo, stacked=stacked_patch
             )
+        patch_chain = (patch_metadata or {}).pop("patch_chain", None)
+        if patch_chain:
+            patch_metadata["patch_objects"] = [  # type: ignore[index]
+                o.to_dict() for o in patch_chain.objects
+            ]
 
         # Create placeholder TaskInfo for dry run
         dry_run_tasks = [
@@ -403,13 +450,6 @@ class JobRunner:
         # JSON output mode
         if as_json:
             job_info = artifact_data["job_info"]
-            # Remove patch_content (too large for JSON output)
-            if job_info.get("patch_info"):
-                job_info["patch_info"] = {
-                    k: v
-                    for k, v in job_info["patch_info"].items()
-                    if k != "patch_content"
-                }
             # Truncate command in task_requests (bootstrap script is large)
             slim_updates = []
             for tu in task_requests:
@@ -500,9 +540,9 @@ class JobRunner:
         for task_config in artifact_data["task_configs"]:
             tasks_branch.add(f"[green]task_{task_config['task_id']}.json[/green]")
 
-        if patch:
+        if patch_chain:
             git_branch = tree.add("[cyan]git-changes/[/cyan]")
-            git_branch.add("[green]changes.patch[/green]")
+            git_branch.add("[green]patches.txt[/green]")
 
         tree.add("[green]job.json[/green]")
         console.print(tree)
@@ -516,6 +556,13 @@ class JobRunner:
             )
             console.print(f"  Base commit: [cyan]{actual_commit}[/cyan]")
             console.print(f"  Remote repo: [cyan]{actual_repo}[/cyan]")
+            if patch_chain:
+                for obj in patch_chain.objects:
+                    state = "new" if obj.data is not None else "stored"
+                    console.print(
+                        f"  Patch object: [cyan]{obj.key}[/cyan] "
+                        f"({obj.size:,} bytes, {state})"
+                    )
             console.print()
 
         # 5. Print job.json content
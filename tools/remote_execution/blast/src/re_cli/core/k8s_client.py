@@ -170,11 +170,14 @@ class K8sClient:
         steps: list[dict],
         need_signed_url: bool = True,
         run_name: Optional[str] = None,
+        patch_keys: Optional[list[str]] = None,
     ) -> dict:
         """Create a run via RemoteExecutionRun CRD (action=create).
 
         Matches execution_helper.py expected interface:
         - Returns run_id, tasks, signed_url (if requested), artifacts_path
+        - With patch_keys, also returns patch_store_path and patch_upload_urls
+          (presigned URLs for the keys the patch store does not have yet)
         """
         # Generate run_id locally for idempotency
         run_id = uuid.uuid4().hex[:18]
@@ -202,6 +205,8 @@ class K8sClient:
             "need_signed_url": need_signed_url,
             "run_id": run_id,  # Pass run_id for idempotency
         }
+        if patch_keys:
+            spec["patch_keys"] = patch_keys
 
         self._apply_crd("RemoteExecutionRun", "remoteexecutionruns", crd_name, spec)
 
@@ -232,6 +237,8 @@ class K8sClient:
             "tasks": tasks,
             "artifacts_path": status.get("artifacts_path", ""),
             "signed_url": status.get("signed_url"),
+            "patch_store_path": status.get("patch_store_path"),
+            "patch_upload_urls": status.get("patch_upload_urls") or {},
             "crd_name": crd_name,  # Return CRD name for reference
         }
 
@@ -0,0 +1,253 @@
+"""Content-addressed patch objects for the Remote Execution CLI.
+
+Local changes are shipped as gzip-compressed ``git diff --binary`` output keyed
+by ``<base_commit>/<sha256 of the diff>.patch.gz``. The key depends only on the
+base commit and the diff bytes, so resubmitting an unchanged diff maps to an
+object the patch store already has and nothing is uploaded.
+
+A stacked submission reuses a patch chain uploaded earlier from the same base
+commit and only adds the delta between that chain's head commit and HEAD.
+Uploaded chains are remembered in ~/.blast/patches.json.
+"""
+
+import gzip
+import hashlib
+import json
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from .artifacts import upload_bytes
+from .core_types import console
+from .git_helper import GitHelper
+
+
+PATCH_MANIFEST_FILE = Path.home() / ".blast" / "patches.json"
+
+# Keep the manifest small; old chains are unlikely to be stacked on again
+MAX_MANIFEST_ENTRIES = 200
+# Fall back to a full patch once a chain gets this long, so workers don't
+# download and apply an ever-growing list of small deltas
+MAX_STACK_DEPTH = 8
+
+
+@dataclass
+class PatchObject:
+    """A single compressed patch object.
+
+    ``data`` is None for objects that belong to a previously uploaded chain
+    and are referenced by key only.
+    """
+
+    key: str
+    sha256: str
+    base_commit: str
+    head_commit: str
+    size: int = 0
+    data: Optional[bytes] = field(default=None, repr=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "key": self.key,
+            "sha256": self.sha256,
+            "base_commit": self.base_commit,
+            "head_commit": self.head_commit,
+            "size": self.size,
+        }
+
+
+@dataclass
+class PatchChain:
+    """Ordered patch objects that reproduce base_commit..head_commit.
+
+    ``full`` always holds the complete diff so callers can fall back to it
+    when the patch store is unavailable or lost part of a stacked chain.
+    """
+
+    base_commit: str
+    head_commit: str
+    full: PatchObject
+    objects: list[PatchObject]
+    # Objects that must be shipped inside inputs.zip instead of the store
+    embedded: list[PatchObject] = field(default_factory=list)
+
+    @property
+    def keys(self) -> list[str]:
+        return [o.key for o in self.objects]
+
+    @property
+    def is_stacked(self) -> bool:
+        return len(self.objects) > 1
+
+    def use_full(self) -> None:
+        """Replace the chain with the single full patch object."""
+        self.objects = [self.full]
+
+
+def make_patch_object(base_commit: str, head_commit: str, diff: bytes) -> PatchObject:
+    """Compress a diff and derive its content-addressed key."""
+    digest = hashlib.sha256(diff).hexdigest()
+    # mtime=0 keeps the compressed bytes deterministic for the same diff
+    data = gzip.compress(diff, mtime=0)
+    return PatchObject(
+        key=f"{base_commit}/{digest}.patch.gz",
+        sha256=digest,
+        base_commit=base_commit,
+        head_commit=head_commit,
+        size=len(diff),
+        data=data,
+    )
+
+
+def load_manifest() -> list[dict]:
+    """Load previously uploaded patch chains (newest last)."""
+    if not PATCH_MANIFEST_FILE.exists():
+        return []
+    try:
+        with open(PATCH_MANIFEST_FILE) as f:
+            return json.load(f)
+    except Exception:
+        return []
+
+
+def record_chain(repo_name: str, chain: PatchChain) -> None:
+    """Remember an uploaded chain so later submissions can stack on it."""
+    records = [
+        r
+        for r in load_manifest()
+        if not (r.get("repo") == repo_name and r.get("chain") == chain.keys)
+    ]
+    records.append(
+        {
+            "repo": repo_name,
+            "base_commit": chain.base_commit,
+            "head_commit": chain.head_commit,
+            "chain": chain.keys,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+    )
+    records = records[-MAX_MANIFEST_ENTRIES:]
+
+    PATCH_MANIFEST_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(PATCH_MANIFEST_FILE, "w") as f:
+        json.dump(records, f, indent=2)
+
+
+def _find_stack_parent(
+    git: GitHelper,
+    repo_name: str,
+    base_commit: str,
+    head_commit: str,
+    records: list[dict],
+) -> Optional[dict]:
+    """Find the newest uploaded chain whose head is an ancestor of HEAD."""
+    for record in reversed(records):
+        if record.get("repo") != repo_name:
+            continue
+        if record.get("base_commit") != base_commit:
+            continue
+        if len(record.get("chain", [])) >= MAX_STACK_DEPTH:
+            continue
+        parent_head = record.get("head_commit")
+        if not parent_head or parent_head == head_commit:
+            continue
+        if git.is_ancestor(parent_head, head_commit):
+            return record
+    return None
+
+
+def build_patch_chain(
+    git: GitHelper,
+    repo_name: str,
+    base_commit: str,
+    stacked: bool = False,
+) -> PatchChain:
+    """Build the patch chain for base_commit..HEAD.
+
+    Args:
+        git: GitHelper for the local repository
+        repo_name: Repository name used to scope the local manifest
+        base_commit: Commit the worker checks out before applying patches
+        stacked: If True, send only the delta from a previously uploaded chain
+    """
+    head_commit = git.get_head_commit()
+    full = make_patch_object(
+        base_commit, head_commit, git.create_binary_patch(base_commit, head_commit)
+    )
+    chain = PatchChain(
+        base_commit=base_commit,
+        head_commit=head_commit,
+        full=full,
+        objects=[full],
+    )
+    if not stacked:
+        return chain
+
+    records = load_manifest()
+    if any(r.get("chain") == [full.key] for r in records):
+        # Unchanged diff that was uploaded before: a single reference is enough
+        return chain
+
+    parent = _find_stack_parent(git, repo_name, base_commit, head_commit, records)
+    if parent is None:
+        return chain
+
+    parent_head = parent["head_commit"]
+    delta = make_patch_object(
+        base_commit, head_commit, git.create_binary_patch(parent_head, head_commit)
+    )
+    parent_objects = [
+        PatchObject(
+            key=key,
+            sha256=key.rsplit("/", 1)[-1].split(".", 1)[0],
+            base_commit=base_commit,
+            head_commit=parent_head,
+        )
+        for key in parent["chain"]
+    ]
+    chain.objects = parent_objects + ([delta] if delta.size else [])
+    return chain
+
+
+def upload_patch_objects(
+    chain: PatchChain,
+    store_path: Optional[str],
+    upload_urls: Optional[dict],
+) -> None:
+    """Upload the objects the patch store is missing.
+
+    ``upload_urls`` maps each missing key to a presigned PUT URL; keys that
+    are absent already exist in the store. Without a store path (older
+    controllers) the full patch is shipped inside inputs.zip instead.
+    """
+    upload_urls = upload_urls or {}
+
+    if not store_path:
+        chain.use_full()
+        chain.embedded = [chain.full]
+        return
+
+    # The store evicted part of a previous chain; re-send the full patch
+    if any(o.data is None and o.key in upload_urls for o in chain.objects):
+        console.print(
+            "[yellow]Stacked patch base is no longer stored, "
+            "sending full patch[/yellow]"
+        )
+        chain.use_full()
+
+    uploaded = 0
+    for obj in chain.objects:
+        url = upload_urls.get(obj.key)
+        if not url:
+            continue
+        assert obj.data is not None
+        upload_bytes(obj.data, signed_url=url, content_type="application/gzip")
+        uploaded += len(obj.data)
+
+    if uploaded:
+        console.print(
+            f"  [green]✓[/green] Patch uploaded ({uploaded:,} bytes compressed)"
+        )
+    else:
+        console.print("  [green]✓[/green] Patch already stored, nothing to upload")
@@ -1,12 +1,39 @@
 # MODULE: Apply Git Patch
-# Applies patch file after git clone
+# Applies content-addressed patch objects (or a legacy patch file) after clone
 
-PATCH_FILE="$ARTIFACTS_DIR/git-changes/changes.patch"
+PATCH_DIR="$ARTIFACTS_DIR/git-changes"
+PATCH_LIST="$PATCH_DIR/patches.txt"
+PATCH_FILE="$PATCH_DIR/changes.patch"
+PATCH_APPLIED=""
 
-if [[ -f "$PATCH_FILE" ]]; then
+if [[ -f "$PATCH_LIST" ]]; then
+    # Objects are applied in order; stacked chains list the base patch first.
+    # Objects not shipped in inputs.zip are fetched from the patch store.
+    while read -r PATCH_KEY <&3; do
+        [[ -z "$PATCH_KEY" ]] && continue
+        PATCH_OBJECT="$PATCH_DIR/objects/$PATCH_KEY"
+        if [[ ! -f "$PATCH_OBJECT" ]]; then
+            echo "[Runner] Downloading patch object: $PATCH_KEY"
+            mkdir -p "$(dirname "$PATCH_OBJECT")"
+            aws s3 cp "${PATCH_STORE_PATH%/}/${PATCH_KEY}" "$PATCH_OBJECT" --quiet
+        fi
+        echo "[Runner] Applying patch object: $PATCH_KEY"
+        # Decompress fully first: a truncated object must fail the step, not
+        # let git apply whatever valid prefix gzip managed to stream
+        if ! gzip -dc "$PATCH_OBJECT" > "$PATCH_DIR/current.patch"; then
+            echo "[Runner] Corrupt patch object: $PATCH_KEY" >&2
+            exit 1
+        fi
+        git apply --binary "$PATCH_DIR/current.patch"
+    done 3< "$PATCH_LIST"
+    PATCH_APPLIED="1"
+elif [[ -f "$PATCH_FILE" ]]; then
     echo "[Runner] Applying patch: $PATCH_FILE"
     git apply "$PATCH_FILE"
+    PATCH_APPLIED="1"
+fi
 
+if [[ -n "$PATCH_APPLIED" ]]; then
     # Configure git user for commit (required in CI environments)
     git config user.email "remote-execution@ciforge.local"
     git config user.name "Remote Execution"
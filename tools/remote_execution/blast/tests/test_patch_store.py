@@ -0,0 +1,286 @@
+"""Tests for the content-addressed patch chain and the worker template applying it.
+
+Run from tools/remote_execution/blast with:
+    pip install -e .[dev]
+    pytest tests
+"""
+
+import gzip
+import os
+import shutil
+import stat
+import subprocess
+from pathlib import Path
+
+import pytest
+from re_cli.core import patch_store
+from re_cli.core.git_helper import GitHelper
+from re_cli.core.script_builder.builder import TEMPLATES_DIR
+
+
+APPLY_TEMPLATE = TEMPLATES_DIR / "git_templates" / "git_apply_patch.sh"
+
+pytestmark = pytest.mark.skipif(
+    shutil.which("git") is None or shutil.which("gzip") is None,
+    reason="git and gzip are required",
+)
+
+
+def git(cwd: Path, *args: str) -> str:
+    return subprocess.run(
+        ["git", *args], cwd=cwd, check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+def commit(repo: Path, name: str, content: bytes) -> str:
+    (repo / name).write_bytes(content)
+    git(repo, "add", "-A")
+    git(repo, "commit", "-qm", f"update {name}")
+    return git(repo, "rev-parse", "HEAD")
+
+
+@pytest.fixture
+def repo(tmp_path: Path) -> Path:
+    path = tmp_path / "repo"
+    path.mkdir()
+    git(path, "init", "-q")
+    git(path, "config", "user.email", "test@example.com")
+    git(path, "config", "user.name", "Test")
+    commit(path, "a.txt", b"base\n")
+    return path
+
+
+@pytest.fixture(autouse=True)
+def manifest(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    path = tmp_path / "home" / "patches.json"
+    monkeypatch.setattr(patch_store, "PATCH_MANIFEST_FILE", path)
+    return path
+
+
+@pytest.fixture
+def uploads(monkeypatch: pytest.MonkeyPatch) -> dict:
+    uploaded: dict = {}
+
+    def fake_upload(data: bytes, signed_url: str, content_type: str) -> None:
+        uploaded[signed_url] = data
+
+    monkeypatch.setattr(patch_store, "upload_bytes", fake_upload)
+    return uploaded
+
+
+def test_make_patch_object_is_content_addressed() -> None:
+    diff = b"diff --git a/x b/x\n"
+    obj = patch_store.make_patch_object("base", "head", diff)
+    again = patch_store.make_patch_object("base", "other", diff)
+
+    assert obj.key == f"base/{obj.sha256}.patch.gz"
+    assert (again.key, again.data) == (obj.key, obj.data)
+    assert gzip.decompress(obj.data) == diff
+    assert obj.size == len(diff)
+    assert patch_store.make_patch_object("base", "head", b"x").key != obj.key
+
+
+def test_unstacked_chain_is_the_full_patch(repo: Path) -> None:
+    base = git(repo, "rev-parse", "HEAD")
+    head = commit(repo, "b.bin", bytes(range(256)))
+
+    chain = patch_store.build_patch_chain(GitHelper(cwd=repo), "repo", base)
+
+    assert (chain.base_commit, chain.head_commit) == (base, head)
+    assert chain.objects == [chain.full]
+    assert not chain.is_stacked
+    assert b"GIT binary patch" in gzip.decompress(chain.full.data)
+
+
+def test_stacked_chain_sends_only_the_delta(repo: Path) -> None:
+    base = git(repo, "rev-parse", "HEAD")
+    helper = GitHelper(cwd=repo)
+    commit(repo, "a.txt", b"first\n")
+    first = patch_store.build_patch_chain(helper, "repo", base, stacked=True)
+    assert first.objects == [first.full]
+    patch_store.record_chain("repo", first)
+
+    # The same diff again is a single reference to the stored object
+    again = patch_store.build_patch_chain(helper, "repo", base, stacked=True)
+    assert again.keys == first.keys
+
+    head = commit(repo, "b.txt", b"second\n")
+    chain = patch_store.build_patch_chain(helper, "repo", base, stacked=True)
+    assert chain.is_stacked
+    assert chain.keys[0] == first.full.key
+    assert chain.objects[0].data is None
+    delta = gzip.decompress(chain.objects[1].data)
+    assert b"b.txt" in delta and b"a.txt" not in delta
+    assert chain.head_commit == head
+
+    # Another repo's chains are never stacked on
+    other = patch_store.build_patch_chain(helper, "other", base, stacked=True)
+    assert other.objects == [other.full]
+
+
+def test_stack_depth_is_bounded(repo: Path) -> None:
+    base = git(repo, "rev-parse", "HEAD")
+    helper = GitHelper(cwd=repo)
+    for i in range(patch_store.MAX_STACK_DEPTH + 1):
+        commit(repo, "a.txt", f"{i}\n".encode())
+        chain = patch_store.build_patch_chain(helper, "repo", base, stacked=True)
+        assert len(chain.objects) <= patch_store.MAX_STACK_DEPTH
+        patch_store.record_chain("repo", chain)
+
+
+def test_upload_without_store_embeds_the_full_patch(repo: Path, uploads) -> None:
+    base = git(repo, "rev-parse", "HEAD")
+    commit(repo, "a.txt", b"changed\n")
+    chain = patch_store.build_patch_chain(GitHelper(cwd=repo), "repo", base)
+
+    patch_store.upload_patch_objects(chain, None, None)
+
+    assert chain.embedded == [chain.full]
+    assert uploads == {}
+
+
+def test_upload_sends_only_missing_objects(repo: Path, uploads) -> None:
+    base = git(repo, "rev-parse", "HEAD")
+    helper = GitHelper(cwd=repo)
+    commit(repo, "a.txt", b"first\n")
+    patch_store.record_chain(
+        "repo", patch_store.build_patch_chain(helper, "repo", base, stacked=True)
+    )
+    commit(repo, "b.txt", b"second\n")
+    chain = patch_store.build_patch_chain(helper, "repo", base, stacked=True)
+    delta = chain.objects[1]
+
+    patch_store.upload_patch_objects(chain, "s3://store/", {delta.key: "url-delta"})
+    assert uploads == {"url-delta": delta.data}
+    assert chain.is_stacked and chain.embedded == []
+
+    # Nothing missing, nothing uploaded
+    uploads.clear()
+    patch_store.upload_patch_objects(chain, "s3://store/", {})
+    assert uploads == {}
+
+
+def test_upload_falls_back_to_full_when_the_base_was_evicted(
+    repo: Path, uploads
+) -> None:
+    base = git(repo, "rev-parse", "HEAD")
+    helper = GitHelper(cwd=repo)
+    commit(repo, "a.txt", b"first\n")
+    patch_store.record_chain(
+        "repo", patch_store.build_patch_chain(helper, "repo", base, stacked=True)
+    )
+    commit(repo, "b.txt", b"second\n")
+    chain = patch_store.build_patch_chain(helper, "repo", base, stacked=True)
+    urls = {key: f"url-{i}" for i, key in enumerate(chain.keys)}
+    urls[chain.full.key] = "url-full"
+
+    patch_store.upload_patch_objects(chain, "s3://store/", urls)
+
+    assert chain.objects == [chain.full]
+    assert uploads == {"url-full": chain.full.data}
+
+
+# -----------------------------------------------------------------------------
+# git_apply_patch.sh, run the way the runner script sources it
+# -----------------------------------------------------------------------------
+
+
+@pytest.fixture
+def worker(repo: Path, tmp_path: Path) -> Path:
+    """A checkout of the base commit with an empty artifacts directory."""
+    path = tmp_path / "worker"
+    git(tmp_path, "clone", "-q", str(repo), str(path))
+    git(path, "config", "user.email", "worker@example.com")
+    git(path, "config", "user.name", "Worker")
+    (tmp_path / "artifacts" / "git-changes").mkdir(parents=True)
+    return path
+
+
+@pytest.fixture
+def fake_aws(tmp_path: Path) -> Path:
+    """An `aws s3 cp` stand-in reading s3://store/<key> from tmp_path/store."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    aws = bin_dir / "aws"
+    aws.write_text(
+        "#!/bin/bash\n"
+        f'echo "$3" >> "{tmp_path}/aws.log"\n'
+        f'cp "{tmp_path}/store/${{3#s3://store/}}" "$4"\n'
+    )
+    aws.chmod(aws.stat().st_mode | stat.S_IEXEC)
+    return bin_dir
+
+
+def write_object(root: Path, obj: patch_store.PatchObject) -> None:
+    path = root / obj.key
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(obj.data)
+
+
+def run_template(worker: Path, tmp_path: Path, fake_aws: Path, store_path: str):
+    env = dict(
+        os.environ,
+        ARTIFACTS_DIR=str(tmp_path / "artifacts"),
+        PATCH_STORE_PATH=store_path,
+        PATH=f"{fake_aws}{os.pathsep}{os.environ['PATH']}",
+    )
+    return subprocess.run(
+        ["bash", "-c", f'set -e; source "{APPLY_TEMPLATE}"'],
+        cwd=worker,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+
+
+@pytest.mark.parametrize("store_path", ["s3://store", "s3://store/"])
+def test_template_applies_the_chain(
+    repo: Path, worker: Path, tmp_path: Path, fake_aws: Path, store_path: str
+) -> None:
+    base = git(repo, "rev-parse", "HEAD")
+    helper = GitHelper(cwd=repo)
+    commit(repo, "a.txt", b"first\n")
+    patch_store.record_chain(
+        "repo", patch_store.build_patch_chain(helper, "repo", base, stacked=True)
+    )
+    first = patch_store.build_patch_chain(helper, "repo", base).full
+    commit(repo, "b.bin", bytes(range(256)))
+    chain = patch_store.build_patch_chain(helper, "repo", base, stacked=True)
+    assert chain.is_stacked
+
+    # The base object comes from the store, the delta ships in inputs.zip
+    write_object(tmp_path / "store", first)
+    changes = tmp_path / "artifacts" / "git-changes"
+    write_object(changes / "objects", chain.objects[1])
+    (changes / "patches.txt").write_text("".join(f"{k}\n" for k in chain.keys))
+
+    result = run_template(worker, tmp_path, fake_aws, store_path)
+
+    assert result.returncode == 0, result.stderr
+    assert (tmp_path / "aws.log").read_text() == f"s3://store/{first.key}\n"
+    assert (worker / "a.txt").read_bytes() == b"first\n"
+    assert (worker / "b.bin").read_bytes() == bytes(range(256))
+    assert git(worker, "log", "-1", "--format=%s") == (
+        "Applied patch from remote execution"
+    )
+
+
+def test_template_fails_on_a_truncated_object(
+    repo: Path, worker: Path, tmp_path: Path, fake_aws: Path
+) -> None:
+    base = git(repo, "rev-parse", "HEAD")
+    commit(repo, "a.txt", b"changed\n" * 1000)
+    commit(repo, "b.txt", os.urandom(4096))
+    full = patch_store.build_patch_chain(GitHelper(cwd=repo), "repo", base).full
+    changes = tmp_path / "artifacts" / "git-changes"
+    full.data = full.data[: len(full.data) // 2]
+    write_object(changes / "objects", full)
+    (changes / "patches.txt").write_text(f"{full.key}\n")
+
+    result = run_template(worker, tmp_path, fake_aws, "s3://store")
+
+    assert result.returncode != 0
+    assert "Corrupt patch object" in result.stderr
+    # Nothing of the patch was applied or committed
+    assert (worker / "a.txt").read_bytes() == b"base\n"
+    assert git(worker, "rev-parse", "HEAD") == base
@@ -1,21 +1,41 @@
 #!/usr/bin/env python3
+"""
+Backfill the workflow_run and workflow_job events of a GitHub repo, and the job
+logs, into S3 and DynamoDB the same way the github-status-test lambda does.
+
+Runs are processed concurrently, so are the pages of jobs and the logs of each
+run, with all GitHub requests sharing one request rate budget. The id of the
+last run up to which everything was backfilled is saved to a checkpoint file,
+and a rerun resumes from there.
+"""
 
 import gzip
 import json
+import math
 import os
-from typing import Any
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
 from urllib.request import urlopen
 from warnings import warn
 
 import boto3
-from octokit import Octokit
+from boto3.dynamodb.types import TypeSerializer
 
 
-S3 = boto3.resource("s3")
 BUCKET_NAME = "ossci-raw-job-status"
-BUCKET = S3.Bucket(BUCKET_NAME)
+LOG_CLASSIFIER_URL = (
+    "https://vwg52br27lx5oymv4ouejwf4re0akoeg.lambda-url.us-east-1.on.aws/"
+)
+DYNAMODB_TABLES = {
+    "workflow_run": "torchci-workflow-run",
+    "workflow_job": "torchci-workflow-job",
+}
+PER_PAGE = 100
 
-DYNAMO = boto3.resource("dynamodb")
+SERIALIZER = TypeSerializer()
 
 
 def json_dumps(body: Any) -> str:
@@ -23,172 +43,298 @@ def json_dumps(body: Any) -> str:
     return json.dumps(body, sort_keys=True, indent=4, separators=(",", ": "))
 
 
-def upload_log(
-    client: Octokit, owner: str, repo: str, job_id: int, conclusion: str
-) -> None:
-    # This logic is copied from github-status-test lambda function
-    log = client.actions.download_job_logs_for_workflow_run(
-        owner=owner, repo=repo, job_id=job_id
-    ).json
-
-    log_path = f"log/{job_id}"
-    if repo != "pytorch":
-        log_path = f"log/{owner}/{repo}/{job_id}"
-
-    print(f"..Uploading log to {log_path}")
-    try:
-        # This needs to be in try catch because GitHub doesn't keep log older than 60 days I think
-        S3.Object(BUCKET_NAME, log_path).put(
-            Body=gzip.compress(log.encode(encoding="UTF-8")),
-            ContentType="text/plain",
-            ContentEncoding="gzip",
-            Metadata={"conclusion": conclusion},
-        )
+class RateLimiter:
+    """
+    Spaces out the GitHub API requests of all the threads to at most
+    requests_per_hour, 0 for no limit
+    """
+
+    def __init__(self, requests_per_hour: float) -> None:
+        self.interval = 3600 / requests_per_hour if requests_per_hour else 0.0
+        self.lock = threading.Lock()
+        self.next_at = time.monotonic()
 
-        # Invoke log classifier
-        urlopen(
-            f"https://vwg52br27lx5oymv4ouejwf4re0akoeg.lambda-url.us-east-1.on.aws/?job_id={job_id}&repo={owner}/{repo}"
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            at = max(self.next_at, now)
+            self.next_at = at + self.interval
+        time.sleep(at - now)
+
+
+def load_checkpoint(path: str, key: Dict[str, str]) -> Optional[int]:
+    """The last backfilled run id saved for key (owner, repo, ...), if any"""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("key") != key:
+        warn(f"Ignoring checkpoint {path} for {checkpoint.get('key')}, not {key}")
+        return None
+    return int(checkpoint["run_id"])
+
+
+def save_checkpoint(path: str, key: Dict[str, str], run_id: int) -> None:
+    # Written next to the checkpoint first, so a crash doesn't leave half of it
+    with open(path + ".tmp", "w") as f:
+        json.dump({"key": key, "run_id": run_id}, f)
+    os.replace(path + ".tmp", path)
+
+
+class Backfiller:
+    """
+    Backfills the events of owner/repo. Up to workers runs are processed at the
+    same time, and up to log_workers pages of jobs and logs of those runs.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        owner: str,
+        repo: str,
+        *,
+        s3: Any = None,
+        dynamodb: Any = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        workers: int = 4,
+        log_workers: int = 16,
+        classifier_url: Optional[str] = LOG_CLASSIFIER_URL,
+    ) -> None:
+        self.client = client
+        self.owner = owner
+        self.repo = repo
+        # Clients rather than resources, these are shared by the threads
+        self.s3 = s3 if s3 is not None else boto3.client("s3")
+        self.dynamodb = dynamodb if dynamodb is not None else boto3.client("dynamodb")
+        self.rate_limiter = rate_limiter or RateLimiter(0)
+        self.workers = workers
+        self.log_workers = log_workers
+        self.classifier_url = classifier_url
+
+    def github(self, method: Callable[..., Any], **params: Any) -> Any:
+        self.rate_limiter.wait()
+        return method(owner=self.owner, repo=self.repo, **params).json
+
+    def upload_log(self, job_id: int, conclusion: str) -> None:
+        # This logic is copied from github-status-test lambda function
+        log = self.github(
+            self.client.actions.download_job_logs_for_workflow_run, job_id=job_id
         )
-    except Exception as error:
-        warn(
-            f"Failed to upload {log} for job {job_id} from repo {owner}/{repo}: "
-            + f"{error}, skipping..."
+
+        log_path = f"log/{job_id}"
+        if self.repo != "pytorch":
+            log_path = f"log/{self.owner}/{self.repo}/{job_id}"
+
+        print(f"..Uploading log to {log_path}")
+        try:
+            # This needs to be in try catch because GitHub doesn't keep log older than 60 days I think
+            self.s3.put_object(
+                Bucket=BUCKET_NAME,
+                Key=log_path,
+                Body=gzip.compress(log.encode(encoding="UTF-8")),
+                ContentType="text/plain",
+                ContentEncoding="gzip",
+                Metadata={"conclusion": conclusion},
+            )
+
+            # Invoke log classifier
+            if self.classifier_url:
+                urlopen(
+                    f"{self.classifier_url}?job_id={job_id}&repo={self.owner}/{self.repo}"
+                )
+        except Exception as error:
+            warn(
+                f"Failed to upload {log} for job {job_id} from repo {self.owner}/{self.repo}: "
+                + f"{error}, skipping..."
+            )
+
+    def process_event(self, event: str, body: Any) -> None:
+        # This logic is copied from github-status-test lambda function
+        if self.repo == "pytorch":
+            repo_prefix = ""
+        else:
+            repo_prefix = f"{self.owner}/{self.repo}/"
+
+        if "id" not in body:
+            warn(f"Missing ID in {body}, skipping...")
+            return
+
+        id = body["id"]
+        print(f"{event}/{repo_prefix}{id}")
+        self.s3.put_object(
+            Bucket=BUCKET_NAME,
+            Key=f"{event}/{repo_prefix}{id}",
+            Body=json_dumps(body),
+            ContentType="application/json",
         )
 
+        dynamodb_table = DYNAMODB_TABLES.get(event)
+        if not dynamodb_table:
+            return
 
-def process_event(owner: str, repo: str, event: str, body: Any) -> None:
-    # This logic is copied from github-status-test lambda function
-    if repo == "pytorch":
-        repo_prefix = ""
-    else:
-        repo_prefix = f"{owner}/{repo}/"
-
-    if "id" not in body:
-        warn(f"Missing ID in {body}, skipping...")
-        return
-
-    id = body["id"]
-    print(f"{event}/{repo_prefix}{id}")
-    S3.Object(BUCKET_NAME, f"{event}/{repo_prefix}{id}").put(
-        Body=json_dumps(body), ContentType="application/json"
-    )
+        body["dynamoKey"] = f"{self.owner}/{self.repo}/{id}"
+        self.dynamodb.put_item(
+            TableName=dynamodb_table,
+            Item={key: SERIALIZER.serialize(value) for key, value in body.items()},
+        )
 
-    dynamodb_table = ""
-    if event == "workflow_run":
-        dynamodb_table = "torchci-workflow-run"
-    elif event == "workflow_job":
-        dynamodb_table = "torchci-workflow-job"
-
-    if not dynamodb_table:
-        return
-
-    body["dynamoKey"] = f"{owner}/{repo}/{id}"
-    DYNAMO.Table(dynamodb_table).put_item(Item=body)
-
-
-def process_workflow_run(
-    client: Octokit, owner: str, repo: str, event: str, workflow_run: Any
-) -> None:
-    process_event(owner, repo, event, workflow_run)
-
-    count = 0
-    run_id = workflow_run["id"]
-    # Process all the workflow jobs from the run
-    params = {
-        "owner": owner,
-        "repo": repo,
-        "run_id": run_id,
-        "filter": "all",
-        "per_page": 100,
-        "page": 1,
-    }
-
-    while True:
-        response = client.actions.list_jobs_for_workflow_run(**params).json
+    def fetch_jobs(self, run_id: int, page: int) -> Tuple[int, List[Any]]:
+        """The total number of jobs of the run and the jobs on one page"""
+        params = {"run_id": run_id, "filter": "all", "per_page": PER_PAGE, "page": page}
+        response = self.github(self.client.actions.list_jobs_for_workflow_run, **params)
         if not response:
             warn(
-                f"Fetching workflow_job for run {run_id} from repo {owner}/{repo} "
+                f"Fetching workflow_job for run {run_id} from repo {self.owner}/{self.repo} "
                 + f"with {params} returns no response, skipping..."
             )
-            return
+            return 0, []
 
         if "total_count" not in response:
             warn(
-                f"Fetching workflow_job for run {run_id} from repo {owner}/{repo} "
+                f"Fetching workflow_job for run {run_id} from repo {self.owner}/{self.repo} "
                 f"with {params} returns an invalid response {response}, skipping..."
             )
-            return
-
-        total_count = response.get("total_count", 0)
+            return 0, []
+
+        return response["total_count"], response.get("jobs", [])
+
+    def process_job(self, workflow_job: Any) -> None:
+        self.process_event("workflow_job", workflow_job)
+        self.upload_log(workflow_job["id"], workflow_job["conclusion"])
+
+    def process_workflow_run(
+        self, executor: ThreadPoolExecutor, event: str, workflow_run: Any
+    ) -> None:
+        """
+        Processes the run and all its jobs, the remaining pages of jobs and the
+        jobs themselves on executor
+        """
+        self.process_event(event, workflow_run)
+
+        run_id = workflow_run["id"]
+        # Process all the workflow jobs from the run
+        total_count, jobs = self.fetch_jobs(run_id, 1)
         if not total_count:
             # Finish processing all events
             return
 
-        count += len(response["jobs"])
-        print(f"..Processing {count} jobs...")
-        for workflow_job in response.get("jobs", []):
-            job_id = workflow_job["id"]
-            conclusion = workflow_job["conclusion"]
-
-            process_event(owner, repo, "workflow_job", workflow_job)
-            upload_log(client, owner, repo, job_id, conclusion)
-
-        if not count or count >= total_count:
-            # Finish processing all events
+        pages = [
+            executor.submit(self.fetch_jobs, run_id, page)
+            for page in range(2, math.ceil(total_count / PER_PAGE) + 1)
+        ]
+        futures = [executor.submit(self.process_job, job) for job in jobs]
+        count = len(jobs)
+        for page in pages:
+            _, jobs = page.result()
+            count += len(jobs)
+            futures.extend(executor.submit(self.process_job, job) for job in jobs)
+        print(f"..Processing {count} jobs of run {run_id}...")
+        for future in futures:
+            future.result()
+
+    def backfill(
+        self,
+        event: str,
+        branch: str = "",
+        limit: int = 0,
+        checkpoint: str = "",
+    ) -> None:
+        if event != "workflow_run":
             return
 
-        params["page"] += 1
-
-
-def backfill(
-    owner: str, repo: str, event: str, branch: str = "", limit: int = 0
-) -> None:
-    token = os.environ.get("GITHUB_TOKEN", "")
-    client = Octokit(auth="token", token=token)
-    count = 0
-
-    if event == "workflow_run":
-        params = {"owner": owner, "repo": repo, "per_page": 100, "page": 1}
+        key = {"owner": self.owner, "repo": self.repo, "event": event, "branch": branch}
+        # Runs are listed newest first, the ones from the checkpoint on are done
+        done_run_id = load_checkpoint(checkpoint, key)
+        if done_run_id is not None:
+            print(f"Resuming after run {done_run_id}")
 
+        params: Dict[str, Any] = {"per_page": PER_PAGE, "page": 1}
         if branch:
             params["branch"] = branch
 
-        while True:
-            # This returns all events, so there is no need for paging manually
-            response = client.actions.list_workflow_runs_for_repo(**params).json
-            if not response:
-                warn(
-                    f"Fetching {event} for repo {owner}/{repo} with {params} "
-                    f"returns no response, exiting..."
-                )
-                return
-
-            if "total_count" not in response:
-                warn(
-                    f"Fetching {event} for repo {owner}/{repo} with {params} "
-                    f"returns an invalid response {response}, exiting..."
-                )
-                return
-
-            total_count = response.get("total_count", 0)
-            if not total_count:
-                # Finish processing all events
-                return
-
-            count += len(response["workflow_runs"])
-            print(f"Processing {count} {event} events...")
-            for workflow_run in response.get("workflow_runs", []):
-                process_workflow_run(client, owner, repo, event, workflow_run)
-
-            if not count or count >= total_count:
-                # Finish processing all events
-                return
-
-            if limit and count >= limit:
-                # Finish processing all events
-                return
-
-            params["page"] += 1  # type: ignore[operator]
+        # The runs being processed, oldest submission first
+        in_flight: Deque[Tuple[int, Future[None]]] = deque()
+
+        def complete(block: bool) -> None:
+            # The checkpoint only moves past runs everything before is done for
+            while in_flight and (block or in_flight[0][1].done()):
+                run_id, future = in_flight.popleft()
+                future.result()
+                if checkpoint:
+                    save_checkpoint(checkpoint, key, run_id)
+                block = False
+
+        count = 0
+        with ThreadPoolExecutor(self.workers) as run_executor, ThreadPoolExecutor(
+            self.log_workers
+        ) as log_executor:
+            try:
+                while True:
+                    response = self.github(
+                        self.client.actions.list_workflow_runs_for_repo, **params
+                    )
+                    if not response:
+                        warn(
+                            f"Fetching {event} for repo {self.owner}/{self.repo} with {params} "
+                            f"returns no response, exiting..."
+                        )
+                        break
+
+                    if "total_count" not in response:
+                        warn(
+                            f"Fetching {event} for repo {self.owner}/{self.repo} with {params} "
+                            f"returns an invalid response {response}, exiting..."
+                        )
+                        break
+
+                    total_count = response.get("total_count", 0)
+                    if not total_count:
+                        # Finish processing all events
+                        break
+
+                    count += len(response["workflow_runs"])
+                    print(f"Processing {count} {event} events...")
+                    for workflow_run in response.get("workflow_runs", []):
+                        if (
+                            done_run_id is not None
+                            and workflow_run["id"] >= done_run_id
+                        ):
+                            continue
+                        # Don't get ahead of the runs being processed by too much
+                        while len(in_flight) >= 2 * self.workers:
+                            complete(block=True)
+                        in_flight.append(
+                            (
+                                workflow_run["id"],
+                                run_executor.submit(
+                                    self.process_workflow_run,
+                                    log_executor,
+                                    event,
+                                    workflow_run,
+                                ),
+                            )
+                        )
+                        complete(block=False)
+
+                    if not count or count >= total_count:
+                        # Finish processing all events
+                        break
+
+                    if limit and count >= limit:
+                        # Finish processing all events
+                        break
+
+                    params["page"] += 1
+
+                while in_flight:
+                    complete(block=True)
+            except BaseException:
+                # Stop on the first error, the next run resumes from the checkpoint
+                run_executor.shutdown(wait=False, cancel_futures=True)
+                log_executor.shutdown(wait=False, cancel_futures=True)
+                raise
 
 
 def parse_args() -> Any:
@@ -226,12 +372,47 @@ def parse_args() -> Any:
         default=0,
         help="limit the total number of events, 0 for backfilling all events",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="the number of runs processed at the same time",
+    )
+    parser.add_argument(
+        "--log-workers",
+        type=int,
+        default=16,
+        help="the number of job pages and logs processed at the same time",
+    )
+    parser.add_argument(
+        "--requests-per-hour",
+        type=float,
+        default=4000,
+        help="the GitHub API request budget, 0 for no limit",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=str,
+        default="backfill_events.checkpoint.json",
+        help="where the last backfilled run is saved to resume from, empty for none",
+    )
     return parser.parse_args()
 
 
 def main() -> None:
+    from octokit import Octokit
+
     args = parse_args()
-    backfill(args.owner, args.repo, args.event, args.branch)
+    token = os.environ.get("GITHUB_TOKEN", "")
+    backfiller = Backfiller(
+        Octokit(auth="token", token=token),
+        args.owner,
+        args.repo,
+        rate_limiter=RateLimiter(args.requests_per_hour),
+        workers=args.workers,
+        log_workers=args.log_workers,
+    )
+    backfiller.backfill(args.event, args.branch, args.limit, args.checkpoint)
 
 
 if __name__ == "__main__":
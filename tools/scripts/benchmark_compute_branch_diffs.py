@@ -0,0 +1,184 @@
+"""
+Compare GitRepo.compute_branch_diffs with the previous implementation, which
+ran `git show` for every commit of a duplicated patch-id and removed commits
+from lists one at a time, on a local repo with a main and a release branch.
+Main lands --commits commits, reverting and relanding one in ten; release
+cherry-picks the first landing of every change in the first half of main.
+
+    python benchmark_compute_branch_diffs.py --commits 3000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+from gitutils import _check_output, fuzzy_list_to_dict, GitRepo
+
+
+START = 1_600_000_000
+
+
+def _commit(
+    branch: str,
+    mark: int,
+    parent: int,
+    title: str,
+    author_date: int,
+    commit_date: int,
+    change: str,
+) -> str:
+    message = f"{title}\n\nSummary of {title}\n"
+    return (
+        f"commit refs/heads/{branch}\n"
+        f"mark :{mark}\n"
+        f"author Dev <dev@example.com> {author_date} +0000\n"
+        f"committer Dev <dev@example.com> {commit_date} +0000\n"
+        f"data {len(message.encode())}\n{message}"
+        f"from :{parent}\n"
+        f"{change}\n"
+    )
+
+
+def _add(path: str, content: str) -> str:
+    return f"M 644 inline {path}\ndata {len(content.encode())}\n{content}\n"
+
+
+def make_repo(path: str, commits: int) -> None:
+    _check_output(["git", "init", "-q", "-b", "main", path])
+    _check_output(
+        [
+            "git",
+            "-C",
+            path,
+            "remote",
+            "add",
+            "origin",
+            "https://github.com/pytorch/example",
+        ]
+    )
+    message = "Initial commit\n"
+    stream = [
+        "commit refs/heads/main\nmark :1\n"
+        f"author Dev <dev@example.com> {START} +0000\n"
+        f"committer Dev <dev@example.com> {START} +0000\n"
+        f"data {len(message)}\n{message}" + _add("README", "example") + "\n"
+    ]
+    mark = 1
+    # (title, author date, change) of what landed on main, oldest first
+    landed: List[Tuple[str, int, str]] = []
+    for i in range(commits):
+        landed.append((f"Change {i}", START + len(landed), _add(f"f{i}", f"{i}\n")))
+        if i % 10 == 3:
+            landed.append(
+                (f"Revert Change {i - 3}", START + len(landed), f"D f{i - 3}\n")
+            )
+        if i % 10 == 6:
+            landed.append(
+                (
+                    f"Change {i - 6}",
+                    START + len(landed),
+                    _add(f"f{i - 6}", f"{i - 6}\n"),
+                )
+            )
+
+    parent = 1
+    cherry_picks = []
+    picked = set()
+    for n, (title, author_date, change) in enumerate(landed):
+        mark += 1
+        stream.append(
+            _commit("main", mark, parent, title, author_date, author_date, change)
+        )
+        parent = mark
+        if (
+            n < len(landed) // 2
+            and not title.startswith("Revert")
+            and title not in picked
+        ):
+            picked.add(title)
+            cherry_picks.append((title, author_date, change))
+
+    parent = 1
+    for title, author_date, change in cherry_picks:
+        mark += 1
+        stream.append(
+            _commit(
+                "release",
+                mark,
+                parent,
+                title,
+                author_date,
+                START + 10 * commits + mark,
+                change,
+            )
+        )
+        parent = mark
+    _check_output(["git", "-C", path, "fast-import", "--quiet"], input="".join(stream))
+
+
+def compute_branch_diffs_per_commit(
+    repo: GitRepo, from_branch: str, to_branch: str
+) -> Tuple[List[str], List[str]]:
+    """The previous compute_branch_diffs, less the pytorch/pytorch exceptions"""
+    from_ref = repo.rev_parse(from_branch)
+    to_ref = repo.rev_parse(to_branch)
+    merge_base = repo.get_merge_base(from_ref, to_ref)
+    from_commits = repo.revlist(f"{merge_base}..{from_ref}")
+    to_commits = repo.revlist(f"{merge_base}..{to_ref}")
+    from_ids = fuzzy_list_to_dict(repo.patch_id(from_commits))
+    to_ids = fuzzy_list_to_dict(repo.patch_id(to_commits))
+    for patch_id in set(from_ids).intersection(set(to_ids)):
+        from_values = from_ids[patch_id]
+        to_values = to_ids[patch_id]
+        if len(from_values) != len(to_values):
+            while len(from_values) > 0 and len(to_values) > 0:
+                frc = repo.get_commit(from_values.pop())
+                toc = repo.get_commit(to_values.pop())
+                if frc.title != toc.title or frc.author_date != toc.author_date:
+                    raise RuntimeError(
+                        f"Unexpected differences between {frc} and {toc}"
+                    )
+                from_commits.remove(frc.commit_hash)
+                to_commits.remove(toc.commit_hash)
+            continue
+        for commit in from_values:
+            from_commits.remove(commit)
+        for commit in to_values:
+            to_commits.remove(commit)
+    return (from_commits, to_commits)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--commits", type=int, default=3000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "repo")
+        make_repo(path, args.commits)
+        repo = GitRepo(path)
+        print(
+            f"main: {len(repo.revlist('main'))} commits,"
+            f" release: {len(repo.revlist('release'))} commits"
+        )
+        results: Dict[str, Tuple[List[str], List[str]]] = {}
+        for name, run in (
+            ("per-commit", compute_branch_diffs_per_commit),
+            ("batched", GitRepo.compute_branch_diffs),
+        ):
+            start = time.perf_counter()
+            results[name] = run(repo, "main", "release")
+            elapsed = time.perf_counter() - start
+            from_commits, to_commits = results[name]
+            print(
+                f"{name:>10}: {elapsed:7.2f}s  {len(from_commits)} missing in release,"
+                f" {len(to_commits)} missing in main"
+            )
+
+    assert results["per-commit"] == results["batched"], "branch diffs differ"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Compare checking every commit with is_green, which rescans the whole
+commit_jobs_batch_query result for each commit, against the GreenEvaluator
+that get_latest_green_commit uses. Only the last commit is green, so every
+commit is checked, and both have to print the same RED messages.
+
+    python benchmark_fetch_latest_green_commit.py --commits 2000 --jobs 15
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+import fetch_latest_green_commit
+from fetch_latest_green_commit import (
+    eprint,
+    get_latest_green_commit,
+    is_green,
+    WorkflowCheck,
+)
+
+
+WORKFLOWS = ["pull", "trunk", "Lint", "periodic", "inductor", "pull-test-sandbox"]
+REQUIRES = ["pull", "trunk", "lint", "^inductor$"]
+UNSTABLE_ISSUES = ["pull / linux-jammy / test (flaky)", "trunk / win / build"]
+
+
+def make_results(commits: List[str], jobs: int, seed: int) -> List[Dict[str, Any]]:
+    """
+    Every commit but the last is red, from a failed job or from a required
+    workflow that didn't run; the failures of unstable jobs don't count
+    """
+    rng = random.Random(seed)
+    names = []
+    for j in range(jobs):
+        workflow = WORKFLOWS[j % len(WORKFLOWS)]
+        config = ("default", "flaky", "distributed")[j % 3]
+        if j % 7 == 0:
+            names.append((workflow, f"{workflow} / win / build"))
+        else:
+            names.append(
+                (
+                    workflow,
+                    f"{workflow} / linux-jammy / test ({config}, {j % 4 + 1}, 4)",
+                )
+            )
+    # Jobs of required workflows that aren't unstable
+    stable_required = [
+        j
+        for j, (workflow, name) in enumerate(names)
+        if workflow in WORKFLOWS[:3] and "flaky" not in name and "win" not in name
+    ]
+
+    results = []
+    for i, sha in enumerate(commits):
+        red = i < len(commits) - 1
+        missing = rng.choice(WORKFLOWS[:3]) if red and rng.random() < 0.5 else None
+        failed = rng.choice(stable_required) if red and missing is None else None
+        for j, (workflow, name) in enumerate(names):
+            if workflow == missing:
+                continue
+            conclusion = "success"
+            if j == failed or rng.random() < 0.01:
+                conclusion = rng.choice(["failure", "cancelled", ""])
+            results.append(
+                {
+                    "sha": sha,
+                    **WorkflowCheck(
+                        workflowName=workflow,
+                        name=name,
+                        jobName=name.rsplit(" / ", 1)[-1],
+                        conclusion=conclusion,
+                    )._asdict(),
+                }
+            )
+    # The query doesn't return the rows grouped by commit
+    rng.shuffle(results)
+    return results
+
+
+def get_latest_green_commit_per_commit(
+    commits: List[str], requires: List[str], results: List[Dict[str, Any]]
+) -> Optional[str]:
+    for commit in commits:
+        eprint(f"Checking {commit}")
+        green, msg = is_green(commit, requires, results)
+        if green:
+            eprint("GREEN")
+            return commit
+        else:
+            eprint("RED: " + msg)
+    return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--commits", type=int, default=2000)
+    parser.add_argument("--jobs", type=int, default=15)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Don't query ClickHouse for the unstable issues
+    fetch_latest_green_commit.fetch_unstable_issues = lambda: UNSTABLE_ISSUES  # type: ignore[assignment]
+
+    commits = [f"{i:040x}" for i in range(args.commits)]
+    results = make_results(commits, args.jobs, args.seed)
+    print(f"{len(commits)} commits, {len(results)} job rows")
+
+    outputs = {}
+    for name, run in (
+        ("per-commit", get_latest_green_commit_per_commit),
+        ("evaluator", get_latest_green_commit),
+    ):
+        log = io.StringIO()
+        start = time.perf_counter()
+        with contextlib.redirect_stderr(log):
+            green = run(commits, REQUIRES, results)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>10}: {elapsed:8.3f}s")
+        outputs[name] = (green, log.getvalue())
+
+    assert outputs["per-commit"] == outputs["evaluator"], "results differ"
+    green, messages = outputs["evaluator"]
+    print(f"latest green commit {green}, {messages.count('RED: ')} red commits")
+
+
+if __name__ == "__main__":
+    main()
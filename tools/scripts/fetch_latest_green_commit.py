@@ -1,6 +1,7 @@
 import json
 import re
 import sys
+from collections import defaultdict
 from functools import lru_cache
 from pathlib import Path
 from typing import Any, cast, Dict, List, NamedTuple, Optional, Tuple
@@ -109,47 +110,90 @@ def is_unstable(job: dict[str, Any]) -> bool:
     return False
 
 
+class GreenEvaluator:
+    """
+    Decides whether commits are green for one set of required workflows. The
+    required patterns are compiled once, and which of them a workflow name
+    matches and whether a job is unstable are only worked out once per name.
+    Given the results of commit_jobs_batch_query, they are grouped by sha once
+    so that every commit can be checked without rescanning all of them.
+    """
+
+    def __init__(
+        self, requires: List[str], results: Optional[List[Dict[str, Any]]] = None
+    ) -> None:
+        # Skip empty entries; fullmatch("") never matches a real workflow name.
+        # Full match: "pull" won't also match "pull-test-sandbox".
+        # Explicit regex still works (e.g. "^Apple$").
+        self.requires = {
+            check: re.compile(check, flags=re.IGNORECASE) for check in requires if check
+        }
+        self.results_by_sha: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for check in results or []:
+            self.results_by_sha[check["sha"]].append(check)
+        self._required_by_workflow: Dict[str, List[str]] = {}
+        self._unstable_by_name: Dict[str, bool] = {}
+
+    def required_checks(self, workflow_name: str) -> List[str]:
+        required = self._required_by_workflow.get(workflow_name)
+        if required is None:
+            required = [
+                check
+                for check, pattern in self.requires.items()
+                if pattern.fullmatch(workflow_name)
+            ]
+            self._required_by_workflow[workflow_name] = required
+        return required
+
+    def is_unstable(self, check: Dict[str, Any]) -> bool:
+        unstable = self._unstable_by_name.get(check["name"])
+        if unstable is None:
+            unstable = is_unstable(check)
+            self._unstable_by_name[check["name"]] = unstable
+        return unstable
+
+    def evaluate(self, workflow_checks: List[Dict[str, Any]]) -> Tuple[bool, str]:
+        satisfied = set()
+        for check in workflow_checks:
+            # Ignore result from unstable job, be it success or failure
+            if self.is_unstable(check):
+                continue
+
+            workflow_name = check["workflowName"]
+            required = self.required_checks(workflow_name)
+            if not required:
+                continue
+            if check["conclusion"] not in ["success", "skipped"]:
+                return (
+                    False,
+                    f"{workflow_name} was not successful, {check['name']} failed",
+                )
+            satisfied.update(required)
+
+        missing_workflows = [x for x in self.requires if x not in satisfied]
+        if len(missing_workflows) > 0:
+            return False, "missing required workflows: " + ", ".join(missing_workflows)
+
+        return True, ""
+
+    def is_green(self, commit: str) -> Tuple[bool, str]:
+        return self.evaluate(self.results_by_sha.get(commit, []))
+
+
 def is_green(
     commit: str, requires: List[str], results: List[Dict[str, Any]]
 ) -> Tuple[bool, str]:
     workflow_checks = get_commit_results(commit, results)
-
-    # Skip empty entries; fullmatch("") never matches a real workflow name.
-    regex = {check: False for check in requires if check}
-
-    for check in workflow_checks:
-        jobName = check["name"]
-        # Ignore result from unstable job, be it success or failure
-        if is_unstable(check):
-            continue
-
-        workflow_name = check["workflowName"]
-        conclusion = check["conclusion"]
-        for required_check in regex:
-            # Full match: "pull" won't also match "pull-test-sandbox".
-            # Explicit regex still works (e.g. "^Apple$").
-            if re.fullmatch(required_check, workflow_name, flags=re.IGNORECASE):
-                if conclusion not in ["success", "skipped"]:
-                    return (
-                        False,
-                        f"{workflow_name} was not successful, {jobName} failed",
-                    )
-                else:
-                    regex[required_check] = True
-
-    missing_workflows = [x for x in regex.keys() if not regex[x]]
-    if len(missing_workflows) > 0:
-        return False, "missing required workflows: " + ", ".join(missing_workflows)
-
-    return True, ""
+    return GreenEvaluator(requires).evaluate(workflow_checks)
 
 
 def get_latest_green_commit(
     commits: List[str], requires: List[str], results: List[Dict[str, Any]]
 ) -> Optional[str]:
+    evaluator = GreenEvaluator(requires, results)
     for commit in commits:
         eprint(f"Checking {commit}")
-        green, msg = is_green(commit, requires, results)
+        green, msg = evaluator.is_green(commit)
         if green:
             eprint("GREEN")
             return commit
@@ -43,11 +43,17 @@ def fuzzy_list_to_dict(items: List[Tuple[str, str]]) -> Dict[str, List[str]]:
     return dict(rc)
 
 
-def _check_output(items: List[str], encoding: str = "utf-8") -> str:
+def _check_output(
+    items: List[str], encoding: str = "utf-8", input: Optional[str] = None
+) -> str:
     from subprocess import CalledProcessError, check_output, STDOUT
 
     try:
-        return check_output(items, stderr=STDOUT).decode(encoding)
+        return check_output(
+            items,
+            stderr=STDOUT,
+            input=input.encode(encoding) if input is not None else None,
+        ).decode(encoding)
     except CalledProcessError as e:
         msg = f"Command `{' '.join(e.cmd)}` returned non-zero exit code {e.returncode}"
         stdout = e.stdout.decode(encoding) if e.stdout is not None else ""
@@ -129,6 +135,26 @@ def parse_fuller_format(lines: Union[str, List[str]]) -> GitCommit:
     )
 
 
+LOG_FORMAT = "%H%n%an <%ae>%n%at%n%ct%n%B"
+
+
+def parse_log_format(record: str) -> GitCommit:
+    """
+    Parses a commit printed by `git log -z` with LOG_FORMAT, i.e. its hash,
+    author, author and committer dates (unix) and raw message on separate lines
+    """
+    commit_hash, author, author_date, commit_date, message = record.split("\n", 4)
+    title, _, body = message.partition("\n")
+    return GitCommit(
+        commit_hash=commit_hash,
+        author=author,
+        author_date=datetime.fromtimestamp(int(author_date)),
+        commit_date=datetime.fromtimestamp(int(commit_date)),
+        title=title.strip(),
+        body=body,
+    )
+
+
 class GitRepo:
     def __init__(self, path: str, remote: str = "origin", debug: bool = False) -> None:
         self.repo_dir = path
@@ -181,13 +207,17 @@ class GitRepo:
         return self._run_git("merge-base", from_ref, to_ref).strip()
 
     def patch_id(self, ref: Union[str, List[str]]) -> List[Tuple[str, str]]:
-        is_list = isinstance(ref, list)
-        if is_list:
-            if len(ref) == 0:
-                return []
-            ref = " ".join(ref)
+        refs = ref if isinstance(ref, list) else ref.split()
+        if len(refs) == 0:
+            return []
+        # The refs go through stdin, there can be too many for a command line
         rc = _check_output(
-            ["sh", "-c", f"git -C {self.repo_dir} show {ref}|git patch-id --stable"]
+            [
+                "sh",
+                "-c",
+                f"git -C {self.repo_dir} show --stdin|git patch-id --stable",
+            ],
+            input="\n".join(refs) + "\n",
         ).strip()
         return [cast(Tuple[str, str], x.split(" ", 1)) for x in rc.split("\n")]
 
@@ -202,6 +232,15 @@ class GitRepo:
             self._run_git("show", "--format=fuller", "--date=unix", "--shortstat", ref)
         )
 
+    def get_commits(self, *revisions: str) -> Dict[str, GitCommit]:
+        """
+        Returns the commits of the given revisions (as passed to `git log`,
+        e.g. `^base`, `branch`) by hash, all read by a single `git log`
+        """
+        rc = self._run_git("log", "-z", f"--format={LOG_FORMAT}", *revisions)
+        commits = (parse_log_format(record) for record in rc.split("\0") if record)
+        return {commit.commit_hash: commit for commit in commits}
+
     def cherry_pick(self, ref: str) -> None:
         self._run_git("cherry-pick", "-x", ref)
 
@@ -222,55 +261,59 @@ class GitRepo:
         to_commits = self.revlist(f"{merge_base}..{to_ref}")
         from_ids = fuzzy_list_to_dict(self.patch_id(from_commits))
         to_ids = fuzzy_list_to_dict(self.patch_id(to_commits))
+        is_pytorch = "pytorch/pytorch" in self.remote_url()
+        # Metadata of the commits on both sides, only read if there are duplicates
+        commits: Dict[str, GitCommit] = {}
+        from_removed = set()
+        to_removed = set()
         for patch_id in set(from_ids).intersection(set(to_ids)):
             from_values = from_ids[patch_id]
             to_values = to_ids[patch_id]
             if len(from_values) != len(to_values):
+                if not commits:
+                    commits = self.get_commits(f"^{merge_base}", from_ref, to_ref)
                 # Eliminate duplicate commits+reverts from the list
                 while len(from_values) > 0 and len(to_values) > 0:
-                    frc = self.get_commit(from_values.pop())
-                    toc = self.get_commit(to_values.pop())
+                    frc = commits[from_values.pop()]
+                    toc = commits[to_values.pop()]
                     # FRC branch might have PR number added to the title
                     if (  # noqa: SIM102
                         frc.title != toc.title or frc.author_date != toc.author_date
                     ):
                         # HACK: Same commit were merged, reverted and landed again
                         # which creates a tracking problem
-                        if (
-                            "pytorch/pytorch" not in self.remote_url()
-                            or frc.commit_hash
-                            not in {
-                                "0a6a1b27a464ba5be5f587cce2ee12ab8c504dbf",
-                                "6d0f4a1d545a8f161df459e8d4ccafd4b9017dbe",
-                                "edf909e58f06150f7be41da2f98a3b9de3167bca",
-                                "a58c6aea5a0c9f8759a4154e46f544c8b03b8db1",
-                                "7106d216c29ca16a3504aa2bedad948ebcf4abc2",
-                            }
-                        ):
+                        if not is_pytorch or frc.commit_hash not in {
+                            "0a6a1b27a464ba5be5f587cce2ee12ab8c504dbf",
+                            "6d0f4a1d545a8f161df459e8d4ccafd4b9017dbe",
+                            "edf909e58f06150f7be41da2f98a3b9de3167bca",
+                            "a58c6aea5a0c9f8759a4154e46f544c8b03b8db1",
+                            "7106d216c29ca16a3504aa2bedad948ebcf4abc2",
+                        }:
                             raise RuntimeError(
                                 f"Unexpected differences between {frc} and {toc}"
                             )
-                    from_commits.remove(frc.commit_hash)
-                    to_commits.remove(toc.commit_hash)
+                    from_removed.add(frc.commit_hash)
+                    to_removed.add(toc.commit_hash)
                 continue
-            for commit in from_values:
-                from_commits.remove(commit)
-            for commit in to_values:
-                to_commits.remove(commit)
+            from_removed.update(from_values)
+            to_removed.update(to_values)
         # Another HACK: Patch-id is not stable for commits with binary files or for big changes across commits
         # I.e. cherry-picking those from one branch into another will change patchid
-        if "pytorch/pytorch" in self.remote_url():
-            for excluded_commit in {
-                "8e09e20c1dafcdbdb45c2d1574da68a32e54a3a5",
-                "5f37e5c2a39c3acb776756a17730b865f0953432",
-                "b5222584e6d6990c6585981a936defd1af14c0ba",
-                "84d9a2e42d5ed30ec3b8b4140c38dd83abbce88d",
-                "f211ec90a6cdc8a2a5795478b5b5c8d7d7896f7e",
-            }:
-                if excluded_commit in from_commits:
-                    from_commits.remove(excluded_commit)
-
-        return (from_commits, to_commits)
+        if is_pytorch:
+            from_removed.update(
+                {
+                    "8e09e20c1dafcdbdb45c2d1574da68a32e54a3a5",
+                    "5f37e5c2a39c3acb776756a17730b865f0953432",
+                    "b5222584e6d6990c6585981a936defd1af14c0ba",
+                    "84d9a2e42d5ed30ec3b8b4140c38dd83abbce88d",
+                    "f211ec90a6cdc8a2a5795478b5b5c8d7d7896f7e",
+                }
+            )
+
+        return (
+            [commit for commit in from_commits if commit not in from_removed],
+            [commit for commit in to_commits if commit not in to_removed],
+        )
 
     def cherry_pick_commits(self, from_branch: str, to_branch: str) -> None:
         orig_branch = self.current_branch()
@@ -14,7 +14,19 @@ import api.types
 def extract(path: pathlib.Path, *, include_classes: bool = False) -> api.API:
     """Extracts API definitions from a given source file."""
 
-    funcs, classes = extract_raw(path, include_classes=include_classes)
+    return extract_source(
+        path.read_text(), filename=os.fspath(path), include_classes=include_classes
+    )
+
+
+def extract_source(
+    source: str | bytes, *, filename: str = "<unknown>", include_classes: bool = False
+) -> api.API:
+    """Extracts API definitions from in-memory source."""
+
+    funcs, classes = _extract_raw_source(
+        source, filename=filename, include_classes=include_classes
+    )
     parameters = {
         name: _function_def_to_parameters(func) for name, func in funcs.items()
     }
@@ -26,10 +38,20 @@ def extract_raw(
 ) -> tuple[Mapping[str, ast.FunctionDef], Mapping[str, api.Class]]:
     """Extracts API as AST nodes."""
 
+    return _extract_raw_source(
+        path.read_text(), filename=os.fspath(path), include_classes=include_classes
+    )
+
+
+def _extract_raw_source(
+    source: str | bytes, *, filename: str, include_classes: bool
+) -> tuple[Mapping[str, ast.FunctionDef], Mapping[str, api.Class]]:
+    """Extracts API as AST nodes from in-memory source."""
+
     funcs: dict[str, ast.FunctionDef] = {}
     classes: dict[str, api.Class] = {}
     _ContextualNodeVisitor(funcs, classes if include_classes else None, []).visit(
-        ast.parse(path.read_text(), os.fspath(path))
+        ast.parse(source, filename)
     )
     return funcs, classes
 
@@ -0,0 +1,64 @@
+"""Persists extracted APIs keyed by git blob id."""
+
+from __future__ import annotations
+
+import os
+import pathlib
+import pickle
+import tempfile
+from typing import Optional
+
+import api
+
+
+# Bump whenever the extracted API representation changes so that stale
+# entries written by older versions of the linter are ignored.
+_FORMAT_VERSION = 1
+
+
+class APICache:
+    """An on-disk cache of extracted APIs.
+
+    Blob ids are content hashes, so an entry never goes stale for a given
+    format version and can be shared between runs and repositories.
+    """
+
+    def __init__(self, dir: pathlib.Path) -> None:
+        """Creates a cache rooted at the directory."""
+        self._dir = dir / f"v{_FORMAT_VERSION}"
+
+    def _path(self, sha: str, /) -> pathlib.Path:
+        return self._dir / sha[:2] / sha
+
+    def get(self, sha: str, /) -> Optional[api.API]:
+        """Gets the API extracted from the blob, if it is cached."""
+        try:
+            with open(self._path(sha), "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Treat corrupt or incompatible entries as misses.
+            return None
+        return value if isinstance(value, api.API) else None
+
+    def put(self, sha: str, value: api.API, /) -> None:
+        """Stores the API extracted from the blob."""
+        path = self._path(sha)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so that concurrent linter runs
+        # never observe a partially written entry.
+        fd, tmp = tempfile.mkstemp(dir=path.parent)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+def default_dir() -> pathlib.Path:
+    """Gets the default cache directory for the linter."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return pathlib.Path(base) / "bc-linter"
@@ -7,6 +7,7 @@ import pathlib
 import subprocess
 import sys
 
+import api.cache
 import api.compatibility
 import api.config
 import api.git
@@ -38,6 +39,26 @@ def run() -> None:
         default=None,
         help="Directory to load .bc-linter.yml from (defaults to repository root)",
     )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=None,
+        help="Directory for caching extracted APIs by git blob id "
+        "(defaults to $XDG_CACHE_HOME/bc-linter)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        default=False,
+        required=False,
+        action="store_true",
+        help="Disable the extracted API cache",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of processes used to parse files (defaults to CPU count)",
+    )
     args = parser.parse_args(sys.argv[1:])
 
     repo = api.git.Repository(pathlib.Path("."))
@@ -70,8 +91,20 @@ def run() -> None:
         reason = "missing" if cfg_status == "default_missing" else "invalid/malformed"
         print(f"BC-linter: No usable config ({reason}); using defaults")
 
+    cache = None
+    if not args.no_cache:
+        cache_dir = (
+            pathlib.Path(args.cache_dir) if args.cache_dir else api.cache.default_dir()
+        )
+        cache = api.cache.APICache(cache_dir)
+
     violations = api.compatibility.check_range(
-        repo, head=args.head_commit, base=args.base_commit, config=cfg
+        repo,
+        head=args.head_commit,
+        base=args.base_commit,
+        config=cfg,
+        cache=cache,
+        max_workers=args.jobs,
     )
     if len(violations) == 0:
         return
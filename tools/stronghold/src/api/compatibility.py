@@ -2,59 +2,116 @@
 
 from __future__ import annotations
 
+import concurrent.futures
 import difflib
 import pathlib
-import tempfile
 from collections.abc import Iterable, Mapping, Sequence
 
 import api
 import api.ast
+import api.cache
 import api.config
 import api.git
 import api.violations
 
 
+# The API of a file that does not exist, equivalent to an empty file.
+_EMPTY_API = api.API(functions={}, classes={})
+
+
 def check_range(
     repo: api.git.Repository,
     *,
     head: str,
     base: str,
     config: api.config.Config | None = None,
+    cache: api.cache.APICache | None = None,
+    max_workers: int | None = None,
 ) -> Mapping[pathlib.Path, Sequence[api.violations.Violation]]:
+    """Identifies API compatibility issues in a range of commits.
+
+    Both versions of every changed file are read through a single git
+    process and parsed in parallel. When a cache is given, APIs are looked
+    up by blob id so that unchanged versions are never re-parsed.
+    """
     cfg = config or api.config.default_config()
+    # Only consider Python files.
+    #
+    # Note: path allow/deny is applied at symbol-level inside `check` so that
+    # annotation-based overrides can include symbols even from otherwise
+    # excluded files.
+    files = [
+        file
+        for file in repo.get_files_in_range(f"{base}..{head}")
+        if file.suffix == ".py"
+    ]
+
+    # Get the contents before and after the diff.
+    #
+    # Note that if the file doesn't exist, it is equivalent to it
+    # being empty.
+    blobs = repo.get_blobs(
+        [(file, commit_id) for file in files for commit_id in (base, head)]
+    )
+    apis = _extract_blobs(
+        [blob for blob in blobs.values() if blob is not None],
+        cache=cache,
+        max_workers=max_workers,
+    )
+
+    def _api_at(file: pathlib.Path, commit_id: str) -> api.API:
+        blob = blobs[(file, commit_id)]
+        return _EMPTY_API if blob is None else apis[blob.sha]
+
     result = {}
-    for file in repo.get_files_in_range(f"{base}..{head}"):
-        # Only consider Python files.
-        if file.suffix != ".py":
-            continue
-        # Note: path allow/deny is applied at symbol-level inside `check` so that
-        # annotation-based overrides can include symbols even from otherwise
-        # excluded files.
-
-        # Get the contents before and after the diff.
-        #
-        # Note that if the file doesn't exist, it is equivalent to it
-        # being empty.
-        after = repo.get_contents(file, commit_id=head) or ""
-        before = repo.get_contents(file, commit_id=base) or ""
-
-        with tempfile.NamedTemporaryFile() as before_file:
-            before_path = pathlib.Path(before_file.name)
-            before_path.write_text(before)
-
-            with tempfile.NamedTemporaryFile() as after_file:
-                after_path = pathlib.Path(after_file.name)
-                after_path.write_text(after)
-
-                violations = api.compatibility.check(
-                    before_path, after_path, file_path=file, config=cfg
-                )
-                if len(violations) > 0:
-                    result[file] = violations
+    for file in files:
+        violations = check_apis(
+            _api_at(file, base), _api_at(file, head), file_path=file, config=cfg
+        )
+        if len(violations) > 0:
+            result[file] = violations
 
     return result
 
 
+def _extract_blobs(
+    blobs: Sequence[api.git.Blob],
+    *,
+    cache: api.cache.APICache | None,
+    max_workers: int | None,
+) -> Mapping[str, api.API]:
+    """Extracts the API of every distinct blob, keyed by blob id."""
+    apis: dict[str, api.API] = {}
+    pending: dict[str, bytes] = {}
+    for blob in blobs:
+        if blob.sha in apis or blob.sha in pending:
+            continue
+        cached = cache.get(blob.sha) if cache is not None else None
+        if cached is not None:
+            apis[blob.sha] = cached
+        else:
+            pending[blob.sha] = blob.contents
+
+    if len(pending) > 1 and max_workers != 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+            extracted = dict(
+                zip(pending, executor.map(_extract_contents, pending.values()))
+            )
+    else:
+        extracted = {sha: _extract_contents(c) for sha, c in pending.items()}
+
+    for sha, extracted_api in extracted.items():
+        if cache is not None:
+            cache.put(sha, extracted_api)
+        apis[sha] = extracted_api
+    return apis
+
+
+def _extract_contents(contents: bytes) -> api.API:
+    """Extracts the API from blob contents (runs in worker processes)."""
+    return api.ast.extract_source(contents, include_classes=True)
+
+
 def check(
     before: pathlib.Path,
     after: pathlib.Path,
@@ -63,9 +120,23 @@ def check(
     config: api.config.Config | None = None,
 ) -> Sequence[api.violations.Violation]:
     """Identifies API compatibility issues between two files."""
+    return check_apis(
+        api.ast.extract(before, include_classes=True),
+        api.ast.extract(after, include_classes=True),
+        file_path=file_path,
+        config=config,
+    )
+
+
+def check_apis(
+    before_api: api.API,
+    after_api: api.API,
+    *,
+    file_path: pathlib.Path | None = None,
+    config: api.config.Config | None = None,
+) -> Sequence[api.violations.Violation]:
+    """Identifies API compatibility issues between two extracted APIs."""
     cfg = config or api.config.default_config()
-    before_api = api.ast.extract(before, include_classes=True)
-    after_api = api.ast.extract(after, include_classes=True)
     before_funcs = before_api.functions
     after_funcs = after_api.functions
     before_classes = before_api.classes
@@ -2,12 +2,24 @@
 
 from __future__ import annotations
 
+import dataclasses
+import os
 import pathlib
 import subprocess
-from collections.abc import Iterable
+from collections.abc import Iterable, Mapping, Sequence
 from typing import Any, Optional, Union
 
 
+@dataclasses.dataclass(frozen=True)
+class Blob:
+    """Represents the contents of a file at a specific commit."""
+
+    # The git object id of the blob.
+    sha: str
+    # The raw contents of the blob.
+    contents: bytes
+
+
 class Repository:
     """Represents a local git repository."""
 
@@ -47,6 +59,48 @@ class Repository:
         assert proc.stdout is not None  # this was piped
         return proc.stdout
 
+    def get_blobs(
+        self, specs: Sequence[tuple[pathlib.Path, str]], /
+    ) -> Mapping[tuple[pathlib.Path, str], Optional[Blob]]:
+        """Gets the blobs for many (path, commit_id) pairs at once.
+
+        All objects are read through a single `git cat-file --batch`
+        process. Missing files map to None.
+        """
+        if len(specs) == 0:
+            return {}
+        request = "".join(
+            f"{commit_id}:{os.fspath(path)}\n" for path, commit_id in specs
+        )
+        proc = subprocess.run(
+            ["git", "cat-file", "--batch"],
+            cwd=self._dir,
+            input=request.encode(),
+            stdout=subprocess.PIPE,
+            check=True,
+        )
+        out = proc.stdout
+
+        blobs: dict[tuple[pathlib.Path, str], Optional[Blob]] = {}
+        pos = 0
+        for spec in specs:
+            end = out.index(b"\n", pos)
+            header = out[pos:end].decode()
+            pos = end + 1
+            fields = header.split(" ")
+            # Missing objects are reported as "<spec> missing" (or
+            # "ambiguous"), which may itself contain spaces.
+            if len(fields) < 3 or fields[-1] in ("missing", "ambiguous"):
+                blobs[spec] = None
+                continue
+            sha, kind, size = fields[0], fields[1], int(fields[2])
+            object_end = pos + size
+            contents = out[pos:object_end]
+            # Every object is followed by a newline.
+            pos = object_end + 1
+            blobs[spec] = Blob(sha=sha, contents=contents) if kind == "blob" else None
+        return blobs
+
     def run(
         self, args: list[Union[pathlib.Path, str]], /, **kwargs: Any
     ) -> subprocess.CompletedProcess[str]:
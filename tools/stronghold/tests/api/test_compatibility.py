@@ -1,7 +1,10 @@
 import pathlib
 import textwrap
 from typing import Any, List
+from unittest import mock
 
+import api.ast
+import api.cache
 import api.compatibility
 import api.violations
 import pytest
@@ -842,6 +845,67 @@ def test_check_range(git_repo: api.git.Repository) -> None:
     }
 
 
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_check_range_many_files(max_workers: int, git_repo: api.git.Repository) -> None:
+    contents = textwrap.dedent(
+        """
+        def will_be_deleted():
+          pass
+        """
+    )
+    paths = [pathlib.Path(f"module_{i}.py") for i in range(4)]
+    for path in paths:
+        git.commit_file(git_repo, path, contents)
+    git_repo.run(["tag", "base"], check=True)
+    for path in paths[:3]:
+        git.commit_file(git_repo, path, "")
+
+    violations = api.compatibility.check_range(
+        git_repo, head="HEAD", base="base", max_workers=max_workers
+    )
+
+    assert violations == {
+        path: [api.violations.FunctionDeleted(func="will_be_deleted", line=1)]
+        for path in paths[:3]
+    }
+
+
+def test_check_range_uses_cache(
+    git_repo: api.git.Repository, tmp_path_factory: pytest.TempPathFactory
+) -> None:
+    git.commit_file(
+        git_repo,
+        pathlib.Path("module.py"),
+        textwrap.dedent(
+            """
+            def will_be_deleted():
+              pass
+            """
+        ),
+    )
+    git.commit_file(git_repo, pathlib.Path("module.py"), "")
+    cache = api.cache.APICache(tmp_path_factory.mktemp("cache"))
+
+    expected = {
+        pathlib.Path("module.py"): [
+            api.violations.FunctionDeleted(func="will_be_deleted", line=1)
+        ],
+    }
+    violations = api.compatibility.check_range(
+        git_repo, head="HEAD", base="HEAD~", cache=cache
+    )
+    assert violations == expected
+
+    # Both versions are now cached, so they must not be parsed again.
+    with mock.patch.object(
+        api.ast, "extract_source", side_effect=AssertionError("re-parsed")
+    ):
+        violations = api.compatibility.check_range(
+            git_repo, head="HEAD", base="HEAD~", cache=cache
+        )
+    assert violations == expected
+
+
 def test_class_field_removed(tmp_path: pathlib.Path) -> None:
     before = tmp_path / "before_cls.py"
     before.write_text(
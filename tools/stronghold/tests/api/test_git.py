@@ -1,4 +1,5 @@
 import pathlib
+import subprocess
 
 import api.git
 from testing import git
@@ -42,3 +43,29 @@ def test_custom_commit_id(git_repo: api.git.Repository) -> None:
     git.commit_file(git_repo, file, "new contents\n")
 
     assert git_repo.get_contents(file, commit_id="HEAD~") == "contents\n"
+
+
+def test_get_blobs(git_repo: api.git.Repository) -> None:
+    file = pathlib.Path("meh.txt")
+    other = pathlib.Path("dir with spaces/other.txt")
+
+    git.commit_file(git_repo, file, "contents\n")
+    git.commit_file(git_repo, file, "new contents\n")
+    git.commit_file(git_repo, other, "")
+
+    blobs = git_repo.get_blobs(
+        [(file, "HEAD~2"), (file, "HEAD"), (other, "HEAD"), (other, "HEAD~2")]
+    )
+
+    before = blobs[(file, "HEAD~2")]
+    after = blobs[(file, "HEAD")]
+    empty = blobs[(other, "HEAD")]
+    assert before is not None and before.contents == b"contents\n"
+    assert after is not None and after.contents == b"new contents\n"
+    assert empty is not None and empty.contents == b""
+    assert blobs[(other, "HEAD~2")] is None
+    # The blob ids match git's own view of the objects.
+    pinfo = git_repo.run(
+        ["rev-parse", f"HEAD~2:{file}"], check=True, stdout=subprocess.PIPE
+    )
+    assert before.sha == pinfo.stdout.strip()
@@ -0,0 +1,235 @@
+"""Tests for tools/scripts/backfill_events against a fake GitHub and moto's S3 and DynamoDB.
+
+Run from the repo root with either:
+    python3 -m unittest discover -vs tools/tests -p 'test_*.py'
+    pytest tools/tests/test_backfill_events.py
+"""
+
+import gzip
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+from unittest import main, mock, TestCase
+
+import boto3
+from moto import mock_aws
+
+from tools.scripts.backfill_events import (
+    Backfiller,
+    BUCKET_NAME,
+    DYNAMODB_TABLES,
+    load_checkpoint,
+    RateLimiter,
+)
+
+
+class FakeResponse:
+    def __init__(self, json: Any) -> None:
+        self.json = json
+
+
+class FakeActions:
+    """The few GitHub Actions endpoints used by the backfill, from memory"""
+
+    def __init__(self, jobs_per_run: Dict[int, int]) -> None:
+        # Newest run first, like GitHub lists them
+        self.runs = [{"id": run_id} for run_id in sorted(jobs_per_run, reverse=True)]
+        self.jobs_per_run = jobs_per_run
+        self.failing_job: Optional[int] = None
+        self.lock = threading.Lock()
+        self.listed_runs: Set[int] = set()
+
+    def list_workflow_runs_for_repo(
+        self, owner: str, repo: str, per_page: int, page: int
+    ) -> FakeResponse:
+        start = (page - 1) * per_page
+        return FakeResponse(
+            {
+                "total_count": len(self.runs),
+                "workflow_runs": [
+                    dict(run) for run in self.runs[start : start + per_page]
+                ],
+            }
+        )
+
+    def list_jobs_for_workflow_run(
+        self, owner: str, repo: str, run_id: int, filter: str, per_page: int, page: int
+    ) -> FakeResponse:
+        with self.lock:
+            self.listed_runs.add(run_id)
+        total_count = self.jobs_per_run[run_id]
+        jobs = [
+            {"id": run_id * 1000 + i, "run_id": run_id, "conclusion": "success"}
+            for i in range((page - 1) * per_page, min(page * per_page, total_count))
+        ]
+        return FakeResponse({"total_count": total_count, "jobs": jobs})
+
+    def download_job_logs_for_workflow_run(
+        self, owner: str, repo: str, job_id: int
+    ) -> FakeResponse:
+        if job_id == self.failing_job:
+            raise RuntimeError(f"Failed to download the log of {job_id}")
+        return FakeResponse(f"log of {job_id}")
+
+
+class FakeOctokit:
+    def __init__(self, jobs_per_run: Dict[int, int]) -> None:
+        self.actions = FakeActions(jobs_per_run)
+
+
+class TestBackfill(TestCase):
+    def setUp(self) -> None:
+        env = mock.patch.dict(
+            os.environ,
+            {
+                "AWS_ACCESS_KEY_ID": "testing",
+                "AWS_SECRET_ACCESS_KEY": "testing",
+                "AWS_DEFAULT_REGION": "us-east-1",
+            },
+        )
+        env.start()
+        self.addCleanup(env.stop)
+        aws = mock_aws()
+        aws.start()
+        self.addCleanup(aws.stop)
+        self.s3 = boto3.client("s3")
+        self.s3.create_bucket(Bucket=BUCKET_NAME)
+        self.dynamodb = boto3.client("dynamodb")
+        for table in DYNAMODB_TABLES.values():
+            self.dynamodb.create_table(
+                TableName=table,
+                KeySchema=[{"AttributeName": "dynamoKey", "KeyType": "HASH"}],
+                AttributeDefinitions=[
+                    {"AttributeName": "dynamoKey", "AttributeType": "S"}
+                ],
+                BillingMode="PAY_PER_REQUEST",
+            )
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.checkpoint = os.path.join(tmp.name, "checkpoint.json")
+        # 3 pages of runs, a few of them with more than a page of jobs
+        self.jobs_per_run = {
+            run_id: (150 if run_id % 100 == 0 else run_id % 3)
+            for run_id in range(1, 231)
+        }
+        self.client = FakeOctokit(self.jobs_per_run)
+
+    def backfill(self, limit: int = 0) -> None:
+        backfiller = Backfiller(
+            self.client,
+            "pytorch",
+            "vision",
+            s3=self.s3,
+            dynamodb=self.dynamodb,
+            workers=4,
+            log_workers=8,
+            classifier_url=None,
+        )
+        with mock.patch("builtins.print"):
+            backfiller.backfill("workflow_run", limit=limit, checkpoint=self.checkpoint)
+
+    def keys(self, prefix: str) -> List[str]:
+        paginator = self.s3.get_paginator("list_objects_v2")
+        return [
+            obj["Key"]
+            for page in paginator.paginate(Bucket=BUCKET_NAME, Prefix=prefix)
+            for obj in page.get("Contents", [])
+        ]
+
+    def count_items(self, table: str) -> int:
+        paginator = self.dynamodb.get_paginator("scan")
+        return sum(
+            page["Count"]
+            for page in paginator.paginate(TableName=table, Select="COUNT")
+        )
+
+    def assert_backfilled(self) -> None:
+        total_jobs = sum(self.jobs_per_run.values())
+        self.assertEqual(
+            len(self.keys("workflow_run/pytorch/vision/")), len(self.jobs_per_run)
+        )
+        self.assertEqual(len(self.keys("workflow_job/pytorch/vision/")), total_jobs)
+        self.assertEqual(len(self.keys("log/pytorch/vision/")), total_jobs)
+        self.assertEqual(
+            self.count_items("torchci-workflow-run"), len(self.jobs_per_run)
+        )
+        self.assertEqual(self.count_items("torchci-workflow-job"), total_jobs)
+
+    def test_backfill(self) -> None:
+        self.backfill()
+        self.assert_backfilled()
+        log = self.s3.get_object(Bucket=BUCKET_NAME, Key="log/pytorch/vision/100149")
+        self.assertEqual(gzip.decompress(log["Body"].read()), b"log of 100149")
+        self.assertEqual(log["Metadata"], {"conclusion": "success"})
+        item = self.dynamodb.get_item(
+            TableName="torchci-workflow-job",
+            Key={"dynamoKey": {"S": "pytorch/vision/100149"}},
+        )["Item"]
+        self.assertEqual(item["run_id"], {"N": "100"})
+        # Everything was backfilled, down to the oldest run
+        key = {
+            "owner": "pytorch",
+            "repo": "vision",
+            "event": "workflow_run",
+            "branch": "",
+        }
+        self.assertEqual(load_checkpoint(self.checkpoint, key), 1)
+        with self.assertWarnsRegex(UserWarning, "Ignoring checkpoint"):
+            self.assertIsNone(
+                load_checkpoint(self.checkpoint, {**key, "repo": "audio"})
+            )
+
+    def test_resume(self) -> None:
+        # Crashes on a job of run 100, in the middle of the second page
+        self.client.actions.failing_job = 100_149
+        with self.assertRaisesRegex(RuntimeError, "100149"):
+            self.backfill()
+        key = {
+            "owner": "pytorch",
+            "repo": "vision",
+            "event": "workflow_run",
+            "branch": "",
+        }
+        resume_from = load_checkpoint(self.checkpoint, key)
+        assert resume_from is not None
+        # Every run newer than the one that failed is done
+        self.assertGreater(resume_from, 100)
+
+        self.client.actions.failing_job = None
+        self.client.actions.listed_runs.clear()
+        self.backfill()
+        self.assert_backfilled()
+        # Only the runs after the checkpoint were processed again
+        self.assertEqual(self.client.actions.listed_runs, set(range(1, resume_from)))
+        self.assertEqual(load_checkpoint(self.checkpoint, key), 1)
+
+    def test_limit(self) -> None:
+        self.backfill(limit=100)
+        # Whole pages of runs
+        self.assertEqual(self.client.actions.listed_runs, set(range(131, 231)))
+
+
+class TestRateLimiter(TestCase):
+    def test_spaces_out_requests(self) -> None:
+        limiter = RateLimiter(requests_per_hour=3600 * 50)
+        start = time.monotonic()
+        threads = [threading.Thread(target=limiter.wait) for _ in range(11)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # The first request goes straight away, the others 20ms apart
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+    def test_no_limit(self) -> None:
+        limiter = RateLimiter(requests_per_hour=0)
+        start = time.monotonic()
+        for _ in range(1000):
+            limiter.wait()
+        self.assertLess(time.monotonic() - start, 0.1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Tests for tools/analytics/cubinsizes against a synthetic ELF with a fatbin section.
+
+Run from the repo root with either:
+    python3 -m unittest discover -vs tools/tests -p 'test_*.py'
+    pytest tools/tests/test_cubinsizes.py
+"""
+
+import os
+import struct
+import tempfile
+import zipfile
+import zlib
+from typing import List, Tuple
+from unittest import main, mock, TestCase
+
+from tools.analytics.cubinsizes import (
+    analyze_file,
+    analyze_wheel_member,
+    CUBIN_HEADER,
+    ELF64_HEADER,
+    ELF64_SECTION_HEADER,
+    FATBIN_HEADER,
+    fatbin_sizes,
+    SHF_COMPRESSED,
+)
+
+
+CUBIN_HEADER_SIZE = 64
+# (kind, sm_ver, elf_size) of each cubin, kind 1 is ptx and 2 is sm
+FATBINS = [
+    [(2, 80, 100), (1, 90, 40), (2, 80, 20)],
+    [(2, 90, 300)],
+]
+EXPECTED = {"sm_80": 120, "ptx_90": 40, "sm_90": 300}
+
+
+def make_fatbin(fatbins: List[List[Tuple[int, int, int]]]) -> bytes:
+    data = b""
+    for cubins in fatbins:
+        body = b""
+        for kind, sm_ver, elf_size in cubins:
+            header = CUBIN_HEADER.pack(
+                kind, 0x0101, CUBIN_HEADER_SIZE, elf_size, 0, 0x10000, sm_ver
+            )
+            body += header.ljust(CUBIN_HEADER_SIZE, b"\0") + b"\xcc" * elf_size
+        data += FATBIN_HEADER.pack(0xBA55ED50, 1, FATBIN_HEADER.size, len(body))
+        data += body
+    return data
+
+
+def make_elf(section: bytes, compressed: bool = False) -> bytes:
+    """A little-endian ELF64 with .nv_fatbin, .shstrtab and a trailing section table."""
+    flags = 0x2
+    if compressed:
+        # Elf64_Chdr with ELFCOMPRESS_ZLIB, as written by --compress-debug-sections
+        section = struct.pack("<IIQQ", 1, 0, len(section), 8) + zlib.compress(section)
+        flags |= SHF_COMPRESSED
+    names = b"\0.nv_fatbin\0.shstrtab\0"
+    fatbin_offset = ELF64_HEADER.size
+    names_offset = fatbin_offset + len(section)
+    shoff = (names_offset + len(names) + 7) & ~7
+    sections = [
+        ELF64_SECTION_HEADER.pack(0, 0, 0, 0, 0, 0, 0, 0, 0, 0),
+        ELF64_SECTION_HEADER.pack(
+            1, 1, flags, 0, fatbin_offset, len(section), 0, 0, 8, 0
+        ),
+        ELF64_SECTION_HEADER.pack(11, 3, 0, 0, names_offset, len(names), 0, 0, 1, 0),
+    ]
+    header = ELF64_HEADER.pack(
+        b"\x7fELF\x02\x01\x01".ljust(16, b"\0"),
+        3,
+        62,
+        1,
+        0,
+        0,
+        shoff,
+        0,
+        ELF64_HEADER.size,
+        0,
+        0,
+        ELF64_SECTION_HEADER.size,
+        len(sections),
+        2,
+    )
+    data = header + section + names
+    return data.ljust(shoff, b"\0") + b"".join(sections)
+
+
+class TestCubinSizes(TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.tmpdir = tmpdir.name
+
+    def write_wheel(self, elf: bytes, compression: int) -> str:
+        path = os.path.join(self.tmpdir, "torch-2.0-cp312-none-linux_x86_64.whl")
+        with zipfile.ZipFile(path, "w", compression) as zf:
+            zf.writestr("torch/lib/libtorch_cuda.so", elf)
+        return path
+
+    def test_fatbin_sizes(self) -> None:
+        data = memoryview(make_fatbin(FATBINS))
+        self.assertEqual(fatbin_sizes(data), EXPECTED)
+
+    def test_bad_magic(self) -> None:
+        data = bytearray(make_fatbin(FATBINS))
+        data[0] ^= 0xFF
+        with self.assertRaisesRegex(RuntimeError, "fatbin magic"):
+            fatbin_sizes(memoryview(data))
+
+    def test_analyze_file(self) -> None:
+        for compressed in (False, True):
+            with self.subTest(compressed=compressed):
+                path = os.path.join(self.tmpdir, "libtorch_cuda.so")
+                with open(path, "wb") as f:
+                    f.write(make_elf(make_fatbin(FATBINS), compressed))
+                name, sections = analyze_file(path, "libtorch_cuda.so")
+                self.assertEqual(sections[".nv_fatbin"], EXPECTED)
+                self.assertEqual(sections["__nv_relfatbin"], {})
+
+    def test_wheel_member_is_read_in_place(self) -> None:
+        elf = make_elf(make_fatbin(FATBINS))
+        for compression in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            with self.subTest(compression=compression):
+                wheel = self.write_wheel(elf, compression)
+                with mock.patch("tools.analytics.cubinsizes.NamedTemporaryFile") as tmp:
+                    name, sections = analyze_wheel_member(
+                        wheel, "torch/lib/libtorch_cuda.so"
+                    )
+                tmp.assert_not_called()
+                self.assertEqual(name, "torch/lib/libtorch_cuda.so")
+                self.assertEqual(
+                    sections, {".nv_fatbin": EXPECTED, "__nv_relfatbin": {}}
+                )
+
+    def test_wheel_member_with_compressed_section(self) -> None:
+        # Falls back to extracting the library and decompressing with pyelftools
+        wheel = self.write_wheel(
+            make_elf(make_fatbin(FATBINS), compressed=True), zipfile.ZIP_DEFLATED
+        )
+        name, sections = analyze_wheel_member(wheel, "torch/lib/libtorch_cuda.so")
+        self.assertEqual(sections[".nv_fatbin"], EXPECTED)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 from typing import Any, Dict, List
 from unittest import main, mock, TestCase
 
-from tools.scripts.fetch_latest_green_commit import is_green, WorkflowCheck
+from tools.scripts.fetch_latest_green_commit import (
+    get_latest_green_commit,
+    is_green,
+    WorkflowCheck,
+)
 
 
 workflow_names = [
@@ -232,5 +236,72 @@ class TestPrintCommits(TestCase):
         self.assertTrue(result[0])
 
 
+@mock.patch(
+    "tools.scripts.fetch_latest_green_commit.fetch_unstable_issues",
+    return_value=["pull / unreliable (config)"],
+)
+class TestLatestGreenCommit(TestCase):
+    def make_results(self, sha: str, **conclusions: str) -> List[Dict[str, Any]]:
+        results = []
+        for check in TestChecks().make_test_checks():
+            name = check["workflowName"]
+            check["conclusion"] = conclusions.get(name, "success")
+            results.append({"sha": sha, **check})
+        return results
+
+    def test_latest_green_commit(self, mock_fetch_unstable_issues: Any) -> None:
+        """Every commit is checked against its own results, newest first"""
+        results = (
+            self.make_results("b", trunk="failure")
+            + self.make_results("c", Lint="cancelled")
+            + self.make_results("d")
+        )
+        # a has no results, unstable jobs don't count
+        results = [check for check in results if check["workflowName"] != "Apple"]
+        for sha in "bcd":
+            results.append(
+                WorkflowCheck(
+                    workflowName="Apple",
+                    name="test/job",
+                    jobName="job",
+                    conclusion="success",
+                )._asdict()
+                | {"sha": sha}
+            )
+            results.append(
+                WorkflowCheck(
+                    workflowName="pull",
+                    name="pull / unreliable (config, 1, 2)",
+                    jobName="unreliable",
+                    conclusion="failure",
+                )._asdict()
+                | {"sha": sha}
+            )
+
+        with mock.patch("tools.scripts.fetch_latest_green_commit.eprint") as eprint:
+            green = get_latest_green_commit(list("abcd"), requires, results)
+        self.assertEqual(green, "d")
+        self.assertEqual(
+            [call.args[0] for call in eprint.call_args_list],
+            [
+                "Checking a",
+                "RED: missing required workflows: pull, trunk, lint, "
+                "linux-binary-libtorch-pre-cxx11, ^Apple$",
+                "Checking b",
+                "RED: trunk was not successful, test/job failed",
+                "Checking c",
+                "RED: Lint was not successful, test/job failed",
+                "Checking d",
+                "GREEN",
+            ],
+        )
+        # Every commit agrees with checking it on its own
+        for sha in "abcd":
+            self.assertEqual(
+                is_green(sha, requires, results)[0],
+                sha == "d",
+            )
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,91 @@
+"""Tests for GitRepo.compute_branch_diffs on small local repos.
+
+Run from the repo root with either:
+    python3 -m unittest discover -vs tools/tests -p 'test_*.py'
+    pytest tools/tests/test_gitutils.py
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+from unittest import main, skipIf, TestCase
+
+from tools.scripts.gitutils import GitRepo
+
+
+@skipIf(shutil.which("git") is None, "git is not installed")
+class TestComputeBranchDiffs(TestCase):
+    def setUp(self) -> None:
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.date = 1_600_000_000
+        self.git("init", "-q", "-b", "main")
+        self.git("remote", "add", "origin", "https://github.com/pytorch/example")
+        self.commit("README", "Initial commit")
+        self.git("branch", "release")
+        self.repo = GitRepo(self.path)
+
+    def git(self, *args: str) -> str:
+        env = {
+            **os.environ,
+            "GIT_AUTHOR_NAME": "Dev",
+            "GIT_AUTHOR_EMAIL": "dev@example.com",
+            "GIT_COMMITTER_NAME": "Dev",
+            "GIT_COMMITTER_EMAIL": "dev@example.com",
+            "GIT_AUTHOR_DATE": f"{self.date} +0000",
+            "GIT_COMMITTER_DATE": f"{self.date} +0000",
+        }
+        # Every commit gets its own date
+        self.date += 1
+        return subprocess.check_output(
+            ["git", "-C", self.path, *args], env=env, text=True
+        ).strip()
+
+    def commit(self, path: str, title: str) -> str:
+        with open(os.path.join(self.path, path), "w") as f:
+            f.write(title)
+        self.git("add", path)
+        self.git("commit", "-q", "-m", title)
+        return self.git("rev-parse", "HEAD")
+
+    def cherry_pick(self, branch: str, *commits: str) -> None:
+        self.git("checkout", "-q", branch)
+        for commit in commits:
+            self.git("cherry-pick", commit)
+        self.git("checkout", "-q", "main")
+
+    def test_duplicate_and_revert(self) -> None:
+        a = self.commit("a", "Change A")
+        b = self.commit("b", "Change B")
+        self.git("revert", "--no-edit", "HEAD")
+        revert = self.git("rev-parse", "HEAD")
+        self.git("cherry-pick", b)
+        reland = self.git("rev-parse", "HEAD")
+        c = self.commit("c", "Change C")
+        self.cherry_pick("release", a, b)
+
+        self.assertEqual(
+            self.repo.compute_branch_diffs("main", "release"),
+            ([c, reland, revert], []),
+        )
+        self.assertEqual(
+            self.repo.compute_branch_diffs("release", "main"),
+            ([], [c, reland, revert]),
+        )
+
+    def test_unexpected_duplicate(self) -> None:
+        b = self.commit("b", "Change B")
+        self.git("revert", "--no-edit", "HEAD")
+        self.git("cherry-pick", b)
+        self.cherry_pick("release", b)
+        self.git("checkout", "-q", "release")
+        self.git("commit", "-q", "--amend", "-m", "Another change")
+        self.git("checkout", "-q", "main")
+
+        with self.assertRaisesRegex(RuntimeError, "Unexpected differences"):
+            self.repo.compute_branch_diffs("main", "release")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Tests for the in-process grep/sed translation of the grep linter.
+
+Run from the repo root with either:
+    python3 -m unittest discover -vs tools/tests -p 'test_*.py'
+    pytest tools/tests/test_grep_linter.py
+"""
+
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from unittest import main, skipIf, TestCase
+
+from tools.linter.adapters.grep_linter import (
+    GrepEngine,
+    parse_sed,
+    translate_ere,
+    UnsupportedPattern,
+)
+
+
+def ere_search(pattern: str, line: str) -> bool:
+    return re.search(translate_ere(pattern), line) is not None
+
+
+class TestTranslateEre(TestCase):
+    def test_escapes(self) -> None:
+        self.assertTrue(ere_search(r"a\.b", "a.b"))
+        self.assertFalse(ere_search(r"a\.b", "axb"))
+        self.assertTrue(ere_search(r"\(x\)", "(x)"))
+        self.assertTrue(ere_search(r"\s\w+", " word"))
+        self.assertTrue(ere_search(r"\<foo\>", "a foo b"))
+        self.assertFalse(ere_search(r"\<foo\>", "afoob"))
+        # \t is a tab for sed only
+        self.assertEqual(translate_ere(r"\t", escapes="tn"), r"\t")
+        for pattern in (r"\t", "a\\", r"\d", "é"):
+            with self.subTest(pattern=pattern):
+                with self.assertRaises(UnsupportedPattern):
+                    translate_ere(pattern)
+
+    def test_bracket_expressions(self) -> None:
+        self.assertTrue(ere_search(r"[]x]", "]"))
+        self.assertTrue(ere_search(r"[^]x]", "y"))
+        self.assertFalse(ere_search(r"^[^]x]$", "]"))
+        # A backslash is literal inside brackets
+        self.assertTrue(ere_search(r"[\n]", "\\"))
+        self.assertFalse(ere_search(r"[\n]", "\n"))
+        self.assertTrue(ere_search("[[:blank:]]+$", "x \t"))
+        self.assertTrue(ere_search("^[[:upper:][:digit:]_-]+$", "AB_1-"))
+        self.assertFalse(ere_search("[[:upper:]]", "ab"))
+        for pattern in ("[abc", "[[:nope:]]", "[[=a=]]", "[[.a.]]", "[é]"):
+            with self.subTest(pattern=pattern):
+                with self.assertRaises(UnsupportedPattern):
+                    translate_ere(pattern)
+
+    def test_quantifiers(self) -> None:
+        self.assertTrue(ere_search("^a{2,3}$", "aaa"))
+        self.assertFalse(ere_search("^a{2,3}$", "a"))
+        self.assertTrue(ere_search("a{", "a{"))
+        # ERE reads these as (a*)? and (a*)+, Python as lazy and possessive
+        for pattern in ("a*?", "a*+", "a{2}?", "a+*"):
+            with self.subTest(pattern=pattern):
+                with self.assertRaises(UnsupportedPattern):
+                    translate_ere(pattern)
+
+    def test_alternation(self) -> None:
+        self.assertTrue(ere_search("foo|bar", "bar"))
+        # Every line of a grep pattern is an alternative
+        self.assertTrue(ere_search("foo\nbar", "bar"))
+        for pattern in ("a|ab", "(a|ab)c", "x\ny", "(ab)*", "a*(ab)+", "(a){2}"):
+            with self.subTest(pattern=pattern):
+                with self.assertRaises(UnsupportedPattern):
+                    translate_ere(pattern, exact_match=True)
+        # Escaped and bracketed | are literal
+        self.assertEqual(translate_ere(r"a\|b[|]", exact_match=True), r"a\|b[\|]")
+        self.assertEqual(translate_ere("(ab)c*", exact_match=True), "(ab)c*")
+
+    def test_invalid_regex(self) -> None:
+        with self.assertRaises(UnsupportedPattern):
+            translate_ere("(a")
+
+
+class TestParseSed(TestCase):
+    def test_replacement(self) -> None:
+        cases = [
+            ("s/[[:blank:]]+$//", "x  \t", "x"),
+            ("s/\t/    /", "\ta\tb", "    a\tb"),
+            ("s/\t/    /g", "\ta\tb", "    a    b"),
+            ("s/a/[&]/g", "banana", "b[a]n[a]n[a]"),
+            (r"s/(\w+)-(\w+)/\2-\1/", "ab-cd ef-gh", "cd-ab ef-gh"),
+            (r"s/x(y?)/<\1>/g", "xy x", "<y> <>"),
+            (r"s/a/\&\n/", "a", "&\n"),
+            ("s/A/b/Ig", "aA", "bb"),
+            (r"s|/usr|\|opt|", "/usr/bin", "|opt/bin"),
+            (r"s/a\/b/c/", "a/b", "c"),
+            ("s,x,y,", "xx", "yx"),
+        ]
+        for script, line, expected in cases:
+            with self.subTest(script=script, line=line):
+                sed = parse_sed(script)
+                self.assertEqual(sed.apply(line.encode()), expected.encode())
+
+    def test_max_count(self) -> None:
+        self.assertEqual(parse_sed("s/a/b/").max_count, 1)
+        self.assertEqual(parse_sed("s/a/b/g").max_count, 0)
+
+    def test_unsupported_scripts(self) -> None:
+        for script in (
+            "y/a/b/",
+            "s/a/b",
+            "s//b/",
+            "s/a/b/p",
+            "s/a/b/2",
+            r"s/a/\U&/",
+            "s/(a|ab)/X/",
+            "s/a*(ab)*/X/",
+            "s/a*?/X/",
+        ):
+            with self.subTest(script=script):
+                with self.assertRaises(UnsupportedPattern):
+                    parse_sed(script)
+
+
+SED_CASES = [
+    ("s/[[:blank:]]+$//", "trailing  \t\nnone\n"),
+    ("s/\t/    /", "\tone\ttab\nnone\n"),
+    ("s/(a+)(b*)/<\\2\\1>/g", "aab ab b aaa\n"),
+    ("s/(a|ab)/X/", "abc\n"),
+    ("s/a*(ab)*/X/", "aabc\n"),
+    ("s/[^[:alnum:] ]/_/g", "a-b c.d\n"),
+]
+
+
+@skipIf(shutil.which("sed") is None, "sed is not installed")
+class TestGrepEngineReplacement(TestCase):
+    """The replacement, in process or through sed, is the one `sed -r` makes"""
+
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def test_matches_sed(self) -> None:
+        for script, content in SED_CASES:
+            with self.subTest(script=script):
+                path = os.path.join(self.dir, "file.txt")
+                with open(path, "w") as f:
+                    f.write(content)
+                engine = GrepEngine(
+                    ".", None, script, "TEST", "test", "desc", match_first_only=True
+                )
+                [message] = engine.lint_file(path)
+                expected = subprocess.run(
+                    ["sed", "-r", script, path], capture_output=True, check=True
+                ).stdout.decode()
+                self.assertEqual(message.replacement, expected)
+                self.assertEqual(message.original, content)
+
+    def test_falls_back_to_sed_for_alternation(self) -> None:
+        engine = GrepEngine(
+            ".", None, "s/(a|ab)/X/", "TEST", "test", "desc", match_first_only=True
+        )
+        self.assertIsNone(engine.sed)
+        path = os.path.join(self.dir, "file.txt")
+        with open(path, "w") as f:
+            f.write("abc\n")
+        [message] = engine.lint_file(path)
+        self.assertEqual(message.replacement, "Xc\n")
+
+
+if __name__ == "__main__":
+    main()